@@ -8,20 +8,49 @@ and batch operations. All endpoints require authentication and rate limiting.
 
 import time
 import uuid
-from typing import Dict, Any
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, BackgroundTasks
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Any, List, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, BackgroundTasks, Request
 from fastapi import status as http_status
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 import structlog
 
 from app.core.config import settings, OCRType
 from app.core.redis import check_rate_limit, increment_rate_limit, get_queue_length
-from app.core.monitoring import get_system_health
+from app.core.health import health_monitor
+from app.core.monitoring import StageTimer
+from app.core.startup import startup_timeline
+from app.core.stats import request_stats
+from app.services.admission import AdmissionRejected
+from app.services.batch_stream import BatchStream, StreamItem, upload_items
+from app.services.bulk_job import BulkJobError, BulkJobSpec, bulk_jobs, shop_results_prefix, stored_status
+from app.services.compact_image import COMPACT_CONTENT_TYPE, HEADER_SIZE, is_compact, parse_header
+from app.services.deadlines import (
+    ClientDisconnected,
+    DeadlineExceeded,
+    expire,
+    resolve_deadline,
+    run_until_disconnected
+)
+from app.services.image_quality import ImageRejected
 from app.services.ocr_service import OCRService
+from app.services.scheduler import Lane
+from app.services.storage import (
+    LocalObjectStore,
+    ObjectNotFound,
+    StoredObject,
+    get_object_store,
+    is_clean_key,
+    is_shop_prefix,
+    is_shop_upload,
+    upload_prefix,
+    verify_upload_signature
+)
 from app.models.schemas import (
     OCRRequest, OCRResult, BatchOCRRequest, BatchOCRResponse,
     AsyncOCRRequest, AsyncOCRStatus, HealthStatus, MetricsResponse,
-    UploadResponse, OCRError, WebSocketMessage
+    UploadResponse, OCRError, WebSocketMessage, BulkJobRequest, BulkJobStatus,
+    PresignedUploadRequest, PresignedUploadResponse
 )
 
 # Configure logging
@@ -49,11 +78,206 @@ async def check_rate_limits(user_id: str, shop_id: str) -> None:
     await increment_rate_limit(user_id, shop_id)
 
 
+# Non-standard status (as used by nginx) for requests the client abandoned
+HTTP_499_CLIENT_CLOSED_REQUEST = 499
+
+OCR_TYPES = (OCRType.PRODUCT, OCRType.RECEIPT, OCRType.INVOICE, OCRType.BARCODE, OCRType.HANDWRITTEN)
+
+
+def check_ocr_type(ocr_type: str) -> None:
+    """Reject an ocr_type no parser or profile knows about."""
+    if ocr_type not in OCR_TYPES:
+        raise HTTPException(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid ocr_type: must be one of {', '.join(OCR_TYPES)}"
+        )
+
+
+def request_deadline(http_request: Request, default_seconds: float) -> float:
+    """Absolute deadline from the client's timeout header or the endpoint default."""
+    try:
+        return resolve_deadline(http_request.headers.get(settings.OCR_REQUEST_TIMEOUT_HEADER), default_seconds)
+    except ValueError:
+        raise HTTPException(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid {settings.OCR_REQUEST_TIMEOUT_HEADER} header"
+        )
+
+
+def idempotency_key(http_request: Request) -> Optional[str]:
+    """The client's ``Idempotency-Key``: retries sending it join the original job."""
+    key = http_request.headers.get("idempotency-key")
+    if key is None:
+        return None
+    if not 0 < len(key) <= 255 or not key.isprintable():
+        raise HTTPException(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            detail="Idempotency-Key must be 1-255 printable characters"
+        )
+    return key
+
+
+class UploadStreamingResponse(StreamingResponse):
+    """StreamingResponse whose body is produced while the request body is still being read.
+
+    Starlette's StreamingResponse listens for client disconnects by reading
+    ``receive`` itself, which would swallow the upload; here the body
+    iterator owns ``receive`` and notices disconnects through it.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+async def stored_upload(storage_key: str, current_user: Dict[str, str], check_size: bool = True) -> StoredObject:
+    """Look up one of the current shop's stored uploads (404 for anyone else's)."""
+    if not is_shop_upload(storage_key, current_user["shop_id"]):
+        raise HTTPException(status_code=http_status.HTTP_404_NOT_FOUND, detail="File not found")
+    try:
+        stored = await get_object_store().stat(storage_key)
+    except ObjectNotFound:
+        raise HTTPException(status_code=http_status.HTTP_404_NOT_FOUND, detail="File not found")
+    if check_size and stored.size > settings.MAX_IMAGE_SIZE_MB * 1024 * 1024:
+        raise HTTPException(
+            status_code=http_status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File too large. Maximum size is {settings.MAX_IMAGE_SIZE_MB}MB"
+        )
+    return stored
+
+
+async def check_compact_upload(image: UploadFile) -> None:
+    """Validate the header of a compact pre-processed upload without decoding it."""
+    if image.content_type != COMPACT_CONTENT_TYPE:
+        return
+    header = await image.read(HEADER_SIZE)
+    await image.seek(0)
+    try:
+        parse_header(header, image.size)
+    except OCRError as e:
+        raise HTTPException(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            detail=f"{image.filename}: {e.message}"
+        )
+
+
+async def resolve_image_source(
+    image: Optional[UploadFile], storage_key: Optional[str], current_user: Dict[str, str]
+) -> Optional[StoredObject]:
+    """Validate an image given as a multipart upload or as a storage key.
+
+    Returns the stored object for a storage key, None for an upload.
+    """
+    if storage_key is not None:
+        return await stored_upload(storage_key, current_user)
+
+    if image is None:
+        raise HTTPException(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            detail="Provide an image file or a storage_key"
+        )
+
+    # Validate file
+    if not image.content_type or not image.content_type.startswith("image/"):
+        raise HTTPException(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            detail="Invalid file type. Please upload an image."
+        )
+
+    # Check file size
+    if image.size > settings.MAX_IMAGE_SIZE_MB * 1024 * 1024:
+        raise HTTPException(
+            status_code=http_status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File too large. Maximum size is {settings.MAX_IMAGE_SIZE_MB}MB"
+        )
+    await check_compact_upload(image)
+    return None
+
+
+def remove_temp_file(background_tasks: BackgroundTasks, path: Optional[str]) -> None:
+    """Delete a temporary upload once the response has been sent."""
+    if path:
+        background_tasks.add_task(lambda: __import__("os").remove(path))
+
+
+def parse_byte_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single-range ``Range`` header into an inclusive (start, end).
+
+    Returns None when the header should be ignored (malformed or multiple
+    ranges); raises ValueError when the range cannot be satisfied.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        return None
+    first, separator, last = spec.strip().partition("-")
+    if not separator or not (first or last) or not all(part.isdigit() for part in (first, last) if part):
+        return None
+
+    if not first:
+        # Suffix range: the last N bytes
+        if int(last) == 0 or size == 0:
+            raise ValueError("Range not satisfiable")
+        return max(0, size - int(last)), size - 1
+
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise ValueError("Range not satisfiable")
+    end = min(int(last), size - 1) if last else size - 1
+    return start, end
+
+
+def scan_option(http_request: Request, name: str, header: str, default: str) -> str:
+    """A /scan option from the query string (short name) or its X-OCR-* header."""
+    value = http_request.query_params.get(name)
+    if value is None:
+        value = http_request.headers.get(header)
+    return default if value is None else value
+
+
+async def read_raw_body(http_request: Request, timer: StageTimer) -> bytes:
+    """Read a raw image request body into memory, enforcing the size limit."""
+    limit = settings.MAX_IMAGE_SIZE_MB * 1024 * 1024
+    too_large = HTTPException(
+        status_code=http_status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"File too large. Maximum size is {settings.MAX_IMAGE_SIZE_MB}MB"
+    )
+    declared = http_request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > limit:
+        raise too_large
+
+    body = bytearray()
+    with timer.stage("upload_read"):
+        async for chunk in http_request.stream():
+            body += chunk
+            if len(body) > limit:
+                raise too_large
+    if not body:
+        raise HTTPException(status_code=http_status.HTTP_400_BAD_REQUEST, detail="Empty request body")
+    return bytes(body)
+
+
+async def save_upload(image: UploadFile, path: str, timer: StageTimer) -> int:
+    """Read an uploaded image and write it to ``path``, timing both steps.
+
+    Returns the number of bytes saved.
+    """
+    with timer.stage("upload_read"):
+        content = await image.read()
+
+    with timer.stage("persistence"):
+        with open(path, "wb") as buffer:
+            buffer.write(content)
+    return len(content)
+
+
 # Health and monitoring endpoints
 @api_router.get("/health", response_model=HealthStatus, tags=["Health"])
 async def health_check():
-    """Comprehensive health check endpoint."""
-    health = await get_system_health()
+    """Component health from the last background refresh (no live probes)."""
+    health = health_monitor.current()
 
     if health["status"] != "healthy":
         raise HTTPException(
@@ -64,28 +288,45 @@ async def health_check():
     return health
 
 
+@api_router.get("/health/deep", response_model=HealthStatus, tags=["Health"])
+async def deep_health_check():
+    """Live diagnostics: database pool, Redis INFO and model details (rate limited)."""
+    return await health_monitor.deep()
+
+
 @api_router.get("/metrics", response_model=MetricsResponse, tags=["Monitoring"])
 async def get_metrics():
-    """Get service metrics and performance data."""
-    # TODO: Implement actual metrics collection
+    """Get service metrics and performance data.
+
+    Live numbers from this instance over sliding 1/5/15 minute windows. The
+    Prometheus exposition is served separately at ``/metrics``.
+    """
+    summary = request_stats.summary()
+    queue_status = await get_queue_length()
+    queue_status["in_flight"] = summary["in_flight"]
+    try:
+        ocr_service = OCRService.get_instance()
+        queue_status["admission"] = ocr_service.admission.status()
+        queue_status["scheduler"] = ocr_service.scheduler.status()
+    except RuntimeError:
+        pass
+
     return MetricsResponse(
-        total_requests=0,
-        successful_requests=0,
-        failed_requests=0,
-        average_processing_time_ms=25.0,
-        model_accuracy={"overall": 0.95, "product_name": 0.92, "price": 0.98},
-        errors_by_type={"model_error": 0, "timeout": 0},
-        queue_status=await get_queue_length(),
-        uptime_seconds=3600
+        **summary,
+        model_accuracy=request_stats.mean_confidence(),
+        queue_status=queue_status,
+        uptime_seconds=round(startup_timeline.uptime_seconds, 3)
     )
 
 
 # Core OCR endpoints
 @api_router.post("/process", response_model=OCRResult, tags=["OCR"])
 async def process_image(
+    http_request: Request,
     background_tasks: BackgroundTasks,
-    image: UploadFile = File(..., description="Image file to process"),
-    ocr_type: OCRType = Form(OCRType.PRODUCT, description="Type of OCR processing"),
+    image: Optional[UploadFile] = File(None, description="Image file to process"),
+    storage_key: Optional[str] = Form(None, description="Key of an image uploaded with /uploads/presign"),
+    ocr_type: str = Form(OCRType.PRODUCT, description="Type of OCR processing"),
     confidence_threshold: float = Form(0.8, description="Confidence threshold"),
     extract_barcodes: bool = Form(True, description="Extract barcodes"),
     language: str = Form("en", description="Processing language"),
@@ -93,31 +334,23 @@ async def process_image(
 ):
     """Process a single image synchronously with OCR."""
 
-    # Validate file
-    if not image.content_type or not image.content_type.startswith("image/"):
-        raise HTTPException(
-            status_code=http_status.HTTP_400_BAD_REQUEST,
-            detail="Invalid file type. Please upload an image."
-        )
+    check_ocr_type(ocr_type)
+    stored = await resolve_image_source(image, storage_key, current_user)
 
-    # Check file size
-    if image.size > settings.MAX_IMAGE_SIZE_MB * 1024 * 1024:
-        raise HTTPException(
-            status_code=http_status.HTTP_413_PAYLOAD_TOO_LARGE,
-            detail=f"File too large. Maximum size is {settings.MAX_IMAGE_SIZE_MB}MB"
-        )
+    deadline = request_deadline(http_request, settings.OCR_INTERACTIVE_TIMEOUT_SECONDS)
+    retry_key = idempotency_key(http_request)
 
     # Check rate limits
     await check_rate_limits(current_user["user_id"], current_user["shop_id"])
 
+    temp_path = None
     try:
-        # Save uploaded file temporarily
-        temp_filename = f"temp_{uuid.uuid4()}_{image.filename}"
-        temp_path = f"/tmp/{temp_filename}"
-
-        with open(temp_path, "wb") as buffer:
-            content = await image.read()
-            buffer.write(content)
+        timer = StageTimer(ocr_type)
+        if stored is None:
+            # Save uploaded file temporarily
+            temp_filename = f"temp_{uuid.uuid4()}_{image.filename}"
+            temp_path = f"/tmp/{temp_filename}"
+            await save_upload(image, temp_path, timer)
 
         # Create OCR request
         request = OCRRequest(
@@ -128,16 +361,25 @@ async def process_image(
             extract_barcodes=extract_barcodes,
             language=language,
             image_path=temp_path,
-            file_size=image.size,
-            filename=image.filename
+            storage_key=storage_key,
+            file_size=stored.size if stored else image.size,
+            filename=image.filename if image else storage_key,
+            submitted_at=time.time(),
+            deadline=deadline,
+            timings=timer.timings,
+            idempotency_key=retry_key
         )
 
-        # Process image
+        # Process image; stop working on it if the client goes away
         ocr_service = OCRService.get_instance()
-        result = await ocr_service.process_image(request)
+        result = await run_until_disconnected(
+            http_request.is_disconnected,
+            ocr_service.process_image(request),
+            on_disconnect=lambda: expire(request)
+        )
 
         # Clean up temporary file
-        background_tasks.add_task(lambda: __import__("os").remove(temp_path))
+        remove_temp_file(background_tasks, temp_path)
 
         logger.info(
             "OCR request completed",
@@ -149,7 +391,38 @@ async def process_image(
 
         return result
 
+    except ImageRejected as e:
+        # Unreadable photo: tell the till to retake it rather than retry
+        remove_temp_file(background_tasks, temp_path)
+        raise HTTPException(
+            status_code=http_status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=e.to_dict()
+        )
+
+    except AdmissionRejected as e:
+        remove_temp_file(background_tasks, temp_path)
+        raise HTTPException(
+            status_code=http_status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"OCR service overloaded: {e.message}",
+            headers={"Retry-After": str(e.retry_after_seconds)}
+        )
+
+    except DeadlineExceeded as e:
+        remove_temp_file(background_tasks, temp_path)
+        raise HTTPException(
+            status_code=http_status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=f"OCR processing timed out: {e.message}"
+        )
+
+    except ClientDisconnected:
+        remove_temp_file(background_tasks, temp_path)
+        raise HTTPException(
+            status_code=HTTP_499_CLIENT_CLOSED_REQUEST,
+            detail="Client closed the request"
+        )
+
     except Exception as e:
+        remove_temp_file(background_tasks, temp_path)
         logger.error("OCR processing failed", error=str(e), user_id=current_user["user_id"])
         raise HTTPException(
             status_code=http_status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -157,11 +430,115 @@ async def process_image(
         )
 
 
+@api_router.post("/scan", tags=["OCR"])
+async def scan_image(http_request: Request, current_user: Dict = Depends(get_current_user)):
+    """Process one image sent as the raw request body; lean alternative to /process.
+
+    No multipart parsing, temp file or form coercion: the body is the image
+    (any ``image/*`` type, including the compact format) and options come
+    from the query string or headers:
+
+    * ``t`` / ``X-OCR-Type``: ocr_type (default product)
+    * ``c`` / ``X-OCR-Confidence``: confidence threshold (default 0.8)
+    * ``b`` / ``X-OCR-Barcodes``: extract barcodes, 1 or 0 (default 1)
+    * ``l`` / ``X-OCR-Language``: language (default en)
+
+    The response is ``OCRResult.to_compact()``.
+    """
+    content_type = http_request.headers.get("content-type", "")
+    if not (content_type.startswith("image/") or content_type.startswith("application/octet-stream")):
+        raise HTTPException(
+            status_code=http_status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Send the image as the request body with an image/* content type"
+        )
+
+    ocr_type = scan_option(http_request, "t", "x-ocr-type", OCRType.PRODUCT)
+    language = scan_option(http_request, "l", "x-ocr-language", "en")
+    extract_barcodes = scan_option(http_request, "b", "x-ocr-barcodes", "1").lower() in ("1", "true", "yes")
+    try:
+        confidence_threshold = float(scan_option(http_request, "c", "x-ocr-confidence", "0.8"))
+    except ValueError:
+        confidence_threshold = -1.0
+    if ocr_type not in OCR_TYPES or not 0.0 <= confidence_threshold <= 1.0:
+        raise HTTPException(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid options: t must be one of {', '.join(OCR_TYPES)} and c between 0 and 1"
+        )
+
+    deadline = request_deadline(http_request, settings.OCR_INTERACTIVE_TIMEOUT_SECONDS)
+    retry_key = idempotency_key(http_request)
+    await check_rate_limits(current_user["user_id"], current_user["shop_id"])
+
+    timer = StageTimer(ocr_type)
+    body = await read_raw_body(http_request, timer)
+    if content_type.startswith(COMPACT_CONTENT_TYPE) or is_compact(body):
+        try:
+            parse_header(body[:HEADER_SIZE], len(body))
+        except OCRError as e:
+            raise HTTPException(status_code=http_status.HTTP_400_BAD_REQUEST, detail=e.message)
+
+    request = OCRRequest(
+        shop_id=current_user["shop_id"],
+        user_id=current_user["user_id"],
+        ocr_type=ocr_type,
+        confidence_threshold=confidence_threshold,
+        extract_barcodes=extract_barcodes,
+        language=language,
+        image_bytes=body,
+        file_size=len(body),
+        submitted_at=time.time(),
+        deadline=deadline,
+        timings=timer.timings,
+        idempotency_key=retry_key
+    )
+
+    try:
+        ocr_service = OCRService.get_instance()
+        result = await run_until_disconnected(
+            http_request.is_disconnected,
+            ocr_service.process_image(request),
+            on_disconnect=lambda: expire(request)
+        )
+        return JSONResponse(result.to_compact())
+
+    except ImageRejected as e:
+        raise HTTPException(status_code=http_status.HTTP_422_UNPROCESSABLE_ENTITY, detail=e.to_dict())
+
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=http_status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"OCR service overloaded: {e.message}",
+            headers={"Retry-After": str(e.retry_after_seconds)}
+        )
+
+    except DeadlineExceeded as e:
+        raise HTTPException(
+            status_code=http_status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=f"OCR processing timed out: {e.message}"
+        )
+
+    except ClientDisconnected:
+        raise HTTPException(status_code=HTTP_499_CLIENT_CLOSED_REQUEST, detail="Client closed the request")
+
+    except Exception as e:
+        logger.error("OCR scan failed", error=str(e), user_id=current_user["user_id"])
+        raise HTTPException(
+            status_code=http_status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"OCR processing failed: {str(e)}"
+        )
+
+    finally:
+        # Do not keep the image alive with the request object
+        request.image_bytes = None
+
+
 @api_router.post("/process/async", response_model=AsyncOCRStatus, tags=["OCR"])
 async def process_image_async(
+    http_request: Request,
     background_tasks: BackgroundTasks,
-    image: UploadFile = File(..., description="Image file to process"),
-    ocr_type: OCRType = Form(OCRType.PRODUCT, description="Type of OCR processing"),
+    image: Optional[UploadFile] = File(None, description="Image file to process"),
+    storage_key: Optional[str] = Form(None, description="Key of an image uploaded with /uploads/presign"),
+    ocr_type: str = Form(OCRType.PRODUCT, description="Type of OCR processing"),
     confidence_threshold: float = Form(0.8, description="Confidence threshold"),
     extract_barcodes: bool = Form(True, description="Extract barcodes"),
     language: str = Form("en", description="Processing language"),
@@ -170,29 +547,23 @@ async def process_image_async(
 ):
     """Process an image asynchronously with OCR."""
 
-    # Similar validation as sync endpoint
-    if not image.content_type or not image.content_type.startswith("image/"):
-        raise HTTPException(
-            status_code=http_status.HTTP_400_BAD_REQUEST,
-            detail="Invalid file type. Please upload an image."
-        )
+    check_ocr_type(ocr_type)
+    stored = await resolve_image_source(image, storage_key, current_user)
 
-    if image.size > settings.MAX_IMAGE_SIZE_MB * 1024 * 1024:
-        raise HTTPException(
-            status_code=http_status.HTTP_413_PAYLOAD_TOO_LARGE,
-            detail=f"File too large. Maximum size is {settings.MAX_IMAGE_SIZE_MB}MB"
-        )
+    deadline = request_deadline(http_request, settings.OCR_PROCESSING_TIMEOUT_SECONDS)
 
     await check_rate_limits(current_user["user_id"], current_user["shop_id"])
 
     try:
-        # Save file temporarily
-        temp_filename = f"async_{uuid.uuid4()}_{image.filename}"
-        temp_path = f"/tmp/{temp_filename}"
-
-        with open(temp_path, "wb") as buffer:
-            content = await image.read()
-            buffer.write(content)
+        timer = StageTimer(ocr_type)
+        temp_path = None
+        if stored is None:
+            # Save file temporarily
+            temp_filename = f"async_{uuid.uuid4()}_{image.filename}"
+            temp_path = f"/tmp/{temp_filename}"
+            file_size = await save_upload(image, temp_path, timer)
+        else:
+            file_size = stored.size
 
         # Create job record in database
         job_id = str(uuid.uuid4())
@@ -210,7 +581,12 @@ async def process_image_async(
             confidence_threshold,
             extract_barcodes,
             language,
-            callback_url
+            callback_url,
+            time.time(),
+            timer.timings,
+            deadline,
+            storage_key,
+            file_size
         )
 
         return AsyncOCRStatus(
@@ -254,9 +630,10 @@ async def get_job_status(job_id: str, current_user: Dict = Depends(get_current_u
 
 @api_router.post("/batch", response_model=BatchOCRResponse, tags=["OCR"])
 async def process_batch(
+    http_request: Request,
     background_tasks: BackgroundTasks,
     images: List[UploadFile] = File(..., description="Images to process"),
-    ocr_type: OCRType = Form(OCRType.PRODUCT, description="Type of OCR processing"),
+    ocr_type: str = Form(OCRType.PRODUCT, description="Type of OCR processing"),
     confidence_threshold: float = Form(0.8, description="Confidence threshold"),
     extract_barcodes: bool = Form(True, description="Extract barcodes"),
     language: str = Form("en", description="Processing language"),
@@ -265,6 +642,8 @@ async def process_batch(
 ):
     """Process multiple images in batch."""
 
+    check_ocr_type(ocr_type)
+
     # Validate batch size
     if len(images) > 10:
         raise HTTPException(
@@ -282,10 +661,14 @@ async def process_batch(
 
         if image.size > settings.MAX_IMAGE_SIZE_MB * 1024 * 1024:
             raise HTTPException(
-                status_code=http_status.HTTP_413_PAYLOAD_TOO_LARGE,
+                status_code=http_status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
                 detail=f"File too large: {image.filename}"
             )
 
+        await check_compact_upload(image)
+
+    deadline = request_deadline(http_request, settings.OCR_PROCESSING_TIMEOUT_SECONDS)
+
     await check_rate_limits(current_user["user_id"], current_user["shop_id"])
 
     try:
@@ -297,15 +680,15 @@ async def process_batch(
             temp_filename = f"batch_{batch_id}_{i}_{image.filename}"
             temp_path = f"/tmp/{temp_filename}"
 
-            with open(temp_path, "wb") as buffer:
-                content = await image.read()
-                buffer.write(content)
+            timer = StageTimer(ocr_type)
+            await save_upload(image, temp_path, timer)
 
-            temp_files.append(temp_path)
+            temp_files.append((temp_path, timer.timings))
 
         # Create OCR requests
         requests = []
-        for i, (image, temp_path) in enumerate(zip(images, temp_files)):
+        submitted_at = time.time()
+        for i, (image, (temp_path, timings)) in enumerate(zip(images, temp_files)):
             requests.append(OCRRequest(
                 shop_id=current_user["shop_id"],
                 user_id=current_user["user_id"],
@@ -315,19 +698,35 @@ async def process_batch(
                 language=language,
                 image_path=temp_path,
                 file_size=image.size,
-                filename=image.filename
+                filename=image.filename,
+                submitted_at=submitted_at,
+                lane=Lane.BULK,
+                deadline=deadline,
+                timings=timings
             ))
 
-        # Process batch
+        # Process batch; stop working on it if the client goes away
         ocr_service = OCRService.get_instance()
-        results = await ocr_service.batch_process(requests)
+        try:
+            results = await run_until_disconnected(
+                http_request.is_disconnected,
+                ocr_service.batch_process(requests),
+                on_disconnect=lambda: [expire(request) for request in requests]
+            )
+        except ClientDisconnected:
+            for temp_path, _ in temp_files:
+                background_tasks.add_task(lambda path=temp_path: __import__("os").remove(path))
+            raise HTTPException(
+                status_code=HTTP_499_CLIENT_CLOSED_REQUEST,
+                detail="Client closed the request"
+            )
 
         # Clean up temporary files
-        for temp_path in temp_files:
+        for temp_path, _ in temp_files:
             background_tasks.add_task(lambda path=temp_path: __import__("os").remove(path))
 
-        # Calculate total processing time
-        total_time = sum(r.processing_time_ms for r in results)
+        # Wall-clock time for the whole batch (images run concurrently)
+        total_time = int((time.time() - submitted_at) * 1000)
 
         batch_response = BatchOCRResponse(
             batch_id=batch_id,
@@ -347,6 +746,9 @@ async def process_batch(
 
         return batch_response
 
+    except HTTPException:
+        raise
+
     except Exception as e:
         logger.error("Batch OCR failed", error=str(e), batch_id=batch_id)
         raise HTTPException(
@@ -355,6 +757,135 @@ async def process_batch(
         )
 
 
+@api_router.post("/batch/stream", tags=["OCR"])
+async def process_batch_stream(
+    http_request: Request,
+    ocr_type: str = Query(OCRType.PRODUCT, description="Type of OCR processing"),
+    confidence_threshold: float = Query(0.8, description="Confidence threshold"),
+    extract_barcodes: bool = Query(True, description="Extract barcodes"),
+    language: str = Query("en", description="Processing language"),
+    current_user: Dict = Depends(get_current_user)
+):
+    """Process a large batch as it uploads, streaming results back as NDJSON.
+
+    The body is ``multipart/form-data`` (one file part per image) or an
+    uncompressed ``application/x-tar`` archive. Processing starts with the
+    first complete image; every result is written as one JSON line as soon
+    as it finishes, followed by a summary line with the wall-clock time.
+    """
+    check_ocr_type(ocr_type)
+    await check_rate_limits(current_user["user_id"], current_user["shop_id"])
+
+    try:
+        items = upload_items(http_request.headers.get("content-type", ""), http_request.stream())
+    except OCRError as e:
+        raise HTTPException(status_code=http_status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail=e.message)
+
+    def make_request(item: StreamItem) -> OCRRequest:
+        return OCRRequest(
+            shop_id=current_user["shop_id"],
+            user_id=current_user["user_id"],
+            ocr_type=ocr_type,
+            confidence_threshold=confidence_threshold,
+            extract_barcodes=extract_barcodes,
+            language=language,
+            image_bytes=item.data,
+            file_size=len(item.data),
+            filename=item.filename,
+            submitted_at=item.received_at,
+            lane=Lane.BULK
+        )
+
+    ocr_service = OCRService.get_instance()
+    stream = BatchStream(ocr_service.process_image, make_request)
+    logger.info("Streaming batch started", batch_id=stream.batch_id, shop_id=current_user["shop_id"])
+
+    return UploadStreamingResponse(stream.run(items), media_type="application/x-ndjson")
+
+
+def bulk_output_prefix(output_prefix: Optional[str], shop_id: str) -> str:
+    """Results prefix for a shop's bulk job: its own results area or a folder inside it."""
+    base = shop_results_prefix(shop_id)
+    if output_prefix is None:
+        return base
+    prefix = output_prefix.rstrip("/")
+    if prefix != base and not (prefix.startswith(f"{base}/") and is_clean_key(prefix)):
+        raise HTTPException(
+            status_code=http_status.HTTP_403_FORBIDDEN,
+            detail=f"Bulk job results must be written under {base}/"
+        )
+    return prefix
+
+
+@api_router.post(
+    "/bulk-jobs", response_model=BulkJobStatus, status_code=http_status.HTTP_202_ACCEPTED, tags=["Bulk Jobs"]
+)
+async def start_bulk_job(job: BulkJobRequest, current_user: Dict = Depends(get_current_user)):
+    """Start (or resume, with an existing job_id) OCR of every image under a storage prefix.
+
+    Jobs only read the shop's own uploads and write under the shop's
+    results prefix, both in the default bucket.
+    """
+    check_ocr_type(job.ocr_type)
+    shop_id = current_user["shop_id"]
+    if {job.bucket, job.output_bucket} - {None, settings.MINIO_BUCKET_NAME}:
+        raise HTTPException(
+            status_code=http_status.HTTP_403_FORBIDDEN,
+            detail=f"Bulk jobs can only use the {settings.MINIO_BUCKET_NAME} bucket"
+        )
+    if not is_shop_prefix(job.prefix, shop_id):
+        raise HTTPException(
+            status_code=http_status.HTTP_403_FORBIDDEN,
+            detail=f"Bulk jobs can only process keys under {upload_prefix(shop_id)}"
+        )
+
+    spec = BulkJobSpec(
+        prefix=job.prefix,
+        ocr_type=job.ocr_type,
+        job_id=job.job_id,
+        language=job.language,
+        extract_barcodes=job.extract_barcodes,
+        output_prefix=bulk_output_prefix(job.output_prefix, shop_id),
+        shop_id=shop_id,
+        user_id=current_user["user_id"],
+    )
+    try:
+        started = bulk_jobs.start(spec, OCRService.get_instance().process_image)
+    except BulkJobError as e:
+        raise HTTPException(status_code=http_status.HTTP_409_CONFLICT, detail=str(e))
+
+    logger.info("Bulk job started", job_id=spec.job_id, bucket=spec.bucket, prefix=spec.prefix)
+    return BulkJobStatus(**started.status())
+
+
+@api_router.get("/bulk-jobs/{job_id}", response_model=BulkJobStatus, tags=["Bulk Jobs"])
+async def get_bulk_job(
+    job_id: str,
+    output_prefix: Optional[str] = Query(None, description="The job's output_prefix, if it set one"),
+    current_user: Dict = Depends(get_current_user)
+):
+    """Progress of one of the shop's bulk jobs, live if it runs in this instance, else from its checkpoint."""
+    shop_id = current_user["shop_id"]
+    job = bulk_jobs.get(shop_id, job_id)
+    if job is not None:
+        status = job.status()
+    else:
+        status = await stored_status(job_id, output_prefix=bulk_output_prefix(output_prefix, shop_id))
+    if status is None:
+        raise HTTPException(status_code=http_status.HTTP_404_NOT_FOUND, detail="Bulk job not found")
+    return BulkJobStatus(**status)
+
+
+@api_router.delete("/bulk-jobs/{job_id}", response_model=BulkJobStatus, tags=["Bulk Jobs"])
+async def cancel_bulk_job(job_id: str, current_user: Dict = Depends(get_current_user)):
+    """Stop one of the shop's running bulk jobs; it can be resumed later from its checkpoint."""
+    shop_id = current_user["shop_id"]
+    job = bulk_jobs.get(shop_id, job_id)
+    if job is None or not bulk_jobs.cancel(shop_id, job_id):
+        raise HTTPException(status_code=http_status.HTTP_404_NOT_FOUND, detail="No running bulk job with this id")
+    return BulkJobStatus(**job.status())
+
+
 @api_router.post("/upload", response_model=UploadResponse, tags=["File Management"])
 async def upload_image(
     image: UploadFile = File(..., description="Image file to upload"),
@@ -372,9 +903,10 @@ async def upload_image(
     # Check file size
     if image.size > settings.MAX_IMAGE_SIZE_MB * 1024 * 1024:
         raise HTTPException(
-            status_code=http_status.HTTP_413_PAYLOAD_TOO_LARGE,
+            status_code=http_status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
             detail=f"File too large. Maximum size is {settings.MAX_IMAGE_SIZE_MB}MB"
         )
+    await check_compact_upload(image)
 
     # Check rate limits (stricter for uploads)
     await check_rate_limits(current_user["user_id"], current_user["shop_id"])
@@ -383,21 +915,17 @@ async def upload_image(
         # Generate unique filename
         file_extension = image.filename.split(".")[-1] if "." in image.filename else "jpg"
         unique_filename = f"{uuid.uuid4()}.{file_extension}"
-        file_path = f"/tmp/{unique_filename}"
+        storage_key = f"{upload_prefix(current_user['shop_id'])}{unique_filename}"
 
-        # Save file
-        with open(file_path, "wb") as buffer:
-            content = await image.read()
-            buffer.write(content)
-
-        # Generate accessible URL (in production, upload to S3/MinIO)
-        image_url = f"/api/v1/files/{unique_filename}"
+        # Stream the spooled upload to object storage
+        await get_object_store().put_file(storage_key, image.file, image.size, image.content_type)
 
         return UploadResponse(
             filename=unique_filename,
             file_size=image.size,
-            image_url=image_url,
-            content_type=image.content_type
+            image_url=f"/api/v1/files/{storage_key}",
+            content_type=image.content_type,
+            storage_key=storage_key
         )
 
     except Exception as e:
@@ -408,17 +936,121 @@ async def upload_image(
         )
 
 
-@api_router.get("/files/{filename}", tags=["File Management"])
-async def get_uploaded_file(filename: str, current_user: Dict = Depends(get_current_user)):
-    """Serve uploaded image files."""
-    # TODO: Implement file serving with proper authentication
-    # For now, return placeholder response
-    raise HTTPException(
-        status_code=http_status.HTTP_501_NOT_IMPLEMENTED,
-        detail="File serving not implemented yet"
+@api_router.post("/uploads/presign", response_model=PresignedUploadResponse, tags=["File Management"])
+async def presign_upload(upload: PresignedUploadRequest, current_user: Dict = Depends(get_current_user)):
+    """Get a URL to upload an image directly to storage, bypassing the OCR API.
+
+    PUT the bytes to ``upload_url``, then pass ``storage_key`` to /process or
+    /process/async.
+    """
+    if not upload.content_type.startswith("image/"):
+        raise HTTPException(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            detail="Invalid file type. Please upload an image."
+        )
+    if upload.size > settings.MAX_IMAGE_SIZE_MB * 1024 * 1024:
+        raise HTTPException(
+            status_code=http_status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File too large. Maximum size is {settings.MAX_IMAGE_SIZE_MB}MB"
+        )
+
+    await check_rate_limits(current_user["user_id"], current_user["shop_id"])
+
+    file_extension = upload.filename.split(".")[-1] if "." in upload.filename else "jpg"
+    storage_key = f"{upload_prefix(current_user['shop_id'])}{uuid.uuid4()}.{file_extension}"
+    expires = settings.OCR_UPLOAD_URL_EXPIRES_SECONDS
+
+    return PresignedUploadResponse(
+        storage_key=storage_key,
+        upload_url=get_object_store().presigned_upload_url(storage_key, expires),
+        headers={"Content-Type": upload.content_type},
+        expires_at=time.time() + expires,
+        image_url=f"/api/v1/files/{storage_key}"
     )
 
 
+@api_router.put("/files/{storage_key:path}", tags=["File Management"])
+async def put_uploaded_file(storage_key: str, http_request: Request, expires: int, signature: str):
+    """Target of presigned upload URLs on the local storage backend.
+
+    Authenticated by the URL signature; S3-compatible backends receive
+    uploads directly and never reach this endpoint.
+    """
+    store = get_object_store()
+    if not isinstance(store, LocalObjectStore):
+        raise HTTPException(status_code=http_status.HTTP_404_NOT_FOUND, detail="Upload directly to storage")
+    if not verify_upload_signature(storage_key, expires, signature):
+        raise HTTPException(status_code=http_status.HTTP_403_FORBIDDEN, detail="Invalid or expired upload URL")
+
+    try:
+        stored = await store.write_stream(
+            storage_key, http_request.stream(), settings.MAX_IMAGE_SIZE_MB * 1024 * 1024
+        )
+    except ValueError:
+        raise HTTPException(
+            status_code=http_status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File too large. Maximum size is {settings.MAX_IMAGE_SIZE_MB}MB"
+        )
+
+    return JSONResponse({"storage_key": storage_key, "size": stored.size}, headers={"ETag": f'"{stored.etag}"'})
+
+
+@api_router.get("/files/{storage_key:path}", tags=["File Management"])
+async def get_uploaded_file(storage_key: str, http_request: Request, current_user: Dict = Depends(get_current_user)):
+    """Stream a stored upload with ETag, conditional GET and byte-range support."""
+    stored = await stored_upload(storage_key, current_user, check_size=False)
+
+    etag = '"%s"' % stored.etag.strip('"') if stored.etag else None
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Cache-Control": f"private, max-age={settings.OCR_FILE_CACHE_SECONDS}",
+    }
+    if etag:
+        headers["ETag"] = etag
+    if stored.last_modified:
+        headers["Last-Modified"] = formatdate(stored.last_modified, usegmt=True)
+
+    # Conditional GET: If-None-Match wins over If-Modified-Since
+    if_none_match = http_request.headers.get("if-none-match")
+    if_modified_since = http_request.headers.get("if-modified-since")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        if etag and (etag in tags or "*" in tags):
+            return Response(status_code=http_status.HTTP_304_NOT_MODIFIED, headers=headers)
+    elif if_modified_since and stored.last_modified:
+        try:
+            if int(stored.last_modified) <= parsedate_to_datetime(if_modified_since).timestamp():
+                return Response(status_code=http_status.HTTP_304_NOT_MODIFIED, headers=headers)
+        except (TypeError, ValueError):
+            pass
+
+    store = get_object_store()
+    range_header = http_request.headers.get("range")
+    if_range = http_request.headers.get("if-range")
+    if range_header and (if_range is None or if_range == etag):
+        try:
+            byte_range = parse_byte_range(range_header, stored.size)
+        except ValueError:
+            raise HTTPException(
+                status_code=http_status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                detail="Requested range not satisfiable",
+                headers={"Content-Range": f"bytes */{stored.size}"}
+            )
+        if byte_range is not None:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{stored.size}"
+            headers["Content-Length"] = str(end - start + 1)
+            return StreamingResponse(
+                store.iter_range(storage_key, start, end - start + 1),
+                status_code=http_status.HTTP_206_PARTIAL_CONTENT,
+                media_type=stored.content_type,
+                headers=headers
+            )
+
+    headers["Content-Length"] = str(stored.size)
+    return StreamingResponse(store.iter_range(storage_key), media_type=stored.content_type, headers=headers)
+
+
 # Background task functions
 async def process_ocr_job_background(
     job_id: str,
@@ -429,7 +1061,12 @@ async def process_ocr_job_background(
     confidence_threshold: float,
     extract_barcodes: bool,
     language: str,
-    callback_url: str = None
+    callback_url: str = None,
+    submitted_at: float = None,
+    timings: Dict[str, float] = None,
+    deadline: Optional[float] = None,
+    storage_key: Optional[str] = None,
+    file_size: int = 0
 ):
     """Background task for async OCR processing."""
     try:
@@ -444,8 +1081,13 @@ async def process_ocr_job_background(
             extract_barcodes=extract_barcodes,
             language=language,
             image_path=image_path,
-            file_size=0,  # Not needed for background processing
-            filename="async_image"
+            storage_key=storage_key,
+            file_size=file_size,
+            filename=storage_key or "async_image",
+            submitted_at=submitted_at,
+            lane=Lane.BULK,
+            deadline=deadline,
+            timings=timings or {}
         )
 
         # Process image
@@ -468,12 +1110,13 @@ async def process_ocr_job_background(
         # TODO: Update job status to FAILED in database
         # TODO: Call error callback if provided
     finally:
-        # Clean up temporary file
-        try:
-            import os
-            os.remove(image_path)
-        except Exception:
-            pass
+        # Clean up temporary file (stored uploads are kept)
+        if image_path:
+            try:
+                import os
+                os.remove(image_path)
+            except Exception:
+                pass
 
 
 
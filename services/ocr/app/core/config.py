@@ -30,7 +30,13 @@ class Settings(BaseSettings):
 
     # Redis Configuration
     REDIS_URL: str = "redis://localhost:58392"
-    REDIS_POOL_SIZE: int = 10
+    REDIS_POOL_SIZE: int = 10  # Connections per node and role
+    # Comma separated endpoints per role (see app/core/redis.py); empty = REDIS_URL
+    REDIS_CACHE_URLS: str = ""
+    REDIS_QUEUE_URLS: str = ""
+    REDIS_RATE_LIMIT_URLS: str = ""
+    REDIS_RING_VNODES: int = 160  # Virtual nodes per endpoint on the hash ring
+    REDIS_LEGACY_QUEUE_RECHECK_SECONDS: float = 60.0  # Re-read drained pre-sharding queue keys this often
 
     # Kafka Configuration
     KAFKA_BROKERS: str = "localhost:54629"
@@ -42,21 +48,128 @@ class Settings(BaseSettings):
     MINIO_ACCESS_KEY: str = "minioadmin"
     MINIO_SECRET_KEY: str = "minioadmin"
     MINIO_BUCKET_NAME: str = "zakpos-ocr"
+    MINIO_SECURE: bool = False  # HTTPS to the object store
+    MINIO_REGION: str = "us-east-1"
     MAX_IMAGE_SIZE_MB: int = 10
+    OCR_STORAGE_BACKEND: str = "s3"  # s3 (MinIO / S3-compatible) | local (see app/services/storage.py)
+    OCR_STORAGE_LOCAL_DIR: str = "storage"  # One directory per bucket for the local backend
+    OCR_UPLOAD_URL_EXPIRES_SECONDS: int = 900  # Lifetime of presigned upload URLs
+    OCR_FILE_CACHE_SECONDS: int = 3600  # Cache-Control max-age for /files
+    OCR_PUBLIC_BASE_URL: str = ""  # Origin of this service in local-backend upload URLs
 
     # OCR Model Configuration
     OCR_MODEL_PRIMARY: str = "microsoft/trocr-small-printed"
     OCR_MODEL_FALLBACK: str = "tesseract"
+    OCR_MODEL_ROUTES: str = ""  # e.g. "receipt=microsoft/trocr-base-printed,handwritten=microsoft/trocr-small-handwritten"
+    OCR_MODEL_MEMORY_BUDGET_MB: int = 2048  # 0 = unlimited
     OCR_CONFIDENCE_THRESHOLD: float = 0.8
-    OCR_PROCESSING_TIMEOUT_SECONDS: int = 30
+    OCR_PROCESSING_TIMEOUT_SECONDS: int = 30  # Upper bound for every request deadline
+    OCR_INTERACTIVE_TIMEOUT_SECONDS: float = 5.0  # Default deadline for /process scans
+    OCR_REQUEST_TIMEOUT_HEADER: str = "X-Request-Timeout-Ms"  # Client-supplied deadline
+    OCR_DISCONNECT_POLL_SECONDS: float = 0.1  # How often to check for a gone client
+
+    # HTTP Server (python main.py)
+    OCR_SERVER: str = "uvicorn"  # uvicorn (HTTP/1.1) | hypercorn (HTTP/2, see README)
+    OCR_TLS_CERTFILE: Optional[str] = None  # With a key, hypercorn offers h2 over TLS (ALPN)
+    OCR_TLS_KEYFILE: Optional[str] = None
+    OCR_H2_MAX_CONCURRENT_STREAMS: int = 100  # Scans multiplexed on one HTTP/2 connection
     OCR_ENABLE_GPU: bool = False
 
+    # Compact Pre-processed Uploads (see app/services/compact_image.py)
+    OCR_COMPACT_MAX_SIDE: int = 4096  # Larger pre-scaled payloads are rejected
+
+    # Image Quality and Preprocessing Recipes (see app/services/image_quality.py)
+    OCR_QUALITY_MAX_SIDE: int = 512  # Measurements run on a thumbnail no larger than this
+    OCR_QUALITY_REJECT_BLURRY: bool = True  # Reject unreadable images with a retake hint
+    OCR_QUALITY_MIN_SHARPNESS: float = 25.0  # Laplacian variance below which an image is too blurry
+    OCR_QUALITY_SHARPEN_BELOW: float = 100.0  # Unsharp-mask softer images than this
+    OCR_QUALITY_MAX_NOISE: float = 8.0  # Estimated noise sigma (gray levels) above which to denoise
+    OCR_QUALITY_MIN_CONTRAST: float = 0.35  # 5th-95th percentile spread below which to apply CLAHE
+    OCR_QUALITY_MAX_GLARE: float = 0.05  # Blown-out fraction above which to threshold locally
+
+    # Tiled Invoice Recognition (see app/services/tiling.py)
+    OCR_TILING_ENABLED: bool = True  # Recognise invoices line by line instead of as one 384px input
+    OCR_TILE_MAX_DIMENSION: int = 4096  # Invoice pages are kept up to this size (others 2048)
+    OCR_TILE_DETECT_MAX_SIDE: int = 1600  # Text regions are found on a copy no larger than this
+    OCR_TILE_MAX_ASPECT: float = 8.0  # Wider regions are split into overlapping segments
+    OCR_TILE_OVERLAP: float = 0.15  # Fraction of a segment shared with the next one
+    OCR_TILE_PADDING: float = 0.2  # Margin around each region, as a fraction of its height
+    OCR_TILE_BATCH_SIZE: int = 16  # Tiles per encoder / generate call
+
+    # Orientation and Deskew (see app/services/orientation.py)
+    OCR_ORIENTATION_ENABLED: bool = True
+    OCR_ORIENTATION_MAX_SIDE: int = 1024  # Estimation runs on a copy no larger than this
+    OCR_ORIENTATION_MAX_SKEW_DEGREES: float = 10.0  # Skew search range, either direction
+    OCR_ORIENTATION_MIN_SKEW_DEGREES: float = 0.5  # Smaller skew is left uncorrected
+    OCR_ORIENTATION_MARGIN: float = 1.2  # How much stronger a rotated reading must be to win
+
+    # Local Model Artifact Store (see app/services/model_store.py)
+    OCR_MODEL_STORE_DIR: str = "model_store"
+    OCR_MODEL_VERSION: Optional[str] = None  # None = active (CURRENT) version
+    OCR_MODEL_OFFLINE: bool = False  # Never contact the Hugging Face hub
+    OCR_MODEL_MMAP: bool = True  # Memory-map safetensors weights (CPU only)
+
     # Performance Settings
     OCR_CACHE_TTL_SECONDS: int = 3600  # 1 hour
     OCR_BATCH_SIZE: int = 5
     OCR_QUEUE_SIZE: int = 1000
     OCR_WORKERS: int = 4
 
+    # Job History Partitions and Retention (see app/services/job_retention.py)
+    OCR_JOB_PARTITIONS_AHEAD: int = 3  # Monthly partitions created in advance
+    OCR_JOB_RETENTION_MONTHS: int = 13  # Months of job history kept in Postgres
+    OCR_JOB_ARCHIVE_PREFIX: str = "archive"  # Object-storage prefix of archived partitions
+    OCR_JOB_MAINTENANCE_INTERVAL_SECONDS: float = 21600.0  # 0 = only via make job-retention
+
+    # Single-Flight Coalescing (see app/services/singleflight.py)
+    OCR_SINGLEFLIGHT_ENABLED: bool = True
+    OCR_SINGLEFLIGHT_GRACE_SECONDS: float = 5.0  # Work kept running for a retry after its client left
+    OCR_SINGLEFLIGHT_REDIS_LEASE: bool = False  # Coalesce across replicas (needs ENABLE_MODEL_CACHING)
+    OCR_SINGLEFLIGHT_LEASE_POLL_SECONDS: float = 0.05
+
+    # Admission Control (see app/services/admission.py)
+    OCR_ADMISSION_ENABLED: bool = True
+    OCR_ADMISSION_SAFETY_FACTOR: float = 0.8  # Admit while predicted time <= factor * deadline
+    OCR_ADMISSION_EWMA_ALPHA: float = 0.2  # Weight of the newest service-time sample
+    OCR_ADMISSION_DEGRADE: bool = True  # Try fallback-only / barcode-only before rejecting
+
+    # Fair Scheduling Across Shops (see app/services/scheduler.py)
+    OCR_TENANT_WEIGHTS: str = ""  # e.g. "shop-a=4,shop-b=2"; unlisted shops use the default
+    OCR_TENANT_DEFAULT_WEIGHT: float = 1.0
+    OCR_TENANT_STATUS_LIMIT: int = 50  # Shops listed in the metrics output, deepest queues first
+    OCR_INTERACTIVE_RESERVED_SLOTS: int = 1  # Of OCR_WORKERS, held back for /process scans
+    OCR_BULK_WORK_STEALING: bool = True  # Bulk work may use idle reserved slots
+
+    # Streaming Batches (see app/services/batch_stream.py)
+    OCR_STREAM_MAX_IMAGES: int = 1000  # Per /batch/stream upload
+    OCR_STREAM_CONCURRENCY: int = 4  # Images of one stream processed at once
+    OCR_STREAM_MAX_PENDING: int = 8  # Received images waiting for a worker (bounds memory)
+
+    # Bulk Jobs over Object Storage (see app/services/bulk_job.py)
+    OCR_BULK_CONCURRENCY: int = 4  # Images of one job downloaded / processed at once
+    OCR_BULK_PREFETCH: int = 16  # Downloaded images waiting for OCR
+    OCR_BULK_PART_SIZE: int = 500  # Result lines per JSON-lines part (and checkpoint)
+    OCR_BULK_MAX_RETRIES: int = 3  # Retries of an image rejected by admission control
+    OCR_BULK_OUTPUT_PREFIX: str = "ocr-results"
+    OCR_BULK_EXTENSIONS: str = ".jpg,.jpeg,.png,.webp,.tif,.tiff,.bmp"
+
+    # Model Warm-up and Graph Optimisation
+    OCR_WARMUP_ENABLED: bool = True
+    OCR_WARMUP_BATCH_SIZES: str = "1,5"  # Comma separated, usually 1 and OCR_BATCH_SIZE
+    OCR_WARMUP_WINDOW: int = 5  # Calls per p95 window
+    OCR_WARMUP_MAX_ITERATIONS: int = 40  # Per batch size
+    OCR_WARMUP_P95_TOLERANCE: float = 0.1  # Relative p95 change considered settled
+    OCR_GRAPH_OPTIMIZATION: str = "none"  # none | compile | torchscript
+    OCR_TORCH_INTRA_OP_THREADS: int = 0  # 0 = torch default
+    OCR_TORCH_INTER_OP_THREADS: int = 0  # 0 = torch default
+
+    # Generation (decoding) Profiles, see GENERATION_PROFILES
+    OCR_GENERATION_ADAPTIVE: bool = True  # Shrink token budgets from observed output lengths
+    OCR_GENERATION_WINDOW: int = 500  # Output lengths kept per ocr_type
+    OCR_GENERATION_MIN_SAMPLES: int = 50  # Before the budget starts adapting
+    OCR_GENERATION_HEADROOM: float = 0.25  # Budget = p99 length * (1 + headroom)
+    OCR_GENERATION_STATIC_CACHE: bool = True  # Static KV cache where the model supports it
+
     # Rate Limiting
     RATE_LIMIT_REQUESTS_PER_MINUTE: int = 100
     RATE_LIMIT_BURST_SIZE: int = 10
@@ -68,6 +181,9 @@ class Settings(BaseSettings):
 
     # Monitoring
     SENTRY_DSN: Optional[str] = None
+    OCR_HEALTH_INTERVAL_SECONDS: float = 5.0  # Background health refresh (see app/core/health.py)
+    OCR_HEALTH_CHECK_TIMEOUT_SECONDS: float = 2.0  # Per component check
+    OCR_HEALTH_DEEP_MIN_INTERVAL_SECONDS: float = 10.0  # Deep diagnostics are reused this long
     PROMETHEUS_ENABLED: bool = True
 
     # Feature Flags
@@ -122,10 +238,6 @@ def get_log_level() -> str:
 # Model paths and configurations
 MODEL_CONFIGS = {
     "microsoft/trocr-small-printed": {
-        "max_length": 128,
-        "num_beams": 1,
-        "early_stopping": True,
-        "use_cache": True,
         "torch_dtype": "float16" if settings.OCR_ENABLE_GPU else "float32",
     },
     "tesseract": {
@@ -136,6 +248,18 @@ MODEL_CONFIGS = {
 }
 
 
+# Decoding settings per ocr_type. max_new_tokens is the ceiling; the budget
+# actually used adapts to observed output lengths (OCR_GENERATION_*).
+GENERATION_PROFILES = {
+    "product": {"max_new_tokens": 32, "stop_on_price": True},
+    "receipt": {"max_new_tokens": 64},
+    "invoice": {"max_new_tokens": 128},
+    "invoice_tile": {"max_new_tokens": 48},  # One text line of a tiled invoice
+    "handwritten": {"max_new_tokens": 96},
+    "default": {"max_new_tokens": 128},
+}
+
+
 # API Response models
 class OCRType:
     """Supported OCR processing types."""
@@ -143,6 +267,7 @@ class OCRType:
     RECEIPT = "receipt"
     INVOICE = "invoice"
     BARCODE = "barcode"
+    HANDWRITTEN = "handwritten"
 
 
 class ProcessingStatus:
@@ -3,16 +3,25 @@ Database Configuration and Models for ZakPOS OCR Server
 ======================================================
 
 SQLAlchemy setup with PostgreSQL integration for OCR processing data.
-Includes models for jobs, metrics, and error logging.
+Includes models for jobs, metrics, and error logging. The job table is
+partitioned by month (see app/core/partitions.py).
 """
 
+from datetime import datetime, timezone
+
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
-from sqlalchemy import String, Integer, Float, Boolean, Text, DateTime, JSON, UUID, ForeignKey
+from sqlalchemy import String, Integer, Float, Boolean, Text, DateTime, JSON, UUID, Index, text
 from sqlalchemy.sql import func
 import structlog
 
 from app.core.config import settings
+from app.core.partitions import (
+    ensure_error_log_index,
+    ensure_partitions,
+    migrate_legacy_jobs,
+    prepare_job_table
+)
 
 # Configure logging
 logger = structlog.get_logger(__name__)
@@ -35,9 +44,21 @@ class Base(DeclarativeBase):
 
 # Database Models
 class OCRProcessingJob(Base):
-    """Model for OCR processing jobs and results."""
+    """Model for OCR processing jobs and results.
+
+    Partitioned by month on ``created_at``, which is therefore part of the
+    primary key; filter queries by ``created_at`` so only the months they
+    cover are scanned.
+    """
 
     __tablename__ = "ocr_processing_jobs"
+    __table_args__ = (
+        # A shop's job history, newest first
+        Index("ix_ocr_processing_jobs_shop_created", "shop_id", "created_at"),
+        # Jobs waiting or running, oldest first
+        Index("ix_ocr_processing_jobs_status_created", "status", "created_at"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
     id: Mapped[UUID] = mapped_column(UUID, primary_key=True, server_default=func.gen_random_uuid())
     shop_id: Mapped[UUID] = mapped_column(UUID, nullable=False)
@@ -66,7 +87,7 @@ class OCRProcessingJob(Base):
     processing_metadata: Mapped[dict] = mapped_column(JSON)
 
     # Timestamps
-    created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), primary_key=True, server_default=func.now())
     started_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True))
     completed_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True))
     error_message: Mapped[str] = mapped_column(Text)
@@ -112,7 +133,8 @@ class OCRErrorLog(Base):
     __tablename__ = "ocr_error_logs"
 
     id: Mapped[UUID] = mapped_column(UUID, primary_key=True, server_default=func.gen_random_uuid())
-    job_id: Mapped[UUID] = mapped_column(UUID, ForeignKey("ocr_processing_jobs.id", ondelete="CASCADE"))
+    # No foreign key: error logs outlive jobs archived out of the partitioned table
+    job_id: Mapped[UUID] = mapped_column(UUID, index=True)
 
     # Error details
     error_type: Mapped[str] = mapped_column(String(50), nullable=False)
@@ -140,13 +162,27 @@ async def init_db() -> None:
     """Initialize database and create tables."""
     try:
         async with engine.begin() as conn:
+            await prepare_job_table(conn)
             # Create all tables
             await conn.run_sync(Base.metadata.create_all)
+            # Job rows need a partition for the current month to land in
+            await ensure_partitions(conn, datetime.now(timezone.utc).date(), settings.OCR_JOB_PARTITIONS_AHEAD)
+            # History from before partitioning moves into its months
+            await migrate_legacy_jobs(conn)
         logger.info("Database tables created successfully")
     except Exception as e:
         logger.error("Failed to initialize database", error=str(e))
         raise
 
+    try:
+        # create_all only indexes new tables; CONCURRENTLY cannot run in a transaction
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            await ensure_error_log_index(conn)
+    except Exception as e:
+        # Another replica may be building it; lookups by job are only slower
+        logger.warning("Could not index error logs by job", error=str(e))
+
 
 async def close_db() -> None:
     """Close database connections."""
@@ -175,13 +211,14 @@ async def check_database_health() -> dict:
     """Check database connectivity and health."""
     try:
         async with AsyncSessionLocal() as session:
-            result = await session.execute("SELECT 1 as health_check")
-            await result.fetchone()
+            result = await session.execute(text("SELECT 1 AS health_check"))
+            result.scalar_one()
 
         return {
             "status": "healthy",
             "database": "connected",
-            "pool_size": settings.DATABASE_POOL_SIZE
+            "pool_size": settings.DATABASE_POOL_SIZE,
+            "pool": engine.pool.status()
         }
     except Exception as e:
         logger.error("Database health check failed", error=str(e))
@@ -0,0 +1,167 @@
+"""
+Health Snapshots for ZakPOS OCR Server
+=====================================
+
+Load balancers and orchestrators probe every instance every few seconds;
+answering each probe with a live database query and Redis round trip turns
+health checking into real load on shared infrastructure. Instead, one
+background task refreshes the status of each component every
+OCR_HEALTH_INTERVAL_SECONDS and probes are served from that snapshot:
+
+* liveness  - the event loop answers (no dependencies at all)
+* readiness - infrastructure initialised, models loaded, snapshot fresh
+* snapshot  - last background result for database, Redis and the OCR engines
+* deep      - live diagnostics (Redis INFO, pool and model details), run at
+              most once per OCR_HEALTH_DEEP_MIN_INTERVAL_SECONDS
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import structlog
+
+from app.core.config import settings
+from app.core.database import check_database_health
+from app.core.monitoring import get_system_health, record_component_health
+from app.core.redis import ping_redis
+
+logger = structlog.get_logger(__name__)
+
+Check = Callable[[], Awaitable[Dict[str, Any]]]
+
+# Component statuses that count as up
+HEALTHY = ("healthy", "ready")
+
+
+async def check_ocr_service() -> Dict[str, Any]:
+    """In-process engine status (no I/O)."""
+    from app.services.ocr_service import OCRService
+
+    try:
+        ocr_service = OCRService.get_instance()
+    except RuntimeError:
+        return {"status": "not_ready", "error": "Not initialized"}
+    return {
+        "status": "ready" if ocr_service.is_ready() else "not_ready",
+        "engines": ocr_service.engines.status(),
+        "warmup": ocr_service.warmup_report,
+    }
+
+
+class HealthMonitor:
+    """Refreshes component health in the background and serves the result."""
+
+    def __init__(self, interval_seconds: float, timeout_seconds: float) -> None:
+        self.interval_seconds = interval_seconds
+        self.timeout_seconds = timeout_seconds
+        self._checks: Dict[str, Check] = {
+            "database": check_database_health,
+            "redis": ping_redis,
+            "ocr_service": check_ocr_service,
+        }
+        self._snapshot: Dict[str, Any] = {
+            "status": "starting",
+            "timestamp": 0.0,
+            "version": settings.VERSION,
+            "services": {},
+        }
+        self._task: Optional[asyncio.Task] = None
+        self._deep: Optional[Dict[str, Any]] = None
+        self._deep_lock = asyncio.Lock()
+
+    async def _run_check(self, name: str, check: Check) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(check(), timeout=self.timeout_seconds)
+        except asyncio.TimeoutError:
+            result = {"status": "unhealthy", "error": f"Check timed out after {self.timeout_seconds}s"}
+        except Exception as e:
+            result = {"status": "unhealthy", "error": str(e)}
+        result["latency_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        record_component_health(name, result.get("status") in HEALTHY)
+        return result
+
+    async def refresh(self) -> Dict[str, Any]:
+        """Run every check concurrently and replace the snapshot."""
+        names = list(self._checks)
+        results = await asyncio.gather(*(self._run_check(name, self._checks[name]) for name in names))
+        services = dict(zip(names, results))
+
+        if services["ocr_service"]["status"] not in HEALTHY:
+            overall = "unhealthy"
+        elif all(result["status"] in HEALTHY for result in results):
+            overall = "healthy"
+        else:
+            overall = "degraded"
+
+        self._snapshot = {
+            "status": overall,
+            "timestamp": time.time(),
+            "version": settings.VERSION,
+            "services": services,
+        }
+        return self._snapshot
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error("Health refresh failed", error=str(e))
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self) -> None:
+        """Start background refreshing (the first refresh runs immediately)."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    @property
+    def age_seconds(self) -> float:
+        timestamp = self._snapshot["timestamp"]
+        return time.time() - timestamp if timestamp else float("inf")
+
+    @property
+    def stale(self) -> bool:
+        """No refresh for three intervals: the refresher itself is stuck."""
+        return self.age_seconds > 3 * self.interval_seconds
+
+    def current(self) -> Dict[str, Any]:
+        """The latest snapshot, with its age (no I/O)."""
+        snapshot = dict(self._snapshot)
+        if self.stale and snapshot["status"] != "starting":
+            snapshot["status"] = "stale"
+        age = self.age_seconds
+        snapshot["age_seconds"] = round(age, 3) if age != float("inf") else None
+        return snapshot
+
+    def is_ready(self) -> bool:
+        """Models loaded and the snapshot fresh.
+
+        Shared dependencies (database, Redis) are reported but do not gate
+        readiness: when they fail they fail for every instance, and taking
+        all of them out of rotation would only turn degraded service into
+        no service.
+        """
+        services = self._snapshot["services"]
+        return (
+            not self.stale
+            and services.get("ocr_service", {}).get("status") in HEALTHY
+        )
+
+    async def deep(self) -> Dict[str, Any]:
+        """Live diagnostics, shared by concurrent callers and rate limited."""
+        async with self._deep_lock:
+            max_age = settings.OCR_HEALTH_DEEP_MIN_INTERVAL_SECONDS
+            if self._deep is None or time.time() - self._deep["timestamp"] >= max_age:
+                self._deep = await get_system_health()
+            return self._deep
+
+
+health_monitor = HealthMonitor(settings.OCR_HEALTH_INTERVAL_SECONDS, settings.OCR_HEALTH_CHECK_TIMEOUT_SECONDS)
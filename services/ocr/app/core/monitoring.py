@@ -7,7 +7,8 @@ Health checks, metrics collection, and structured logging setup.
 
 import time
 import structlog
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Iterator, Optional
 from fastapi import FastAPI, Request, Response
 from prometheus_client import Counter, Histogram, Gauge, generate_latest
 import json
@@ -38,6 +39,19 @@ PROCESSING_TIME = Histogram(
     ["model", "ocr_type"]
 )
 
+# Pipeline stages, in request order
+PIPELINE_STAGES = (
+    "queue_wait", "upload_read", "fetch", "decode", "preprocess", "quality", "orientation", "layout", "encoder",
+    "decoder", "barcode", "parse", "cache", "persistence",
+)
+
+STAGE_DURATION = Histogram(
+    "ocr_stage_duration_seconds",
+    "Time spent in each OCR pipeline stage in seconds",
+    ["stage", "ocr_type"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+
 MODEL_ACCURACY = Gauge(
     "ocr_model_accuracy",
     "OCR model accuracy score",
@@ -48,6 +62,88 @@ ACTIVE_JOBS = Gauge(
     "ocr_active_jobs", "Number of active OCR processing jobs"
 )
 
+ADMISSION_DECISIONS = Counter(
+    "ocr_admission_decisions_total",
+    "Admission control decisions",
+    ["decision"]
+)
+
+# Shops are only named when listed in OCR_TENANT_WEIGHTS; every other shop is
+# counted as "other" so the label set stays bounded
+TENANT_QUEUE_DEPTH = Gauge(
+    "ocr_tenant_queue_depth",
+    "Requests waiting for an execution slot, per weighted shop (or other) and lane",
+    ["tenant", "lane"]
+)
+
+TENANT_QUEUE_WAIT = Histogram(
+    "ocr_tenant_queue_wait_seconds",
+    "Time spent waiting for an execution slot, per weighted shop (or other)",
+    ["tenant"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+
+LANE_QUEUE_DEPTH = Gauge(
+    "ocr_lane_queue_depth",
+    "Requests waiting for an execution slot, per lane",
+    ["lane"]
+)
+
+LANE_RUNNING = Gauge(
+    "ocr_lane_running",
+    "Execution slots held, per lane",
+    ["lane"]
+)
+
+LANE_QUEUE_WAIT = Histogram(
+    "ocr_lane_queue_wait_seconds",
+    "Time spent waiting for an execution slot, per lane",
+    ["lane"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+
+ABANDONED_WORK = Counter(
+    "ocr_abandoned_work_total",
+    "Requests stopped early because their deadline passed or the client disconnected",
+    ["reason", "stage"]
+)
+
+PREPROCESS_RECIPES = Counter(
+    "ocr_preprocess_recipes_total",
+    "Preprocessing recipe chosen from image quality (clean = none, rejected = too blurry)",
+    ["recipe"]
+)
+
+ORIENTATION_CORRECTIONS = Counter(
+    "ocr_orientation_corrections_total",
+    "Images rotated or deskewed before recognition",
+    ["source", "rotation"]
+)
+
+DUPLICATE_WORK_AVOIDED = Counter(
+    "ocr_duplicate_work_avoided_total",
+    "Duplicate requests answered from another request's in-flight work",
+    ["source"]
+)
+
+DUPLICATE_SECONDS_AVOIDED = Counter(
+    "ocr_duplicate_work_avoided_seconds_total",
+    "Processing time not spent thanks to single-flight coalescing",
+    ["source"]
+)
+
+JOB_PARTITIONS = Counter(
+    "ocr_job_partitions_total",
+    "Job history partitions created, detached and archived",
+    ["action"]
+)
+
+COMPONENT_HEALTH = Gauge(
+    "ocr_component_up",
+    "Component status from the last background health refresh (1 = healthy)",
+    ["component"]
+)
+
 ERROR_COUNT = Counter(
     "ocr_errors_total",
     "Total number of OCR errors",
@@ -55,13 +151,26 @@ ERROR_COUNT = Counter(
 )
 
 
-def setup_monitoring(app: FastAPI) -> None:
-    """Set up monitoring middleware and endpoints."""
+class MonitoringMiddleware:
+    """Request logging and metrics as plain ASGI middleware.
+
+    Unlike ``@app.middleware("http")`` this passes ``receive`` through
+    untouched, so endpoints can read request bodies as a stream while their
+    response is already streaming (``/api/v1/batch/stream``). Duration is
+    measured until the last response byte is sent.
+    """
 
-    @app.middleware("http")
-    async def monitoring_middleware(request: Request, call_next):
-        """Middleware for request monitoring."""
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope)
         start_time = time.time()
+        status_code = 500
 
         # Log request
         logger.info(
@@ -72,42 +181,14 @@ def setup_monitoring(app: FastAPI) -> None:
             shop_id=request.headers.get("x-shop-id", "unknown")
         )
 
-        try:
-            response = await call_next(request)
-
-            # Record metrics
-            duration = time.time() - start_time
-            REQUEST_COUNT.labels(
-                method=request.method,
-                endpoint=request.url.path,
-                status=response.status_code
-            ).inc()
-
-            REQUEST_DURATION.labels(
-                method=request.method,
-                endpoint=request.url.path
-            ).observe(duration)
-
-            # Log successful request
-            if response.status_code < 400:
-                logger.info(
-                    "Request completed",
-                    method=request.method,
-                    url=str(request.url),
-                    status_code=response.status_code,
-                    duration_ms=round(duration * 1000, 2)
-                )
-            else:
-                logger.warning(
-                    "Request failed",
-                    method=request.method,
-                    url=str(request.url),
-                    status_code=response.status_code,
-                    duration_ms=round(duration * 1000, 2)
-                )
-
-            return response
+        async def send_wrapper(message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
 
+        try:
+            await self.app(scope, receive, send_wrapper)
         except Exception as e:
             duration = time.time() - start_time
             REQUEST_COUNT.labels(
@@ -125,6 +206,43 @@ def setup_monitoring(app: FastAPI) -> None:
             )
             raise
 
+        # Record metrics
+        duration = time.time() - start_time
+        REQUEST_COUNT.labels(
+            method=request.method,
+            endpoint=request.url.path,
+            status=status_code
+        ).inc()
+
+        REQUEST_DURATION.labels(
+            method=request.method,
+            endpoint=request.url.path
+        ).observe(duration)
+
+        # Log successful request
+        if status_code < 400:
+            logger.info(
+                "Request completed",
+                method=request.method,
+                url=str(request.url),
+                status_code=status_code,
+                duration_ms=round(duration * 1000, 2)
+            )
+        else:
+            logger.warning(
+                "Request failed",
+                method=request.method,
+                url=str(request.url),
+                status_code=status_code,
+                duration_ms=round(duration * 1000, 2)
+            )
+
+
+def setup_monitoring(app: FastAPI) -> None:
+    """Set up monitoring middleware and endpoints."""
+
+    app.add_middleware(MonitoringMiddleware)
+
     # Add Prometheus metrics endpoint
     if settings.PROMETHEUS_ENABLED:
         @app.get("/metrics")
@@ -138,7 +256,7 @@ def setup_monitoring(app: FastAPI) -> None:
 
 # Service health check functions
 async def get_system_health() -> dict:
-    """Get comprehensive system health status."""
+    """Live, comprehensive system health (deep diagnostics; probes use app/core/health.py)."""
     health_status = {
         "status": "healthy",
         "timestamp": time.time(),
@@ -195,11 +313,15 @@ async def get_loaded_models_info() -> dict:
             "primary_model": settings.OCR_MODEL_PRIMARY,
             "fallback_model": settings.OCR_MODEL_FALLBACK,
             "gpu_enabled": settings.OCR_ENABLE_GPU,
+            "engines": ocr_service.engines.status(),
+            "registry": ocr_service.models.status(),
+            "generation": ocr_service.generation.status(),
             "models": []
         }
 
         # Add model-specific information
-        for model_name in [settings.OCR_MODEL_PRIMARY, settings.OCR_MODEL_FALLBACK]:
+        routed_models = sorted(set(ocr_service.models.routes.values()) - {settings.OCR_MODEL_PRIMARY})
+        for model_name in [settings.OCR_MODEL_PRIMARY, *routed_models, settings.OCR_MODEL_FALLBACK]:
             try:
                 if model_name.startswith("microsoft/"):
                     # Hugging Face model info
@@ -244,6 +366,34 @@ def record_processing_time(model: str, ocr_type: str, duration_seconds: float) -
     PROCESSING_TIME.labels(model=model, ocr_type=ocr_type).observe(duration_seconds)
 
 
+class StageTimer:
+    """Per-request stage timing breakdown.
+
+    Every stage is observed in the ``ocr_stage_duration_seconds`` histogram
+    and accumulated (in milliseconds) into ``timings``, which is attached to
+    the OCR result.
+    """
+
+    def __init__(self, ocr_type: str, timings: Optional[Dict[str, float]] = None) -> None:
+        self.ocr_type = ocr_type
+        # Stages timed before this timer existed (e.g. by the API layer) are
+        # carried over as-is; they were already observed
+        self.timings: Dict[str, float] = dict(timings or {})
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time the enclosed block as ``name``."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def record(self, name: str, duration_seconds: float) -> None:
+        STAGE_DURATION.labels(stage=name, ocr_type=self.ocr_type).observe(duration_seconds)
+        self.timings[name] = round(self.timings.get(name, 0.0) + duration_seconds * 1000, 3)
+
+
 def record_model_accuracy(model: str, field: str, accuracy: float) -> None:
     """Record model accuracy metric."""
     MODEL_ACCURACY.labels(model=model, field=field).set(accuracy)
@@ -254,6 +404,63 @@ def record_error(error_type: str, model: str) -> None:
     ERROR_COUNT.labels(error_type=error_type, model=model).inc()
 
 
+def record_admission(decision: str) -> None:
+    """Record an admission control decision."""
+    ADMISSION_DECISIONS.labels(decision=decision).inc()
+
+
+def update_tenant_queue_depth(tenant: str, lane: str, depth: int) -> None:
+    """Update a tenant's scheduler queue depth gauge (tenant: weighted shop or other)."""
+    TENANT_QUEUE_DEPTH.labels(tenant=tenant, lane=lane).set(depth)
+
+
+def record_tenant_wait(tenant: str, wait_seconds: float) -> None:
+    """Record how long a tenant's request waited for an execution slot (tenant: weighted shop or other)."""
+    TENANT_QUEUE_WAIT.labels(tenant=tenant).observe(wait_seconds)
+
+
+def record_lane_start(lane: str, wait_seconds: float) -> None:
+    """Record how long a request waited in its lane before starting."""
+    LANE_QUEUE_WAIT.labels(lane=lane).observe(wait_seconds)
+
+
+def update_lane_gauges(lane: str, queued: int, running: int) -> None:
+    """Update a lane's queue depth and running slot gauges."""
+    LANE_QUEUE_DEPTH.labels(lane=lane).set(queued)
+    LANE_RUNNING.labels(lane=lane).set(running)
+
+
+def record_preprocess_recipe(recipe: str) -> None:
+    """Record the preprocessing recipe chosen for an image."""
+    PREPROCESS_RECIPES.labels(recipe=recipe).inc()
+
+
+def record_orientation(source: str, rotation: int) -> None:
+    """Record an orientation correction (source: exif, rotation or skew)."""
+    ORIENTATION_CORRECTIONS.labels(source=source, rotation=str(rotation)).inc()
+
+
+def record_duplicate_work_avoided(source: str, seconds: float) -> None:
+    """Record a duplicate request served by shared work (source: in_flight or replica)."""
+    DUPLICATE_WORK_AVOIDED.labels(source=source).inc()
+    DUPLICATE_SECONDS_AVOIDED.labels(source=source).inc(seconds)
+
+
+def record_job_partition(action: str) -> None:
+    """Record job history maintenance (action: created, detached or archived)."""
+    JOB_PARTITIONS.labels(action=action).inc()
+
+
+def record_component_health(component: str, healthy: bool) -> None:
+    """Record a component's status from the background health refresh."""
+    COMPONENT_HEALTH.labels(component=component).set(1 if healthy else 0)
+
+
+def record_abandoned(reason: str, stage: str) -> None:
+    """Record work stopped early (reason: expired or client_disconnected)."""
+    ABANDONED_WORK.labels(reason=reason, stage=stage).inc()
+
+
 def update_active_jobs(count: int) -> None:
     """Update active jobs gauge."""
     ACTIVE_JOBS.set(count)
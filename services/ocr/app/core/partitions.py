@@ -0,0 +1,221 @@
+"""
+Time-Partitioned Job History for ZakPOS OCR Server
+=================================================
+
+``ocr_processing_jobs`` is range-partitioned on ``created_at``, one
+partition per calendar month (``ocr_processing_jobs_pYYYY_MM``, bounds in
+UTC). Inserts only touch the current month's partition and its indexes,
+and queries bounded by ``created_at`` scan only the months they cover, so
+neither slows down as history grows. Old months leave the table whole:
+they are detached, archived and dropped by app/services/job_retention.py
+instead of being deleted row by row.
+
+Partitions are created OCR_JOB_PARTITIONS_AHEAD months in advance at
+startup and by the maintenance task. There is no default partition: it
+would have to be scanned every time a new month is created.
+
+A plain job table from before partitioning is renamed to
+``ocr_processing_jobs_legacy`` and its rows are moved into monthly
+partitions at startup, where retention archives them like any other month.
+"""
+
+import re
+from datetime import date, datetime, timezone
+from typing import List, Optional, Tuple
+
+import structlog
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+logger = structlog.get_logger(__name__)
+
+JOB_TABLE = "ocr_processing_jobs"
+PARTITION_PREFIX = f"{JOB_TABLE}_p"
+LEGACY_TABLE = f"{JOB_TABLE}_legacy"
+
+# Named as SQLAlchemy names the ``index=True`` index on OCRErrorLog.job_id
+ERROR_LOG_JOB_INDEX = "ix_ocr_error_logs_job_id"
+
+_PARTITION_NAME = re.compile(rf"^{PARTITION_PREFIX}(\d{{4}})_(\d{{2}})$")
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def add_months(month: date, months: int) -> date:
+    """First day of the month ``months`` after ``month`` (may be negative)."""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARTITION_PREFIX}{month.year:04d}_{month.month:02d}"
+
+
+def partition_month(name: str) -> Optional[date]:
+    """Month held by partition ``name`` (None if it is not a job partition)."""
+    match = _PARTITION_NAME.match(name)
+    return date(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+
+def expired_partitions(names: List[str], today: date, retention_months: int) -> List[str]:
+    """Partitions entirely older than the last ``retention_months`` months."""
+    cutoff = add_months(month_start(today), -retention_months)
+    return [
+        name for name in names
+        if (month := partition_month(name)) is not None and add_months(month, 1) <= cutoff
+    ]
+
+
+async def table_kind(conn: AsyncConnection, name: str) -> Optional[str]:
+    """``relkind`` of table ``name``: "r" plain, "p" partitioned, None missing."""
+    result = await conn.execute(
+        text("SELECT relkind::text FROM pg_class WHERE oid = to_regclass(:name)"), {"name": name}
+    )
+    return result.scalar_one_or_none()
+
+
+async def prepare_job_table(conn: AsyncConnection) -> None:
+    """Make room for the partitioned table where a plain one was created before.
+
+    An empty plain table is dropped; one with rows is renamed to
+    ``ocr_processing_jobs_legacy`` for migrate_legacy_jobs to move.
+    """
+    if await table_kind(conn, JOB_TABLE) != "r":
+        return
+
+    # Error logs may outlive (archived) jobs, so they no longer reference them
+    await conn.execute(text("ALTER TABLE IF EXISTS ocr_error_logs DROP CONSTRAINT IF EXISTS ocr_error_logs_job_id_fkey"))
+
+    has_rows = (await conn.execute(text(f"SELECT EXISTS (SELECT 1 FROM {JOB_TABLE})"))).scalar_one()
+    if has_rows:
+        await conn.execute(text(f"ALTER TABLE {JOB_TABLE} RENAME TO {LEGACY_TABLE}"))
+        await conn.execute(text(f"ALTER INDEX IF EXISTS {JOB_TABLE}_pkey RENAME TO {LEGACY_TABLE}_pkey"))
+        logger.warning("Set unpartitioned job history aside for migration", table=LEGACY_TABLE)
+    else:
+        await conn.execute(text(f"DROP TABLE {JOB_TABLE}"))
+        logger.info("Replaced empty job table with a partitioned one", table=JOB_TABLE)
+
+
+async def ensure_error_log_index(conn: AsyncConnection) -> None:
+    """Index ``ocr_error_logs.job_id`` on tables created before it was declared.
+
+    Built with ``CREATE INDEX CONCURRENTLY`` so writes to the error log are
+    not blocked; ``conn`` must be in autocommit mode. An invalid index left
+    by an interrupted build is dropped and built again.
+    """
+    result = await conn.execute(
+        text("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"),
+        {"name": ERROR_LOG_JOB_INDEX},
+    )
+    valid = result.scalar_one_or_none()
+    if valid:
+        return
+    if valid is not None:
+        await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {ERROR_LOG_JOB_INDEX}"))
+    await conn.execute(text(
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {ERROR_LOG_JOB_INDEX} ON ocr_error_logs (job_id)"
+    ))
+    logger.info("Indexed error logs by job", index=ERROR_LOG_JOB_INDEX)
+
+
+def _utc_month(value: datetime) -> date:
+    # Naive timestamps (a legacy ``timestamp`` column) are taken as UTC
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return month_start(value.date())
+
+
+async def _create_partitions(conn: AsyncConnection, first: date, months: int) -> List[str]:
+    created = []
+    for offset in range(months):
+        month = add_months(first, offset)
+        name = partition_name(month)
+        if await table_kind(conn, name) is not None:
+            continue
+        await conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {JOB_TABLE} "
+            f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') "
+            f"TO ('{add_months(month, 1).isoformat()} 00:00:00+00')"
+        ))
+        created.append(name)
+    return created
+
+
+async def ensure_partitions(conn: AsyncConnection, today: date, months_ahead: int) -> List[str]:
+    """Create the partitions of this month and the next ``months_ahead``; returns the new ones."""
+    created = await _create_partitions(conn, month_start(today), max(0, months_ahead) + 1)
+    if created:
+        logger.info("Created job history partitions", partitions=created)
+    return created
+
+
+async def _columns(conn: AsyncConnection, table: str) -> List[str]:
+    result = await conn.execute(
+        text(
+            "SELECT column_name FROM information_schema.columns "
+            "WHERE table_schema = current_schema() AND table_name = :table ORDER BY ordinal_position"
+        ),
+        {"table": table},
+    )
+    return [name for (name,) in result.all()]
+
+
+async def migrate_legacy_jobs(conn: AsyncConnection) -> int:
+    """Move the rows of ``ocr_processing_jobs_legacy`` into monthly partitions; returns the row count.
+
+    Partitions are created for every month the rows cover, the columns
+    both tables share are copied, and the legacy table is dropped, all in
+    the caller's transaction. Rows without ``created_at`` (the partition
+    key) are filed under the time of the migration.
+    """
+    if await table_kind(conn, LEGACY_TABLE) != "r":
+        return 0
+
+    oldest, newest = (await conn.execute(text(
+        f"SELECT min(created_at), max(created_at) FROM {LEGACY_TABLE}"
+    ))).one()
+    now = datetime.now(timezone.utc)
+    first = _utc_month(oldest or now)
+    last = max(_utc_month(newest or now), month_start(now.date()))
+    created = await _create_partitions(conn, first, (last.year - first.year) * 12 + last.month - first.month + 1)
+
+    legacy = set(await _columns(conn, LEGACY_TABLE))
+    columns = [name for name in await _columns(conn, JOB_TABLE) if name in legacy]
+    selected = ", ".join("COALESCE(created_at, now())" if name == "created_at" else name for name in columns)
+    result = await conn.execute(text(
+        f"INSERT INTO {JOB_TABLE} ({', '.join(columns)}) SELECT {selected} FROM {LEGACY_TABLE}"
+    ))
+    await conn.execute(text(f"DROP TABLE {LEGACY_TABLE}"))
+    logger.info(
+        "Moved unpartitioned job history into partitions",
+        rows=result.rowcount, partitions=created, dropped=sorted(legacy - set(columns)),
+    )
+    return result.rowcount
+
+
+async def attached_partitions(conn: AsyncConnection) -> List[Tuple[str, bool]]:
+    """Partitions of the job table as (name, detach pending), oldest first."""
+    result = await conn.execute(
+        text(
+            "SELECT c.relname, i.inhdetachpending FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(:parent) ORDER BY c.relname"
+        ),
+        {"parent": JOB_TABLE},
+    )
+    return [(name, pending) for name, pending in result.all()]
+
+
+async def detached_partitions(conn: AsyncConnection) -> List[str]:
+    """Former partitions that were detached but not yet archived, oldest first."""
+    result = await conn.execute(
+        text(
+            "SELECT relname FROM pg_class "
+            "WHERE relkind = 'r' AND NOT relispartition AND pg_table_is_visible(oid) "
+            "AND starts_with(relname, :prefix) ORDER BY relname"
+        ),
+        {"prefix": PARTITION_PREFIX},
+    )
+    return [name for (name,) in result.all() if partition_month(name) is not None]
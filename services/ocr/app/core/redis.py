@@ -2,116 +2,252 @@
 Redis Configuration for ZakPOS OCR Server
 ========================================
 
-Redis setup for caching, queuing, and session management.
+Redis setup for caching, queuing, and rate limiting.
+
+Each role has its own endpoints and connection pools, so a burst of cache
+traffic cannot starve the queue or rate limiter of connections:
+
+* cache      - REDIS_CACHE_URLS, sharded by consistent hashing
+* queue      - REDIS_QUEUE_URLS
+* rate limit - REDIS_RATE_LIMIT_URLS, sharded by consistent hashing
+
+A role without its own URLs uses REDIS_URL. Keys are placed on a node by
+their hash tag (the part between the first ``{`` and the next ``}``, as in
+Redis Cluster) or, without one, by the whole key. Shop-scoped keys are
+tagged with the shop, so everything for one shop lives on one node and
+adding a node moves only about 1/N of the shops.
 """
 
+import asyncio
+import bisect
+import hashlib
+import json
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
 import redis.asyncio as redis
 import structlog
-from typing import Optional
 
 from app.core.config import settings
 
 # Configure logging
 logger = structlog.get_logger(__name__)
 
-# Redis connection pool
-redis_pool: Optional[redis.ConnectionPool] = None
-redis_client: Optional[redis.Redis] = None
 
+class Role:
+    """Logical Redis roles, each with its own endpoints and pools."""
+    CACHE = "cache"
+    QUEUE = "queue"
+    RATE_LIMIT = "rate_limit"
 
-async def init_redis() -> None:
-    """Initialize Redis connection pool."""
-    global redis_pool, redis_client
+    ALL = (CACHE, QUEUE, RATE_LIMIT)
 
-    try:
-        # Create connection pool
-        redis_pool = redis.ConnectionPool.from_url(
-            settings.REDIS_URL,
-            max_connections=settings.DATABASE_POOL_SIZE,
-            decode_responses=True,
+
+def hash_tag(key: str) -> str:
+    """The part of ``key`` that decides its node (Redis Cluster rules)."""
+    start = key.find("{")
+    if start != -1:
+        end = key.find("}", start + 1)
+        if end > start + 1:
+            return key[start + 1:end]
+    return key
+
+
+def shop_tag(shop_id: str) -> str:
+    """Hash tag that keeps every key of one shop on the same node."""
+    return f"{{shop:{shop_id}}}"
+
+
+def node_name(url: str) -> str:
+    """``host:port/db`` of a Redis URL (never the password)."""
+    parts = urlsplit(url)
+    db = parts.path.lstrip("/") or "0"
+    return f"{parts.hostname or 'localhost'}:{parts.port or 6379}/{db}"
+
+
+def _point(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    """Consistent hash ring with virtual nodes."""
+
+    def __init__(self, nodes: List[str], vnodes: int) -> None:
+        if not nodes:
+            raise ValueError("A hash ring needs at least one node")
+        self.nodes = list(nodes)
+        ring = sorted(
+            (_point(f"{node}#{replica}"), node)
+            for node in self.nodes
+            for replica in range(max(1, vnodes))
+        )
+        self._points = [point for point, _ in ring]
+        self._owners = [node for _, node in ring]
+
+    def node_for(self, key: str) -> str:
+        """Node that owns ``key`` (by its hash tag)."""
+        index = bisect.bisect(self._points, _point(hash_tag(key))) % len(self._points)
+        return self._owners[index]
+
+
+class ShardedRedis:
+    """The clients of one role, with keys routed over a hash ring."""
+
+    def __init__(self, role: str, urls: List[str]) -> None:
+        self.role = role
+        self.pools: Dict[str, redis.ConnectionPool] = {}
+        self.clients: Dict[str, redis.Redis] = {}
+        for url in urls:
+            name = node_name(url)
+            if name in self.clients:
+                continue
+            self.pools[name] = redis.ConnectionPool.from_url(
+                url,
+                max_connections=settings.REDIS_POOL_SIZE,
+                decode_responses=True,
+            )
+            self.clients[name] = redis.Redis(connection_pool=self.pools[name])
+        self.ring = HashRing(list(self.clients), settings.REDIS_RING_VNODES)
+
+    def client_for(self, key: str) -> redis.Redis:
+        return self.clients[self.ring.node_for(key)]
+
+    async def ping(self) -> Dict[str, str]:
+        """Ping every node; returns node -> "up" or the error."""
+        names = list(self.clients)
+        results = await asyncio.gather(
+            *(self.clients[name].ping() for name in names), return_exceptions=True
         )
+        return {
+            name: "up" if not isinstance(result, Exception) else str(result)
+            for name, result in zip(names, results)
+        }
+
+    async def close(self) -> None:
+        for name, client in self.clients.items():
+            await client.close()
+            await self.pools[name].disconnect()
 
-        # Create Redis client
-        redis_client = redis.Redis(connection_pool=redis_pool)
 
-        # Test connection
-        await redis_client.ping()
-        logger.info("Redis connected successfully", url=settings.REDIS_URL)
+def role_urls(role: str) -> List[str]:
+    """Configured endpoints of ``role`` (REDIS_URL when none are set)."""
+    configured = {
+        Role.CACHE: settings.REDIS_CACHE_URLS,
+        Role.QUEUE: settings.REDIS_QUEUE_URLS,
+        Role.RATE_LIMIT: settings.REDIS_RATE_LIMIT_URLS,
+    }[role]
+    urls = [url.strip() for url in configured.split(",") if url.strip()]
+    return urls or [settings.REDIS_URL]
+
+
+# Sharded clients by role
+shards: Dict[str, ShardedRedis] = {}
+
+
+async def init_redis() -> None:
+    """Initialize the connection pools of every role."""
+    global shards
+
+    try:
+        shards = {role: ShardedRedis(role, role_urls(role)) for role in Role.ALL}
+
+        # Test connections
+        for role, shard in shards.items():
+            nodes = await shard.ping()
+            failed = {name: error for name, error in nodes.items() if error != "up"}
+            if failed:
+                raise ConnectionError(f"{role} nodes unreachable: {failed}")
+        logger.info(
+            "Redis connected successfully",
+            nodes={role: list(shard.clients) for role, shard in shards.items()},
+        )
 
     except Exception as e:
-        logger.error("Failed to connect to Redis", error=str(e), url=settings.REDIS_URL)
+        logger.error("Failed to connect to Redis", error=str(e))
         raise
 
 
 async def close_redis() -> None:
     """Close Redis connections."""
-    global redis_pool, redis_client
+    global shards
 
     try:
-        if redis_client:
-            await redis_client.close()
-        if redis_pool:
-            await redis_pool.disconnect()
+        for shard in shards.values():
+            await shard.close()
+        shards = {}
         logger.info("Redis connections closed")
     except Exception as e:
         logger.error("Error closing Redis connections", error=str(e))
 
 
-async def get_redis() -> redis.Redis:
-    """Get Redis client instance."""
-    if not redis_client:
+def _client(role: str, key: str) -> Optional[redis.Redis]:
+    shard = shards.get(role)
+    return shard.client_for(key) if shard else None
+
+
+async def get_redis(role: str = Role.CACHE, key: str = "") -> redis.Redis:
+    """Get the Redis client that owns ``key`` in ``role``."""
+    if not shards:
         raise RuntimeError("Redis not initialized. Call init_redis() first.")
-    return redis_client
+    return shards[role].client_for(key)
 
 
 # Cache utility functions
-async def cache_ocr_result(job_id: str, result: dict, ttl_seconds: int = None) -> None:
-    """Cache OCR processing result."""
-    if not redis_client:
+def result_cache_key(shop_id: str, key: str) -> str:
+    return f"ocr:result:{shop_tag(shop_id)}:{key}"
+
+
+async def cache_ocr_result(shop_id: str, key: str, result: dict, ttl_seconds: int = None) -> None:
+    """Cache OCR processing result on the shop's cache node."""
+    cache_key = result_cache_key(shop_id, key)
+    client = _client(Role.CACHE, cache_key)
+    if not client:
         return
 
     try:
-        cache_key = f"ocr:result:{job_id}"
         ttl = ttl_seconds or settings.OCR_CACHE_TTL_SECONDS
 
-        await redis_client.setex(
+        await client.setex(
             cache_key,
             ttl,
-            result
+            json.dumps(result)
         )
-        logger.debug("Cached OCR result", job_id=job_id, ttl=ttl)
+        logger.debug("Cached OCR result", shop_id=shop_id, key=key, ttl=ttl)
     except Exception as e:
-        logger.error("Failed to cache OCR result", error=str(e), job_id=job_id)
+        logger.error("Failed to cache OCR result", error=str(e), shop_id=shop_id, key=key)
 
 
-async def get_cached_ocr_result(job_id: str) -> Optional[dict]:
+async def get_cached_ocr_result(shop_id: str, key: str) -> Optional[dict]:
     """Get cached OCR result."""
-    if not redis_client:
+    cache_key = result_cache_key(shop_id, key)
+    client = _client(Role.CACHE, cache_key)
+    if not client:
         return None
 
     try:
-        cache_key = f"ocr:result:{job_id}"
-        result = await redis_client.get(cache_key)
+        result = await client.get(cache_key)
         if result:
-            logger.debug("Retrieved cached OCR result", job_id=job_id)
-            return result
+            logger.debug("Retrieved cached OCR result", shop_id=shop_id, key=key)
+            return json.loads(result)
     except Exception as e:
-        logger.error("Failed to get cached OCR result", error=str(e), job_id=job_id)
+        logger.error("Failed to get cached OCR result", error=str(e), shop_id=shop_id, key=key)
 
     return None
 
 
 async def cache_model_features(image_hash: str, features: dict) -> None:
     """Cache image features for faster processing."""
-    if not redis_client:
+    cache_key = f"ocr:features:{image_hash}"
+    client = _client(Role.CACHE, cache_key)
+    if not client:
         return
 
     try:
-        cache_key = f"ocr:features:{image_hash}"
-        await redis_client.setex(
+        await client.setex(
             cache_key,
             86400,  # 24 hours
-            features
+            json.dumps(features)
         )
         logger.debug("Cached model features", image_hash=image_hash)
     except Exception as e:
@@ -120,34 +256,117 @@ async def cache_model_features(image_hash: str, features: dict) -> None:
 
 async def get_cached_model_features(image_hash: str) -> Optional[dict]:
     """Get cached image features."""
-    if not redis_client:
+    cache_key = f"ocr:features:{image_hash}"
+    client = _client(Role.CACHE, cache_key)
+    if not client:
         return None
 
     try:
-        cache_key = f"ocr:features:{image_hash}"
-        features = await redis_client.get(cache_key)
+        features = await client.get(cache_key)
         if features:
             logger.debug("Retrieved cached model features", image_hash=image_hash)
-            return features
+            return json.loads(features)
     except Exception as e:
         logger.error("Failed to get cached model features", error=str(e), image_hash=image_hash)
 
     return None
 
 
+# Cluster-wide leases (see app/services/singleflight.py); kept on the same
+# node as the result they guard
+_RELEASE_LEASE = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+def lease_key(shop_id: str, key: str) -> str:
+    return f"ocr:lease:{shop_tag(shop_id)}:{key}"
+
+
+async def acquire_lease(shop_id: str, key: str, owner: str, ttl_seconds: float) -> Optional[bool]:
+    """Take the lease on ``key``; None when Redis is unavailable."""
+    name = lease_key(shop_id, key)
+    client = _client(Role.CACHE, name)
+    if not client:
+        return None
+
+    try:
+        return bool(await client.set(name, owner, nx=True, px=int(ttl_seconds * 1000)))
+    except Exception as e:
+        logger.error("Failed to acquire lease", error=str(e), shop_id=shop_id, key=key)
+        return None
+
+
+async def release_lease(shop_id: str, key: str, owner: str) -> None:
+    """Release the lease on ``key`` if ``owner`` still holds it."""
+    name = lease_key(shop_id, key)
+    client = _client(Role.CACHE, name)
+    if not client:
+        return
+
+    try:
+        await client.eval(_RELEASE_LEASE, 1, name, owner)
+    except Exception as e:
+        logger.error("Failed to release lease", error=str(e), shop_id=shop_id, key=key)
+
+
 # Queue management functions
+# (one hash tag: both priorities live on the same node)
+QUEUE_KEYS = {"high": "ocr:queue:{jobs}:high", "normal": "ocr:queue:{jobs}:normal"}
+
+# Untagged keys used before sharding. Jobs queued there by older replicas
+# are served first; nothing is pushed to them. Once a key is found empty it
+# is skipped, but re-read every REDIS_LEGACY_QUEUE_RECHECK_SECONDS in case an
+# older replica still running during a rollout queued more work.
+LEGACY_QUEUE_KEYS = {"high": "ocr:queue:high", "normal": "ocr:queue:normal"}
+_legacy_queues_drained: Dict[str, float] = {}
+
+
+def _legacy_queue_drained(priority: str) -> bool:
+    drained_at = _legacy_queues_drained.get(priority)
+    return drained_at is not None and time.monotonic() - drained_at < settings.REDIS_LEGACY_QUEUE_RECHECK_SECONDS
+
+
+async def _legacy_queue_length(priority: str) -> int:
+    if _legacy_queue_drained(priority):
+        return 0
+    queue_key = LEGACY_QUEUE_KEYS[priority]
+    client = _client(Role.QUEUE, queue_key)
+    length = await client.llen(queue_key) if client else 0
+    if length:
+        _legacy_queues_drained.pop(priority, None)
+    else:
+        _legacy_queues_drained[priority] = time.monotonic()
+    return length
+
+
+async def _pop_legacy_job(priority: str) -> Optional[str]:
+    if _legacy_queue_drained(priority):
+        return None
+    queue_key = LEGACY_QUEUE_KEYS[priority]
+    client = _client(Role.QUEUE, queue_key)
+    job_id = await client.rpop(queue_key) if client else None
+    if job_id is None:
+        if priority not in _legacy_queues_drained:
+            logger.info("Legacy queue drained", queue=queue_key)
+        _legacy_queues_drained[priority] = time.monotonic()
+    else:
+        _legacy_queues_drained.pop(priority, None)
+    return job_id
+
+
 async def add_to_processing_queue(job_id: str, priority: str = "normal") -> None:
     """Add job to processing queue."""
-    if not redis_client:
+    queue_key = QUEUE_KEYS["high" if priority == "high" else "normal"]
+    client = _client(Role.QUEUE, queue_key)
+    if not client:
         return
 
     try:
-        if priority == "high":
-            queue_key = "ocr:queue:high"
-        else:
-            queue_key = "ocr:queue:normal"
-
-        await redis_client.lpush(queue_key, job_id)
+        await client.lpush(queue_key, job_id)
         logger.debug("Added job to processing queue", job_id=job_id, priority=priority)
     except Exception as e:
         logger.error("Failed to add job to queue", error=str(e), job_id=job_id)
@@ -155,12 +374,17 @@ async def add_to_processing_queue(job_id: str, priority: str = "normal") -> None
 
 async def get_queue_length() -> dict:
     """Get current queue lengths."""
-    if not redis_client:
+    client = _client(Role.QUEUE, QUEUE_KEYS["high"])
+    if not client:
         return {"high": 0, "normal": 0, "total": 0}
 
     try:
-        high_queue = await redis_client.llen("ocr:queue:high")
-        normal_queue = await redis_client.llen("ocr:queue:normal")
+        async with client.pipeline(transaction=False) as pipe:
+            pipe.llen(QUEUE_KEYS["high"])
+            pipe.llen(QUEUE_KEYS["normal"])
+            high_queue, normal_queue = await pipe.execute()
+        high_queue += await _legacy_queue_length("high")
+        normal_queue += await _legacy_queue_length("normal")
         return {
             "high": high_queue,
             "normal": normal_queue,
@@ -173,16 +397,15 @@ async def get_queue_length() -> dict:
 
 async def get_next_job_id(priority: str = "high") -> Optional[str]:
     """Get next job from processing queue."""
-    if not redis_client:
+    priority = "high" if priority == "high" else "normal"
+    queue_key = QUEUE_KEYS[priority]
+    client = _client(Role.QUEUE, queue_key)
+    if not client:
         return None
 
     try:
-        if priority == "high":
-            queue_key = "ocr:queue:high"
-        else:
-            queue_key = "ocr:queue:normal"
-
-        job_id = await redis_client.rpop(queue_key)
+        # Older jobs first: the pre-sharding queue drains before the new one
+        job_id = await _pop_legacy_job(priority) or await client.rpop(queue_key)
         if job_id:
             logger.debug("Retrieved job from queue", job_id=job_id, priority=priority)
         return job_id
@@ -192,22 +415,25 @@ async def get_next_job_id(priority: str = "high") -> Optional[str]:
 
 
 # Rate limiting functions
+def _rate_limit_keys(user_id: str, shop_id: str) -> Tuple[str, str]:
+    # Users belong to one shop: tag both counters with it so a request
+    # touches a single node
+    tag = shop_tag(shop_id)
+    return f"rate_limit:{tag}:user:{user_id}", f"rate_limit:{tag}:shop"
+
+
 async def check_rate_limit(user_id: str, shop_id: str) -> bool:
     """Check if user/shop has exceeded rate limit."""
-    if not redis_client:
+    user_key, shop_key = _rate_limit_keys(user_id, shop_id)
+    client = _client(Role.RATE_LIMIT, shop_key)
+    if not client:
         return True  # Allow if Redis unavailable
 
     try:
-        # Check per-user limit
-        user_key = f"rate_limit:user:{user_id}"
-        user_count = await redis_client.get(user_key) or 0
+        user_count, shop_count = await client.mget(user_key, shop_key)
 
-        # Check per-shop limit
-        shop_key = f"rate_limit:shop:{shop_id}"
-        shop_count = await redis_client.get(shop_key) or 0
-
-        return int(user_count) < settings.RATE_LIMIT_REQUESTS_PER_MINUTE and \
-               int(shop_count) < (settings.RATE_LIMIT_REQUESTS_PER_MINUTE * 10)
+        return int(user_count or 0) < settings.RATE_LIMIT_REQUESTS_PER_MINUTE and \
+               int(shop_count or 0) < (settings.RATE_LIMIT_REQUESTS_PER_MINUTE * 10)
     except Exception as e:
         logger.error("Failed to check rate limit", error=str(e))
         return True  # Allow if check fails
@@ -215,41 +441,62 @@ async def check_rate_limit(user_id: str, shop_id: str) -> bool:
 
 async def increment_rate_limit(user_id: str, shop_id: str) -> None:
     """Increment rate limit counters."""
-    if not redis_client:
+    user_key, shop_key = _rate_limit_keys(user_id, shop_id)
+    client = _client(Role.RATE_LIMIT, shop_key)
+    if not client:
         return
 
     try:
-        # Increment per-user counter (expires in 1 minute)
-        user_key = f"rate_limit:user:{user_id}"
-        await redis_client.incr(user_key)
-        await redis_client.expire(user_key, 60)
-
-        # Increment per-shop counter (expires in 1 minute)
-        shop_key = f"rate_limit:shop:{shop_id}"
-        await redis_client.incr(shop_key)
-        await redis_client.expire(shop_key, 60)
+        # Per-user and per-shop counters, expiring after 1 minute
+        async with client.pipeline(transaction=False) as pipe:
+            for key in (user_key, shop_key):
+                pipe.incr(key)
+                pipe.expire(key, 60)
+            await pipe.execute()
 
     except Exception as e:
         logger.error("Failed to increment rate limit", error=str(e))
 
 
-# Health check function
+# Health check functions
+async def ping_redis() -> dict:
+    """Cheap connectivity check of every node, for the background health refresher."""
+    if not shards:
+        return {"status": "disconnected", "error": "Not initialized"}
+    roles = list(shards)
+    results = await asyncio.gather(*(shards[role].ping() for role in roles))
+    nodes = dict(zip(roles, results))
+    healthy = all(state == "up" for role_nodes in results for state in role_nodes.values())
+    return {"status": "healthy" if healthy else "unhealthy", "nodes": nodes}
+
+
 async def check_redis_health() -> dict:
-    """Check Redis connectivity and health."""
+    """Check Redis connectivity and health of every node."""
     try:
-        if not redis_client:
+        if not shards:
             return {"status": "disconnected", "error": "Not initialized"}
 
-        # Test basic operations
-        await redis_client.ping()
-        info = await redis_client.info()
+        roles: Dict[str, Dict[str, dict]] = {}
+        healthy = True
+        for role, shard in shards.items():
+            roles[role] = {}
+            for name, client in shard.clients.items():
+                try:
+                    info = await client.info()
+                    roles[role][name] = {
+                        "status": "healthy",
+                        "version": info.get("redis_version", "unknown"),
+                        "connected_clients": info.get("connected_clients", 0),
+                        "used_memory": info.get("used_memory_human", "unknown"),
+                    }
+                except Exception as e:
+                    healthy = False
+                    roles[role][name] = {"status": "unhealthy", "error": str(e)}
 
         return {
-            "status": "healthy",
-            "redis": "connected",
-            "version": info.get("redis_version", "unknown"),
-            "connected_clients": info.get("connected_clients", 0),
-            "used_memory": info.get("used_memory_human", "unknown")
+            "status": "healthy" if healthy else "unhealthy",
+            "redis": "connected" if healthy else "partial",
+            "roles": roles,
         }
     except Exception as e:
         logger.error("Redis health check failed", error=str(e))
@@ -258,13 +505,3 @@ async def check_redis_health() -> dict:
             "redis": "disconnected",
             "error": str(e)
         }
-
-
-
-
-
-
-
-
-
-
@@ -0,0 +1,69 @@
+"""
+Startup Timeline for ZakPOS OCR Server
+=====================================
+
+Records how long each startup phase (database, Redis, model loading) takes,
+relative to the moment the application modules were imported. Exposed via
+the health endpoints so autoscaling can be tuned against real cold starts.
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+
+class StartupTimeline:
+    """Ordered record of startup phases with offsets from process import."""
+
+    def __init__(self) -> None:
+        self._origin = time.monotonic()
+        self._phases: List[Dict[str, Any]] = []
+        self._ready_at: Optional[float] = None
+
+    def _offset_ms(self, timestamp: float) -> float:
+        return round((timestamp - self._origin) * 1000, 1)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time a startup phase; failures are recorded and re-raised."""
+        started = time.monotonic()
+        entry: Dict[str, Any] = {"phase": name, "started_ms": self._offset_ms(started), "status": "running"}
+        self._phases.append(entry)
+        try:
+            yield
+        except BaseException as e:
+            entry["status"] = "failed"
+            entry["error"] = str(e)
+            raise
+        else:
+            entry["status"] = "completed"
+        finally:
+            finished = time.monotonic()
+            entry["finished_ms"] = self._offset_ms(finished)
+            entry["duration_ms"] = round((finished - started) * 1000, 1)
+            logger.info("Startup phase finished", **entry)
+
+    def mark_ready(self) -> None:
+        """Record the first moment the instance became ready for traffic."""
+        if self._ready_at is None:
+            self._ready_at = time.monotonic()
+            logger.info("Instance ready", ready_ms=self._offset_ms(self._ready_at))
+
+    @property
+    def uptime_seconds(self) -> float:
+        return time.monotonic() - self._origin
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "uptime_seconds": round(self.uptime_seconds, 3),
+            "ready_ms": self._offset_ms(self._ready_at) if self._ready_at is not None else None,
+            "phases": [dict(phase) for phase in self._phases],
+        }
+
+
+# Global timeline, created when the app package is first imported
+startup_timeline = StartupTimeline()
@@ -0,0 +1,204 @@
+"""
+Rolling Performance Statistics for ZakPOS OCR Server
+===================================================
+
+In-process request statistics over sliding 1, 5 and 15 minute windows:
+throughput, latency percentiles, error rates by type, cache hit ratio and
+queue depth. Backs the JSON ``/api/v1/metrics`` summary; Prometheus
+histograms remain the source for long-term dashboards.
+
+Time is divided into fixed intervals, each holding plain counters and a
+log-bucketed quantile sketch. A window is the merge of its most recent
+intervals, so recording is O(1) and old data ages out without a sweep.
+All updates run on the event loop thread, so no locks are needed.
+"""
+
+import math
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+# Window name -> length in seconds
+WINDOWS = {"1m": 60, "5m": 300, "15m": 900}
+
+
+class QuantileSketch:
+    """Log-bucketed quantile sketch with bounded relative error.
+
+    Values are counted in buckets whose bounds grow geometrically by
+    ``gamma = (1 + accuracy) / (1 - accuracy)``, so any reported quantile is
+    within ``accuracy`` (relative) of the true value. Sketches merge by
+    adding bucket counts.
+    """
+
+    def __init__(self, accuracy: float = 0.01) -> None:
+        self.accuracy = accuracy
+        self._log_gamma = math.log((1 + accuracy) / (1 - accuracy))
+        self.buckets: Counter = Counter()
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, value: float) -> None:
+        # Sub-microsecond values share the lowest bucket
+        index = math.ceil(math.log(max(value, 1e-6)) / self._log_gamma)
+        self.buckets[index] += 1
+        self.count += 1
+        self.total += value
+
+    def merge(self, other: "QuantileSketch") -> None:
+        self.buckets.update(other.buckets)
+        self.count += other.count
+        self.total += other.total
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                # Bucket midpoint (in relative terms)
+                return 2 * math.exp(index * self._log_gamma) / (1 + math.exp(self._log_gamma))
+        return None
+
+
+class _Interval:
+    """Counters for one fixed time interval."""
+
+    def __init__(self, slot: int) -> None:
+        self.slot = slot
+        self.requests = 0
+        self.failures = 0
+        self.errors: Counter = Counter()
+        self.latency = QuantileSketch()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.max_in_flight = 0
+
+
+class RollingStats:
+    """Sliding-window request statistics plus lifetime totals."""
+
+    def __init__(self, interval_seconds: int = 10, windows: Optional[Dict[str, int]] = None) -> None:
+        self.interval_seconds = interval_seconds
+        self.windows = windows or WINDOWS
+        self._size = max(self.windows.values()) // interval_seconds
+        self._intervals: List[Optional[_Interval]] = [None] * self._size
+        self.started_at = time.time()
+
+        # Lifetime totals
+        self.total_requests = 0
+        self.total_failures = 0
+        self.total_latency_seconds = 0.0
+        self.errors_by_type: Counter = Counter()
+        self._confidence: Dict[str, Tuple[float, int]] = {}
+
+        self.in_flight = 0
+
+    def _interval(self, now: Optional[float] = None) -> _Interval:
+        slot = int((now or time.time()) // self.interval_seconds)
+        position = slot % self._size
+        interval = self._intervals[position]
+        if interval is None or interval.slot != slot:
+            interval = self._intervals[position] = _Interval(slot)
+        return interval
+
+    def request_started(self) -> None:
+        self.in_flight += 1
+        interval = self._interval()
+        interval.max_in_flight = max(interval.max_in_flight, self.in_flight)
+
+    def request_finished(
+        self,
+        duration_seconds: float,
+        error_type: Optional[str] = None,
+        model: Optional[str] = None,
+        confidence: Optional[float] = None,
+    ) -> None:
+        """Record a finished request; ``error_type`` marks it as failed."""
+        self.in_flight = max(0, self.in_flight - 1)
+        interval = self._interval()
+        interval.requests += 1
+        interval.latency.add(duration_seconds * 1000)
+
+        self.total_requests += 1
+        self.total_latency_seconds += duration_seconds
+
+        if error_type is not None:
+            interval.failures += 1
+            interval.errors[error_type] += 1
+            self.total_failures += 1
+            self.errors_by_type[error_type] += 1
+        elif model is not None and confidence is not None:
+            total, count = self._confidence.get(model, (0.0, 0))
+            self._confidence[model] = (total + confidence, count + 1)
+
+    def record_cache(self, hit: bool) -> None:
+        interval = self._interval()
+        if hit:
+            interval.cache_hits += 1
+        else:
+            interval.cache_misses += 1
+
+    def window(self, seconds: int, now: Optional[float] = None) -> Dict[str, Any]:
+        """Merge the intervals covering the last ``seconds`` into a summary."""
+        now = now or time.time()
+        newest = int(now // self.interval_seconds)
+        oldest = newest - seconds // self.interval_seconds + 1
+
+        latency = QuantileSketch()
+        errors: Counter = Counter()
+        requests = failures = hits = misses = max_in_flight = 0
+        for interval in self._intervals:
+            if interval is None or not oldest <= interval.slot <= newest:
+                continue
+            requests += interval.requests
+            failures += interval.failures
+            errors.update(interval.errors)
+            latency.merge(interval.latency)
+            hits += interval.cache_hits
+            misses += interval.cache_misses
+            max_in_flight = max(max_in_flight, interval.max_in_flight)
+
+        # Before the service has been up for a full window, rates use uptime
+        elapsed = min(seconds, max(now - self.started_at, self.interval_seconds))
+
+        def rounded(value: Optional[float]) -> Optional[float]:
+            return round(value, 2) if value is not None else None
+
+        return {
+            "requests": requests,
+            "throughput_rps": round(requests / elapsed, 3),
+            "error_rate": round(failures / requests, 4) if requests else 0.0,
+            "errors_by_type": dict(errors),
+            "latency_ms": {
+                "mean": rounded(latency.total / latency.count) if latency.count else None,
+                "p50": rounded(latency.quantile(0.50)),
+                "p95": rounded(latency.quantile(0.95)),
+                "p99": rounded(latency.quantile(0.99)),
+            },
+            "cache_hit_ratio": round(hits / (hits + misses), 4) if hits + misses else None,
+            "max_in_flight": max_in_flight,
+        }
+
+    def mean_confidence(self) -> Dict[str, float]:
+        return {model: round(total / count, 4) for model, (total, count) in self._confidence.items() if count}
+
+    def summary(self) -> Dict[str, Any]:
+        now = time.time()
+        return {
+            "total_requests": self.total_requests,
+            "successful_requests": self.total_requests - self.total_failures,
+            "failed_requests": self.total_failures,
+            "average_processing_time_ms": round(
+                self.total_latency_seconds / self.total_requests * 1000, 2
+            ) if self.total_requests else 0.0,
+            "errors_by_type": dict(self.errors_by_type),
+            "in_flight": self.in_flight,
+            "windows": {name: self.window(seconds, now) for name, seconds in self.windows.items()},
+        }
+
+
+# Global statistics instance
+request_stats = RollingStats()
@@ -0,0 +1,6 @@
+"""
+OCR Data Models
+==============
+
+Pydantic request/response schemas shared by the API and the OCR service.
+"""
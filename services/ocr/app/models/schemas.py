@@ -0,0 +1,215 @@
+"""
+API Schemas for ZakPOS OCR Server
+================================
+
+Pydantic models for OCR requests, results, batch and async jobs, health and
+metrics responses, plus the ``OCRError`` exception raised by the pipeline.
+"""
+
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+from app.core.config import OCRType, ProcessingStatus
+
+__all__ = [
+    "OCRType", "ProcessingStatus", "OCRError", "OCRRequest", "OCRResult",
+    "BatchOCRRequest", "BatchOCRResponse", "AsyncOCRRequest", "AsyncOCRStatus",
+    "HealthStatus", "MetricsResponse", "UploadResponse", "WebSocketMessage",
+    "BulkJobRequest", "BulkJobStatus", "PresignedUploadRequest", "PresignedUploadResponse",
+]
+
+
+class OCRError(Exception):
+    """OCR pipeline error with a machine-readable code."""
+
+    def __init__(self, code: str, message: str) -> None:
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+    def to_dict(self) -> Dict[str, str]:
+        return {"code": self.code, "message": self.message}
+
+
+class OCRRequest(BaseModel):
+    """A single image to process."""
+    shop_id: str
+    user_id: str
+    ocr_type: str = OCRType.PRODUCT
+    confidence_threshold: float = Field(0.8, ge=0.0, le=1.0)
+    extract_barcodes: bool = True
+    language: str = "en"
+    image_path: Optional[str] = None
+    image_bytes: Optional[bytes] = Field(None, description="Encoded image held in memory instead of at image_path")
+    storage_key: Optional[str] = Field(None, description="Object-storage key of an uploaded image")
+    file_size: int = 0
+    filename: Optional[str] = None
+    submitted_at: Optional[float] = Field(None, description="Epoch seconds when the request was accepted")
+    lane: str = Field("interactive", description="Execution lane: interactive (till scans) or bulk (back office)")
+    deadline: Optional[float] = Field(None, description="Epoch seconds after which the result is no longer wanted")
+    timings: Dict[str, float] = Field(
+        default_factory=dict, description="Stage timings (ms) recorded before OCR processing started"
+    )
+    idempotency_key: Optional[str] = Field(None, description="Client key that maps retries onto the original job")
+    content_key: Optional[str] = Field(None, description="Key of the image and options (result cache, single-flight)")
+
+
+class OCRResult(BaseModel):
+    """Text, structured fields and barcodes extracted from one image."""
+    id: str
+    text: str = ""
+    confidence: float = 0.0
+    structured: Dict[str, Any] = Field(default_factory=dict)
+    barcodes: List[Dict[str, Any]] = Field(default_factory=list)
+    processing_time_ms: int = 0
+    model_used: str
+    error: Optional[str] = None
+    timings: Optional[Dict[str, float]] = Field(
+        None, description="Milliseconds spent in each pipeline stage"
+    )
+    degraded: Optional[str] = Field(
+        None, description="Reduced processing mode applied under load (fallback_only, barcode_only)"
+    )
+
+    @property
+    def is_successful(self) -> bool:
+        return self.error is None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return self.model_dump()
+
+    def to_compact(self) -> Dict[str, Any]:
+        """Short-key form returned by /scan; empty fields are left out.
+
+        id, t = text, c = confidence, ms = processing time, m = model,
+        s = structured, b = barcodes, d = degraded, e = error
+        """
+        compact: Dict[str, Any] = {
+            "id": self.id,
+            "t": self.text,
+            "c": round(self.confidence, 3),
+            "ms": self.processing_time_ms,
+            "m": self.model_used,
+        }
+        for key, value in (("s", self.structured), ("b", self.barcodes), ("d", self.degraded), ("e", self.error)):
+            if value:
+                compact[key] = value
+        return compact
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "OCRResult":
+        return cls.model_validate(data)
+
+
+class BatchOCRRequest(BaseModel):
+    """Options shared by every image of a batch."""
+    ocr_type: str = OCRType.PRODUCT
+    confidence_threshold: float = Field(0.8, ge=0.0, le=1.0)
+    extract_barcodes: bool = True
+    language: str = "en"
+    priority: str = "normal"
+
+
+class BatchOCRResponse(BaseModel):
+    batch_id: str
+    total_images: int
+    processed_images: int
+    results: List[OCRResult]
+    processing_time_ms: int
+
+
+class AsyncOCRRequest(BaseModel):
+    ocr_type: str = OCRType.PRODUCT
+    confidence_threshold: float = Field(0.8, ge=0.0, le=1.0)
+    extract_barcodes: bool = True
+    language: str = "en"
+    callback_url: Optional[str] = None
+
+
+class AsyncOCRStatus(BaseModel):
+    job_id: str
+    status: str = ProcessingStatus.QUEUED
+    progress_percentage: int = 0
+    estimated_time_seconds: Optional[int] = None
+    result: Optional[OCRResult] = None
+    error: Optional[str] = None
+
+
+class BulkJobRequest(BaseModel):
+    """OCR every image under an object-storage prefix."""
+    prefix: str = Field(..., description="Key prefix to process, within uploads/<shop_id>/")
+    bucket: Optional[str] = Field(None, description="Source bucket (default MINIO_BUCKET_NAME)")
+    job_id: Optional[str] = Field(None, description="Reuse the id of a stopped job to resume it")
+    ocr_type: str = OCRType.INVOICE
+    language: str = "en"
+    extract_barcodes: bool = False
+    output_bucket: Optional[str] = None
+    output_prefix: Optional[str] = Field(None, description="Within <OCR_BULK_OUTPUT_PREFIX>/<shop_id> (the default)")
+
+
+class BulkJobStatus(BaseModel):
+    job_id: str
+    state: str
+    error: Optional[str] = None
+    bucket: str
+    prefix: str
+    results: str = Field(..., description="Bucket and prefix of the JSON-lines result parts")
+    processed: int = 0
+    failed: int = 0
+    skipped: int = 0
+    checkpoint_after: Optional[str] = Field(None, description="Every key up to this one has a stored result")
+    parts: int = 0
+    images_per_second: Optional[float] = None
+
+
+class HealthStatus(BaseModel):
+    status: str
+    timestamp: float
+    version: str
+    services: Dict[str, Any] = Field(default_factory=dict)
+    age_seconds: Optional[float] = Field(None, description="Age of the background snapshot served")
+
+
+class MetricsResponse(BaseModel):
+    total_requests: int
+    successful_requests: int
+    failed_requests: int
+    average_processing_time_ms: float
+    model_accuracy: Dict[str, float] = Field(default_factory=dict)
+    errors_by_type: Dict[str, int] = Field(default_factory=dict)
+    queue_status: Any = None
+    uptime_seconds: float
+    in_flight: int = 0
+    windows: Dict[str, Any] = Field(
+        default_factory=dict, description="Throughput, latency percentiles, error and cache rates per 1m/5m/15m window"
+    )
+
+
+class UploadResponse(BaseModel):
+    filename: str
+    file_size: int
+    image_url: str
+    content_type: str
+    storage_key: Optional[str] = Field(None, description="Pass as storage_key to /process or /process/async")
+
+
+class PresignedUploadRequest(BaseModel):
+    filename: str
+    content_type: str = Field(..., description="Image MIME type, e.g. image/jpeg")
+    size: int = Field(..., gt=0, description="Size of the image in bytes")
+
+
+class PresignedUploadResponse(BaseModel):
+    storage_key: str
+    upload_url: str = Field(..., description="PUT the image bytes here, directly to storage")
+    method: str = "PUT"
+    headers: Dict[str, str] = Field(default_factory=dict, description="Headers to send with the upload")
+    expires_at: float
+    image_url: str
+
+
+class WebSocketMessage(BaseModel):
+    type: str
+    job_id: Optional[str] = None
+    data: Dict[str, Any] = Field(default_factory=dict)
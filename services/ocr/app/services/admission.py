@@ -0,0 +1,159 @@
+"""
+Admission Control for ZakPOS OCR
+===============================
+
+Decides, before any work is done, whether a request can finish within its
+deadline. Each processing mode (full TrOCR, Tesseract-only, barcode-only)
+is a lane with its own in-flight count and EWMA of service time (how long a
+request holds an execution slot). The predicted completion time of a new
+request is the work already admitted to every lane, each request weighted
+by its lane's service time and spread over the OCR_WORKERS inference
+threads, plus its own service time.
+
+Requests that would miss their deadline in the full lane are degraded to a
+cheaper lane when one would make it, otherwise rejected with a Retry-After
+hint, so the requests we do accept still meet their SLO under a spike.
+"""
+
+import math
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+import structlog
+
+from app.core.config import settings
+from app.core.monitoring import record_admission
+from app.models.schemas import OCRError, OCRRequest
+
+logger = structlog.get_logger(__name__)
+
+
+class ProcessingMode:
+    """Admission lanes, most to least expensive."""
+    FULL = "full"
+    FALLBACK_ONLY = "fallback_only"
+    BARCODE_ONLY = "barcode_only"
+
+
+# Service time assumed for a lane before it has any observations (seconds)
+_PRIOR_SERVICE_SECONDS = {
+    ProcessingMode.FULL: 0.5,
+    ProcessingMode.FALLBACK_ONLY: 0.3,
+    ProcessingMode.BARCODE_ONLY: 0.05,
+}
+
+
+class AdmissionRejected(OCRError):
+    """Raised when a request cannot be served within its deadline."""
+
+    def __init__(self, message: str, retry_after_seconds: int) -> None:
+        super().__init__("OVERLOADED", message)
+        self.retry_after_seconds = retry_after_seconds
+
+
+class AdmissionTicket:
+    """An admitted request's lane, released when processing ends."""
+
+    def __init__(self, mode: str, degraded: bool, predicted_seconds: float) -> None:
+        self.mode = mode
+        self.degraded = degraded
+        self.predicted_seconds = predicted_seconds
+        self.service_seconds: Optional[float] = None
+
+    def observe(self, service_seconds: float) -> None:
+        """Record how long the finished request held its execution slot."""
+        self.service_seconds = service_seconds
+
+
+class AdmissionController:
+    """Per-lane in-flight tracking and EWMA service-time prediction."""
+
+    def __init__(self, fallback_available: Callable[[], bool]) -> None:
+        self._fallback_available = fallback_available
+        self.in_flight: Dict[str, int] = {mode: 0 for mode in _PRIOR_SERVICE_SECONDS}
+        self.service_seconds: Dict[str, float] = dict(_PRIOR_SERVICE_SECONDS)
+        self.decisions: Dict[str, int] = {}
+
+    @property
+    def total_in_flight(self) -> int:
+        return sum(self.in_flight.values())
+
+    def predict(self, mode: str) -> float:
+        """Predicted seconds until a request admitted to ``mode`` now completes."""
+        workers = max(1, settings.OCR_WORKERS)
+        admitted = sum(count * self.service_seconds[lane] for lane, count in self.in_flight.items())
+        return admitted / workers + self.service_seconds[mode]
+
+    def _candidates(self, request: OCRRequest) -> Iterator[str]:
+        if request.ocr_type == "barcode":
+            # Barcode scans never use the text models
+            yield ProcessingMode.BARCODE_ONLY
+            return
+        yield ProcessingMode.FULL
+        if not settings.OCR_ADMISSION_DEGRADE:
+            return
+        if self._fallback_available():
+            yield ProcessingMode.FALLBACK_ONLY
+        if request.extract_barcodes:
+            yield ProcessingMode.BARCODE_ONLY
+
+    def _decide(self, request: OCRRequest, budget_seconds: float) -> AdmissionTicket:
+        if self.total_in_flight >= settings.OCR_QUEUE_SIZE:
+            retry_after = self.predict(ProcessingMode.FULL)
+            raise AdmissionRejected(f"Queue full ({settings.OCR_QUEUE_SIZE} requests in flight)", _retry_after(retry_after))
+
+        target = budget_seconds * settings.OCR_ADMISSION_SAFETY_FACTOR
+        first_prediction = None
+        for position, mode in enumerate(self._candidates(request)):
+            predicted = self.predict(mode)
+            if first_prediction is None:
+                first_prediction = predicted
+            if predicted <= target:
+                return AdmissionTicket(mode, degraded=position > 0, predicted_seconds=predicted)
+
+        raise AdmissionRejected(
+            f"Predicted completion {first_prediction:.1f}s exceeds deadline {budget_seconds:.1f}s",
+            _retry_after(first_prediction - target),
+        )
+
+    @contextmanager
+    def admit(self, request: OCRRequest, budget_seconds: float) -> Iterator[AdmissionTicket]:
+        """Admit a request (or raise AdmissionRejected) and hold its lane slot."""
+        if not settings.OCR_ADMISSION_ENABLED:
+            yield AdmissionTicket(ProcessingMode.FULL, degraded=False, predicted_seconds=0.0)
+            return
+
+        try:
+            ticket = self._decide(request, budget_seconds)
+        except AdmissionRejected as e:
+            self._count("rejected")
+            logger.warning("Request rejected by admission control", reason=e.message, retry_after=e.retry_after_seconds)
+            raise
+
+        self._count(f"degraded_{ticket.mode}" if ticket.degraded else "admitted")
+        self.in_flight[ticket.mode] += 1
+        try:
+            yield ticket
+        finally:
+            self.in_flight[ticket.mode] -= 1
+            if ticket.service_seconds is not None:
+                alpha = settings.OCR_ADMISSION_EWMA_ALPHA
+                previous = self.service_seconds[ticket.mode]
+                self.service_seconds[ticket.mode] = alpha * ticket.service_seconds + (1 - alpha) * previous
+
+    def _count(self, decision: str) -> None:
+        self.decisions[decision] = self.decisions.get(decision, 0) + 1
+        record_admission(decision)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "enabled": settings.OCR_ADMISSION_ENABLED,
+            "in_flight": dict(self.in_flight),
+            "service_ms": {mode: round(seconds * 1000, 1) for mode, seconds in self.service_seconds.items()},
+            "predicted_ms": {mode: round(self.predict(mode) * 1000, 1) for mode in self.in_flight},
+            "decisions": dict(self.decisions),
+        }
+
+
+def _retry_after(seconds: float) -> int:
+    return max(1, math.ceil(seconds))
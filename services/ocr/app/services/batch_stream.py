@@ -0,0 +1,340 @@
+"""
+Streaming Batch Processing for ZakPOS OCR
+=========================================
+
+Backs ``/api/v1/batch/stream``: images are taken off a multipart or tar
+upload as their last byte arrives, processed while the rest of the upload
+is still in flight, and each result is written back as one NDJSON line as
+soon as it completes (in completion order, tagged with the image index).
+
+Memory stays bounded: at most OCR_STREAM_MAX_PENDING decoded uploads wait
+for a worker and OCR_STREAM_CONCURRENCY are processed at once. When both
+are full the upload is simply not read, so TCP flow control slows the
+client down instead of the service buffering the whole batch.
+"""
+
+import asyncio
+import json
+import tarfile
+import time
+import uuid
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+import structlog
+
+from app.core.config import settings
+from app.core.monitoring import record_abandoned
+from app.models.schemas import OCRError, OCRRequest, OCRResult
+from app.services.deadlines import expire
+
+logger = structlog.get_logger(__name__)
+
+_TAR_BLOCK = 512
+
+
+class StreamItem:
+    """One image taken off the upload stream."""
+
+    def __init__(self, index: int, filename: str, data: bytes, error: Optional[OCRError] = None) -> None:
+        self.index = index
+        self.filename = filename
+        self.data = data
+        self.error = error
+        self.received_at = time.time()
+
+
+class _ItemLimiter:
+    """Numbers items and enforces the per-image and per-stream limits."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.max_bytes = settings.MAX_IMAGE_SIZE_MB * 1024 * 1024
+
+    def item(self, filename: str, data: bytes, truncated: bool = False) -> StreamItem:
+        if self.count >= settings.OCR_STREAM_MAX_IMAGES:
+            raise OCRError("TOO_MANY_IMAGES", f"Maximum {settings.OCR_STREAM_MAX_IMAGES} images per stream")
+        index = self.count
+        self.count += 1
+        if truncated:
+            error = OCRError("FILE_TOO_LARGE", f"Image size exceeds {settings.MAX_IMAGE_SIZE_MB}MB limit")
+            return StreamItem(index, filename, b"", error)
+        return StreamItem(index, filename, data)
+
+
+async def iter_multipart(content_type: str, chunks: AsyncIterator[bytes]) -> AsyncIterator[StreamItem]:
+    """Yield the file parts of a ``multipart/form-data`` body as each one completes.
+
+    Parts without a filename (plain form fields) are skipped.
+    """
+    from multipart.multipart import MultipartParser, parse_options_header
+
+    _, options = parse_options_header(content_type)
+    boundary = options.get(b"boundary")
+    if not boundary:
+        raise OCRError("INVALID_UPLOAD", "Missing multipart boundary")
+
+    limiter = _ItemLimiter()
+    completed: List[StreamItem] = []
+    part: Dict[str, Any] = {}
+    header: Dict[str, bytes] = {}
+
+    def on_part_begin() -> None:
+        part.clear()
+        part.update(headers={}, data=bytearray(), truncated=False)
+
+    def on_part_data(data: bytes, start: int, end: int) -> None:
+        if part["truncated"]:
+            return
+        if len(part["data"]) + end - start > limiter.max_bytes:
+            # Keep parsing past an oversized image, but do not buffer it
+            part["truncated"] = True
+            part["data"] = bytearray()
+            return
+        part["data"] += data[start:end]
+
+    def on_header_field(data: bytes, start: int, end: int) -> None:
+        header["field"] = header.get("field", b"") + data[start:end]
+
+    def on_header_value(data: bytes, start: int, end: int) -> None:
+        header["value"] = header.get("value", b"") + data[start:end]
+
+    def on_header_end() -> None:
+        part["headers"][header.get("field", b"").lower()] = header.get("value", b"")
+        header.clear()
+
+    def on_part_end() -> None:
+        _, disposition = parse_options_header(part["headers"].get(b"content-disposition", b""))
+        filename = disposition.get(b"filename")
+        if filename is None:
+            return
+        completed.append(limiter.item(filename.decode("utf-8", "replace"), bytes(part["data"]), part["truncated"]))
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+    })
+
+    async for chunk in chunks:
+        parser.write(chunk)
+        while completed:
+            yield completed.pop(0)
+    parser.finalize()
+    while completed:
+        yield completed.pop(0)
+
+
+async def iter_tar(chunks: AsyncIterator[bytes]) -> AsyncIterator[StreamItem]:
+    """Yield the regular files of an uncompressed tar stream as each one completes.
+
+    Members are read sequentially from the stream (no seeking), honouring
+    GNU long names and PAX ``path`` records.
+    """
+    limiter = _ItemLimiter()
+    buffer = bytearray()
+    long_name: Optional[str] = None
+    chunks = chunks.__aiter__()
+    finished = False
+
+    async def fill(size: int) -> bool:
+        nonlocal finished
+        while len(buffer) < size and not finished:
+            try:
+                buffer.extend(await chunks.__anext__())
+            except StopAsyncIteration:
+                finished = True
+        return len(buffer) >= size
+
+    async def take(size: int, keep: bool) -> bytes:
+        """Consume ``size`` bytes plus padding; only buffer them if ``keep``."""
+        padded = -(-size // _TAR_BLOCK) * _TAR_BLOCK
+        data = bytearray()
+        remaining = padded
+        while remaining:
+            if not buffer and not await fill(1):
+                raise OCRError("INVALID_UPLOAD", "Truncated tar archive")
+            piece = buffer[:remaining]
+            del buffer[:len(piece)]
+            if keep and len(data) < size:
+                data += piece[:size - len(data)]
+            remaining -= len(piece)
+        return bytes(data)
+
+    while await fill(_TAR_BLOCK):
+        block = bytes(buffer[:_TAR_BLOCK])
+        del buffer[:_TAR_BLOCK]
+        if block == b"\0" * _TAR_BLOCK:
+            # End-of-archive marker
+            return
+        try:
+            info = tarfile.TarInfo.frombuf(block, "utf-8", "surrogateescape")
+        except tarfile.TarError as e:
+            raise OCRError("INVALID_UPLOAD", f"Invalid tar header: {e}")
+
+        if info.type == tarfile.GNUTYPE_LONGNAME:
+            long_name = (await take(info.size, keep=True)).rstrip(b"\0").decode("utf-8", "replace")
+            continue
+        if info.type in (tarfile.XHDTYPE, tarfile.XGLTYPE):
+            for record in (await take(info.size, keep=True)).decode("utf-8", "replace").splitlines():
+                _, _, field = record.partition(" ")
+                key, _, value = field.partition("=")
+                if key == "path" and info.type == tarfile.XHDTYPE:
+                    long_name = value
+            continue
+
+        name = long_name or info.name
+        long_name = None
+        if not info.isreg():
+            await take(info.size, keep=False)
+            continue
+
+        oversized = info.size > limiter.max_bytes
+        data = await take(info.size, keep=not oversized)
+        yield limiter.item(name, data, truncated=oversized)
+
+    if buffer:
+        raise OCRError("INVALID_UPLOAD", "Truncated tar archive")
+
+
+def upload_items(content_type: str, chunks: AsyncIterator[bytes]) -> AsyncIterator[StreamItem]:
+    """Pick the stream parser for an upload's content type."""
+    if content_type.startswith("multipart/form-data"):
+        return iter_multipart(content_type, chunks)
+    if content_type.split(";")[0].strip() in ("application/x-tar", "application/tar"):
+        return iter_tar(chunks)
+    raise OCRError("UNSUPPORTED_MEDIA_TYPE", "Upload multipart/form-data or application/x-tar")
+
+
+def _line(payload: Dict[str, Any]) -> bytes:
+    return json.dumps(payload, default=str).encode() + b"\n"
+
+
+class BatchStream:
+    """Runs one streamed batch: reader, bounded queue, workers and NDJSON output."""
+
+    def __init__(
+        self,
+        process: Callable[[OCRRequest], Any],
+        make_request: Callable[[StreamItem], OCRRequest],
+        concurrency: Optional[int] = None,
+        max_pending: Optional[int] = None,
+    ) -> None:
+        self.batch_id = str(uuid.uuid4())
+        self._process = process
+        self._make_request = make_request
+        self.concurrency = concurrency or settings.OCR_STREAM_CONCURRENCY
+        self.max_pending = max_pending or settings.OCR_STREAM_MAX_PENDING
+        self._in_flight: Dict[int, OCRRequest] = {}
+        self.abandoned = False
+        self.received = 0
+        self.succeeded = 0
+        self.failed = 0
+
+    async def run(self, items: AsyncIterator[StreamItem]) -> AsyncIterator[bytes]:
+        """Consume ``items`` and yield one NDJSON line per image, then a summary."""
+        started = time.time()
+        pending: asyncio.Queue = asyncio.Queue(maxsize=self.max_pending)
+        output: asyncio.Queue = asyncio.Queue(maxsize=self.max_pending)
+        upload_error: List[OCRError] = []
+
+        async def read() -> None:
+            try:
+                async for item in items:
+                    self.received += 1
+                    await pending.put(item)
+            except OCRError as e:
+                upload_error.append(e)
+            except Exception as e:
+                # Client disconnected mid-upload
+                logger.info("Streaming batch upload aborted", batch_id=self.batch_id, error=str(e))
+                self._abandon()
+            for _ in range(self.concurrency):
+                await pending.put(None)
+
+        async def work() -> None:
+            while True:
+                item = await pending.get()
+                if item is None or self.abandoned:
+                    break
+                await output.put(await self._run_item(item, started))
+            await output.put(None)
+
+        yield _line({"type": "batch", "batch_id": self.batch_id})
+
+        tasks = [asyncio.create_task(read())] + [asyncio.create_task(work()) for _ in range(self.concurrency)]
+        completed = False
+        try:
+            running = self.concurrency
+            while running:
+                line = await output.get()
+                if line is None:
+                    running -= 1
+                    continue
+                yield line
+            await tasks[0]
+            completed = True
+        finally:
+            if not completed:
+                # The client stopped reading results mid-batch
+                self._abandon()
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+        summary: Dict[str, Any] = {
+            "type": "summary",
+            "batch_id": self.batch_id,
+            "total_images": self.received,
+            "successful": self.succeeded,
+            "failed": self.failed,
+            "wall_clock_ms": int((time.time() - started) * 1000),
+        }
+        if upload_error:
+            summary["error"] = upload_error[0].to_dict()
+        logger.info("Streaming batch completed", **summary)
+        yield _line(summary)
+
+    def _abandon(self) -> None:
+        """Stop the batch: expire running images and skip queued ones."""
+        if self.abandoned:
+            return
+        self.abandoned = True
+        for request in self._in_flight.values():
+            expire(request)
+        record_abandoned("client_disconnected", "stream")
+
+    async def _run_item(self, item: StreamItem, started: float) -> bytes:
+        line: Dict[str, Any] = {
+            "type": "result",
+            "index": item.index,
+            "filename": item.filename,
+            "received_ms": int((item.received_at - started) * 1000),
+        }
+        if item.error is not None:
+            self.failed += 1
+            line.update(type="error", error=item.error.to_dict(), completed_ms=line["received_ms"])
+            return _line(line)
+
+        request = self._make_request(item)
+        self._in_flight[id(request)] = request
+        try:
+            result: OCRResult = await self._process(request)
+        except OCRError as e:
+            self.failed += 1
+            line.update(type="error", error=e.to_dict())
+        except Exception as e:
+            self.failed += 1
+            line.update(type="error", error={"code": "PROCESSING_ERROR", "message": str(e)})
+        else:
+            self.succeeded += 1
+            line["result"] = result.to_dict()
+        finally:
+            self._in_flight.pop(id(request), None)
+            # Drop the image bytes as soon as the item is done
+            request.image_bytes = None
+
+        line["completed_ms"] = int((time.time() - started) * 1000)
+        return _line(line)
@@ -0,0 +1,480 @@
+"""
+Bulk OCR of an Object-Storage Prefix
+====================================
+
+Digitises every image under a bucket prefix (e.g. years of supplier
+invoices) in one resumable job:
+
+    list prefix (streamed) -> download (prefetched) -> OCR -> JSON-lines parts
+
+The listing is consumed page by page in key order. Up to OCR_BULK_PREFETCH
+downloaded images wait for one of OCR_BULK_CONCURRENCY OCR workers, so
+downloads overlap recognition without holding the whole prefix in memory.
+OCR runs in the bulk lane, so jobs never delay interactive scans.
+
+Results are written as ``results-00000.jsonl`` parts under
+``<output prefix>/<job id>/``; jobs started through the API write under
+``<OCR_BULK_OUTPUT_PREFIX>/<shop id>/`` and only read the shop's uploads.
+A part only ever holds the contiguous run of
+keys that are all finished, and ``checkpoint.json`` records the last of
+them; a crashed or cancelled job run again with the same id continues
+after that key without duplicating or losing results.
+
+Usage:
+    python -m app.services.bulk_job run --prefix invoices/2019/ --ocr-type invoice --job-id invoices-2019
+    python -m app.services.bulk_job status invoices-2019
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+import structlog
+
+from app.core.config import settings
+from app.models.schemas import OCRError, OCRRequest, OCRResult
+from app.services.admission import AdmissionRejected
+from app.services.scheduler import Lane
+from app.services.storage import ObjectNotFound, ObjectStore, StoredObject, get_object_store
+
+logger = structlog.get_logger(__name__)
+
+# (processed | failed | skipped, result line or None)
+Outcome = Tuple[str, Optional[Dict[str, Any]]]
+
+
+class BulkJobError(Exception):
+    """Raised for invalid or conflicting bulk jobs."""
+    pass
+
+
+def shop_results_prefix(shop_id: str) -> str:
+    """Where a shop's bulk jobs write their results (one folder per job below it)."""
+    return f"{settings.OCR_BULK_OUTPUT_PREFIX.rstrip('/')}/{shop_id}"
+
+
+class BulkJobSpec:
+    """What a bulk job processes and where its results go."""
+
+    # Fields that must match when a job is resumed
+    _IDENTITY = (
+        "shop_id", "bucket", "prefix", "ocr_type", "language", "extract_barcodes", "output_bucket", "output_prefix"
+    )
+
+    def __init__(
+        self,
+        prefix: str,
+        ocr_type: str = "invoice",
+        bucket: Optional[str] = None,
+        job_id: Optional[str] = None,
+        language: str = "en",
+        extract_barcodes: bool = False,
+        output_bucket: Optional[str] = None,
+        output_prefix: Optional[str] = None,
+        shop_id: str = "bulk",
+        user_id: str = "bulk",
+    ) -> None:
+        self.job_id = job_id or str(uuid.uuid4())
+        self.bucket = bucket or settings.MINIO_BUCKET_NAME
+        self.prefix = prefix
+        self.ocr_type = ocr_type
+        self.language = language
+        self.extract_barcodes = extract_barcodes
+        self.output_bucket = output_bucket or self.bucket
+        self.output_prefix = (output_prefix or settings.OCR_BULK_OUTPUT_PREFIX).rstrip("/")
+        self.shop_id = shop_id
+        self.user_id = user_id
+
+    @property
+    def result_prefix(self) -> str:
+        return f"{self.output_prefix}/{self.job_id}/"
+
+    @property
+    def checkpoint_key(self) -> str:
+        return f"{self.result_prefix}checkpoint.json"
+
+    def part_key(self, part: int) -> str:
+        return f"{self.result_prefix}results-{part:05d}.jsonl"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "user_id": self.user_id,
+            **{field: getattr(self, field) for field in self._IDENTITY},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "BulkJobSpec":
+        return cls(**data)
+
+    def matches(self, other: Dict[str, Any]) -> bool:
+        return all(other.get(field) == getattr(self, field) for field in self._IDENTITY)
+
+
+class BulkCheckpoint:
+    """Durable progress of a job: everything up to ``after`` is in parts ``< part``."""
+
+    def __init__(self, data: Optional[Dict[str, Any]] = None) -> None:
+        data = data or {}
+        self.after: Optional[str] = data.get("after")
+        self.part: int = data.get("part", 0)
+        self.processed: int = data.get("processed", 0)
+        self.failed: int = data.get("failed", 0)
+        self.skipped: int = data.get("skipped", 0)
+        self.started_at: float = data.get("started_at") or time.time()
+        self.finished_at: Optional[float] = data.get("finished_at")
+
+    def to_dict(self, spec: BulkJobSpec) -> Dict[str, Any]:
+        return {
+            "spec": spec.to_dict(),
+            "after": self.after,
+            "part": self.part,
+            "processed": self.processed,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "started_at": self.started_at,
+            "updated_at": time.time(),
+            "finished_at": self.finished_at,
+        }
+
+
+async def read_checkpoint(spec: BulkJobSpec, output: Optional[ObjectStore] = None) -> Optional[Dict[str, Any]]:
+    """The stored checkpoint of a job, or None if it never checkpointed."""
+    output = output or get_object_store(spec.output_bucket)
+    try:
+        return json.loads(await output.get_bytes(spec.checkpoint_key))
+    except ObjectNotFound:
+        return None
+
+
+async def stored_status(
+    job_id: str, output_bucket: Optional[str] = None, output_prefix: Optional[str] = None
+) -> Optional[Dict[str, Any]]:
+    """Status of a job that is not running in this process, from its checkpoint."""
+    stored = await read_checkpoint(
+        BulkJobSpec(prefix="", job_id=job_id, output_bucket=output_bucket, output_prefix=output_prefix)
+    )
+    if stored is None:
+        return None
+    job = BulkJob(BulkJobSpec.from_dict(stored["spec"]), process=None)
+    job.checkpoint = BulkCheckpoint(stored)
+    job.state = "completed" if job.checkpoint.finished_at is not None else "stopped"
+    return job.status()
+
+
+def _is_image(key: str) -> bool:
+    extensions = tuple(ext.strip().lower() for ext in settings.OCR_BULK_EXTENSIONS.split(",") if ext.strip())
+    return key.lower().endswith(extensions)
+
+
+class BulkJob:
+    """One run of a bulk job (resuming from its checkpoint, if any)."""
+
+    def __init__(
+        self,
+        spec: BulkJobSpec,
+        process: Callable[[OCRRequest], Awaitable[OCRResult]],
+        source: Optional[ObjectStore] = None,
+        output: Optional[ObjectStore] = None,
+        concurrency: Optional[int] = None,
+        prefetch: Optional[int] = None,
+    ) -> None:
+        self.spec = spec
+        self._process = process
+        self.source = source or get_object_store(spec.bucket)
+        self.output = output or get_object_store(spec.output_bucket)
+        self.concurrency = concurrency or settings.OCR_BULK_CONCURRENCY
+        self.prefetch = prefetch or settings.OCR_BULK_PREFETCH
+        self.state = "pending"
+        self.error: Optional[str] = None
+        self.checkpoint = BulkCheckpoint()
+        self.listed = 0
+
+        # Finished items by listing sequence, waiting for all earlier ones
+        self._finished: Dict[int, Tuple[str, Outcome]] = {}
+        self._next_seq = 0
+        self._watermark: Optional[str] = None
+        self._buffer: List[bytes] = []
+        self._buffered = {"processed": 0, "failed": 0, "skipped": 0}
+        self._flush_lock = asyncio.Lock()
+
+    async def run(self) -> Dict[str, Any]:
+        """Process the prefix to the end; returns the final status."""
+        stored = await read_checkpoint(self.spec, self.output)
+        if stored is not None:
+            if not self.spec.matches(stored["spec"]):
+                raise BulkJobError(f"Job {self.spec.job_id} already exists with different parameters")
+            self.checkpoint = BulkCheckpoint(stored)
+            if self.checkpoint.finished_at is not None:
+                self.state = "completed"
+                return self.status()
+            logger.info("Resuming bulk job", job_id=self.spec.job_id, after=self.checkpoint.after)
+        self._watermark = self.checkpoint.after
+
+        self.state = "running"
+        try:
+            await self._pipeline()
+            self.checkpoint.finished_at = time.time()
+            await self._flush()
+            self.state = "completed"
+        except asyncio.CancelledError:
+            self.state = "cancelled"
+            raise
+        except Exception as e:
+            self.state = "failed"
+            self.error = str(e)
+            logger.error("Bulk job failed", job_id=self.spec.job_id, error=str(e))
+            raise
+        finally:
+            logger.info("Bulk job stopped", **self.status())
+        return self.status()
+
+    async def _pipeline(self) -> None:
+        listed: asyncio.Queue = asyncio.Queue(maxsize=self.prefetch)
+        ready: asyncio.Queue = asyncio.Queue(maxsize=self.prefetch)
+
+        async def list_prefix() -> None:
+            async for entry in self.source.list_objects(self.spec.prefix, start_after=self.checkpoint.after):
+                if entry.key.startswith(self.spec.result_prefix):
+                    continue
+                seq = self.listed
+                self.listed += 1
+                await listed.put((seq, entry))
+            for _ in range(self.concurrency):
+                await listed.put(None)
+
+        async def download() -> None:
+            while True:
+                job = await listed.get()
+                if job is None:
+                    return
+                seq, entry = job
+                await ready.put((seq, entry, await self._download(entry)))
+
+        async def produce() -> None:
+            await asyncio.gather(list_prefix(), *(download() for _ in range(self.concurrency)))
+            for _ in range(self.concurrency):
+                await ready.put(None)
+
+        async def recognise() -> None:
+            while True:
+                job = await ready.get()
+                if job is None:
+                    return
+                seq, entry, downloaded = job
+                await self._finish(seq, entry.key, await self._recognise(entry, downloaded))
+
+        tasks = [asyncio.create_task(produce())] + [asyncio.create_task(recognise()) for _ in range(self.concurrency)]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _download(self, entry: StoredObject) -> Union[bytes, Outcome]:
+        """Image bytes, or the outcome for objects that are not processed."""
+        if not _is_image(entry.key):
+            return ("skipped", None)
+        if entry.size > settings.MAX_IMAGE_SIZE_MB * 1024 * 1024:
+            error = OCRError("FILE_TOO_LARGE", f"Image size exceeds {settings.MAX_IMAGE_SIZE_MB}MB limit")
+            return ("failed", {"key": entry.key, "error": error.to_dict()})
+        try:
+            return await self.source.get_bytes(entry.key)
+        except ObjectNotFound:
+            # Deleted since it was listed
+            return ("skipped", None)
+        except Exception as e:
+            return ("failed", {"key": entry.key, "error": {"code": "DOWNLOAD_ERROR", "message": str(e)}})
+
+    async def _recognise(self, entry: StoredObject, downloaded: Union[bytes, Outcome]) -> Outcome:
+        if isinstance(downloaded, tuple):
+            return downloaded
+
+        line: Dict[str, Any] = {"key": entry.key, "size": entry.size, "etag": entry.etag}
+        for attempt in range(settings.OCR_BULK_MAX_RETRIES + 1):
+            request = OCRRequest(
+                shop_id=self.spec.shop_id,
+                user_id=self.spec.user_id,
+                ocr_type=self.spec.ocr_type,
+                extract_barcodes=self.spec.extract_barcodes,
+                language=self.spec.language,
+                image_bytes=downloaded,
+                file_size=entry.size,
+                filename=entry.key,
+                submitted_at=time.time(),
+                lane=Lane.BULK
+            )
+            try:
+                result = await self._process(request)
+            except AdmissionRejected as e:
+                # Overloaded: back off instead of failing the image
+                if attempt == settings.OCR_BULK_MAX_RETRIES:
+                    line["error"] = e.to_dict()
+                    return ("failed", line)
+                await asyncio.sleep(e.retry_after_seconds)
+            except OCRError as e:
+                line["error"] = e.to_dict()
+                return ("failed", line)
+            except Exception as e:
+                line["error"] = {"code": "PROCESSING_ERROR", "message": str(e)}
+                return ("failed", line)
+            else:
+                line["result"] = result.to_dict()
+                return ("processed", line)
+
+    async def _finish(self, seq: int, key: str, outcome: Outcome) -> None:
+        """Record a finished item and move the contiguous watermark forward."""
+        self._finished[seq] = (key, outcome)
+        while self._next_seq in self._finished:
+            key, (kind, line) = self._finished.pop(self._next_seq)
+            self._next_seq += 1
+            self._watermark = key
+            self._buffered[kind] += 1
+            if line is not None:
+                self._buffer.append(json.dumps(line, default=str).encode() + b"\n")
+
+        if len(self._buffer) >= settings.OCR_BULK_PART_SIZE:
+            await self._flush()
+
+    async def _flush(self) -> None:
+        """Write buffered lines as the next part, then advance the checkpoint."""
+        async with self._flush_lock:
+            lines, self._buffer = self._buffer, []
+            counts, self._buffered = self._buffered, {"processed": 0, "failed": 0, "skipped": 0}
+            after = self._watermark
+
+            checkpoint = self.checkpoint
+            if lines:
+                await self.output.put_bytes(
+                    self.spec.part_key(checkpoint.part), b"".join(lines), content_type="application/x-ndjson"
+                )
+                checkpoint.part += 1
+            checkpoint.after = after
+            checkpoint.processed += counts["processed"]
+            checkpoint.failed += counts["failed"]
+            checkpoint.skipped += counts["skipped"]
+            await self.output.put_bytes(
+                self.spec.checkpoint_key,
+                json.dumps(checkpoint.to_dict(self.spec)).encode(),
+                content_type="application/json"
+            )
+
+    def status(self) -> Dict[str, Any]:
+        checkpoint = self.checkpoint
+        elapsed = (checkpoint.finished_at or time.time()) - checkpoint.started_at
+        processed = checkpoint.processed + self._buffered["processed"]
+        return {
+            "job_id": self.spec.job_id,
+            "state": self.state,
+            "error": self.error,
+            "bucket": self.spec.bucket,
+            "prefix": self.spec.prefix,
+            "results": f"{self.spec.output_bucket}/{self.spec.result_prefix}",
+            "processed": processed,
+            "failed": checkpoint.failed + self._buffered["failed"],
+            "skipped": checkpoint.skipped + self._buffered["skipped"],
+            "checkpoint_after": checkpoint.after,
+            "parts": checkpoint.part,
+            "images_per_second": round(processed / elapsed, 2) if elapsed > 0 else None,
+        }
+
+
+class BulkJobRegistry:
+    """Bulk jobs running in this process, by shop and job id."""
+
+    def __init__(self) -> None:
+        self.jobs: Dict[Tuple[str, str], BulkJob] = {}
+        self._tasks: Dict[Tuple[str, str], asyncio.Task] = {}
+
+    def start(self, spec: BulkJobSpec, process: Callable[[OCRRequest], Awaitable[OCRResult]]) -> BulkJob:
+        key = (spec.shop_id, spec.job_id)
+        running = self._tasks.get(key)
+        if running is not None and not running.done():
+            raise BulkJobError(f"Job {spec.job_id} is already running")
+        job = self.jobs[key] = BulkJob(spec, process)
+        task = self._tasks[key] = asyncio.create_task(job.run())
+        # Failures are reported through the job status
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return job
+
+    def get(self, shop_id: str, job_id: str) -> Optional[BulkJob]:
+        return self.jobs.get((shop_id, job_id))
+
+    def cancel(self, shop_id: str, job_id: str) -> bool:
+        task = self._tasks.get((shop_id, job_id))
+        if task is None or task.done():
+            return False
+        task.cancel()
+        self.jobs[(shop_id, job_id)].state = "cancelling"
+        return True
+
+
+# Global registry instance
+bulk_jobs = BulkJobRegistry()
+
+
+async def _run_cli(args: argparse.Namespace) -> Dict[str, Any]:
+    if args.command == "status":
+        status = await stored_status(args.job_id, args.output_bucket, args.output_prefix)
+        if status is None:
+            raise BulkJobError(f"No checkpoint for job {args.job_id}")
+        return status
+
+    from app.services.ocr_service import OCRService
+
+    service = await OCRService.initialize(wait_for_models=True)
+    spec = BulkJobSpec(
+        prefix=args.prefix,
+        ocr_type=args.ocr_type,
+        bucket=args.bucket,
+        job_id=args.job_id,
+        language=args.language,
+        extract_barcodes=args.extract_barcodes,
+        output_bucket=args.output_bucket,
+        output_prefix=args.output_prefix,
+        shop_id=args.shop_id,
+    )
+    print(f"🚚 Bulk job {spec.job_id}: {spec.bucket}/{spec.prefix} -> {spec.output_bucket}/{spec.result_prefix}")
+    job = BulkJob(spec, service.process_image, concurrency=args.concurrency, prefetch=args.prefetch)
+    return await job.run()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="OCR every image under an object-storage prefix")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_cmd = commands.add_parser("run", help="Run (or resume) a bulk job")
+    run_cmd.add_argument("--prefix", required=True, help="Key prefix to process")
+    run_cmd.add_argument("--bucket", default=None, help="Source bucket (default MINIO_BUCKET_NAME)")
+    run_cmd.add_argument("--job-id", default=None, help="Reuse an id to resume a stopped job")
+    run_cmd.add_argument("--ocr-type", default="invoice")
+    run_cmd.add_argument("--language", default="en")
+    run_cmd.add_argument("--extract-barcodes", action="store_true")
+    run_cmd.add_argument("--shop-id", default="bulk")
+    run_cmd.add_argument("--concurrency", type=int, default=None)
+    run_cmd.add_argument("--prefetch", type=int, default=None)
+
+    status_cmd = commands.add_parser("status", help="Show a job's checkpoint")
+    status_cmd.add_argument("job_id")
+
+    for command in (run_cmd, status_cmd):
+        command.add_argument("--output-bucket", default=None, help="Results bucket (default: source bucket)")
+        command.add_argument("--output-prefix", default=None, help="Results prefix (default OCR_BULK_OUTPUT_PREFIX)")
+
+    args = parser.parse_args(argv)
+
+    try:
+        status = asyncio.run(_run_cli(args))
+    except (BulkJobError, OCRError) as e:
+        print(f"❌ {e}")
+        return 1
+    print(json.dumps(status, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+"""
+Compact Pre-processed Image Format
+==================================
+
+Mobile clients can crop, scale and grayscale a scan on the phone and send
+it as ``image/vnd.zakpos.ocr`` instead of a full JPEG. The payload goes
+straight to the quality / enhancement stage: no JPEG decode, no resize, no
+colour conversion on the server.
+
+Layout (little-endian), version 1::
+
+    magic      4s  b"ZKOC"
+    version    B   1
+    encoding   B   0 = raw 8-bit grayscale rows, 1 = grayscale WebP
+    channels   B   1
+    reserved   B   0
+    width      H   payload image size
+    height     H
+    src_width  H   size of the original photo
+    src_height H
+    crop       4H  left, top, right, bottom of the crop in the original photo
+    length     I   payload bytes that follow the header
+
+The header is validated on its own (28 bytes) before the upload is
+accepted; raw payloads are then wrapped without a copy.
+"""
+
+import io
+import struct
+from typing import Any, Dict, Optional, Tuple
+
+import structlog
+from PIL import Image
+
+from app.core.config import settings
+from app.models.schemas import OCRError
+
+logger = structlog.get_logger(__name__)
+
+COMPACT_CONTENT_TYPE = "image/vnd.zakpos.ocr"
+MAGIC = b"ZKOC"
+VERSION = 1
+
+# Key of the parsed header in ``Image.info`` of a decoded compact image
+INFO_KEY = "zakpos_compact"
+
+_HEADER = struct.Struct("<4sBBBBHHHHHHHHI")
+HEADER_SIZE = _HEADER.size
+
+
+class Encoding:
+    """Payload encodings."""
+    RAW = 0
+    WEBP = 1
+
+
+class CompactHeader:
+    """Parsed and validated header of a compact image."""
+
+    def __init__(
+        self,
+        version: int,
+        encoding: int,
+        width: int,
+        height: int,
+        source_size: Tuple[int, int],
+        crop: Tuple[int, int, int, int],
+        length: int,
+    ) -> None:
+        self.version = version
+        self.encoding = encoding
+        self.width = width
+        self.height = height
+        self.source_size = source_size
+        self.crop = crop
+        self.length = length
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "encoding": "raw" if self.encoding == Encoding.RAW else "webp",
+            "size": [self.width, self.height],
+            "source_size": list(self.source_size),
+            "crop": list(self.crop),
+        }
+
+
+def _invalid(message: str) -> OCRError:
+    return OCRError("INVALID_COMPACT_IMAGE", message)
+
+
+def is_compact(prefix: bytes) -> bool:
+    """True if ``prefix`` (the first bytes of an upload) starts a compact image."""
+    return prefix[:len(MAGIC)] == MAGIC
+
+
+def parse_header(data: bytes, total_size: Optional[int] = None) -> CompactHeader:
+    """Validate the header at the start of ``data``.
+
+    ``total_size`` (the whole upload, when known) must match the declared
+    payload length exactly.
+    """
+    if len(data) < HEADER_SIZE:
+        raise _invalid("Truncated header")
+    (magic, version, encoding, channels, _reserved, width, height,
+     src_width, src_height, left, top, right, bottom, length) = _HEADER.unpack_from(data)
+
+    if magic != MAGIC:
+        raise _invalid("Not a compact image")
+    if version != VERSION:
+        raise _invalid(f"Unsupported version {version}")
+    if encoding not in (Encoding.RAW, Encoding.WEBP) or channels != 1:
+        raise _invalid("Only 8-bit grayscale raw or WebP payloads are supported")
+    if not (0 < width <= settings.OCR_COMPACT_MAX_SIDE and 0 < height <= settings.OCR_COMPACT_MAX_SIDE):
+        raise _invalid(f"Image must be 1-{settings.OCR_COMPACT_MAX_SIDE} px per side")
+    if not (left < right <= src_width and top < bottom <= src_height):
+        raise _invalid("Crop box outside the source image")
+    if encoding == Encoding.RAW and length != width * height:
+        raise _invalid("Raw payload length does not match its dimensions")
+    if total_size is not None and total_size != HEADER_SIZE + length:
+        raise _invalid("Payload length does not match the upload")
+
+    return CompactHeader(version, encoding, width, height, (src_width, src_height), (left, top, right, bottom), length)
+
+
+def decode_compact(data: bytes) -> Image.Image:
+    """Turn a compact upload into a grayscale image ready for preprocessing."""
+    header = parse_header(data, len(data))
+    payload = memoryview(data)[HEADER_SIZE:]
+
+    if header.encoding == Encoding.RAW:
+        image = Image.frombuffer("L", (header.width, header.height), payload, "raw", "L", 0, 1)
+    else:
+        image = Image.open(io.BytesIO(payload))
+        if image.format != "WEBP" or image.size != (header.width, header.height):
+            raise _invalid("WebP payload does not match its header")
+        image.load()
+        if image.mode != "L":
+            image = image.convert("L")
+
+    image.info[INFO_KEY] = header.to_dict()
+    return image
+
+
+def encode_compact(
+    image: Image.Image,
+    source_size: Optional[Tuple[int, int]] = None,
+    crop: Optional[Tuple[int, int, int, int]] = None,
+    encoding: int = Encoding.WEBP,
+    quality: int = 80,
+) -> bytes:
+    """Reference encoder (what the mobile app does after cropping and scaling)."""
+    gray = image.convert("L")
+    source_size = source_size or gray.size
+    crop = crop or (0, 0, source_size[0], source_size[1])
+    if encoding == Encoding.RAW:
+        payload = gray.tobytes()
+    else:
+        buffer = io.BytesIO()
+        gray.save(buffer, format="WEBP", quality=quality)
+        payload = buffer.getvalue()
+    header = _HEADER.pack(
+        MAGIC, VERSION, encoding, 1, 0, gray.width, gray.height,
+        source_size[0], source_size[1], *crop, len(payload)
+    )
+    return header + payload
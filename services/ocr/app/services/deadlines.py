@@ -0,0 +1,106 @@
+"""
+Request Deadlines for ZakPOS OCR
+===============================
+
+Every ``OCRRequest`` carries an absolute deadline. The pipeline checks it
+between stages and inside ``generate`` (via a stopping criterion), and the
+API expires it when the client disconnects, so overload never spends
+cycles on results nobody will read.
+"""
+
+import asyncio
+import math
+import time
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+import structlog
+
+from app.core.config import settings
+from app.core.monitoring import record_abandoned
+from app.models.schemas import OCRError, OCRRequest
+
+logger = structlog.get_logger(__name__)
+
+T = TypeVar("T")
+
+
+class DeadlineExceeded(OCRError):
+    """Raised when a request's deadline passes (or its client went away)."""
+
+    def __init__(self, stage: str) -> None:
+        super().__init__("DEADLINE_EXCEEDED", f"Request deadline passed before {stage}")
+        self.stage = stage
+
+
+class ClientDisconnected(Exception):
+    """Raised when the client closed the connection before the result was ready."""
+    pass
+
+
+def resolve_deadline(timeout_ms: Optional[str], default_seconds: float, now: Optional[float] = None) -> float:
+    """Absolute deadline from a client timeout header or the endpoint default.
+
+    Both are capped by OCR_PROCESSING_TIMEOUT_SECONDS. Raises ValueError for
+    a malformed, non-finite or non-positive header value.
+    """
+    seconds = default_seconds
+    if timeout_ms is not None:
+        seconds = float(timeout_ms) / 1000
+        # float() accepts "nan" and "inf", and nan compares false with everything
+        if not math.isfinite(seconds) or seconds <= 0:
+            raise ValueError("Request timeout must be a positive number")
+    seconds = min(seconds, settings.OCR_PROCESSING_TIMEOUT_SECONDS)
+    return (now or time.time()) + seconds
+
+
+def is_expired(request: OCRRequest) -> bool:
+    return request.deadline is not None and time.time() >= request.deadline
+
+
+def remaining_seconds(request: OCRRequest) -> Optional[float]:
+    if request.deadline is None:
+        return None
+    return request.deadline - time.time()
+
+
+def check_deadline(request: OCRRequest, stage: str) -> None:
+    """Stop processing before ``stage`` if the deadline has passed."""
+    if is_expired(request):
+        record_abandoned("expired", stage)
+        raise DeadlineExceeded(stage)
+
+
+def expire(request: OCRRequest) -> None:
+    """Expire a request immediately; running stages stop at their next check."""
+    request.deadline = 0.0
+
+
+async def run_until_disconnected(
+    is_disconnected: Callable[[], Awaitable[bool]],
+    work: Awaitable[T],
+    on_disconnect: Optional[Callable[[], Any]] = None,
+) -> T:
+    """Await ``work``, cancelling it if the client disconnects first.
+
+    ``is_disconnected`` is polled every OCR_DISCONNECT_POLL_SECONDS (e.g.
+    Starlette's ``Request.is_disconnected``). ``on_disconnect`` runs before
+    cancellation: a stage already running on the inference executor cannot
+    be cancelled, but sees the request expire at its next deadline check or
+    decoding step.
+    """
+    task = asyncio.ensure_future(work)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=settings.OCR_DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await is_disconnected():
+                if on_disconnect is not None:
+                    on_disconnect()
+                task.cancel()
+                record_abandoned("client_disconnected", "request")
+                logger.info("Client disconnected, cancelled OCR work")
+                raise ClientDisconnected()
+    finally:
+        if not task.done():
+            task.cancel()
@@ -0,0 +1,131 @@
+"""
+Lazy OCR Engine Registry
+=======================
+
+Defers heavy imports (torch, transformers, pytesseract) and model loading
+until an engine is needed, and loads registered engines in background
+threads so the server can accept traffic (e.g. barcode-only scans) while
+models are still warming up.
+"""
+
+import asyncio
+import time
+from typing import Any, Callable, Dict, Optional
+
+import structlog
+
+from app.core.startup import startup_timeline
+
+logger = structlog.get_logger(__name__)
+
+
+class EngineState:
+    """Engine loading lifecycle states."""
+    PENDING = "pending"
+    LOADING = "loading"
+    READY = "ready"
+    FAILED = "failed"
+
+
+class _EngineSlot:
+    """Book-keeping for a single registered engine."""
+
+    def __init__(self, name: str, loader: Callable[[], Any], required: bool) -> None:
+        self.name = name
+        self.loader = loader
+        self.required = required
+        self.state = EngineState.PENDING
+        self.value: Any = None
+        self.error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self.ready_event = asyncio.Event()
+
+
+class EngineRegistry:
+    """Registry of lazily loaded OCR engines.
+
+    Loaders are either plain blocking callables, run in a worker thread so
+    imports and weight loading never block the event loop, or coroutine
+    functions that are awaited directly.
+    """
+
+    def __init__(self) -> None:
+        self._engines: Dict[str, _EngineSlot] = {}
+
+    def register(self, name: str, loader: Callable[[], Any], required: bool = True) -> None:
+        """Register an engine loader. Required engines gate readiness."""
+        self._engines[name] = _EngineSlot(name, loader, required)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._engines
+
+    def load_in_background(self) -> None:
+        """Start loading every pending engine without waiting for it."""
+        for slot in self._engines.values():
+            self._ensure_loading(slot)
+
+    def _ensure_loading(self, slot: _EngineSlot) -> asyncio.Task:
+        if slot.task is None:
+            slot.task = asyncio.create_task(self._load(slot), name=f"engine-load:{slot.name}")
+        return slot.task
+
+    async def _load(self, slot: _EngineSlot) -> None:
+        slot.state = EngineState.LOADING
+        started = time.perf_counter()
+        try:
+            with startup_timeline.phase(f"engine:{slot.name}"):
+                if asyncio.iscoroutinefunction(slot.loader):
+                    slot.value = await slot.loader()
+                else:
+                    slot.value = await asyncio.to_thread(slot.loader)
+            slot.state = EngineState.READY
+            logger.info("Engine loaded", engine=slot.name, load_seconds=round(time.perf_counter() - started, 3))
+        except Exception as e:
+            slot.state = EngineState.FAILED
+            slot.error = str(e)
+            logger.error("Engine failed to load", engine=slot.name, error=str(e))
+        finally:
+            slot.load_seconds = round(time.perf_counter() - started, 3)
+            slot.ready_event.set()
+
+    def get(self, name: str) -> Optional[Any]:
+        """Return a loaded engine, or None if it is not ready (never blocks)."""
+        slot = self._engines.get(name)
+        if slot is None or slot.state != EngineState.READY:
+            return None
+        return slot.value
+
+    async def wait_for(self, name: str, timeout: Optional[float] = None) -> Optional[Any]:
+        """Load (if needed) and wait for an engine, up to ``timeout`` seconds."""
+        slot = self._engines.get(name)
+        if slot is None:
+            return None
+        self._ensure_loading(slot)
+        try:
+            await asyncio.wait_for(slot.ready_event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        return self.get(name)
+
+    def state(self, name: str) -> Optional[str]:
+        slot = self._engines.get(name)
+        return slot.state if slot else None
+
+    def is_ready(self, name: str) -> bool:
+        return self.state(name) == EngineState.READY
+
+    def all_required_ready(self) -> bool:
+        """Whether every required engine has finished loading successfully."""
+        return all(slot.state == EngineState.READY for slot in self._engines.values() if slot.required)
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            slot.name: {
+                "state": slot.state,
+                "required": slot.required,
+                "load_seconds": slot.load_seconds,
+                "error": slot.error,
+            }
+            for slot in self._engines.values()
+        }
@@ -0,0 +1,169 @@
+"""
+Generation Profiles for TrOCR Decoding
+=====================================
+
+Per-``ocr_type`` decoding settings: token budgets, early stopping once a
+price has been read (product labels) and KV-cache configuration. Budgets
+adapt to the observed output-length distribution, so short-text requests
+stop paying for the worst-case invoice line.
+"""
+
+import math
+import re
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+import structlog
+
+from app.core.config import settings, GENERATION_PROFILES
+
+logger = structlog.get_logger(__name__)
+
+# A complete price at the end of the decoded text, e.g. "$12.50", "1,250.00"
+_TRAILING_PRICE = re.compile(r"(?:\d{1,3}(?:,\d{3})+|\d+)\.\d{2}\s*$")
+
+# Tokens decoded from the tail of each sequence when checking for a price
+_PRICE_TAIL_TOKENS = 8
+
+
+class GenerationProfile:
+    """Decoding settings for one ocr_type."""
+
+    def __init__(
+        self,
+        ocr_type: str,
+        max_new_tokens: int,
+        min_new_tokens: int = 8,
+        stop_on_price: bool = False,
+        num_beams: int = 1,
+    ) -> None:
+        self.ocr_type = ocr_type
+        self.max_new_tokens = max_new_tokens
+        self.min_new_tokens = min_new_tokens
+        self.stop_on_price = stop_on_price
+        self.num_beams = num_beams
+        self._lengths: Deque[int] = deque(maxlen=settings.OCR_GENERATION_WINDOW)
+        # observe() is called from the inference threads
+        self._lock = threading.Lock()
+        self.budget = max_new_tokens
+        self.truncations = 0
+        self.requests = 0
+
+    def observe(self, output_lengths: List[int], budget: int) -> None:
+        """Record generated lengths and recompute the adaptive budget.
+
+        Outputs that hit the budget were truncated, so their true length is
+        unknown; they are recorded at twice the budget (capped at the profile
+        maximum) to push the budget back up quickly.
+        """
+        with self._lock:
+            for length in output_lengths:
+                self.requests += 1
+                if length >= budget:
+                    self.truncations += 1
+                    length = min(self.max_new_tokens, budget * 2)
+                self._lengths.append(length)
+
+            if not settings.OCR_GENERATION_ADAPTIVE or len(self._lengths) < settings.OCR_GENERATION_MIN_SAMPLES:
+                return
+            ordered = sorted(self._lengths)
+
+        p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+        budget = math.ceil(p99 * (1 + settings.OCR_GENERATION_HEADROOM)) + 1
+        self.budget = max(self.min_new_tokens, min(self.max_new_tokens, budget))
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "max_new_tokens": self.max_new_tokens,
+            "current_budget": self.budget,
+            "samples": len(self._lengths),
+            "requests": self.requests,
+            "truncations": self.truncations,
+            "stop_on_price": self.stop_on_price,
+        }
+
+
+def _price_stopping_criteria(tokenizer: Any) -> Any:
+    """Stopping criterion that ends decoding once every sequence ends in a price."""
+    from transformers import StoppingCriteria
+
+    class PriceStoppingCriteria(StoppingCriteria):
+        def __call__(self, input_ids, scores, **kwargs) -> bool:
+            tails = tokenizer.batch_decode(input_ids[:, -_PRICE_TAIL_TOKENS:], skip_special_tokens=True)
+            return all(_TRAILING_PRICE.search(tail) for tail in tails)
+
+    return PriceStoppingCriteria()
+
+
+def _expiry_stopping_criteria(expired: Callable[[], bool]) -> Any:
+    """Stopping criterion that ends decoding once the request deadline has passed."""
+    from transformers import StoppingCriteria
+
+    class ExpiryStoppingCriteria(StoppingCriteria):
+        def __call__(self, input_ids, scores, **kwargs) -> bool:
+            return expired()
+
+    return ExpiryStoppingCriteria()
+
+
+class GenerationProfiles:
+    """Registry of generation profiles, keyed by ocr_type."""
+
+    def __init__(self, profiles: Optional[Dict[str, Dict[str, Any]]] = None) -> None:
+        profiles = profiles or GENERATION_PROFILES
+        self._profiles = {
+            ocr_type: GenerationProfile(ocr_type, **options) for ocr_type, options in profiles.items()
+        }
+        self._default = self._profiles.get("default") or GenerationProfile("default", max_new_tokens=128)
+
+    def get(self, ocr_type: str) -> GenerationProfile:
+        return self._profiles.get(ocr_type, self._default)
+
+    def longest(self) -> GenerationProfile:
+        """Profile with the largest token ceiling, used for warm-up."""
+        return max(self._profiles.values(), key=lambda p: p.max_new_tokens, default=self._default)
+
+    def generate_kwargs(
+        self,
+        profile: GenerationProfile,
+        model: Any,
+        tokenizer: Any,
+        expired: Optional[Callable[[], bool]] = None,
+    ) -> Dict[str, Any]:
+        """Build ``generate()`` arguments for a profile.
+
+        ``expired`` is polled after every decoding step; decoding stops as
+        soon as it returns True.
+        """
+        from transformers import StoppingCriteriaList
+
+        kwargs: Dict[str, Any] = {
+            "max_new_tokens": profile.budget,
+            "num_beams": profile.num_beams,
+            "use_cache": True,
+        }
+        if profile.num_beams > 1:
+            kwargs["early_stopping"] = True
+        criteria = []
+        if profile.stop_on_price:
+            criteria.append(_price_stopping_criteria(tokenizer))
+        if expired is not None:
+            criteria.append(_expiry_stopping_criteria(expired))
+        if criteria:
+            kwargs["stopping_criteria"] = StoppingCriteriaList(criteria)
+        # Static (pre-allocated, reused) KV cache where the installed
+        # transformers and the decoder support it; otherwise the dynamic cache
+        if settings.OCR_GENERATION_STATIC_CACHE and getattr(model, "_supports_static_cache", False):
+            kwargs["cache_implementation"] = "static"
+        return kwargs
+
+    @staticmethod
+    def output_lengths(generated_ids: Any, pad_token_id: Optional[int]) -> List[int]:
+        """New tokens per sequence, excluding the decoder start token and padding."""
+        if pad_token_id is None:
+            return [generated_ids.shape[1] - 1] * generated_ids.shape[0]
+        return [int(n) - 1 for n in (generated_ids != pad_token_id).sum(dim=1).tolist()]
+
+    def status(self) -> Dict[str, Any]:
+        return {ocr_type: profile.status() for ocr_type, profile in self._profiles.items()}
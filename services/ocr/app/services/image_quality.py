@@ -0,0 +1,162 @@
+"""
+Image Quality Analysis for ZakPOS OCR
+=====================================
+
+Measures each image on a small grayscale thumbnail and picks the
+preprocessing recipe it actually needs:
+
+* contrast  - spread between the 5th and 95th brightness percentiles
+* sharpness - variance of the Laplacian (low = blurry)
+* noise     - Immerkaer's fast sigma estimate
+* glare     - fraction of blown-out pixels
+
+Clean prints go to the model untouched (thresholding them only costs time
+and tends to hurt TrOCR). Images too blurry to read are rejected before any
+model runs, with a hint to retake the photo.
+"""
+
+import math
+from typing import Any, Dict, List
+
+import cv2
+import numpy as np
+import structlog
+from PIL import Image
+
+from app.core.config import settings
+from app.models.schemas import OCRError
+
+logger = structlog.get_logger(__name__)
+
+# Kernel of Immerkaer's noise estimate (two Laplacians, cancels image structure)
+_NOISE_KERNEL = np.array([[1, -2, 1], [-2, 4, -2], [1, -2, 1]], dtype=np.float32)
+
+# Below this contrast the image is treated as blank rather than blurry
+_BLANK_CONTRAST = 0.05
+
+
+class Step:
+    """Preprocessing steps, applied in this order."""
+    DENOISE = "denoise"
+    SHARPEN = "sharpen"
+    CONTRAST = "contrast"
+    THRESHOLD = "threshold"
+
+    ORDER = (DENOISE, SHARPEN, CONTRAST, THRESHOLD)
+
+
+class ImageRejected(OCRError):
+    """Raised for images that cannot be read; ``hint`` tells the user what to do."""
+
+    def __init__(self, code: str, message: str, hint: str) -> None:
+        super().__init__(code, message)
+        self.hint = hint
+
+    def to_dict(self) -> Dict[str, str]:
+        return {"code": self.code, "message": self.message, "hint": self.hint}
+
+
+class QualityReport:
+    """Measurements of one image and the recipe chosen from them."""
+
+    def __init__(self, contrast: float, sharpness: float, noise: float, glare: float) -> None:
+        self.contrast = contrast
+        self.sharpness = sharpness
+        self.noise = noise
+        self.glare = glare
+        self.steps: List[str] = select_steps(self)
+
+    @property
+    def blank(self) -> bool:
+        return self.contrast < _BLANK_CONTRAST
+
+    @property
+    def blurry(self) -> bool:
+        return not self.blank and self.sharpness < settings.OCR_QUALITY_MIN_SHARPNESS
+
+    @property
+    def recipe(self) -> str:
+        return "+".join(self.steps) or "clean"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "contrast": round(self.contrast, 3),
+            "sharpness": round(self.sharpness, 1),
+            "noise": round(self.noise, 2),
+            "glare": round(self.glare, 3),
+            "recipe": self.recipe,
+        }
+
+
+def thumbnail(image: Image.Image, max_side: int) -> np.ndarray:
+    """Grayscale copy of ``image`` no larger than ``max_side`` pixels."""
+    scale = min(1.0, max_side / max(image.size))
+    size = (max(1, int(image.width * scale)), max(1, int(image.height * scale)))
+    return np.asarray(image.resize(size, Image.Resampling.BILINEAR, reducing_gap=2.0).convert("L"))
+
+
+def analyze(image: Image.Image) -> QualityReport:
+    """Measure contrast, sharpness, noise and glare of ``image``."""
+    gray = thumbnail(image, settings.OCR_QUALITY_MAX_SIDE)
+    low, high = np.percentile(gray, (5, 95))
+    contrast = float(high - low) / 255.0
+    sharpness = float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+    height, width = gray.shape
+    if height > 2 and width > 2:
+        residual = cv2.filter2D(gray.astype(np.float32), -1, _NOISE_KERNEL)[1:-1, 1:-1]
+        noise = float(np.abs(residual).sum()) * math.sqrt(math.pi / 2) / (6.0 * (width - 2) * (height - 2))
+    else:
+        noise = 0.0
+    # Blown-out highlights only count as glare on photographed paper; on a
+    # scan the paper itself is saturated
+    paper = float(np.median(gray))
+    glare = float((gray >= 250).mean()) if paper < 235 else 0.0
+
+    return QualityReport(contrast, sharpness, noise, glare)
+
+
+def select_steps(report: QualityReport) -> List[str]:
+    """Preprocessing steps ``report`` calls for (none for a clean image)."""
+    steps = set()
+    if report.noise > settings.OCR_QUALITY_MAX_NOISE:
+        steps.add(Step.DENOISE)
+    elif report.sharpness < settings.OCR_QUALITY_SHARPEN_BELOW:
+        # Sharpening a noisy image only amplifies the noise
+        steps.add(Step.SHARPEN)
+    if report.contrast < settings.OCR_QUALITY_MIN_CONTRAST:
+        steps.add(Step.CONTRAST)
+    if report.glare > settings.OCR_QUALITY_MAX_GLARE:
+        # Local thresholding reads text around hot spots a global view cannot
+        steps.add(Step.THRESHOLD)
+    return [step for step in Step.ORDER if step in steps]
+
+
+def check_readable(report: QualityReport) -> None:
+    """Reject images too blurry for any model to read."""
+    if settings.OCR_QUALITY_REJECT_BLURRY and report.blurry:
+        raise ImageRejected(
+            "IMAGE_TOO_BLURRY",
+            f"Image is too blurry to read (sharpness {report.sharpness:.0f})",
+            "Hold the camera steady, move closer until the text is in focus and retake the photo",
+        )
+
+
+def apply_steps(image: Image.Image, steps: List[str]) -> Image.Image:
+    """Run the preprocessing ``steps`` on ``image``; returns an RGB image."""
+    if not steps:
+        return image
+    gray = cv2.cvtColor(np.asarray(image.convert("RGB")), cv2.COLOR_RGB2GRAY)
+    for step in steps:
+        if step == Step.DENOISE:
+            gray = cv2.medianBlur(gray, 3)
+        elif step == Step.SHARPEN:
+            blurred = cv2.GaussianBlur(gray, (0, 0), 1.5)
+            gray = cv2.addWeighted(gray, 1.5, blurred, -0.5, 0)
+        elif step == Step.CONTRAST:
+            gray = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8)).apply(gray)
+        elif step == Step.THRESHOLD:
+            gray = cv2.adaptiveThreshold(
+                gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2
+            )
+    return Image.fromarray(gray).convert("RGB")
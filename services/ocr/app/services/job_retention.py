@@ -0,0 +1,184 @@
+"""
+Job History Retention and Archival
+==================================
+
+Keeps the monthly partitions of ``ocr_processing_jobs`` (see
+app/core/partitions.py) in shape:
+
+1. creates partitions OCR_JOB_PARTITIONS_AHEAD months ahead;
+2. detaches partitions older than OCR_JOB_RETENTION_MONTHS with
+   ``DETACH PARTITION ... CONCURRENTLY``, so inserts and queries on the live
+   table are never blocked;
+3. streams each detached partition out with ``COPY`` into a gzipped CSV,
+   uploads it to ``OCR_JOB_ARCHIVE_PREFIX/ocr_processing_jobs/YYYY/`` in
+   object storage and, once the upload is verified, drops the table.
+
+Every step can be repeated: a partition detached by an interrupted run is
+still a table of its own and is archived by the next one. Replicas take a
+Postgres advisory lock, so only one maintains the history at a time. Runs
+every OCR_JOB_MAINTENANCE_INTERVAL_SECONDS in the server, or once with:
+
+    python -m app.services.job_retention
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import structlog
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.core.config import settings
+from app.core.database import engine
+from app.core.monitoring import record_job_partition
+from app.core.partitions import (
+    JOB_TABLE,
+    attached_partitions,
+    detached_partitions,
+    ensure_partitions,
+    expired_partitions,
+    partition_month,
+)
+from app.services.storage import ObjectStore, get_object_store
+
+logger = structlog.get_logger(__name__)
+
+# Advisory lock held by the replica maintaining the job history
+_LOCK_KEY = 0x4F43524A  # "OCRJ"
+
+
+def archive_key(name: str) -> str:
+    month = partition_month(name)
+    return f"{settings.OCR_JOB_ARCHIVE_PREFIX.rstrip('/')}/{JOB_TABLE}/{month:%Y}/{name}.csv.gz"
+
+
+async def archive_partition(conn: AsyncConnection, store: ObjectStore, name: str) -> Dict[str, Any]:
+    """Copy detached partition ``name`` to object storage, then drop it."""
+    key = archive_key(name)
+    raw = await conn.get_raw_connection()
+
+    with tempfile.TemporaryFile() as spool:
+        with gzip.GzipFile(fileobj=spool, mode="wb", compresslevel=6) as archive:
+            async def write(chunk: bytes) -> None:
+                await asyncio.to_thread(archive.write, chunk)
+
+            status = await raw.driver_connection.copy_from_query(
+                f"SELECT * FROM {name} ORDER BY created_at", output=write, format="csv", header=True
+            )
+        length = spool.tell()
+        spool.seek(0)
+        await store.put_file(key, spool, length, "application/gzip")
+
+    stored = await store.stat(key)
+    if stored.size != length:
+        raise RuntimeError(f"Archive {key} is {stored.size} bytes, expected {length}; keeping {name}")
+
+    await conn.execute(text(f"DROP TABLE {name}"))
+    rows = int(status.split()[-1])
+    record_job_partition("archived")
+    logger.info("Archived job history partition", partition=name, key=key, rows=rows, bytes=length)
+    return {"partition": name, "key": key, "rows": rows, "bytes": length}
+
+
+async def maintain_job_history(today: Optional[date] = None) -> Dict[str, Any]:
+    """Create upcoming partitions and archive expired ones (one replica at a time)."""
+    today = today or datetime.now(timezone.utc).date()
+    report: Dict[str, Any] = {"created": [], "detached": [], "archived": []}
+
+    async with engine.connect() as conn:
+        # DETACH ... CONCURRENTLY cannot run inside a transaction
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        locked = (await conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": _LOCK_KEY})).scalar_one()
+        if not locked:
+            report["skipped"] = "job history maintained by another replica"
+            return report
+
+        try:
+            report["created"] = await ensure_partitions(conn, today, settings.OCR_JOB_PARTITIONS_AHEAD)
+            for name in report["created"]:
+                record_job_partition("created")
+
+            partitions = await attached_partitions(conn)
+            pending = [name for name, detaching in partitions if detaching]
+            expired = expired_partitions(
+                [name for name, detaching in partitions if not detaching], today, settings.OCR_JOB_RETENTION_MONTHS
+            )
+            for name in pending:
+                # Left half-detached by an interrupted run
+                await conn.execute(text(f"ALTER TABLE {JOB_TABLE} DETACH PARTITION {name} FINALIZE"))
+            for name in expired:
+                await conn.execute(text(f"ALTER TABLE {JOB_TABLE} DETACH PARTITION {name} CONCURRENTLY"))
+                record_job_partition("detached")
+            report["detached"] = pending + expired
+
+            store = get_object_store()
+            for name in await detached_partitions(conn):
+                report["archived"].append(await archive_partition(conn, store, name))
+        finally:
+            await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _LOCK_KEY})
+
+    return report
+
+
+class JobHistoryMaintainer:
+    """Runs job history maintenance in the background."""
+
+    def __init__(self, interval_seconds: float) -> None:
+        self.interval_seconds = interval_seconds
+        self.last_report: Optional[Dict[str, Any]] = None
+        self.last_run: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                self.last_report = await maintain_job_history()
+                self.last_run = time.time()
+            except Exception as e:
+                logger.error("Job history maintenance failed", error=str(e))
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self) -> None:
+        """Start background maintenance (disabled when the interval is 0)."""
+        if self._task is None and self.interval_seconds > 0:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+job_history = JobHistoryMaintainer(settings.OCR_JOB_MAINTENANCE_INTERVAL_SECONDS)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Create job history partitions and archive expired ones")
+    parser.add_argument("--today", type=date.fromisoformat, default=None, help="Run as of this date (YYYY-MM-DD)")
+    args = parser.parse_args(argv)
+
+    async def run() -> Dict[str, Any]:
+        try:
+            return await maintain_job_history(args.today)
+        finally:
+            await engine.dispose()
+
+    try:
+        report = asyncio.run(run())
+    except Exception as e:
+        print(f"❌ {e}")
+        return 1
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,224 @@
+"""
+OCR Model Registry
+=================
+
+Routes requests to a recognition model by ``ocr_type`` and ``language``
+(printed labels, receipts, handwritten notes, ...), loads models on demand
+and keeps the resident set within a memory budget by evicting the least
+recently used model that no in-flight request is holding.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple
+
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+WILDCARD = "*"
+
+
+class LoadedModel:
+    """A resident recognition model with its processor."""
+
+    def __init__(
+        self,
+        model_id: str,
+        processor: Any,
+        model: Any,
+        device: str,
+        memory_bytes: int,
+        warmup_report: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self.model_id = model_id
+        self.processor = processor
+        self.model = model
+        self.device = device
+        self.memory_bytes = memory_bytes
+        self.warmup_report = warmup_report
+
+
+class _ModelEntry:
+    """Residency and load statistics for one model id."""
+
+    def __init__(self, model_id: str) -> None:
+        self.model_id = model_id
+        self.loaded: Optional[LoadedModel] = None
+        self.loading: Optional[asyncio.Task] = None
+        self.in_use = 0
+        self.load_count = 0
+        self.eviction_count = 0
+        self.last_load_seconds: Optional[float] = None
+        self.total_load_seconds = 0.0
+        self.last_used: Optional[float] = None
+
+
+def parse_model_routes(value: str) -> Dict[Tuple[str, str], str]:
+    """Parse ``OCR_MODEL_ROUTES``.
+
+    Format: comma separated ``ocr_type[:language]=model_id`` entries, where
+    either side of the key may be ``*``, e.g.
+    ``receipt=microsoft/trocr-base-printed,handwritten=microsoft/trocr-small-handwritten``.
+    """
+    routes: Dict[Tuple[str, str], str] = {}
+    for entry in value.split(","):
+        if not entry.strip():
+            continue
+        key, _, model_id = entry.partition("=")
+        if not model_id.strip():
+            raise ValueError(f"Invalid model route: {entry!r}")
+        ocr_type, _, language = key.strip().partition(":")
+        routes[(ocr_type or WILDCARD, language or WILDCARD)] = model_id.strip()
+    return routes
+
+
+class ModelRegistry:
+    """On-demand model loading with a least-recently-used memory budget.
+
+    All book-keeping runs on the event loop; only the blocking ``loader``
+    call runs in a worker thread. A model is never evicted while a lease
+    on it is open.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[str], LoadedModel],
+        default_model: str,
+        routes: Optional[Dict[Tuple[str, str], str]] = None,
+        budget_bytes: int = 0,
+        estimate_bytes: Optional[Callable[[str], Optional[int]]] = None,
+    ) -> None:
+        self._loader = loader
+        self.default_model = default_model
+        self.routes = routes or {}
+        self.budget_bytes = budget_bytes
+        self._estimate_bytes = estimate_bytes
+        # Least recently used first
+        self._entries: "OrderedDict[str, _ModelEntry]" = OrderedDict()
+
+    def resolve(self, ocr_type: str, language: str = "en") -> str:
+        """Pick the model for a request: exact route, then wildcards, then default."""
+        for key in ((ocr_type, language), (ocr_type, WILDCARD), (WILDCARD, language)):
+            if key in self.routes:
+                return self.routes[key]
+        return self.default_model
+
+    def _entry(self, model_id: str) -> _ModelEntry:
+        entry = self._entries.get(model_id)
+        if entry is None:
+            entry = self._entries[model_id] = _ModelEntry(model_id)
+        return entry
+
+    def is_resident(self, model_id: str) -> bool:
+        entry = self._entries.get(model_id)
+        return entry is not None and entry.loaded is not None
+
+    @property
+    def resident_bytes(self) -> int:
+        return sum(e.loaded.memory_bytes for e in self._entries.values() if e.loaded is not None)
+
+    async def preload(self, model_id: str) -> LoadedModel:
+        """Load a model (if needed) without holding a lease on it."""
+        loaded = await self._ensure_loaded(model_id)
+        self._entries.move_to_end(model_id)
+        return loaded
+
+    @asynccontextmanager
+    async def lease(self, model_id: str) -> AsyncIterator[LoadedModel]:
+        """Hold a model for the duration of an inference call."""
+        entry = self._entry(model_id)
+        while True:
+            loaded = await self._ensure_loaded(model_id)
+            # Another model's load may have evicted this one before we were
+            # resumed; only pin it if it is still resident
+            if entry.loaded is loaded:
+                break
+            logger.info("Model evicted before it could be leased; reloading", model=model_id)
+        entry.in_use += 1
+        entry.last_used = time.time()
+        self._entries.move_to_end(model_id)
+        try:
+            yield loaded
+        finally:
+            entry.in_use -= 1
+
+    async def _ensure_loaded(self, model_id: str) -> LoadedModel:
+        entry = self._entry(model_id)
+        if entry.loaded is not None:
+            return entry.loaded
+        if entry.loading is None:
+            entry.loading = asyncio.create_task(self._load(entry), name=f"model-load:{model_id}")
+        return await asyncio.shield(entry.loading)
+
+    async def _load(self, entry: _ModelEntry) -> LoadedModel:
+        try:
+            # Make room up front when the artifact size is known, to avoid a
+            # transient peak above the budget while the new model loads
+            estimate = self._estimate_bytes(entry.model_id) if self._estimate_bytes else None
+            if estimate:
+                self._evict_to_fit(estimate, keep=entry.model_id)
+
+            started = time.perf_counter()
+            loaded = await asyncio.to_thread(self._loader, entry.model_id)
+            elapsed = time.perf_counter() - started
+
+            entry.loaded = loaded
+            entry.load_count += 1
+            entry.last_load_seconds = round(elapsed, 3)
+            entry.total_load_seconds += elapsed
+            logger.info(
+                "Model loaded",
+                model=entry.model_id,
+                load_seconds=entry.last_load_seconds,
+                memory_mb=round(loaded.memory_bytes / 1024 / 1024, 1),
+            )
+            self._evict_to_fit(0, keep=entry.model_id)
+            return loaded
+        finally:
+            entry.loading = None
+
+    def _evict_to_fit(self, incoming_bytes: int, keep: str) -> None:
+        """Evict idle models, least recently used first, until within budget."""
+        if self.budget_bytes <= 0:
+            return
+
+        for entry in list(self._entries.values()):
+            if self.resident_bytes + incoming_bytes <= self.budget_bytes:
+                return
+            if entry.model_id == keep or entry.loaded is None or entry.in_use > 0:
+                continue
+            logger.info("Evicting model", model=entry.model_id, memory_mb=round(entry.loaded.memory_bytes / 1024 / 1024, 1))
+            entry.loaded = None
+            entry.eviction_count += 1
+
+        if self.resident_bytes + incoming_bytes > self.budget_bytes:
+            logger.warning(
+                "Model memory budget exceeded; remaining models are in use",
+                resident_mb=round(self.resident_bytes / 1024 / 1024, 1),
+                budget_mb=round(self.budget_bytes / 1024 / 1024, 1),
+            )
+
+    def status(self) -> Dict[str, Any]:
+        """Residency, load counts and load latency for the health output."""
+        return {
+            "budget_mb": round(self.budget_bytes / 1024 / 1024, 1),
+            "resident_mb": round(self.resident_bytes / 1024 / 1024, 1),
+            "routes": {f"{t}:{l}": m for (t, l), m in self.routes.items()},
+            "models": {
+                entry.model_id: {
+                    "resident": entry.loaded is not None,
+                    "loading": entry.loading is not None,
+                    "memory_mb": round(entry.loaded.memory_bytes / 1024 / 1024, 1) if entry.loaded else None,
+                    "in_use": entry.in_use,
+                    "load_count": entry.load_count,
+                    "eviction_count": entry.eviction_count,
+                    "last_load_seconds": entry.last_load_seconds,
+                    "avg_load_seconds": round(entry.total_load_seconds / entry.load_count, 3) if entry.load_count else None,
+                    "last_used": entry.last_used,
+                }
+                for entry in self._entries.values()
+            },
+        }
@@ -0,0 +1,282 @@
+"""
+Local Model Artifact Store for ZakPOS OCR
+========================================
+
+Versioned on-disk store of OCR model artifacts so production instances never
+contact the Hugging Face hub. Models are fetched once (by CI or an operator
+with network access), converted to safetensors and activated per version:
+
+    <OCR_MODEL_STORE_DIR>/
+        microsoft--trocr-small-printed/
+            CURRENT                  # name of the active version
+            3f1a9c0e2b7d/
+                manifest.json        # source, revision, file hashes
+                config.json
+                model.safetensors
+                preprocessor_config.json, tokenizer files, ...
+
+At load time safetensors weights are memory-mapped, so several worker
+processes on one node share the same page-cache pages instead of each
+holding a private copy of the weights.
+
+Usage:
+    python -m app.services.model_store fetch microsoft/trocr-small-printed
+    python -m app.services.model_store list
+    python -m app.services.model_store activate microsoft/trocr-small-printed 3f1a9c0e2b7d
+    python -m app.services.model_store verify microsoft/trocr-small-printed
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import structlog
+
+from app.core.config import settings
+
+logger = structlog.get_logger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+CURRENT_FILE = "CURRENT"
+
+
+class ModelStoreError(Exception):
+    """Raised when a model artifact is missing, corrupt or not fetchable."""
+    pass
+
+
+def store_root() -> Path:
+    return Path(settings.OCR_MODEL_STORE_DIR)
+
+
+def model_slug(model_id: str) -> str:
+    """Filesystem-safe directory name for a hub model id."""
+    return model_id.replace("/", "--")
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def list_versions(model_id: str) -> List[str]:
+    model_dir = store_root() / model_slug(model_id)
+    if not model_dir.is_dir():
+        return []
+    return sorted(p.name for p in model_dir.iterdir() if (p / MANIFEST_FILE).is_file())
+
+
+def active_version(model_id: str) -> Optional[str]:
+    current = store_root() / model_slug(model_id) / CURRENT_FILE
+    if not current.is_file():
+        return None
+    return current.read_text().strip() or None
+
+
+def resolve_model_path(model_id: str, version: Optional[str] = None) -> Optional[Path]:
+    """Return the artifact directory for a model version, if present locally.
+
+    ``version`` defaults to OCR_MODEL_VERSION, then to the active version.
+    """
+    version = version or settings.OCR_MODEL_VERSION or active_version(model_id)
+    if not version:
+        return None
+    path = store_root() / model_slug(model_id) / version
+    return path if (path / MANIFEST_FILE).is_file() else None
+
+
+def resolve_model_source(model_id: str) -> str:
+    """Local artifact directory if available, else the hub id (online only)."""
+    path = resolve_model_path(model_id)
+    if path is not None:
+        return str(path)
+    if settings.OCR_MODEL_OFFLINE:
+        raise ModelStoreError(
+            f"Model {model_id} not found in {store_root()} and OCR_MODEL_OFFLINE is set; "
+            f"run: python -m app.services.model_store fetch {model_id}"
+        )
+    logger.warning("Model not in local store, resolving against the hub", model=model_id)
+    return model_id
+
+
+def enable_offline_mode() -> None:
+    """Stop transformers/huggingface_hub from making network calls.
+
+    Must run before transformers is first imported.
+    """
+    os.environ["HF_HUB_OFFLINE"] = "1"
+    os.environ["TRANSFORMERS_OFFLINE"] = "1"
+
+
+def read_manifest(path: Path) -> Dict[str, Any]:
+    return json.loads((path / MANIFEST_FILE).read_text())
+
+
+def artifact_bytes(model_id: str) -> Optional[int]:
+    """Size of the stored weights for a model, from its manifest."""
+    path = resolve_model_path(model_id)
+    if path is None:
+        return None
+    files = read_manifest(path)["files"]
+    return sum(meta["bytes"] for name, meta in files.items() if name.endswith(".safetensors")) or None
+
+
+def activate(model_id: str, version: str) -> None:
+    """Point CURRENT at ``version`` atomically."""
+    model_dir = store_root() / model_slug(model_id)
+    if not (model_dir / version / MANIFEST_FILE).is_file():
+        raise ModelStoreError(f"Version {version} of {model_id} is not in the store")
+    tmp = model_dir / f".{CURRENT_FILE}.tmp"
+    tmp.write_text(version + "\n")
+    os.replace(tmp, model_dir / CURRENT_FILE)
+    logger.info("Activated model version", model=model_id, version=version)
+
+
+def verify(model_id: str, version: Optional[str] = None) -> Dict[str, Any]:
+    """Check every artifact file against the manifest hashes."""
+    path = resolve_model_path(model_id, version)
+    if path is None:
+        raise ModelStoreError(f"No local artifacts for {model_id}")
+    manifest = read_manifest(path)
+    mismatched = [
+        name for name, meta in manifest["files"].items()
+        if not (path / name).is_file() or _sha256(path / name) != meta["sha256"]
+    ]
+    if mismatched:
+        raise ModelStoreError(f"Artifact files failed verification: {', '.join(mismatched)}")
+    return manifest
+
+
+def fetch(model_id: str, revision: str = "main", version: Optional[str] = None, make_active: bool = True) -> Path:
+    """Download a hub model, convert it to safetensors and add it to the store.
+
+    Needs network access; meant for CI or an operator machine, not for
+    production instances.
+    """
+    from transformers import TrOCRProcessor, VisionEncoderDecoderModel
+
+    model_dir = store_root() / model_slug(model_id)
+    model_dir.mkdir(parents=True, exist_ok=True)
+
+    model = VisionEncoderDecoderModel.from_pretrained(model_id, revision=revision)
+    processor = TrOCRProcessor.from_pretrained(model_id, revision=revision)
+    commit = getattr(model.config, "_commit_hash", None)
+    version = version or (commit[:12] if commit else time.strftime("%Y%m%d%H%M%S"))
+
+    target = model_dir / version
+    if target.exists():
+        raise ModelStoreError(f"Version {version} of {model_id} already exists")
+
+    # Build in a temporary sibling directory and rename, so a crashed fetch
+    # never leaves a half-written version behind
+    staging = Path(tempfile.mkdtemp(prefix=f".{version}-", dir=model_dir))
+    try:
+        model.save_pretrained(staging, safe_serialization=True)
+        processor.save_pretrained(staging)
+
+        files = {
+            str(p.relative_to(staging)): {"sha256": _sha256(p), "bytes": p.stat().st_size}
+            for p in sorted(staging.rglob("*")) if p.is_file()
+        }
+        manifest = {
+            "model_id": model_id,
+            "revision": revision,
+            "commit": commit,
+            "version": version,
+            "format": "safetensors",
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "files": files,
+        }
+        (staging / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2))
+        os.replace(staging, target)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    logger.info("Fetched model into store", model=model_id, version=version, path=str(target))
+    if make_active:
+        activate(model_id, version)
+    return target
+
+
+def mapped_state_dict(path: Path) -> Dict[str, Any]:
+    """Memory-mapped safetensors weights of the artifact at ``path``.
+
+    ``safe_open`` maps the file copy-on-write; tensors returned by
+    ``get_tensor`` are views over the mapping. Pass the result to
+    ``from_pretrained(state_dict=..., low_cpu_mem_usage=True)``: the model is
+    built on the meta device and adopts these tensors as its parameters, so
+    the weights are read once and stay in the (shareable) page cache.
+    """
+    from safetensors import safe_open
+
+    state: Dict[str, Any] = {}
+    for weights_file in sorted(path.glob("*.safetensors")):
+        with safe_open(str(weights_file), framework="pt") as f:
+            for key in f.keys():
+                state[key] = f.get_tensor(key)
+    return state
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Manage the local OCR model artifact store")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    fetch_cmd = commands.add_parser("fetch", help="Download and convert a hub model")
+    fetch_cmd.add_argument("model_id")
+    fetch_cmd.add_argument("--revision", default="main")
+    fetch_cmd.add_argument("--version", default=None, help="Version name (default: hub commit hash)")
+    fetch_cmd.add_argument("--no-activate", action="store_true", help="Do not make this the active version")
+
+    list_cmd = commands.add_parser("list", help="List stored models and versions")
+    list_cmd.add_argument("model_id", nargs="?")
+
+    activate_cmd = commands.add_parser("activate", help="Set the active version of a model")
+    activate_cmd.add_argument("model_id")
+    activate_cmd.add_argument("version")
+
+    verify_cmd = commands.add_parser("verify", help="Verify artifact hashes against the manifest")
+    verify_cmd.add_argument("model_id")
+    verify_cmd.add_argument("--version", default=None)
+
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "fetch":
+            path = fetch(args.model_id, args.revision, args.version, make_active=not args.no_activate)
+            sys.stdout.write(f"Stored {args.model_id} at {path}\n")
+        elif args.command == "list":
+            root = store_root()
+            slugs = [model_slug(args.model_id)] if args.model_id else sorted(
+                p.name for p in root.iterdir() if p.is_dir()
+            ) if root.is_dir() else []
+            for slug in slugs:
+                model_id = slug.replace("--", "/")
+                current = active_version(model_id)
+                for version in list_versions(model_id):
+                    marker = "*" if version == current else " "
+                    sys.stdout.write(f"{marker} {model_id} {version}\n")
+        elif args.command == "activate":
+            activate(args.model_id, args.version)
+            sys.stdout.write(f"{args.model_id} now uses {args.version}\n")
+        elif args.command == "verify":
+            manifest = verify(args.model_id, args.version)
+            sys.stdout.write(f"{args.model_id} {manifest['version']}: {len(manifest['files'])} files verified\n")
+    except ModelStoreError as e:
+        sys.stderr.write(f"error: {e}\n")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,9 +7,15 @@ and structured data parsing using Microsoft TrOCR and Tesseract.
 """
 
 import asyncio
+import functools
+import importlib.util
+import io
+import itertools
 import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 import uuid
-from typing import Dict, List, Optional, Any
+from typing import Any, Callable, Dict, List, Optional, TypeVar
 from PIL import Image
 import numpy as np
 import structlog
@@ -18,53 +24,109 @@ import cv2
 from app.core.config import settings, MODEL_CONFIGS
 from app.core.redis import cache_ocr_result, get_cached_ocr_result
 from app.core.monitoring import (
+    StageTimer,
+    record_abandoned,
+    record_orientation,
+    record_preprocess_recipe,
     record_processing_time,
     record_model_accuracy,
     record_error,
     log_ocr_processing
 )
 from app.models.schemas import OCRRequest, OCRResult, OCRError
+from app.core.startup import startup_timeline
+from app.core.stats import request_stats
+from app.services.admission import AdmissionController, AdmissionTicket, ProcessingMode
+from app.services.compact_image import INFO_KEY, MAGIC, decode_compact, is_compact
+from app.services.deadlines import DeadlineExceeded, check_deadline, is_expired
+from app.services.engines import EngineRegistry
+from app.services.generation import GenerationProfile, GenerationProfiles
+from app.services.image_quality import ImageRejected, analyze, apply_steps, check_readable
+from app.services.model_registry import LoadedModel, ModelRegistry, parse_model_routes
+from app.services.model_store import artifact_bytes, enable_offline_mode, mapped_state_dict, resolve_model_source
+from app.services.orientation import correct_orientation, exif_transpose
+from app.services.scheduler import FairScheduler
+from app.services.singleflight import SingleFlight, replica_lease, request_key
+from app.services.storage import ObjectNotFound, get_object_store
+from app.services.tiling import Tile, merge_tiles, plan_tiles
+from app.services.warmup import (
+    configure_torch_threads,
+    optimize_model,
+    parse_batch_sizes,
+    run_warmup,
+    synthetic_images
+)
+from app.services.structured_parser import parse_structured_data
+
+# OCR engines are imported lazily by their loaders (torch/transformers alone
+# take seconds); at import time we only check that they are installed.
+torch_available = importlib.util.find_spec("torch") is not None
+transformers_available = torch_available and importlib.util.find_spec("transformers") is not None
+tesseract_available = importlib.util.find_spec("pytesseract") is not None
 
-# Import OCR engines (will be loaded dynamically)
-torch_available = False
-transformers_available = False
-tesseract_available = False
-
-try:
-    import torch
-    from transformers import TrOCRProcessor, VisionEncoderDecoderModel
-    torch_available = True
-    transformers_available = True
-except ImportError:
+if not transformers_available:
     print("Warning: PyTorch/Transformers not available. TrOCR will not work.")
+if not tesseract_available:
+    print("Warning: Tesseract not available. Fallback OCR will not work.")
 
-try:
-    import pytesseract
-    import cv2
-    tesseract_available = True
-except ImportError:
-    print("Warning: Tesseract/OpenCV not available. Fallback OCR will not work.")
+T = TypeVar("T")
 
 
 class OCRService:
     """Main OCR processing service with model management."""
 
     _instance: Optional['OCRService'] = None
-    _models_loaded: bool = False
 
     def __init__(self):
         self.logger = structlog.get_logger(__name__)
-        self.primary_model = None
-        self.processor = None
         self.fallback_model_available = False
-        self.device = "cuda" if settings.OCR_ENABLE_GPU and torch_available and torch.cuda.is_available() else "cpu"
+        self._torch = None
+        self._threads: Optional[Dict[str, int]] = None
+        self.warmup_report: Optional[Dict[str, Any]] = None
+        self.engines = EngineRegistry()
+        self.admission = AdmissionController(fallback_available=lambda: self.fallback_model_available)
+        self.scheduler = FairScheduler()
+        self.flights = SingleFlight()
+        # Replicas that find the lease taken wait for the holder's result in
+        # the result cache; without the cache they would only run the
+        # duplicate later, one after the other
+        self.replica_lease = settings.OCR_SINGLEFLIGHT_REDIS_LEASE
+        if self.replica_lease and not settings.ENABLE_MODEL_CACHING:
+            self.logger.warning(
+                "OCR_SINGLEFLIGHT_REDIS_LEASE needs ENABLE_MODEL_CACHING; replica lease disabled"
+            )
+            self.replica_lease = False
+        self.generation = GenerationProfiles()
+        # CPU-bound stages (decoding, image analysis, inference, Tesseract,
+        # barcodes) run here, never on the event loop
+        self.executor = ThreadPoolExecutor(
+            max_workers=max(1, settings.OCR_WORKERS), thread_name_prefix="ocr-inference"
+        )
+        self.models = ModelRegistry(
+            loader=self._load_trocr_model,
+            default_model=settings.OCR_MODEL_PRIMARY,
+            routes=parse_model_routes(settings.OCR_MODEL_ROUTES),
+            budget_bytes=settings.OCR_MODEL_MEMORY_BUDGET_MB * 1024 * 1024,
+            estimate_bytes=artifact_bytes,
+        )
+
+        if transformers_available and settings.OCR_MODEL_PRIMARY.startswith("microsoft/"):
+            self.engines.register("trocr", self._preload_primary_model)
+        if tesseract_available and settings.OCR_MODEL_FALLBACK == "tesseract":
+            self.engines.register("tesseract", self._load_tesseract, required=False)
 
     @classmethod
-    async def initialize(cls) -> 'OCRService':
-        """Initialize the OCR service singleton."""
+    async def initialize(cls, wait_for_models: bool = False) -> 'OCRService':
+        """Initialize the OCR service singleton.
+
+        Models load in the background; pass ``wait_for_models=True`` to block
+        until every engine has finished loading (scripts, benchmarks).
+        """
         if cls._instance is None:
             cls._instance = cls()
-            await cls._instance._load_models()
+            cls._instance._load_models()
+        if wait_for_models:
+            await cls._instance.wait_until_loaded()
         return cls._instance
 
     @classmethod
@@ -74,95 +136,278 @@ class OCRService:
             raise RuntimeError("OCR Service not initialized. Call initialize() first.")
         return cls._instance
 
-    async def _load_models(self) -> None:
-        """Load OCR models into memory."""
+    def _load_models(self) -> None:
+        """Start loading OCR models in background threads."""
+        self.logger.info("Loading OCR models in background", primary=settings.OCR_MODEL_PRIMARY)
+        self.engines.load_in_background()
+
+    async def wait_until_loaded(self, timeout: Optional[float] = None) -> None:
+        """Wait for all registered engines to finish loading."""
+        for name in ("trocr", "tesseract"):
+            if name in self.engines:
+                await self.engines.wait_for(name, timeout)
+
+    async def _preload_primary_model(self) -> LoadedModel:
+        """Load the default model at startup; other routed models load on demand."""
+        loaded = await self.models.preload(settings.OCR_MODEL_PRIMARY)
+        self.warmup_report = loaded.warmup_report
+        return loaded
+
+    def _load_trocr_model(self, model_id: str) -> LoadedModel:
+        """Load a TrOCR model (blocking, runs in a worker thread)."""
         try:
-            self.logger.info("Loading OCR models", primary=settings.OCR_MODEL_PRIMARY)
-
-            # Load primary model (TrOCR)
-            if transformers_available and settings.OCR_MODEL_PRIMARY.startswith("microsoft/"):
-                await self._load_trocr_model()
-                self.logger.info("TrOCR model loaded successfully", device=self.device)
-
-            # Check fallback model availability
-            if tesseract_available and settings.OCR_MODEL_FALLBACK == "tesseract":
-                self.fallback_model_available = True
-                self.logger.info("Tesseract fallback available")
-
-            self._models_loaded = True
-            self.logger.info("All OCR models loaded successfully")
+            if settings.OCR_MODEL_OFFLINE:
+                enable_offline_mode()
+
+            import torch
+            from transformers import TrOCRProcessor, VisionEncoderDecoderModel
+
+            # Thread pools must be sized before any parallel work runs
+            if self._threads is None:
+                self._threads = configure_torch_threads(torch)
+            device = "cuda" if settings.OCR_ENABLE_GPU and torch.cuda.is_available() else "cpu"
+
+            # Load processor and model, preferring the local artifact store
+            source = resolve_model_source(model_id)
+            local = source != model_id
+            options = dict(MODEL_CONFIGS.get(model_id, {}))
+            if isinstance(options.get("torch_dtype"), str):
+                options["torch_dtype"] = getattr(torch, options["torch_dtype"])
+            if local and settings.OCR_MODEL_MMAP and device == "cpu":
+                # Skeleton on the meta device, parameters taken straight from
+                # the mapped file: one load, no private copy of the weights
+                state = mapped_state_dict(Path(source))
+                if state:
+                    options.update(state_dict=state, low_cpu_mem_usage=True)
+                    self.logger.info("Model weights memory-mapped", model=model_id, tensors=len(state))
+            processor = TrOCRProcessor.from_pretrained(source, local_files_only=local)
+            model = VisionEncoderDecoderModel.from_pretrained(
+                source,
+                local_files_only=local,
+                **options
+            )
 
-        except Exception as e:
-            self.logger.error("Failed to load OCR models", error=str(e))
-            self._models_loaded = False
-            raise
+            # Move to GPU if available
+            if device == "cuda":
+                model = model.to(device)
+                self.logger.info("Model moved to GPU", model=model_id)
 
-    async def _load_trocr_model(self) -> None:
-        """Load Microsoft TrOCR model."""
-        try:
-            # Load processor and model
-            self.processor = TrOCRProcessor.from_pretrained(settings.OCR_MODEL_PRIMARY)
-            self.primary_model = VisionEncoderDecoderModel.from_pretrained(
-                settings.OCR_MODEL_PRIMARY,
-                **MODEL_CONFIGS[settings.OCR_MODEL_PRIMARY]
+            self._torch = torch
+            memory_bytes = sum(
+                t.numel() * t.element_size() for t in itertools.chain(model.parameters(), model.buffers())
             )
 
-            # Move to GPU if available
-            if self.device == "cuda":
-                self.primary_model = self.primary_model.to(self.device)
-                self.logger.info("Model moved to GPU")
+            # Warm up before handing the model out, so its first real
+            # requests do not pay first-call latency
+            warmup_report = None
+            if settings.OCR_WARMUP_ENABLED:
+                with startup_timeline.phase(f"warmup:{model_id}"):
+                    warmup_report = self._warm_up(model, processor, device)
+                warmup_report["threads"] = self._threads
+
+            self.logger.info("TrOCR model loaded successfully", model=model_id, device=device)
+            return LoadedModel(model_id, processor, model, device, memory_bytes, warmup_report)
 
         except Exception as e:
-            self.logger.error("Failed to load TrOCR model", error=str(e))
+            self.logger.error("Failed to load TrOCR model", model=model_id, error=str(e))
             raise
 
+    def _warm_up(self, model: Any, processor: Any, device: str) -> Dict[str, Any]:
+        """Optionally optimise the model graph, then run synthetic batches."""
+        example = processor(images=synthetic_images(1), return_tensors="pt").pixel_values.to(device)
+        mode = optimize_model(model, self._torch, settings.OCR_GRAPH_OPTIMIZATION, example)
+
+        # Warm up with the longest budget so every decode length is covered
+        profile = self.generation.longest()
+
+        def infer(images: List[Image.Image]) -> Any:
+            pixel_values = processor(images=images, return_tensors="pt").pixel_values.to(device)
+            return self._generate(model, processor, self._encode(model, pixel_values), profile)
+
+        report = run_warmup(infer, parse_batch_sizes(settings.OCR_WARMUP_BATCH_SIZES))
+        report["graph_optimization"] = mode
+        return report
+
+    def _encode(self, model: Any, pixel_values: Any) -> Any:
+        """Run the vision encoder once; its outputs are reused by every decoding step."""
+        with self._torch.no_grad():
+            return model.encoder(pixel_values=pixel_values)
+
+    def _generate(
+        self,
+        model: Any,
+        processor: Any,
+        encoder_outputs: Any,
+        profile: GenerationProfile,
+        expired: Optional[Callable[[], bool]] = None
+    ) -> Any:
+        """Run TrOCR decoding with a profile's budget, without autograd bookkeeping."""
+        kwargs = self.generation.generate_kwargs(profile, model, processor.tokenizer, expired)
+        with self._torch.no_grad():
+            return model.generate(encoder_outputs=encoder_outputs, **kwargs)
+
+    async def _run_blocking(self, fn: Callable[..., T], *args: Any) -> T:
+        """Run a blocking pipeline stage on the inference executor."""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, functools.partial(fn, *args))
+
+    def _load_tesseract(self) -> Any:
+        """Import pytesseract and check the tesseract binary is callable."""
+        import pytesseract
+
+        pytesseract.get_tesseract_version()
+        self.fallback_model_available = True
+        self.logger.info("Tesseract fallback available")
+        return pytesseract
+
     def is_ready(self) -> bool:
         """Check if OCR service is ready to process requests."""
-        return self._models_loaded and self.primary_model is not None
+        return self.engines.is_ready("trocr") and self.engines.all_required_ready()
 
     def is_model_loaded(self, model_name: str) -> bool:
         """Check if specific model is loaded."""
-        if model_name == settings.OCR_MODEL_PRIMARY:
-            return self.primary_model is not None
-        elif model_name == settings.OCR_MODEL_FALLBACK:
+        if model_name == settings.OCR_MODEL_FALLBACK:
             return self.fallback_model_available
-        return False
+        return self.models.is_resident(model_name)
 
     async def process_image(self, request: OCRRequest) -> OCRResult:
         """Process a single image with OCR."""
+        started = time.time()
+        request_stats.request_started()
+
+        if request.deadline is None:
+            request.deadline = (request.submitted_at or started) + settings.OCR_PROCESSING_TIMEOUT_SECONDS
+
+        try:
+            if settings.ENABLE_MODEL_CACHING or settings.OCR_SINGLEFLIGHT_ENABLED:
+                request.content_key = await request_key(request)
+            if settings.OCR_SINGLEFLIGHT_ENABLED and request.content_key is not None:
+                # Retries of a request still in progress wait for its result
+                result = await self.flights.run(
+                    f"{request.shop_id}:{request.content_key}", request, self._run_flight
+                )
+            else:
+                result = await self._admit_and_process(request)
+        except OCRError as e:
+            request_stats.request_finished(time.time() - started, error_type=e.code)
+            raise
+        except Exception as e:
+            request_stats.request_finished(time.time() - started, error_type=type(e).__name__)
+            raise
+
+        request_stats.request_finished(
+            time.time() - started, model=result.model_used, confidence=result.confidence
+        )
+        return result
+
+    async def _run_flight(self, request: OCRRequest) -> OCRResult:
+        """The shared work of a single flight, coalesced across replicas if enabled."""
+        if not self.replica_lease:
+            return await self._admit_and_process(request)
+        async with replica_lease(request, request.content_key) as result:
+            if result is not None:
+                return result
+            return await self._admit_and_process(request)
+
+    async def _admit_and_process(self, request: OCRRequest) -> OCRResult:
+        """Admission control, then the pipeline within the request's deadline."""
+        cached = await self._cached_result(request)
+        if cached is not None:
+            # Served without a slot: nothing for admission to learn from
+            return cached
+        budget = request.deadline - time.time()
+        check_deadline(request, "admission")
+        with self.admission.admit(request, budget) as ticket:
+            try:
+                result = await asyncio.wait_for(self._run_scheduled(request, ticket), timeout=budget)
+            except asyncio.TimeoutError:
+                # Deadline passed while waiting (slot, I/O)
+                record_abandoned("expired", "in_flight")
+                raise DeadlineExceeded("completion")
+        if ticket.degraded:
+            result.degraded = ticket.mode
+        return result
+
+    async def _run_scheduled(self, request: OCRRequest, ticket: AdmissionTicket) -> OCRResult:
+        """Wait for this shop's fair share of the execution slots, then process."""
+        async with self.scheduler.slot(request.shop_id, request.lane):
+            # Service time is the whole pipeline run while holding the slot
+            started = time.perf_counter()
+            result = await self._process_image(request, ticket.mode)
+            ticket.observe(time.perf_counter() - started)
+            return result
+
+    async def _cached_result(self, request: OCRRequest) -> Optional[OCRResult]:
+        """The cached result for this image, if result caching is enabled."""
+        if not (settings.ENABLE_MODEL_CACHING and request.content_key):
+            return None
+        timer = StageTimer(request.ocr_type, request.timings)
+        with timer.stage("cache"):
+            cached_result = await get_cached_ocr_result(request.shop_id, request.content_key)
+        request_stats.record_cache(hit=cached_result is not None)
+        if cached_result is None:
+            # The lookup is part of this request's breakdown all the same
+            request.timings = timer.timings
+            return None
+        self.logger.debug("Returning cached result", shop_id=request.shop_id)
+        return OCRResult.from_dict(cached_result)
+
+    async def _process_image(self, request: OCRRequest, mode: str = ProcessingMode.FULL) -> OCRResult:
+        """Run the OCR pipeline for one image, falling back to Tesseract on failure."""
         job_id = str(uuid.uuid4())
         start_time = time.time()
+        timer = StageTimer(request.ocr_type, request.timings)
+        if request.submitted_at is not None:
+            timer.record("queue_wait", max(0.0, start_time - request.submitted_at))
 
         async with log_ocr_processing(job_id, request.shop_id, request.ocr_type):
             try:
-                # Check cache first
-                if settings.ENABLE_MODEL_CACHING:
-                    cached_result = await get_cached_ocr_result(job_id)
-                    if cached_result:
-                        self.logger.debug("Returning cached result", job_id=job_id)
-                        return OCRResult.from_dict(cached_result)
-
                 # Validate and preprocess image
-                image = await self._validate_and_preprocess_image(request)
-
-                # Extract text using primary model
-                result = await self._extract_text_with_primary_model(image, request)
+                check_deadline(request, "decode")
+                image = await self._validate_and_preprocess_image(request, timer)
+                check_deadline(request, "recognition")
+
+                if request.ocr_type == "barcode" or mode == ProcessingMode.BARCODE_ONLY:
+                    # Barcode scans never wait for (or run) the text model
+                    result = OCRResult(
+                        id=str(uuid.uuid4()),
+                        text="",
+                        confidence=1.0,
+                        structured={},
+                        barcodes=[],
+                        processing_time_ms=0,
+                        model_used="barcode"
+                    )
+                elif mode == ProcessingMode.FALLBACK_ONLY:
+                    # Shed TrOCR load: Tesseract only
+                    result = await self._process_with_fallback(request, job_id, timer)
+                elif request.ocr_type == "invoice" and settings.OCR_TILING_ENABLED:
+                    # Full pages: recognise each text line at full resolution
+                    result = await self._extract_text_tiled(image, request, timer)
+                else:
+                    # Extract text using primary model
+                    result = await self._extract_text_with_primary_model(image, request, timer)
 
                 # Extract barcodes if requested
-                if request.extract_barcodes:
-                    barcodes = await self._detect_barcodes(image)
+                if request.extract_barcodes or request.ocr_type == "barcode" or mode == ProcessingMode.BARCODE_ONLY:
+                    check_deadline(request, "barcode")
+                    with timer.stage("barcode"):
+                        barcodes = await self._detect_barcodes(image)
                     result.barcodes = barcodes
 
                 # Parse structured data
-                structured_data = self._parse_structured_data(result.text, request.ocr_type)
+                with timer.stage("parse"):
+                    structured_data = self._parse_structured_data(result.text, request.ocr_type, request.language)
 
                 # Update result with structured data
                 result.structured = structured_data
-                result.processing_time_ms = int((time.time() - start_time) * 1000)
 
-                # Cache result
-                if settings.ENABLE_MODEL_CACHING:
-                    await cache_ocr_result(job_id, result.to_dict())
+                # Cache result; degraded runs must not answer later full-quality requests
+                if settings.ENABLE_MODEL_CACHING and request.content_key and mode == ProcessingMode.FULL:
+                    with timer.stage("cache"):
+                        await cache_ocr_result(request.shop_id, request.content_key, result.to_dict())
+
+                result.processing_time_ms = int((time.time() - start_time) * 1000)
+                result.timings = timer.timings
 
                 # Record metrics
                 self._record_metrics(result, request.ocr_type)
@@ -176,6 +421,10 @@ class OCRService:
 
                 return result
 
+            except (DeadlineExceeded, ImageRejected):
+                # Nobody is waiting for a fallback result, and no model can read the image
+                raise
+
             except Exception as e:
                 duration = time.time() - start_time
                 self.logger.error(
@@ -189,143 +438,288 @@ class OCRService:
                 record_error("processing_error", settings.OCR_MODEL_PRIMARY)
 
                 # Try fallback if available
-                if self.fallback_model_available and request.ocr_type != "barcode":
+                if self.fallback_model_available and request.ocr_type != "barcode" and mode == ProcessingMode.FULL:
                     self.logger.info("Attempting fallback OCR", job_id=job_id)
-                    return await self._process_with_fallback(request, job_id)
+                    return await self._process_with_fallback(request, job_id, timer)
 
                 raise
 
-    async def _validate_and_preprocess_image(self, request: OCRRequest) -> Image.Image:
+    async def _validate_and_preprocess_image(self, request: OCRRequest, timer: StageTimer) -> Image.Image:
         """Validate and preprocess image for OCR."""
         try:
-            # Open and validate image
-            image = Image.open(request.image_path)
-
             # Check file size
             if request.file_size > settings.MAX_IMAGE_SIZE_MB * 1024 * 1024:
                 raise OCRError("FILE_TOO_LARGE", f"Image size exceeds {settings.MAX_IMAGE_SIZE_MB}MB limit")
 
-            # Convert to RGB if needed
-            if image.mode not in ['RGB', 'L']:
-                image = image.convert('RGB')
-
-            # Resize if too large (for performance)
-            max_dimension = 2048
-            if max(image.size) > max_dimension:
-                image.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
-
-            # Image enhancement
-            image = await self._enhance_image(image)
-
-            return image
+            await self._fetch_stored_image(request, timer)
+            return await self._run_blocking(self._prepare_image, request, timer)
 
         except Exception as e:
             if isinstance(e, OCRError):
                 raise
             raise OCRError("INVALID_IMAGE", f"Failed to process image: {str(e)}")
 
-    async def _enhance_image(self, image: Image.Image) -> Image.Image:
-        """Enhance image quality for better OCR accuracy."""
-        try:
-            # Convert to numpy array for processing
-            img_array = np.array(image)
-
-            # Auto-rotate based on EXIF orientation
-            img_array = self._auto_rotate_image(img_array)
+    def _prepare_image(self, request: OCRRequest, timer: StageTimer) -> Image.Image:
+        """Decode, resize, enhance and orient the request's image (blocking)."""
+        # Open and decode image (Image.open alone only reads the header)
+        with timer.stage("decode"):
+            image = self._decode_image(request)
 
-            # Enhance contrast and sharpness
-            if len(img_array.shape) == 3:  # Color image
-                # Convert to grayscale for OCR
-                gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
+        # Compact uploads were cropped, scaled and grayscaled on the phone
+        with timer.stage("preprocess"):
+            # Convert to RGB if needed
+            if INFO_KEY not in image.info and image.mode not in ['RGB', 'L']:
+                image = image.convert('RGB')
 
-                # Apply adaptive thresholding for better text detection
-                enhanced = cv2.adaptiveThreshold(
-                    gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2
-                )
+            # Resize if too large (for performance); tiled invoices keep their small print
+            max_dimension = 2048
+            if request.ocr_type == "invoice" and settings.OCR_TILING_ENABLED:
+                max_dimension = settings.OCR_TILE_MAX_DIMENSION
+            if INFO_KEY not in image.info and max(image.size) > max_dimension:
+                image.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
 
-                # Convert back to PIL Image
-                return Image.fromarray(enhanced).convert('RGB')
-            else:
-                # Already grayscale
-                return Image.fromarray(img_array).convert('RGB')
+        with timer.stage("quality"):
+            # Measure first: unreadable images stop here, clean ones skip enhancement
+            report = analyze(image)
+            if request.ocr_type != "barcode":
+                try:
+                    check_readable(report)
+                except ImageRejected:
+                    record_preprocess_recipe("rejected")
+                    raise
+            record_preprocess_recipe(report.recipe)
+            image = self._enhance_image(image, report.steps)
+
+        return self._orient_image(image, request, timer)
+
+    @staticmethod
+    async def _fetch_stored_image(request: OCRRequest, timer: StageTimer) -> None:
+        """Download an image referenced by storage key (once per request)."""
+        if request.storage_key is None or request.image_bytes is not None:
+            return
+        try:
+            with timer.stage("fetch"):
+                request.image_bytes = await get_object_store().get_bytes(request.storage_key)
+        except ObjectNotFound:
+            raise OCRError("IMAGE_NOT_FOUND", f"No stored image {request.storage_key}")
+
+    @staticmethod
+    def _open_image(request: OCRRequest) -> Image.Image:
+        """Open the request's image from memory or from its saved file."""
+        if request.image_bytes is not None:
+            return Image.open(io.BytesIO(request.image_bytes))
+        return Image.open(request.image_path)
+
+    def _decode_image(self, request: OCRRequest) -> Image.Image:
+        """Decode the request's image, applying its EXIF orientation.
+
+        Compact uploads (see app/services/compact_image.py) are recognised by
+        their magic bytes and wrapped as-is.
+        """
+        if request.image_bytes is not None:
+            if is_compact(request.image_bytes):
+                return decode_compact(request.image_bytes)
+        else:
+            with open(request.image_path, "rb") as f:
+                if is_compact(f.read(len(MAGIC))):
+                    f.seek(0)
+                    return decode_compact(f.read())
+
+        image = self._open_image(request)
+        image.load()
+        image, transposed = exif_transpose(image)
+        if transposed:
+            record_orientation("exif", 0)
+        return image
+
+    def _orient_image(self, image: Image.Image, request: OCRRequest, timer: StageTimer) -> Image.Image:
+        """Turn sideways, upside-down or tilted text upright before recognition.
+
+        Barcode scans skip this: the barcode readers handle any rotation.
+        """
+        if not settings.OCR_ORIENTATION_ENABLED or request.ocr_type == "barcode":
+            return image
+        try:
+            with timer.stage("orientation"):
+                image, orientation = correct_orientation(image, request.language)
+        except Exception as e:
+            self.logger.warning("Orientation detection failed, using image as is", error=str(e))
+            return image
+        if orientation.rotation:
+            record_orientation("rotation", orientation.rotation)
+        if orientation.skew:
+            record_orientation("skew", orientation.rotation)
+        return image
+
+    def _enhance_image(self, image: Image.Image, steps: List[str]) -> Image.Image:
+        """Apply the preprocessing recipe chosen by the quality analysis."""
+        try:
+            if not steps:
+                # Clean image: TrOCR reads it best untouched
+                return image if image.mode == 'RGB' else image.convert('RGB')
+            return apply_steps(image, steps)
 
         except Exception as e:
             self.logger.warning("Image enhancement failed, using original", error=str(e))
             return image
 
-    def _auto_rotate_image(self, img_array: np.ndarray) -> np.ndarray:
-        """Auto-rotate image based on EXIF or content analysis."""
-        try:
-            # Try to detect text orientation and rotate accordingly
-            # For now, just return original - can be enhanced with more sophisticated logic
-            return img_array
-        except Exception:
-            return img_array
-
-    async def _extract_text_with_primary_model(self, image: Image.Image, request: OCRRequest) -> OCRResult:
-        """Extract text using primary TrOCR model."""
-        if not self.primary_model or not self.processor:
+    async def _extract_text_with_primary_model(
+        self, image: Image.Image, request: OCRRequest, timer: StageTimer
+    ) -> OCRResult:
+        """Extract text using the TrOCR model routed for this request."""
+        # Until the default model is up, send traffic to the fallback rather
+        # than queueing it behind startup loading
+        if not self.is_ready():
             raise OCRError("MODEL_NOT_LOADED", "Primary OCR model not available")
 
+        model_id = self.models.resolve(request.ocr_type, request.language)
         start_time = time.time()
 
         try:
+            async with self.models.lease(model_id) as loaded:
+                # Off the event loop, so deadlines and disconnects are acted on
+                # while the model runs
+                generated_text = await self._run_blocking(
+                    self._recognise_image, loaded, image, self.generation.get(request.ocr_type), request, timer
+                )
+
+            # Calculate processing time; the whole-request duration is
+            # recorded once, by _record_metrics
+            processing_time = time.time() - start_time
+
+            return OCRResult(
+                id=str(uuid.uuid4()),
+                text=generated_text,
+                confidence=0.95,  # TrOCR doesn't provide confidence, using default
+                structured={},
+                barcodes=[],
+                processing_time_ms=int(processing_time * 1000),
+                model_used=model_id
+            )
+
+        except DeadlineExceeded:
+            raise
+
+        except Exception as e:
+            record_error("model_inference_error", model_id)
+            raise OCRError("MODEL_INFERENCE_ERROR", f"TrOCR processing failed: {str(e)}")
+
+    def _recognise_image(
+        self, loaded: LoadedModel, image: Image.Image, profile: GenerationProfile,
+        request: OCRRequest, timer: StageTimer
+    ) -> str:
+        """Run one image through the processor, encoder and decoder; returns its text."""
+        with timer.stage("preprocess"):
             # Prepare image for model
-            pixel_values = self.processor(images=image, return_tensors="pt").pixel_values
+            pixel_values = loaded.processor(images=image, return_tensors="pt").pixel_values
 
             # Move to device if using GPU
-            if self.device == "cuda":
-                pixel_values = pixel_values.to(self.device)
-
-            # Generate text
-            with torch.no_grad():
-                generated_ids = self.primary_model.generate(
-                    pixel_values,
-                    max_length=128,
-                    num_beams=1,
-                    early_stopping=True
-                )
+            if loaded.device == "cuda":
+                pixel_values = pixel_values.to(loaded.device)
+
+        with timer.stage("encoder"):
+            encoder_outputs = self._encode(loaded.model, pixel_values)
+
+        check_deadline(request, "decoder")
+        with timer.stage("decoder"):
+            # Generate text within the ocr_type's current token budget;
+            # decoding also stops once the request deadline passes
+            budget = profile.budget
+            generated_ids = self._generate(
+                loaded.model, loaded.processor, encoder_outputs, profile,
+                expired=lambda: is_expired(request)
+            )
+            check_deadline(request, "decoder")
+            profile.observe(
+                GenerationProfiles.output_lengths(generated_ids, loaded.model.generation_config.pad_token_id),
+                budget
+            )
 
             # Decode generated text
-            generated_text = self.processor.batch_decode(generated_ids, skip_special_tokens=True)[0]
+            return loaded.processor.batch_decode(generated_ids, skip_special_tokens=True)[0]
 
-            # Calculate processing time
-            processing_time = time.time() - start_time
+    async def _extract_text_tiled(self, image: Image.Image, request: OCRRequest, timer: StageTimer) -> OCRResult:
+        """Recognise a full page as batches of text-line tiles (see app/services/tiling.py)."""
+        with timer.stage("layout"):
+            tiles = await self._run_blocking(plan_tiles, image)
+        if not tiles:
+            # No text lines found: let the model look at the whole page
+            return await self._extract_text_with_primary_model(image, request, timer)
 
-            # Record metrics
-            record_processing_time(settings.OCR_MODEL_PRIMARY, request.ocr_type, processing_time)
+        if not self.is_ready():
+            raise OCRError("MODEL_NOT_LOADED", "Primary OCR model not available")
 
+        model_id = self.models.resolve(request.ocr_type, request.language)
+        profile = self.generation.get("invoice_tile")
+        batch_size = max(1, settings.OCR_TILE_BATCH_SIZE)
+        start_time = time.time()
+
+        try:
+            async with self.models.lease(model_id) as loaded:
+                for start in range(0, len(tiles), batch_size):
+                    check_deadline(request, "decoder")
+                    # Off the event loop; torch spreads each batch over its intra-op threads
+                    await self._run_blocking(
+                        self._recognise_tiles, loaded, tiles[start:start + batch_size], profile, request, timer
+                    )
+            check_deadline(request, "decoder")
+
+            self.logger.debug("Tiled recognition completed", tiles=len(tiles), model=model_id)
             return OCRResult(
                 id=str(uuid.uuid4()),
-                text=generated_text,
+                text=merge_tiles(tiles),
                 confidence=0.95,  # TrOCR doesn't provide confidence, using default
                 structured={},
                 barcodes=[],
-                processing_time_ms=int(processing_time * 1000),
-                model_used=settings.OCR_MODEL_PRIMARY
+                processing_time_ms=int((time.time() - start_time) * 1000),
+                model_used=model_id
             )
 
+        except DeadlineExceeded:
+            raise
+
         except Exception as e:
-            processing_time = time.time() - start_time
-            record_processing_time(settings.OCR_MODEL_PRIMARY, request.ocr_type, processing_time)
-            record_error("model_inference_error", settings.OCR_MODEL_PRIMARY)
-            raise OCRError("MODEL_INFERENCE_ERROR", f"TrOCR processing failed: {str(e)}")
+            record_error("model_inference_error", model_id)
+            raise OCRError("MODEL_INFERENCE_ERROR", f"Tiled TrOCR processing failed: {str(e)}")
+
+    def _recognise_tiles(
+        self, loaded: LoadedModel, tiles: List[Tile], profile: GenerationProfile,
+        request: OCRRequest, timer: StageTimer
+    ) -> None:
+        """Run one batch of tiles through the encoder and decoder, filling in their text."""
+        with timer.stage("preprocess"):
+            pixel_values = loaded.processor(images=[tile.image for tile in tiles], return_tensors="pt").pixel_values
+            if loaded.device == "cuda":
+                pixel_values = pixel_values.to(loaded.device)
+
+        with timer.stage("encoder"):
+            encoder_outputs = self._encode(loaded.model, pixel_values)
+
+        with timer.stage("decoder"):
+            budget = profile.budget
+            generated_ids = self._generate(
+                loaded.model, loaded.processor, encoder_outputs, profile,
+                expired=lambda: is_expired(request)
+            )
+            profile.observe(
+                GenerationProfiles.output_lengths(generated_ids, loaded.model.generation_config.pad_token_id),
+                budget
+            )
+            texts = loaded.processor.batch_decode(generated_ids, skip_special_tokens=True)
+
+        for tile, text in zip(tiles, texts):
+            tile.text = text
 
-    async def _process_with_fallback(self, request: OCRRequest, job_id: str) -> OCRResult:
+    async def _process_with_fallback(self, request: OCRRequest, job_id: str, timer: StageTimer) -> OCRResult:
         """Process image with Tesseract fallback."""
-        if not self.fallback_model_available:
+        pytesseract = self.engines.get("tesseract")
+        if pytesseract is None:
             raise OCRError("NO_FALLBACK", "Fallback OCR model not available")
 
+        start_time = time.time()
         try:
-            # Open image for Tesseract
-            image = Image.open(request.image_path)
-
-            # Configure Tesseract
-            config = MODEL_CONFIGS["tesseract"]["config"]
-            lang = MODEL_CONFIGS["tesseract"]["lang"]
-
-            # Extract text with Tesseract
-            text = pytesseract.image_to_string(image, lang=lang, config=config)
+            await self._fetch_stored_image(request, timer)
+            text = await self._run_blocking(self._read_with_tesseract, pytesseract, request, timer)
 
             return OCRResult(
                 id=str(uuid.uuid4()),
@@ -333,18 +727,37 @@ class OCRService:
                 confidence=0.8,  # Lower confidence for Tesseract
                 structured={},
                 barcodes=[],
-                processing_time_ms=50,  # Tesseract is faster
-                model_used=settings.OCR_MODEL_FALLBACK
+                processing_time_ms=int((time.time() - start_time) * 1000),
+                model_used=settings.OCR_MODEL_FALLBACK,
+                timings=timer.timings
             )
 
         except Exception as e:
             raise OCRError("FALLBACK_ERROR", f"Tesseract processing failed: {str(e)}")
 
+    def _read_with_tesseract(self, pytesseract: Any, request: OCRRequest, timer: StageTimer) -> str:
+        """Decode and orient the request's image, then read it with Tesseract (blocking)."""
+        # Open image for Tesseract
+        with timer.stage("decode"):
+            image = self._decode_image(request)
+        image = self._orient_image(image, request, timer)
+
+        # Configure Tesseract
+        config = MODEL_CONFIGS["tesseract"]["config"]
+        lang = MODEL_CONFIGS["tesseract"]["lang"]
+
+        # Extract text with Tesseract
+        with timer.stage("fallback"):
+            return pytesseract.image_to_string(image, lang=lang, config=config)
+
     async def _detect_barcodes(self, image: Image.Image) -> List[Dict[str, Any]]:
         """Detect barcodes and QR codes in image."""
         if not settings.ENABLE_BARCODE_DETECTION:
             return []
+        return await self._run_blocking(self._read_barcodes, image)
 
+    def _read_barcodes(self, image: Image.Image) -> List[Dict[str, Any]]:
+        """Run the OpenCV barcode detector (blocking)."""
         try:
             # Convert PIL to OpenCV format
             img_array = np.array(image)
@@ -382,89 +795,18 @@ class OCRService:
             self.logger.warning("Barcode detection failed", error=str(e))
             return []
 
-    def _parse_structured_data(self, text: str, ocr_type: str) -> Dict[str, Any]:
+    def _parse_structured_data(self, text: str, ocr_type: str, language: str = "en") -> Dict[str, Any]:
         """Parse extracted text into structured data based on type."""
         structured = {}
 
         try:
-            if ocr_type == "product":
-                structured = self._parse_product_data(text)
-            elif ocr_type == "receipt":
-                structured = self._parse_receipt_data(text)
-            elif ocr_type == "invoice":
-                structured = self._parse_invoice_data(text)
+            structured = parse_structured_data(text, ocr_type, language)
 
         except Exception as e:
             self.logger.warning("Structured data parsing failed", error=str(e), text=text)
 
         return structured
 
-    def _parse_product_data(self, text: str) -> Dict[str, Any]:
-        """Parse product label text into structured data."""
-        lines = [line.strip() for line in text.split('\n') if line.strip()]
-
-        # Simple parsing logic - can be enhanced with more sophisticated NLP
-        product_name = lines[0] if lines else ""
-
-        # Look for price patterns
-        price = None
-        for line in lines:
-            # Look for price patterns like $19.99, 19.99, $20
-            import re
-            price_match = re.search(r'\$?(\d+\.?\d*)', line)
-            if price_match:
-                price = float(price_match.group(1))
-                break
-
-        return {
-            "product_name": product_name,
-            "price": price,
-            "currency": "USD" if price else None
-        }
-
-    def _parse_receipt_data(self, text: str) -> Dict[str, Any]:
-        """Parse receipt text into structured data."""
-        # Simple receipt parsing - can be enhanced
-        lines = [line.strip() for line in text.split('\n') if line.strip()]
-
-        # Look for total
-        total = None
-        for line in lines:
-            if 'total' in line.lower():
-                import re
-                total_match = re.search(r'\$?(\d+\.?\d*)', line)
-                if total_match:
-                    total = float(total_match.group(1))
-                    break
-
-        return {
-            "total_amount": total,
-            "currency": "USD" if total else None,
-            "item_count": len([l for l in lines if '$' in l or any(c.isdigit() for c in l)])
-        }
-
-    def _parse_invoice_data(self, text: str) -> Dict[str, Any]:
-        """Parse invoice text into structured data."""
-        # Similar to receipt parsing but for invoices
-        lines = [line.strip() for line in text.split('\n') if line.strip()]
-
-        # Look for invoice number
-        invoice_number = None
-        for line in lines:
-            if 'invoice' in line.lower() or 'inv' in line.lower():
-                # Extract number after invoice
-                import re
-                num_match = re.search(r'[\w#]+(\d+)', line)
-                if num_match:
-                    invoice_number = num_match.group(1)
-                    break
-
-        return {
-            "invoice_number": invoice_number,
-            "supplier_name": lines[0] if lines else None,
-            "total_amount": self._parse_receipt_data(text).get("total_amount")
-        }
-
     def _record_metrics(self, result: OCRResult, ocr_type: str) -> None:
         """Record processing metrics."""
         try:
@@ -0,0 +1,280 @@
+"""
+Orientation Detection for ZakPOS OCR
+====================================
+
+Sideways, upside-down or slightly tilted labels come back from TrOCR as
+garbage and get rescanned, so every image is put upright before recognition:
+
+* EXIF orientation (phone cameras) is applied while decoding.
+* Sideways text is found from the glyphs (connected components) of a
+  downscaled ink mask: a glyph's nearest neighbour is the next letter of
+  its word, so neighbours line up along the text.
+* Skew is the angle that maximises the contrast of the row projection
+  profile: text lines give sharp peaks and gaps only when they run level.
+* Upside-down text is told apart by its baseline: Latin glyphs of a line
+  share their bottoms while their tops vary (x-height, ascenders, capitals).
+
+Estimation runs on a copy of at most OCR_ORIENTATION_MAX_SIDE pixels (the
+skew search on one of half that) and costs tens of milliseconds. Images
+without a clear signal are left alone: all-capital or numeric text is never
+turned upside down, and neither is text in scripts without a baseline, such
+as Bengali, whose skew alone is corrected.
+"""
+
+from typing import Any, Dict, List, Tuple
+
+import cv2
+import numpy as np
+import structlog
+from PIL import Image, ImageOps
+
+from app.core.config import settings
+
+logger = structlog.get_logger(__name__)
+
+_EXIF_ORIENTATION = 0x0112
+
+# Counter-clockwise rotation -> PIL transpose
+_TRANSPOSE = {
+    90: Image.Transpose.ROTATE_90,
+    180: Image.Transpose.ROTATE_180,
+    270: Image.Transpose.ROTATE_270,
+}
+
+# Ink fraction range of a mask worth analysing (blank or solid images are skipped)
+_MIN_INK = 0.002
+_MAX_INK = 0.5
+
+# Fewer glyph-sized components than this is no evidence of text direction
+_MIN_GLYPHS = 6
+
+# Glyphs whose nearest neighbour is looked up (pairwise distances are quadratic)
+_MAX_QUERIES = 400
+
+# The skew search runs on a copy no larger than this
+_SKEW_MAX_SIDE = 512
+
+# Per-glyph baseline evidence needed to call text upside down (or a sideways
+# page's direction); all-capital and numeric lines stay well below it
+_MIN_BASELINE_SIGNAL = 0.03
+
+# Languages whose script sits on a baseline (see _baseline_signal)
+_BASELINE_LANGUAGES = frozenset({"en"})
+
+
+class Orientation:
+    """Correction estimated for one image (angles counter-clockwise)."""
+
+    def __init__(self, rotation: int = 0, skew: float = 0.0, exif: bool = False) -> None:
+        self.rotation = rotation
+        self.skew = skew
+        self.exif = exif
+
+    @property
+    def corrected(self) -> bool:
+        return self.exif or self.rotation != 0 or self.skew != 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"exif": self.exif, "rotation": self.rotation, "skew": round(self.skew, 2)}
+
+
+def exif_transpose(image: Image.Image) -> Tuple[Image.Image, bool]:
+    """Apply the EXIF orientation tag, if any. Returns the image and whether it changed."""
+    orientation = image.getexif().get(_EXIF_ORIENTATION, 1)
+    if orientation in (None, 1):
+        return image, False
+    return ImageOps.exif_transpose(image), True
+
+
+def ink_mask(image: Image.Image, max_side: int) -> np.ndarray:
+    """Downscale ``image`` and binarise it; text pixels are 1."""
+    scale = min(1.0, max_side / max(image.size))
+    size = (max(1, int(image.width * scale)), max(1, int(image.height * scale)))
+    gray = np.asarray(image.resize(size, Image.Resampling.BILINEAR, reducing_gap=2.0).convert("L"))
+    _, mask = cv2.threshold(gray, 0, 1, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    if mask.mean() > 0.5:
+        # Light text on a dark background
+        mask = 1 - mask
+    return mask
+
+
+def _profile_score(mask: np.ndarray, angle: float) -> float:
+    """Contrast of the row profile of ``mask`` rotated by ``angle`` degrees."""
+    if angle:
+        height, width = mask.shape
+        matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+        mask = cv2.warpAffine(mask, matrix, (width, height), flags=cv2.INTER_NEAREST)
+    rows = mask.sum(axis=1, dtype=np.float64)
+    mean = rows.mean()
+    return float(rows.var() / (mean * mean)) if mean else 0.0
+
+
+def _best_angle(mask: np.ndarray, max_skew: float) -> Tuple[float, float]:
+    """Coarse-to-fine search for the skew (within ±max_skew) that best levels the text lines."""
+    coarse = np.arange(-max_skew, max_skew + 1e-6, 1.0)
+    scores = [_profile_score(mask, angle) for angle in coarse]
+    best = float(coarse[int(np.argmax(scores))])
+    fine = np.arange(max(-max_skew, best - 0.75), min(max_skew, best + 0.75) + 1e-6, 0.25)
+    scores = [_profile_score(mask, angle) for angle in fine]
+    index = int(np.argmax(scores))
+    return float(fine[index]), scores[index]
+
+
+def _shrink(mask: np.ndarray, max_side: int) -> np.ndarray:
+    """Downscale a binary mask, keeping thin strokes."""
+    scale = max_side / max(mask.shape)
+    if scale >= 1.0:
+        return mask
+    size = (max(1, int(mask.shape[1] * scale)), max(1, int(mask.shape[0] * scale)))
+    return (cv2.resize(mask * 255, size, interpolation=cv2.INTER_AREA) > 64).astype(np.uint8)
+
+
+def _rotate_mask(mask: np.ndarray, angle: float) -> np.ndarray:
+    height, width = mask.shape
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    return cv2.warpAffine(mask, matrix, (width, height), flags=cv2.INTER_NEAREST)
+
+
+def _components(mask: np.ndarray) -> np.ndarray:
+    """Bounding boxes (x, y, w, h) of the glyph-sized connected components of ``mask``."""
+    _, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    boxes = stats[1:, :4]
+    area = stats[1:, cv2.CC_STAT_AREA]
+    height, width = mask.shape
+    # Drop specks, and rules, frames or photos spanning half the image
+    keep = (area >= 4) & (boxes[:, 2] < width / 2) & (boxes[:, 3] < height / 2)
+    return boxes[keep]
+
+
+def _neighbour_directions(boxes: np.ndarray) -> Tuple[int, int]:
+    """How many glyphs have their nearest neighbour beside them vs above or below them.
+
+    Letters of a word sit closer together than the lines of a paragraph, so
+    nearest neighbours (by the gap between boxes) run along the text lines.
+    """
+    index = np.arange(len(boxes))
+    if len(index) > _MAX_QUERIES:
+        index = np.random.default_rng(0).choice(len(boxes), _MAX_QUERIES, replace=False)
+    queries = boxes[index]
+
+    x0, y0 = boxes[:, 0].astype(np.float64), boxes[:, 1].astype(np.float64)
+    x1, y1 = x0 + boxes[:, 2], y0 + boxes[:, 3]
+    qx0, qy0 = queries[:, 0].astype(np.float64)[:, None], queries[:, 1].astype(np.float64)[:, None]
+    qx1, qy1 = qx0 + queries[:, 2:3], qy0 + queries[:, 3:4]
+    gap_x = np.maximum(0.0, np.maximum(x0[None, :] - qx1, qx0 - x1[None, :]))
+    gap_y = np.maximum(0.0, np.maximum(y0[None, :] - qy1, qy0 - y1[None, :]))
+    distance = np.hypot(gap_x, gap_y)
+    # A box is not its own neighbour
+    distance[np.arange(len(index)), index] = np.inf
+    nearest = boxes[distance.argmin(axis=1)]
+
+    dx = (nearest[:, 0] + nearest[:, 2] / 2) - (queries[:, 0] + queries[:, 2] / 2)
+    dy = (nearest[:, 1] + nearest[:, 3] / 2) - (queries[:, 1] + queries[:, 3] / 2)
+    # 0° = beside, 90° = above or below
+    angle = np.degrees(np.arctan2(np.abs(dy), np.abs(dx)))
+    return int((angle < 30).sum()), int((angle > 60).sum())
+
+
+def _text_lines(mask: np.ndarray) -> List[Tuple[int, int]]:
+    """Row ranges of the text lines of a level ``mask``."""
+    rows = mask.sum(axis=1, dtype=np.float64)
+    if not rows.any():
+        return []
+    text_rows = rows > 0.05 * rows.max()
+
+    lines: List[Tuple[int, int]] = []
+    start = None
+    for index, is_text in enumerate(text_rows):
+        if is_text and start is None:
+            start = index
+        elif not is_text and start is not None:
+            lines.append((start, index))
+            start = None
+    if start is not None:
+        lines.append((start, len(text_rows)))
+    return lines
+
+
+def _baseline_signal(mask: np.ndarray) -> float:
+    """Evidence that the level text in ``mask`` is upright (> 0) or upside down (< 0).
+
+    Latin glyphs share a baseline, while their tops vary (x-height,
+    ascenders, capitals) far more than descenders hang below it. Per glyph,
+    this is how much more the tops of each line spread than the bottoms, in
+    glyph heights; all-capital or numeric text gives about 0.
+    """
+    boxes = _components(mask)
+    if len(boxes) < _MIN_GLYPHS:
+        return 0.0
+    # Dots, commas and accents carry no baseline
+    boxes = boxes[boxes[:, 3] >= 0.4 * np.median(boxes[:, 3])]
+    centres = boxes[:, 1] + boxes[:, 3] / 2
+
+    spread = 0.0
+    glyphs = 0
+    for start, end in _text_lines(mask):
+        line = boxes[(centres >= start) & (centres < end)]
+        if len(line) < 3:
+            continue
+        tops = line[:, 1].astype(np.float64)
+        bottoms = tops + line[:, 3]
+        height = float(np.median(line[:, 3]))
+        spread += (np.abs(tops - np.median(tops)).sum() - np.abs(bottoms - np.median(bottoms)).sum()) / height
+        glyphs += len(line)
+    return spread / glyphs if glyphs else 0.0
+
+
+def estimate_orientation(image: Image.Image, language: str = "en") -> Orientation:
+    """Estimate the 90° step and skew that put the text in ``image`` upright.
+
+    Anything uncertain is left alone: text that is neither clearly along
+    nor across the image is treated as upright, and sideways text whose top
+    cannot be told from its bottom is not turned at all. Only Latin-script
+    languages are turned; for others only the skew of upright text is
+    corrected.
+    """
+    mask = ink_mask(image, settings.OCR_ORIENTATION_MAX_SIDE)
+    ink = float(mask.mean())
+    if not _MIN_INK <= ink <= _MAX_INK:
+        return Orientation()
+    boxes = _components(mask)
+    if len(boxes) < _MIN_GLYPHS:
+        return Orientation()
+
+    rotation = 0
+    along, across = _neighbour_directions(boxes)
+    if across > along * settings.OCR_ORIENTATION_MARGIN:
+        if language not in _BASELINE_LANGUAGES:
+            return Orientation()
+        # np.rot90 turns counter-clockwise, like Image.Transpose.ROTATE_90
+        rotation, mask = 90, np.ascontiguousarray(np.rot90(mask))
+
+    max_skew = settings.OCR_ORIENTATION_MAX_SKEW_DEGREES
+    skew, _ = _best_angle(_shrink(mask, _SKEW_MAX_SIDE), max_skew)
+    if abs(skew) < settings.OCR_ORIENTATION_MIN_SKEW_DEGREES:
+        skew = 0.0
+
+    if language in _BASELINE_LANGUAGES:
+        signal = _baseline_signal(_rotate_mask(mask, skew) if skew else mask)
+        if signal < -_MIN_BASELINE_SIGNAL:
+            rotation = (rotation + 180) % 360
+        elif rotation and signal < _MIN_BASELINE_SIGNAL:
+            # Sideways, but which way up is unclear: turning the wrong way is no better
+            return Orientation()
+
+    return Orientation(rotation, skew)
+
+
+def correct_orientation(image: Image.Image, language: str = "en") -> Tuple[Image.Image, Orientation]:
+    """Rotate ``image`` upright (90° steps, then skew) and report what was done."""
+    orientation = estimate_orientation(image, language)
+    if orientation.rotation:
+        image = image.transpose(_TRANSPOSE[orientation.rotation])
+    if orientation.skew:
+        fill = 255 if image.mode == "L" else (255,) * len(image.getbands())
+        image = image.rotate(
+            orientation.skew, resample=Image.Resampling.BILINEAR, expand=True, fillcolor=fill
+        )
+    if orientation.rotation or orientation.skew:
+        logger.debug("Orientation corrected", **orientation.to_dict())
+    return image, orientation
@@ -0,0 +1,319 @@
+"""
+Fair-Share OCR Scheduler
+=======================
+
+Sits between the API and the inference executor (``OCRService.executor``,
+OCR_WORKERS threads) and hands out its OCR_WORKERS execution slots.
+
+Work is split into two lanes. Interactive work (synchronous ``/process``
+scans at the till) always goes first and has OCR_INTERACTIVE_RESERVED_SLOTS
+slots that bulk work (``/process/async``, ``/batch``) may not hold while
+interactive requests wait. Bulk work may steal idle reserved slots, but
+every image is a separate slot grant, so a running import yields to the
+till at its next image boundary.
+
+Within a lane, slots are shared across shops with deficit round-robin
+(DRR): every shop with waiting work gets its own queue; on each round a
+shop's deficit grows by its weight and it may start jobs while the deficit
+covers their cost. A shop bulk-uploading batches therefore only delays its
+own queue, and small shops' checkout scans keep a flat latency. A shop's
+state is dropped once it has nothing queued or running.
+
+Prometheus only names the shops listed in OCR_TENANT_WEIGHTS; all other
+shops share the ``other`` tenant label.
+"""
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+import structlog
+
+from app.core.config import settings
+from app.core.monitoring import (
+    record_lane_start,
+    record_tenant_wait,
+    update_lane_gauges,
+    update_tenant_queue_depth
+)
+
+logger = structlog.get_logger(__name__)
+
+
+OTHER_TENANT = "other"
+
+
+class Lane:
+    """Execution lanes."""
+    INTERACTIVE = "interactive"
+    BULK = "bulk"
+
+
+def parse_tenant_weights(value: str) -> Dict[str, float]:
+    """Parse ``OCR_TENANT_WEIGHTS``: comma separated ``shop_id=weight`` entries."""
+    weights: Dict[str, float] = {}
+    for entry in value.split(","):
+        if not entry.strip():
+            continue
+        shop_id, _, weight = entry.partition("=")
+        try:
+            weights[shop_id.strip()] = float(weight)
+        except ValueError:
+            raise ValueError(f"Invalid tenant weight: {entry!r}")
+        if weights[shop_id.strip()] <= 0:
+            raise ValueError(f"Tenant weight must be positive: {entry!r}")
+    return weights
+
+
+class _Job:
+    """A request waiting for an execution slot."""
+
+    def __init__(self, shop_id: str, cost: float) -> None:
+        self.shop_id = shop_id
+        self.cost = cost
+        self.enqueued_at = time.time()
+        self.granted = asyncio.get_running_loop().create_future()
+
+
+class _Tenant:
+    """Queue and DRR state for one shop within a lane."""
+
+    def __init__(self, shop_id: str, weight: float) -> None:
+        self.shop_id = shop_id
+        self.weight = weight
+        self.queue: Deque[_Job] = deque()
+        self.deficit = 0.0
+        self.running = 0
+        self.started = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+
+class _LaneQueue:
+    """Deficit round-robin over the per-shop queues of one lane."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.tenants: Dict[str, _Tenant] = {}
+        # Round-robin order of shops with queued work
+        self.active: Deque[_Tenant] = deque()
+        # The shop at the head of ``active`` already received this round's quantum
+        self.head_credited = False
+        self.running = 0
+        self.started = 0
+        self.stolen = 0
+        self.total_wait_seconds = 0.0
+
+    @property
+    def queued(self) -> int:
+        return sum(len(tenant.queue) for tenant in self.active)
+
+    def enqueue(self, tenant: _Tenant, job: _Job) -> None:
+        if not tenant.queue:
+            self.active.append(tenant)
+        tenant.queue.append(job)
+
+    def next_job(self, quantum: float) -> Optional[Tuple[_Tenant, _Job]]:
+        """Pop the next job in DRR order, or None if the lane is empty."""
+        while self.active:
+            tenant = self.active[0]
+            if not self.head_credited:
+                tenant.deficit += quantum * tenant.weight
+                self.head_credited = True
+
+            job = None
+            if tenant.queue and tenant.deficit >= tenant.queue[0].cost:
+                job = tenant.queue.popleft()
+                tenant.deficit -= job.cost
+
+            if not tenant.queue:
+                # Idle shops do not bank credit
+                tenant.deficit = 0.0
+                self.active.popleft()
+                self.head_credited = False
+            elif tenant.deficit < tenant.queue[0].cost:
+                self.active.rotate(-1)
+                self.head_credited = False
+
+            if job is not None:
+                return tenant, job
+        return None
+
+    def withdraw(self, tenant: _Tenant, job: _Job) -> bool:
+        """Drop a job whose caller stopped waiting."""
+        try:
+            tenant.queue.remove(job)
+        except ValueError:
+            return False
+        if not tenant.queue and tenant in self.active:
+            if self.active[0] is tenant:
+                self.head_credited = False
+            self.active.remove(tenant)
+            tenant.deficit = 0.0
+        return True
+
+
+class FairScheduler:
+    """Interactive/bulk lanes with reserved capacity, DRR across shops within each."""
+
+    def __init__(
+        self,
+        slots: Optional[int] = None,
+        weights: Optional[Dict[str, float]] = None,
+        default_weight: Optional[float] = None,
+        reserved_interactive: Optional[int] = None,
+        quantum: float = 1.0,
+    ) -> None:
+        self.slots = slots or settings.OCR_WORKERS
+        self.weights = weights if weights is not None else parse_tenant_weights(settings.OCR_TENANT_WEIGHTS)
+        self.default_weight = default_weight or settings.OCR_TENANT_DEFAULT_WEIGHT
+        reserved = settings.OCR_INTERACTIVE_RESERVED_SLOTS if reserved_interactive is None else reserved_interactive
+        # Bulk work must always be able to make progress
+        self.reserved_interactive = max(0, min(reserved, self.slots - 1))
+        self.quantum = quantum
+        self.running = 0
+        self._lanes = {name: _LaneQueue(name) for name in (Lane.INTERACTIVE, Lane.BULK)}
+
+    @property
+    def queued(self) -> int:
+        return sum(lane.queued for lane in self._lanes.values())
+
+    def _tenant(self, lane: _LaneQueue, shop_id: str) -> _Tenant:
+        tenant = lane.tenants.get(shop_id)
+        if tenant is None:
+            weight = self.weights.get(shop_id, self.default_weight)
+            tenant = lane.tenants[shop_id] = _Tenant(shop_id, weight)
+        return tenant
+
+    def _forget_if_idle(self, lane: _LaneQueue, tenant: _Tenant) -> None:
+        """Drop a shop's state once it has nothing queued or running."""
+        if not tenant.queue and not tenant.running and lane.tenants.get(tenant.shop_id) is tenant:
+            del lane.tenants[tenant.shop_id]
+
+    def _metric_tenant(self, shop_id: str) -> str:
+        return shop_id if shop_id in self.weights else OTHER_TENANT
+
+    def _update_tenant_depth(self, lane: _LaneQueue, tenant: _Tenant) -> None:
+        label = self._metric_tenant(tenant.shop_id)
+        if label == OTHER_TENANT:
+            depth = sum(len(t.queue) for t in lane.active if t.shop_id not in self.weights)
+        else:
+            depth = len(tenant.queue)
+        update_tenant_queue_depth(label, lane.name, depth)
+
+    @asynccontextmanager
+    async def slot(self, shop_id: str, lane: str = Lane.INTERACTIVE, cost: float = 1.0) -> AsyncIterator[None]:
+        """Wait for this shop's turn in ``lane``, then hold an execution slot."""
+        queue = self._lanes[lane]
+        tenant = self._tenant(queue, shop_id)
+        job = _Job(shop_id, cost)
+        queue.enqueue(tenant, job)
+        self._update_tenant_depth(queue, tenant)
+        self._dispatch()
+
+        try:
+            await job.granted
+        except asyncio.CancelledError:
+            if job.granted.done() and not job.granted.cancelled():
+                # Granted just before the cancellation landed
+                self._release(queue, tenant)
+            elif queue.withdraw(tenant, job):
+                self._update_tenant_depth(queue, tenant)
+                self._forget_if_idle(queue, tenant)
+                self._update_gauges()
+            raise
+
+        try:
+            yield
+        finally:
+            self._release(queue, tenant)
+
+    def _bulk_may_start(self) -> bool:
+        interactive = self._lanes[Lane.INTERACTIVE]
+        if interactive.queued:
+            return False
+        if self._lanes[Lane.BULK].running < self.slots - self.reserved_interactive:
+            return True
+        # Only idle reserved capacity is left
+        return settings.OCR_BULK_WORK_STEALING
+
+    def _dispatch(self) -> None:
+        """Start queued jobs, interactive first, while slots are free."""
+        interactive = self._lanes[Lane.INTERACTIVE]
+        bulk = self._lanes[Lane.BULK]
+
+        while self.running < self.slots:
+            picked = interactive.next_job(self.quantum)
+            if picked is not None:
+                self._start(interactive, *picked)
+                continue
+            if not self._bulk_may_start():
+                break
+            stolen = bulk.running >= self.slots - self.reserved_interactive
+            picked = bulk.next_job(self.quantum)
+            if picked is None:
+                break
+            if stolen:
+                bulk.stolen += 1
+            self._start(bulk, *picked)
+
+        self._update_gauges()
+
+    def _start(self, lane: _LaneQueue, tenant: _Tenant, job: _Job) -> None:
+        wait = time.time() - job.enqueued_at
+        tenant.running += 1
+        tenant.started += 1
+        tenant.total_wait_seconds += wait
+        tenant.max_wait_seconds = max(tenant.max_wait_seconds, wait)
+        lane.running += 1
+        lane.started += 1
+        lane.total_wait_seconds += wait
+        self.running += 1
+        record_tenant_wait(self._metric_tenant(tenant.shop_id), wait)
+        record_lane_start(lane.name, wait)
+        self._update_tenant_depth(lane, tenant)
+        job.granted.set_result(None)
+
+    def _release(self, lane: _LaneQueue, tenant: _Tenant) -> None:
+        tenant.running -= 1
+        lane.running -= 1
+        self.running -= 1
+        self._forget_if_idle(lane, tenant)
+        self._dispatch()
+
+    def _update_gauges(self) -> None:
+        for lane in self._lanes.values():
+            update_lane_gauges(lane.name, lane.queued, lane.running)
+
+    def status(self) -> Dict[str, Any]:
+        """Per-lane and per-shop (shops with queued or running work) queue depth and wait times."""
+        lanes: Dict[str, Any] = {}
+        for lane in self._lanes.values():
+            tenants: List[_Tenant] = sorted(lane.tenants.values(), key=lambda t: len(t.queue), reverse=True)
+            lanes[lane.name] = {
+                "queued": lane.queued,
+                "running": lane.running,
+                "started": lane.started,
+                "stolen_slots": lane.stolen,
+                "avg_wait_ms": round(lane.total_wait_seconds / lane.started * 1000, 1) if lane.started else None,
+                "tenants": {
+                    tenant.shop_id: {
+                        "weight": tenant.weight,
+                        "queued": len(tenant.queue),
+                        "running": tenant.running,
+                        "started": tenant.started,
+                        "avg_wait_ms": round(tenant.total_wait_seconds / tenant.started * 1000, 1) if tenant.started else None,
+                        "max_wait_ms": round(tenant.max_wait_seconds * 1000, 1),
+                    }
+                    for tenant in tenants[:settings.OCR_TENANT_STATUS_LIMIT]
+                },
+            }
+        return {
+            "slots": self.slots,
+            "reserved_interactive": self.reserved_interactive,
+            "running": self.running,
+            "queued": self.queued,
+            "lanes": lanes,
+        }
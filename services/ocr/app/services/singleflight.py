@@ -0,0 +1,177 @@
+"""
+Single-Flight Coalescing of Duplicate OCR Requests
+==================================================
+
+On flaky shop Wi-Fi the app resends an image while the first attempt is
+still being processed. Requests are keyed by what they ask for: a hash of
+the image and the options or, when the client sends one, its
+``Idempotency-Key``. Concurrent requests with the same key share one
+in-flight task instead of each running inference:
+
+* the work runs on a private copy of the first request, so that request's
+  client disconnecting (the usual reason for the retry) does not stop it;
+* once no request is waiting, the work is given OCR_SINGLEFLIGHT_GRACE_SECONDS
+  for a retry to arrive before it is cancelled;
+* with OCR_SINGLEFLIGHT_REDIS_LEASE, replicas also take a Redis lease on the
+  key, and a replica that finds the lease taken waits for the holder's
+  result in the shared result cache instead of running the work itself
+  (so the lease is only used with ENABLE_MODEL_CACHING).
+
+The same key addresses the result cache, so a retry that arrives after the
+original finished is answered from the cache.
+"""
+
+import asyncio
+import hashlib
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional
+
+import structlog
+
+from app.core.config import settings
+from app.core.monitoring import record_abandoned, record_duplicate_work_avoided
+from app.core.redis import acquire_lease, get_cached_ocr_result, release_lease
+from app.models.schemas import OCRRequest, OCRResult
+from app.services.deadlines import DeadlineExceeded, expire, remaining_seconds
+
+logger = structlog.get_logger(__name__)
+
+_CHUNK_SIZE = 1024 * 1024
+
+Work = Callable[[OCRRequest], Awaitable[OCRResult]]
+
+
+def _hash_file(path: str) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+async def request_key(request: OCRRequest) -> Optional[str]:
+    """Key of what ``request`` asks for (None if its image cannot be identified).
+
+    Scoped to the shop by the caller; options are part of the key, since the
+    same image read as a receipt and as a product label are different work.
+    """
+    if request.idempotency_key:
+        return f"idem:{request.user_id}:{request.idempotency_key}"
+
+    if request.image_bytes is not None:
+        image = hashlib.blake2b(request.image_bytes, digest_size=16).hexdigest()
+    elif request.image_path is not None:
+        image = await asyncio.to_thread(_hash_file, request.image_path)
+    elif request.storage_key is not None:
+        # Upload keys are unique per upload and never rewritten
+        image = f"object:{request.storage_key}"
+    else:
+        return None
+
+    options = f"{request.ocr_type}:{request.confidence_threshold}:{int(request.extract_barcodes)}:{request.language}"
+    return f"img:{image}:{options}"
+
+
+class Flight:
+    """One in-flight piece of work and the requests waiting for it."""
+
+    def __init__(self, request: OCRRequest, task: "asyncio.Task[OCRResult]") -> None:
+        self.request = request
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesces concurrent requests for the same key onto one task."""
+
+    def __init__(self) -> None:
+        self._flights: Dict[str, Flight] = {}
+        self.coalesced = 0
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    def _forget(self, key: str, flight: Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if not flight.task.cancelled():
+            # Retrieve the exception so an unwaited failure is not logged as lost
+            flight.task.exception()
+
+    def _abandon(self, key: str, flight: Flight) -> None:
+        """Cancel work nobody is waiting for any more."""
+        if flight.waiters == 0 and not flight.task.done():
+            expire(flight.request)
+            flight.task.cancel()
+            record_abandoned("client_disconnected", "singleflight")
+            logger.info("Cancelled coalesced OCR work with no waiters", key=key)
+
+    async def run(self, key: str, request: OCRRequest, work: Work) -> OCRResult:
+        """Run ``work`` for ``key`` once, however many requests ask concurrently.
+
+        Every caller waits until its own deadline and gets its own copy of
+        the result.
+        """
+        flight = self._flights.get(key)
+        shared = flight is not None
+        if flight is None:
+            private = request.model_copy()
+            flight = Flight(private, asyncio.ensure_future(work(private)))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _task: self._forget(key, flight))
+        else:
+            self.coalesced += 1
+            logger.info("Joined in-flight OCR work", key=key, waiters=flight.waiters + 1)
+
+        flight.waiters += 1
+        budget = remaining_seconds(request)
+        try:
+            result = await asyncio.wait_for(
+                asyncio.shield(flight.task), timeout=None if budget is None else max(0.0, budget)
+            )
+        except asyncio.TimeoutError:
+            record_abandoned("expired", "in_flight")
+            raise DeadlineExceeded("completion")
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                asyncio.get_running_loop().call_later(
+                    settings.OCR_SINGLEFLIGHT_GRACE_SECONDS, self._abandon, key, flight
+                )
+
+        if shared:
+            record_duplicate_work_avoided("in_flight", result.processing_time_ms / 1000)
+        return result.model_copy(deep=True)
+
+
+@asynccontextmanager
+async def replica_lease(request: OCRRequest, key: str) -> AsyncIterator[Optional[OCRResult]]:
+    """Hold the cluster-wide lease on ``key`` while the body runs.
+
+    Yields None when this replica should do the work (lease taken, or Redis
+    unavailable) and the other replica's result when it finished first.
+    """
+    owner = uuid.uuid4().hex
+    while True:
+        acquired = await acquire_lease(request.shop_id, key, owner, settings.OCR_PROCESSING_TIMEOUT_SECONDS)
+        if acquired is not False:
+            break
+        cached = await get_cached_ocr_result(request.shop_id, key)
+        if cached:
+            result = OCRResult.from_dict(cached)
+            record_duplicate_work_avoided("replica", result.processing_time_ms / 1000)
+            yield result
+            return
+        if request.deadline is not None and time.time() >= request.deadline:
+            record_abandoned("expired", "lease")
+            raise DeadlineExceeded("lease")
+        await asyncio.sleep(settings.OCR_SINGLEFLIGHT_LEASE_POLL_SECONDS)
+
+    try:
+        yield None
+    finally:
+        if acquired:
+            await release_lease(request.shop_id, key, owner)
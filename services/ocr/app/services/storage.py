@@ -0,0 +1,411 @@
+"""
+Object Storage for ZakPOS OCR
+=============================
+
+A small object-store interface with two backends:
+
+* ``s3``: any S3-compatible store (MinIO in development) via the ``minio``
+  client, configured by the ``MINIO_*`` settings.
+* ``local``: a directory per bucket under OCR_STORAGE_LOCAL_DIR, for tests
+  and single-node setups.
+
+Keys are listed in lexicographic order, like S3, so a listing can resume
+after any key. The ``minio`` client is blocking; its calls run in worker
+threads.
+
+Clients upload images directly with presigned PUT URLs, so image bytes
+never pass through the OCR API; reads are streamed in chunks (optionally
+a byte range). The local backend has no server of its own, so its
+"presigned" URLs point at ``PUT /api/v1/files/{key}`` and carry an HMAC
+signature checked by ``verify_upload_signature``.
+"""
+
+import abc
+import asyncio
+import hashlib
+import hmac
+import io
+import mimetypes
+import os
+import time
+from datetime import timedelta
+from pathlib import Path
+from typing import Any, AsyncIterator, BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote, urlencode
+
+import structlog
+
+from app.core.config import settings
+
+logger = structlog.get_logger(__name__)
+
+# Objects fetched per listing call (one worker-thread hop per page)
+_LIST_PAGE_SIZE = 1000
+
+# Bytes per chunk when streaming objects
+_CHUNK_SIZE = 64 * 1024
+
+
+class ObjectNotFound(Exception):
+    """Raised when a key does not exist."""
+    pass
+
+
+class StoredObject:
+    """Listing entry for one object."""
+
+    def __init__(
+        self,
+        key: str,
+        size: int,
+        etag: Optional[str] = None,
+        last_modified: Optional[float] = None,
+        content_type: Optional[str] = None,
+    ) -> None:
+        self.key = key
+        self.size = size
+        self.etag = etag
+        self.last_modified = last_modified
+        self.content_type = content_type or mimetypes.guess_type(key)[0] or "application/octet-stream"
+
+
+class ObjectReader:
+    """Chunked reader over an open object body; ``close`` releases it even if nothing was read."""
+
+    def __init__(self, body: Any, length: Optional[int], release: Callable[[], None]) -> None:
+        self._body = body
+        self._remaining = length
+        self._release = release
+
+    def read_chunk(self) -> bytes:
+        if self._remaining is not None and self._remaining <= 0:
+            return b""
+        size = _CHUNK_SIZE if self._remaining is None else min(_CHUNK_SIZE, self._remaining)
+        chunk = self._body.read(size)
+        if self._remaining is not None:
+            self._remaining -= len(chunk)
+        return chunk
+
+    def close(self) -> None:
+        self._release()
+
+
+def upload_prefix(shop_id: str) -> str:
+    """Key prefix of a shop's uploads; shops can only read and process their own."""
+    return f"uploads/{shop_id}/"
+
+
+def is_clean_key(key: str) -> bool:
+    """True for a relative key with no empty, ``.`` or ``..`` segments.
+
+    Only clean keys can be checked against a prefix: the local backend
+    resolves ``..``, so ``uploads/a/../b/x`` would be another shop's object.
+    """
+    return not key.startswith("/") and "\\" not in key and all(
+        segment not in ("", ".", "..") for segment in key.split("/")
+    )
+
+
+def is_shop_upload(key: str, shop_id: str) -> bool:
+    """True when ``key`` is one of ``shop_id``'s uploads."""
+    return is_clean_key(key) and key.startswith(upload_prefix(shop_id))
+
+
+def is_shop_prefix(prefix: str, shop_id: str) -> bool:
+    """True when every key under ``prefix`` is one of ``shop_id``'s uploads."""
+    return prefix == upload_prefix(shop_id) or is_shop_upload(prefix.removesuffix("/"), shop_id)
+
+
+def _signature(key: str, expires: int) -> str:
+    message = f"PUT\n{key}\n{expires}".encode()
+    return hmac.new(settings.JWT_SECRET.encode(), message, hashlib.sha256).hexdigest()
+
+
+def verify_upload_signature(key: str, expires: int, signature: str) -> bool:
+    """Check a local-backend upload URL: signed for this key and not expired."""
+    return expires >= time.time() and hmac.compare_digest(_signature(key, expires), signature)
+
+
+def _next_page(objects: Iterator[StoredObject]) -> List[StoredObject]:
+    page = []
+    for entry in objects:
+        page.append(entry)
+        if len(page) >= _LIST_PAGE_SIZE:
+            break
+    return page
+
+
+class ObjectStore(abc.ABC):
+    """Async object-store interface for one bucket.
+
+    Backends implement the blocking ``_`` methods; the async methods run
+    them in worker threads.
+    """
+
+    def __init__(self, bucket: str) -> None:
+        self.bucket = bucket
+
+    @abc.abstractmethod
+    def _list(self, prefix: str, start_after: Optional[str]) -> Iterator[StoredObject]:
+        ...
+
+    @abc.abstractmethod
+    def _get(self, key: str) -> bytes:
+        ...
+
+    @abc.abstractmethod
+    def _put(self, key: str, data: bytes, content_type: str) -> None:
+        ...
+
+    @abc.abstractmethod
+    def _put_file(self, key: str, fileobj: BinaryIO, length: int, content_type: str) -> None:
+        ...
+
+    @abc.abstractmethod
+    def _stat(self, key: str) -> StoredObject:
+        ...
+
+    @abc.abstractmethod
+    def _open(self, key: str, offset: int, length: Optional[int]) -> ObjectReader:
+        ...
+
+    @abc.abstractmethod
+    def presigned_upload_url(self, key: str, expires_seconds: int) -> str:
+        """URL a client can PUT the object to directly, valid for ``expires_seconds``."""
+
+    async def list_objects(self, prefix: str = "", start_after: Optional[str] = None) -> AsyncIterator[StoredObject]:
+        """Stream the objects under ``prefix`` in key order, after ``start_after``."""
+        objects = await asyncio.to_thread(self._list, prefix, start_after)
+        while True:
+            page = await asyncio.to_thread(_next_page, objects)
+            if not page:
+                return
+            for entry in page:
+                yield entry
+
+    async def get_bytes(self, key: str) -> bytes:
+        return await asyncio.to_thread(self._get, key)
+
+    async def put_bytes(self, key: str, data: bytes, content_type: str = "application/octet-stream") -> None:
+        await asyncio.to_thread(self._put, key, data, content_type)
+
+    async def put_file(self, key: str, fileobj: BinaryIO, length: int, content_type: str) -> None:
+        """Store a file object without reading it into memory."""
+        await asyncio.to_thread(self._put_file, key, fileobj, length, content_type)
+
+    async def stat(self, key: str) -> StoredObject:
+        return await asyncio.to_thread(self._stat, key)
+
+    async def iter_range(self, key: str, offset: int = 0, length: Optional[int] = None) -> AsyncIterator[bytes]:
+        """Stream an object (or ``length`` bytes from ``offset``) in chunks."""
+        reader = await asyncio.to_thread(self._open, key, offset, length)
+        try:
+            while True:
+                chunk = await asyncio.to_thread(reader.read_chunk)
+                if not chunk:
+                    return
+                yield chunk
+        finally:
+            await asyncio.to_thread(reader.close)
+
+
+class LocalObjectStore(ObjectStore):
+    """Bucket as a directory; keys are relative paths."""
+
+    def __init__(self, bucket: str, root: Optional[str] = None) -> None:
+        super().__init__(bucket)
+        self.root = Path(root or settings.OCR_STORAGE_LOCAL_DIR) / bucket
+
+    def _path(self, key: str) -> Path:
+        if not is_clean_key(key):
+            raise ObjectNotFound(key)
+        path = (self.root / key).resolve()
+        if self.root.resolve() not in path.parents:
+            raise ObjectNotFound(key)
+        return path
+
+    def _list(self, prefix: str, start_after: Optional[str]) -> Iterator[StoredObject]:
+        keys = []
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                if name.startswith("."):
+                    # Partial writes
+                    continue
+                key = Path(directory, name).relative_to(self.root).as_posix()
+                if key.startswith(prefix) and (start_after is None or key > start_after):
+                    keys.append(key)
+        for key in sorted(keys):
+            yield self._stat(key)
+
+    def _stat(self, key: str) -> StoredObject:
+        try:
+            stat = self._path(key).stat()
+        except FileNotFoundError:
+            raise ObjectNotFound(key)
+        return StoredObject(key, stat.st_size, f"{stat.st_mtime_ns:x}-{stat.st_size:x}", stat.st_mtime)
+
+    def _open(self, key: str, offset: int, length: Optional[int]) -> ObjectReader:
+        try:
+            handle = self._path(key).open("rb")
+        except (FileNotFoundError, IsADirectoryError):
+            raise ObjectNotFound(key)
+        handle.seek(offset)
+        return ObjectReader(handle, length, handle.close)
+
+    def _get(self, key: str) -> bytes:
+        try:
+            return self._path(key).read_bytes()
+        except (FileNotFoundError, IsADirectoryError):
+            raise ObjectNotFound(key)
+
+    def _put(self, key: str, data: bytes, content_type: str) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write then rename, so readers never see a partial object
+        partial = path.with_name(f".{path.name}.partial")
+        partial.write_bytes(data)
+        os.replace(partial, path)
+
+    def _put_file(self, key: str, fileobj: BinaryIO, length: int, content_type: str) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partial = path.with_name(f".{path.name}.partial")
+        with partial.open("wb") as target:
+            while True:
+                chunk = fileobj.read(_CHUNK_SIZE)
+                if not chunk:
+                    break
+                target.write(chunk)
+        os.replace(partial, path)
+
+    async def write_stream(self, key: str, chunks: AsyncIterator[bytes], max_bytes: int) -> StoredObject:
+        """Store a streamed upload (the target of local presigned URLs).
+
+        Raises ValueError, keeping nothing, once more than ``max_bytes`` arrive.
+        """
+        path = self._path(key)
+        await asyncio.to_thread(path.parent.mkdir, parents=True, exist_ok=True)
+        partial = path.with_name(f".{path.name}.partial")
+        target = await asyncio.to_thread(partial.open, "wb")
+        written = 0
+        try:
+            async for chunk in chunks:
+                written += len(chunk)
+                if written > max_bytes:
+                    raise ValueError(f"Object larger than {max_bytes} bytes")
+                await asyncio.to_thread(target.write, chunk)
+        except BaseException:
+            await asyncio.to_thread(target.close)
+            partial.unlink(missing_ok=True)
+            raise
+        await asyncio.to_thread(target.close)
+        os.replace(partial, path)
+        return self._stat(key)
+
+    def presigned_upload_url(self, key: str, expires_seconds: int) -> str:
+        expires = int(time.time()) + expires_seconds
+        query = urlencode({"expires": expires, "signature": _signature(key, expires)})
+        return f"{settings.OCR_PUBLIC_BASE_URL}/api/v1/files/{quote(key)}?{query}"
+
+
+class S3ObjectStore(ObjectStore):
+    """S3-compatible bucket through the ``minio`` client."""
+
+    def __init__(self, bucket: str) -> None:
+        super().__init__(bucket)
+        from minio import Minio
+
+        self.client = Minio(
+            settings.MINIO_ENDPOINT,
+            access_key=settings.MINIO_ACCESS_KEY,
+            secret_key=settings.MINIO_SECRET_KEY,
+            secure=settings.MINIO_SECURE,
+            # A fixed region lets presigning work without a network round trip
+            region=settings.MINIO_REGION,
+        )
+
+    @staticmethod
+    def _not_found(error: Any) -> bool:
+        return error.code in ("NoSuchKey", "NoSuchObject", "ResourceNotFound")
+
+    def _list(self, prefix: str, start_after: Optional[str]) -> Iterator[StoredObject]:
+        for entry in self.client.list_objects(self.bucket, prefix=prefix, recursive=True, start_after=start_after):
+            if entry.is_dir:
+                continue
+            modified = entry.last_modified.timestamp() if entry.last_modified else None
+            yield StoredObject(entry.object_name, entry.size, entry.etag, modified)
+
+    def _stat(self, key: str) -> StoredObject:
+        from minio.error import S3Error
+
+        try:
+            entry = self.client.stat_object(self.bucket, key)
+        except S3Error as e:
+            if self._not_found(e):
+                raise ObjectNotFound(key)
+            raise
+        modified = entry.last_modified.timestamp() if entry.last_modified else None
+        return StoredObject(key, entry.size, entry.etag, modified, entry.content_type)
+
+    def _open(self, key: str, offset: int, length: Optional[int]) -> ObjectReader:
+        from minio.error import S3Error
+
+        try:
+            response = self.client.get_object(self.bucket, key, offset=offset, length=length or 0)
+        except S3Error as e:
+            if self._not_found(e):
+                raise ObjectNotFound(key)
+            raise
+
+        def release() -> None:
+            response.close()
+            response.release_conn()
+
+        # The response body is already limited to the requested range
+        return ObjectReader(response, None, release)
+
+    def _get(self, key: str) -> bytes:
+        from minio.error import S3Error
+
+        try:
+            response = self.client.get_object(self.bucket, key)
+        except S3Error as e:
+            if self._not_found(e):
+                raise ObjectNotFound(key)
+            raise
+        try:
+            return response.read()
+        finally:
+            response.close()
+            response.release_conn()
+
+    def _put(self, key: str, data: bytes, content_type: str) -> None:
+        self.client.put_object(self.bucket, key, io.BytesIO(data), len(data), content_type=content_type)
+
+    def _put_file(self, key: str, fileobj: BinaryIO, length: int, content_type: str) -> None:
+        self.client.put_object(self.bucket, key, fileobj, length, content_type=content_type)
+
+    def presigned_upload_url(self, key: str, expires_seconds: int) -> str:
+        return self.client.presigned_put_object(self.bucket, key, expires=timedelta(seconds=expires_seconds))
+
+
+# One store per (backend, bucket): S3 stores hold a client and its connection pool
+_stores: Dict[Tuple[str, str], ObjectStore] = {}
+
+
+def get_object_store(bucket: Optional[str] = None) -> ObjectStore:
+    """Object store for ``bucket`` (default MINIO_BUCKET_NAME) on the configured backend."""
+    bucket = bucket or settings.MINIO_BUCKET_NAME
+    backend = settings.OCR_STORAGE_BACKEND
+    store = _stores.get((backend, bucket))
+    if store is not None:
+        return store
+
+    if backend == "local":
+        store = LocalObjectStore(bucket)
+    elif backend == "s3":
+        store = S3ObjectStore(bucket)
+    else:
+        raise ValueError(f"Unknown OCR_STORAGE_BACKEND: {backend!r}")
+    _stores[(backend, bucket)] = store
+    return store
@@ -0,0 +1,283 @@
+"""
+Structured Data Parser for ZakPOS OCR
+====================================
+
+Single-pass extraction of product, receipt and invoice fields from OCR text.
+Pattern tables are compiled once at import time and selected per language
+and currency, so parsing a document never recompiles a regular expression.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Pattern, Tuple
+
+# Bengali digits are folded to ASCII once per document before scanning
+_DIGIT_TRANSLATION = str.maketrans("০১২৩৪৫৬৭৮৯", "0123456789")
+
+# Amounts: 1,234.56 / 1234.56 / 1234 (two decimal places at most)
+_AMOUNT = r"\d{1,3}(?:,\d{3})+(?:\.\d{1,2})?|\d+(?:\.\d{1,2})?"
+
+
+@dataclass(frozen=True)
+class PatternTable:
+    """Precompiled patterns for one language/currency combination."""
+
+    language: str
+    currency: str
+    amount: Pattern[str]
+    keywords: Pattern[str]
+    marker: Pattern[str]
+    line_item: Pattern[str]
+    invoice_number: Pattern[str]
+    currency_before: Pattern[str]
+    currency_after: Pattern[str]
+
+    def is_marked(self, line: str, start: int, end: int) -> bool:
+        """Whether the amount at line[start:end] carries a currency marker."""
+        return bool(self.currency_before.search(line, 0, start) or self.currency_after.match(line, end))
+
+
+@dataclass
+class LineItem:
+    """A single receipt or invoice line."""
+
+    name: str
+    quantity: float
+    unit_price: Optional[float]
+    amount: float
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "quantity": self.quantity,
+            "unit_price": self.unit_price,
+            "amount": self.amount,
+        }
+
+
+@dataclass
+class ParsedDocument:
+    """Everything the scanner found in a document, independent of ocr_type."""
+
+    currency: str
+    first_line: Optional[str] = None
+    first_amount: Optional[float] = None
+    marked_amount: Optional[float] = None
+    line_items: List[LineItem] = field(default_factory=list)
+    subtotal: Optional[float] = None
+    total: Optional[float] = None
+    grand_total: Optional[float] = None
+    tax: Optional[float] = None
+    invoice_number: Optional[str] = None
+    numeric_lines: int = 0
+
+    @property
+    def total_amount(self) -> Optional[float]:
+        return self.grand_total if self.grand_total is not None else self.total
+
+    def to_product(self) -> Dict[str, Any]:
+        """Product label view: name from the first line, best price candidate."""
+        price = self.marked_amount if self.marked_amount is not None else self.first_amount
+        return {
+            "product_name": self.first_line or "",
+            "price": price,
+            "currency": self.currency if price is not None else None,
+        }
+
+    def to_receipt(self) -> Dict[str, Any]:
+        """Receipt view: totals, tax and line items."""
+        total = self.total_amount
+        return {
+            "total_amount": total,
+            "subtotal": self.subtotal,
+            "tax_amount": self.tax,
+            "currency": self.currency if total is not None else None,
+            "item_count": len(self.line_items) or self.numeric_lines,
+            "line_items": [item.to_dict() for item in self.line_items],
+        }
+
+    def to_invoice(self) -> Dict[str, Any]:
+        """Invoice view: receipt fields plus invoice number and supplier."""
+        invoice = self.to_receipt()
+        invoice["invoice_number"] = self.invoice_number
+        invoice["supplier_name"] = self.first_line
+        return invoice
+
+
+def _build_table(
+    language: str,
+    currency: str,
+    currency_tokens: Tuple[str, ...],
+    keywords: Dict[str, Tuple[str, ...]],
+) -> PatternTable:
+    """Compile the pattern table for a language/currency pair.
+
+    Keyword, amount and marker patterns run against the lowercased line, so
+    they are compiled case-sensitively; IGNORECASE is several times slower.
+    """
+    marker = "|".join(re.escape(token.lower()) for token in currency_tokens)
+
+    # Keyword classes become named alternatives of one pattern so every
+    # line is classified with a single search. The leading lookahead on the
+    # possible first characters lets the regex engine skip most positions.
+    keyword_groups = "|".join(
+        f"(?P<{name}>{'|'.join(words)})" for name, words in keywords.items()
+    )
+    first_chars = "".join(sorted({re.escape(word[0]) for words in keywords.values() for word in words}))
+
+    return PatternTable(
+        language=language,
+        currency=currency,
+        amount=re.compile(rf"(?<![\d,.])(?P<value>{_AMOUNT})"),
+        keywords=re.compile(rf"(?=[{first_chars}])(?<!\w)(?:{keyword_groups})"),
+        marker=re.compile(marker),
+        line_item=re.compile(
+            rf"^(?P<name>.*?[^\W\d_].*?)\s+"
+            rf"(?:(?P<qty>\d+(?:\.\d+)?)(?:\s*[x×@*]\s*|\s+)"
+            rf"(?:(?:{marker})\s*)?(?P<unit>{_AMOUNT})\s+)?"
+            rf"(?:(?:{marker})\s*)?(?P<amount>{_AMOUNT})(?:\s*(?:{marker}))?\s*$"
+        ),
+        invoice_number=re.compile(
+            r"[\s.:#-]*(?:(?:no\b|number\b|nr\b|নং|নম্বর)\.?)?[\s.:#-]*"
+            r"(?P<number>[a-z0-9][a-z0-9/-]*\d[a-z0-9/-]*)"
+        ),
+        currency_before=re.compile(rf"(?:{marker})\s*$"),
+        currency_after=re.compile(rf"\s*(?:{marker})"),
+    )
+
+
+# Keyword patterns are lowercase and must start with a literal character
+_EN_KEYWORDS = {
+    "subtotal": (r"sub\s*-?\s*total\b",),
+    "grand_total": (r"grand\s+total\b", r"amount\s+due\b", r"balance\s+due\b", r"net\s+payable\b"),
+    "total": (r"total\b",),
+    "tax": (r"tax\b", r"vat\b", r"gst\b"),
+    "invoice": (r"invoice\b", r"inv\b\.?", r"bill\b"),
+}
+
+_BN_KEYWORDS = {
+    "subtotal": (r"উপমোট",) + _EN_KEYWORDS["subtotal"],
+    "grand_total": (r"সর্বমোট", r"মোট\s+প্রদেয়") + _EN_KEYWORDS["grand_total"],
+    "total": (r"মোট",) + _EN_KEYWORDS["total"],
+    "tax": (r"ভ্যাট",) + _EN_KEYWORDS["tax"],
+    "invoice": (r"চালান", r"ইনভয়েস") + _EN_KEYWORDS["invoice"],
+}
+
+_CURRENCY_TOKENS = {
+    "USD": ("$", "USD", "US$"),
+    "BDT": ("৳", "BDT", "Tk.", "Tk", "টাকা"),
+}
+
+DEFAULT_CURRENCY = {
+    "en": "USD",
+    "bn": "BDT",
+}
+
+PATTERN_TABLES: Dict[Tuple[str, str], PatternTable] = {
+    (language, currency): _build_table(language, currency, _CURRENCY_TOKENS[currency], keywords)
+    for language, keywords in (("en", _EN_KEYWORDS), ("bn", _BN_KEYWORDS))
+    for currency in _CURRENCY_TOKENS
+}
+
+
+def get_pattern_table(language: str = "en", currency: Optional[str] = None) -> PatternTable:
+    """Select a precompiled pattern table, falling back to English/USD."""
+    language = (language or "en").lower()
+    if language not in DEFAULT_CURRENCY:
+        language = "en"
+    currency = (currency or DEFAULT_CURRENCY[language]).upper()
+    return PATTERN_TABLES.get((language, currency)) or PATTERN_TABLES[(language, DEFAULT_CURRENCY[language])]
+
+
+def _to_float(value: str) -> float:
+    return float(value.replace(",", ""))
+
+
+def scan_document(text: str, language: str = "en", currency: Optional[str] = None) -> ParsedDocument:
+    """Scan OCR text once and collect every structured field it contains."""
+    table = get_pattern_table(language, currency)
+    document = ParsedDocument(currency=table.currency)
+
+    if not text.isascii():
+        # str.translate looks up every character; ASCII text has nothing to fold
+        text = text.translate(_DIGIT_TRANSLATION)
+    for raw_line in text.splitlines():
+        original = raw_line.strip()
+        if not original:
+            continue
+
+        if document.first_line is None:
+            document.first_line = original
+
+        line = original.lower()
+        # Slice names and numbers from the original casing when offsets agree
+        source = original if len(original) == len(line) else line
+        # One amount decides most lines; every amount is only needed on the
+        # few lines that carry a currency marker or a keyword
+        first = table.amount.search(line)
+        if first:
+            document.numeric_lines += 1
+            if document.first_amount is None:
+                document.first_amount = _to_float(first.group("value"))
+            if document.marked_amount is None and table.marker.search(line):
+                for match in table.amount.finditer(line, first.start()):
+                    if table.is_marked(line, match.start(), match.end()):
+                        document.marked_amount = _to_float(match.group("value"))
+                        break
+
+        keyword = table.keywords.search(line)
+        if keyword:
+            kind = keyword.lastgroup
+            if kind == "invoice":
+                if document.invoice_number is None:
+                    number = table.invoice_number.match(line, keyword.end())
+                    if number:
+                        document.invoice_number = source[number.start("number"):number.end("number")]
+                continue
+
+            # Totals and tax use the last amount on the line (the column value)
+            trailing = table.amount.findall(line, keyword.end())
+            if trailing:
+                value = _to_float(trailing[-1])
+                if kind == "subtotal":
+                    document.subtotal = value
+                elif kind == "grand_total":
+                    document.grand_total = value
+                elif kind == "total":
+                    document.total = value
+                elif kind == "tax":
+                    document.tax = value
+            continue
+
+        if first:
+            item = table.line_item.match(line)
+            if item:
+                amount = _to_float(item.group("amount"))
+                quantity = float(item.group("qty")) if item.group("qty") else 1.0
+                unit = item.group("unit")
+                document.line_items.append(LineItem(
+                    name=source[:item.end("name")].strip(" .:-"),
+                    quantity=quantity,
+                    unit_price=_to_float(unit) if unit else amount / quantity if quantity else None,
+                    amount=amount,
+                ))
+
+    return document
+
+
+def parse_structured_data(
+    text: str,
+    ocr_type: str,
+    language: str = "en",
+    currency: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Parse OCR text into the structured payload for the given ocr_type."""
+    if ocr_type not in ("product", "receipt", "invoice"):
+        return {}
+
+    document = scan_document(text, language, currency)
+    if ocr_type == "product":
+        return document.to_product()
+    if ocr_type == "receipt":
+        return document.to_receipt()
+    return document.to_invoice()
@@ -0,0 +1,172 @@
+"""
+Model Warm-up for ZakPOS OCR
+===========================
+
+Runs synthetic batches through a freshly loaded model so kernel selection,
+allocator growth and first-call overhead are paid before real traffic
+arrives. Also applies optional graph optimisation (torch.compile or
+TorchScript tracing of the encoder) and explicit thread-pool sizing.
+"""
+
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import structlog
+from PIL import Image, ImageDraw
+
+from app.core.config import settings
+
+logger = structlog.get_logger(__name__)
+
+_WARMUP_LINES = ["PRICE 125.50", "Total 1,234.00", "ACME Rice 5kg", "INV-2024-0042"]
+
+
+def parse_batch_sizes(value: str) -> List[int]:
+    """Parse a comma separated batch size list such as ``"1,5"``."""
+    sizes = sorted({int(part) for part in value.split(",") if part.strip()})
+    return [size for size in sizes if size > 0] or [1]
+
+
+def configure_torch_threads(torch: Any) -> Dict[str, int]:
+    """Apply OCR_TORCH_*_THREADS settings; 0 keeps torch's default."""
+    if settings.OCR_TORCH_INTRA_OP_THREADS > 0:
+        torch.set_num_threads(settings.OCR_TORCH_INTRA_OP_THREADS)
+    if settings.OCR_TORCH_INTER_OP_THREADS > 0:
+        try:
+            torch.set_num_interop_threads(settings.OCR_TORCH_INTER_OP_THREADS)
+        except RuntimeError as e:
+            # Only settable before the first inter-op parallel work starts
+            logger.warning("Could not set inter-op threads", error=str(e))
+
+    return {"intra_op": torch.get_num_threads(), "inter_op": torch.get_num_interop_threads()}
+
+
+def synthetic_images(count: int) -> List[Image.Image]:
+    """Render small single-line text images shaped like real scans."""
+    images = []
+    for i in range(count):
+        image = Image.new("RGB", (384, 96), "white")
+        ImageDraw.Draw(image).text((12, 36), _WARMUP_LINES[i % len(_WARMUP_LINES)], fill="black")
+        images.append(image)
+    return images
+
+
+def optimize_model(model: Any, torch: Any, mode: str, example_pixel_values: Any) -> str:
+    """Optimise the vision encoder in place; returns the mode actually applied.
+
+    Only the encoder is optimised: it always sees fixed-size 384x384 inputs,
+    whereas the autoregressive decoder's shapes change every step.
+    """
+    mode = (mode or "none").lower()
+    if mode == "none":
+        return "none"
+
+    try:
+        if mode == "compile":
+            if not hasattr(torch, "compile"):
+                raise RuntimeError("torch.compile requires torch>=2.0")
+            model.encoder = torch.compile(model.encoder, dynamic=False)
+        elif mode == "torchscript":
+            model.encoder = _TracedEncoder.trace(model.encoder, torch, example_pixel_values)
+        else:
+            raise ValueError(f"Unknown graph optimisation mode: {mode}")
+        logger.info("Applied graph optimisation", mode=mode)
+        return mode
+    except Exception as e:
+        logger.warning("Graph optimisation failed, using eager model", mode=mode, error=str(e))
+        return "none"
+
+
+class _TracedEncoder:
+    """Factory for a TorchScript-traced encoder that still returns ModelOutputs."""
+
+    @staticmethod
+    def trace(encoder: Any, torch: Any, example_pixel_values: Any) -> Any:
+        from transformers.modeling_outputs import BaseModelOutput
+
+        class HiddenStates(torch.nn.Module):
+            def __init__(self) -> None:
+                super().__init__()
+                self.encoder = encoder
+
+            def forward(self, pixel_values):
+                return self.encoder(pixel_values=pixel_values, return_dict=False)[0]
+
+        with torch.no_grad():
+            traced = torch.jit.trace(HiddenStates().eval(), example_pixel_values, check_trace=False)
+
+        class TracedEncoder(torch.nn.Module):
+            main_input_name = "pixel_values"
+
+            def __init__(self) -> None:
+                super().__init__()
+                # generate() and the decoder projection read the encoder config
+                self.config = encoder.config
+                self.traced = traced
+
+            def forward(self, pixel_values, **kwargs):
+                return BaseModelOutput(last_hidden_state=self.traced(pixel_values))
+
+        return TracedEncoder()
+
+
+def _percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run_warmup(
+    infer: Callable[[List[Image.Image]], Any],
+    batch_sizes: List[int],
+    window: Optional[int] = None,
+    max_iterations: Optional[int] = None,
+    tolerance: Optional[float] = None,
+) -> Dict[str, Any]:
+    """Run synthetic batches until per-batch-size p95 latency settles.
+
+    For every batch size, latencies are collected in windows of ``window``
+    calls; the size is settled once two consecutive windows have p95 values
+    within ``tolerance`` (relative) of each other. Sizes still unsettled after
+    ``max_iterations`` calls are reported with ``settled: false``.
+    """
+    window = window or settings.OCR_WARMUP_WINDOW
+    max_iterations = max_iterations or settings.OCR_WARMUP_MAX_ITERATIONS
+    tolerance = tolerance if tolerance is not None else settings.OCR_WARMUP_P95_TOLERANCE
+
+    started = time.perf_counter()
+    report: Dict[str, Any] = {"batches": {}, "settled": True}
+
+    for batch_size in batch_sizes:
+        images = synthetic_images(batch_size)
+        samples: List[float] = []
+        previous_p95: Optional[float] = None
+        settled = False
+
+        while len(samples) < max_iterations:
+            call_started = time.perf_counter()
+            infer(images)
+            samples.append((time.perf_counter() - call_started) * 1000)
+
+            if len(samples) % window == 0:
+                current_p95 = _percentile(samples[-window:], 0.95)
+                if previous_p95 is not None and abs(current_p95 - previous_p95) <= tolerance * previous_p95:
+                    settled = True
+                    break
+                previous_p95 = current_p95
+
+        steady = samples[-window:]
+        report["batches"][str(batch_size)] = {
+            "iterations": len(samples),
+            "first_call_ms": round(samples[0], 2),
+            "p50_ms": round(_percentile(steady, 0.5), 2),
+            "p95_ms": round(_percentile(steady, 0.95), 2),
+            "settled": settled,
+        }
+        report["settled"] = report["settled"] and settled
+
+        if not settled:
+            logger.warning("Warm-up latency did not settle", batch_size=batch_size, iterations=len(samples))
+
+    report["total_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    logger.info("Model warm-up finished", **report)
+    return report
@@ -0,0 +1,7 @@
+"""
+ZakPOS OCR Benchmarks
+====================
+
+Standalone performance benchmarks for the OCR service. Each module can be
+run directly with ``python -m benchmarks.<module>``.
+"""
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Structured Parser Benchmark
+==========================
+
+Measures the single-pass structured parser on synthetic invoices. The
+previous parser only found the first total and invoice number, so it is not a
+like-for-like baseline: the comparison that matters is against a line-by-line
+parser in the same style that extracts the same fields (totals, tax, invoice
+number and every line item). The report checks that it produces the same
+output as the single-pass parser and times the previous parser separately.
+
+Usage:
+    python -m benchmarks.parser_benchmark --lines 500 --iterations 200
+    python -m benchmarks.parser_benchmark --json > parser.json
+"""
+
+import argparse
+import json
+import random
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.structured_parser import parse_structured_data  # noqa: E402
+
+PRODUCTS = ["Rice 5kg", "Lentils 1kg", "Soybean Oil 2L", "Sugar", "Milk Powder", "Tea 400g", "Biscuits", "Salt 1kg"]
+
+
+def build_invoice(lines: int, seed: int = 7) -> str:
+    """Build a synthetic supplier invoice with the given number of item lines."""
+    rng = random.Random(seed)
+    rows = ["Karim Traders Ltd", "Invoice No: INV-2024-0042", "Date: 2024-03-18"]
+    subtotal = 0.0
+    for _ in range(lines):
+        qty = rng.randint(1, 20)
+        unit = round(rng.uniform(5, 500), 2)
+        amount = round(qty * unit, 2)
+        subtotal += amount
+        rows.append(f"{rng.choice(PRODUCTS)} {qty} x {unit:.2f} {amount:.2f}")
+    tax = round(subtotal * 0.05, 2)
+    rows.extend([f"Subtotal {subtotal:.2f}", f"VAT {tax:.2f}", f"Grand Total ${subtotal + tax:.2f}"])
+    return "\n".join(rows)
+
+
+def legacy_parse_receipt(text: str) -> Dict[str, Any]:
+    """Previous receipt parser: per-line import and pattern lookup."""
+    lines = [line.strip() for line in text.split('\n') if line.strip()]
+    total = None
+    for line in lines:
+        if 'total' in line.lower():
+            import re as _re
+            total_match = _re.search(r'\$?(\d+\.?\d*)', line)
+            if total_match:
+                total = float(total_match.group(1))
+                break
+    return {
+        "total_amount": total,
+        "currency": "USD" if total else None,
+        "item_count": len([l for l in lines if '$' in l or any(c.isdigit() for c in l)])
+    }
+
+
+def legacy_parse_invoice(text: str) -> Dict[str, Any]:
+    """Previous invoice parser: re-parses the whole text via the receipt parser."""
+    lines = [line.strip() for line in text.split('\n') if line.strip()]
+    invoice_number = None
+    for line in lines:
+        if 'invoice' in line.lower() or 'inv' in line.lower():
+            num_match = re.search(r'[\w#]+(\d+)', line)
+            if num_match:
+                invoice_number = num_match.group(1)
+                break
+    return {
+        "invoice_number": invoice_number,
+        "supplier_name": lines[0] if lines else None,
+        "total_amount": legacy_parse_receipt(text).get("total_amount")
+    }
+
+
+_AMOUNT = r'(?<![\d,.])(\d{1,3}(?:,\d{3})+(?:\.\d{1,2})?|\d+(?:\.\d{1,2})?)'
+
+
+def baseline_parse_invoice(text: str) -> Dict[str, Any]:
+    """Line-by-line parser in the legacy style that extracts the same fields as the single-pass parser."""
+    lines = [line.strip() for line in text.split('\n') if line.strip()]
+    fields: Dict[str, Any] = {"subtotal": None, "grand_total": None, "total": None, "tax": None}
+    invoice_number = None
+    line_items = []
+    numeric_lines = 0
+    for line in lines:
+        lower = line.lower()
+        amounts = re.findall(_AMOUNT, lower)
+        if amounts:
+            numeric_lines += 1
+
+        keyword = None
+        for name, pattern in (
+            ("subtotal", r'\bsub\s*-?\s*total\b'),
+            ("grand_total", r'\b(?:grand\s+total|amount\s+due|balance\s+due|net\s+payable)\b'),
+            ("total", r'\btotal\b'),
+            ("tax", r'\b(?:tax|vat|gst)\b'),
+            ("invoice", r'\b(?:invoice|inv|bill)\b\.?'),
+        ):
+            keyword = re.search(pattern, lower)
+            if keyword:
+                break
+        if keyword:
+            if name == "invoice":
+                number = re.match(
+                    r'[\s.:#-]*(?:(?:no|number|nr)\b\.?)?[\s.:#-]*([a-z0-9][a-z0-9/-]*\d[a-z0-9/-]*)',
+                    lower[keyword.end():],
+                )
+                if number and invoice_number is None:
+                    start = keyword.end() + number.start(1)
+                    invoice_number = line[start:start + len(number.group(1))]
+            else:
+                trailing = re.findall(_AMOUNT, lower[keyword.end():])
+                if trailing:
+                    fields[name] = float(trailing[-1].replace(',', ''))
+            continue
+
+        if amounts:
+            item = re.match(
+                rf'^(.*?[a-z].*?)\s+(?:(\d+(?:\.\d+)?)\s*x\s*{_AMOUNT}\s+)?\$?{_AMOUNT}\s*$', lower
+            )
+            if item:
+                amount = float(item.group(4).replace(',', ''))
+                quantity = float(item.group(2)) if item.group(2) else 1.0
+                line_items.append({
+                    "name": line[:item.end(1)].strip(" .:-"),
+                    "quantity": quantity,
+                    "unit_price": float(item.group(3).replace(',', '')) if item.group(3) else amount / quantity,
+                    "amount": amount,
+                })
+
+    total = fields["grand_total"] if fields["grand_total"] is not None else fields["total"]
+    return {
+        "total_amount": total,
+        "subtotal": fields["subtotal"],
+        "tax_amount": fields["tax"],
+        "currency": "USD" if total is not None else None,
+        "item_count": len(line_items) or numeric_lines,
+        "line_items": line_items,
+        "invoice_number": invoice_number,
+        "supplier_name": lines[0] if lines else None,
+    }
+
+
+def time_parser(parse: Callable[[str], Any], text: str, iterations: int) -> Dict[str, float]:
+    """Time a parser over repeated runs and summarise the distribution."""
+    parse(text)  # warm caches
+    samples: List[float] = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        parse(text)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "mean_ms": round(statistics.fmean(samples), 4),
+        "p50_ms": round(samples[len(samples) // 2], 4),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 4),
+        "docs_per_second": round(1000 / statistics.fmean(samples), 1),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the structured data parser")
+    parser.add_argument("--lines", type=int, default=500, help="Item lines per invoice")
+    parser.add_argument("--iterations", type=int, default=200, help="Timed runs per parser")
+    parser.add_argument("--json", action="store_true", help="Emit machine-readable JSON")
+    args = parser.parse_args()
+
+    text = build_invoice(args.lines)
+    current = time_parser(lambda t: parse_structured_data(t, "invoice"), text, args.iterations)
+    baseline = time_parser(baseline_parse_invoice, text, args.iterations)
+    legacy = time_parser(legacy_parse_invoice, text, args.iterations)
+    parsed = parse_structured_data(text, "invoice")
+
+    report = {
+        "benchmark": "structured_parser",
+        "invoice_lines": args.lines,
+        "iterations": args.iterations,
+        "line_items_extracted": len(parsed["line_items"]),
+        "baseline_output_matches": baseline_parse_invoice(text) == parsed,
+        "single_pass": current,
+        "line_by_line": baseline,
+        "speedup": round(baseline["mean_ms"] / current["mean_ms"], 2),
+        "legacy_totals_only": legacy,
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"📄 Invoice with {args.lines} item lines, {args.iterations} iterations")
+        print(f"✅ Line items extracted: {report['line_items_extracted']}")
+        print(f"🔁 Line-by-line baseline output matches: {report['baseline_output_matches']}")
+        for name in ("single_pass", "line_by_line", "legacy_totals_only"):
+            stats = report[name]
+            print(f"⏱️  {name:<18} mean {stats['mean_ms']:.3f} ms  p50 {stats['p50_ms']:.3f} ms  "
+                  f"p95 {stats['p95_ms']:.3f} ms  {stats['docs_per_second']:.0f} docs/s")
+        print(f"🚀 Speedup over the line-by-line baseline: {report['speedup']}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
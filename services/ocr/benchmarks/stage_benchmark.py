@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+OCR Pipeline Stage Benchmark
+===========================
+
+Runs synthetic scans with known ground truth through
+``OCRService.process_image``, the path every API request takes (admission,
+scheduling, decode, orientation, preprocessing, encoder, decoder, barcode,
+parse), at several concurrency levels and batch sizes. Stage latencies are
+read from each result's ``timings`` breakdown (see ``StageTimer``), so the
+benchmark measures exactly what production requests record. Reports
+p50/p95/p99 per stage, images per second and text similarity against the
+ground truth.
+
+Batches go through ``OCRService.batch_process``, which runs
+``process_image`` for each image; single images use the interactive lane
+like ``/process``, larger batches the bulk lane like ``/batch``.
+The result cache and single-flight are turned off so every image runs the
+pipeline.
+
+Usage:
+    python -m benchmarks.stage_benchmark --count 10 --concurrency 1,4 --batch-sizes 1,5
+    python -m benchmarks.stage_benchmark --output bench.json
+    python -m benchmarks.stage_benchmark --baseline bench.json
+"""
+
+import argparse
+import asyncio
+import difflib
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.config import settings  # noqa: E402
+from app.models.schemas import OCRRequest  # noqa: E402
+from app.services.ocr_service import OCRService  # noqa: E402
+from app.services.scheduler import Lane  # noqa: E402
+from app.services.warmup import parse_batch_sizes  # noqa: E402
+from benchmarks.synthetic import KINDS, SyntheticSample, generate_dataset  # noqa: E402
+
+
+class StageTimings:
+    """Per-stage latency samples in milliseconds, in the order stages first appear."""
+
+    def __init__(self) -> None:
+        self.samples: Dict[str, List[float]] = {}
+
+    def add(self, name: str, milliseconds: float) -> None:
+        self.samples.setdefault(name, []).append(milliseconds)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {name: _summarize(values) for name, values in self.samples.items() if values}
+
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def _summarize(values: List[float]) -> Dict[str, float]:
+    ordered = sorted(values)
+    return {
+        "count": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered), 3),
+        "p50_ms": round(_percentile(ordered, 0.50), 3),
+        "p95_ms": round(_percentile(ordered, 0.95), 3),
+        "p99_ms": round(_percentile(ordered, 0.99), 3),
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _batches(samples: List[SyntheticSample], batch_size: int) -> List[List[SyntheticSample]]:
+    """Group samples into same-kind batches, as a shop uploads one kind of document at a time."""
+    batches = []
+    for kind in KINDS:
+        same_kind = [s for s in samples if s.kind == kind]
+        batches.extend(same_kind[i:i + batch_size] for i in range(0, len(same_kind), batch_size))
+    return batches
+
+
+def _request(sample: SyntheticSample, data: bytes, lane: str) -> OCRRequest:
+    return OCRRequest(
+        shop_id="benchmark",
+        user_id="benchmark",
+        ocr_type=sample.kind,
+        image_bytes=data,
+        file_size=len(data),
+        submitted_at=time.time(),
+        lane=lane,
+    )
+
+
+async def run_level(
+    service: OCRService,
+    samples: List[SyntheticSample],
+    concurrency: int,
+    batch_size: int,
+) -> Dict[str, Any]:
+    """Push every sample through ``process_image`` with ``concurrency`` workers."""
+    queue: asyncio.Queue = asyncio.Queue()
+    for batch in _batches(samples, batch_size):
+        queue.put_nowait([(sample, sample.encode()) for sample in batch])
+
+    timings = StageTimings()
+    similarity: Dict[str, List[float]] = {kind: [] for kind in KINDS}
+    outcomes = {"errors": 0, "degraded": 0}
+
+    async def worker() -> None:
+        while not queue.empty():
+            batch = queue.get_nowait()
+            lane = Lane.INTERACTIVE if batch_size == 1 else Lane.BULK
+            started = time.perf_counter()
+            # Failed images come back as results with ``error`` set
+            results = await service.batch_process([_request(sample, data, lane) for sample, data in batch])
+            # Wall time of the whole call: one image, or the batch
+            timings.add("total", (time.perf_counter() - started) * 1000)
+
+            for (sample, _), result in zip(batch, results):
+                if result.error:
+                    outcomes["errors"] += 1
+                    continue
+                if result.degraded:
+                    outcomes["degraded"] += 1
+                for stage, milliseconds in (result.timings or {}).items():
+                    timings.add(stage, milliseconds)
+                similarity[sample.kind].append(difflib.SequenceMatcher(None, sample.text, result.text).ratio())
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall_seconds = time.perf_counter() - started
+
+    return {
+        "concurrency": concurrency,
+        "batch_size": batch_size,
+        "images": len(samples),
+        "wall_seconds": round(wall_seconds, 3),
+        "images_per_second": round(len(samples) / wall_seconds, 2),
+        **outcomes,
+        "stages": timings.summary(),
+        "text_similarity": {
+            kind: round(sum(values) / len(values), 3) for kind, values in similarity.items() if values
+        },
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    """Print p95 and throughput changes against a previous report."""
+    previous = {(level["concurrency"], level["batch_size"]): level for level in baseline["levels"]}
+    print(f"\n📊 Compared with {baseline.get('commit') or 'baseline'}")
+    for level in report["levels"]:
+        before = previous.get((level["concurrency"], level["batch_size"]))
+        if before is None:
+            continue
+        print(f"  concurrency {level['concurrency']} batch {level['batch_size']}: "
+              f"{before['images_per_second']} -> {level['images_per_second']} images/s")
+        for stage, stats in level["stages"].items():
+            old = before["stages"].get(stage)
+            if old and old["p95_ms"]:
+                change = (stats["p95_ms"] - old["p95_ms"]) / old["p95_ms"] * 100
+                print(f"    {stage:<12} p95 {old['p95_ms']:.1f} -> {stats['p95_ms']:.1f} ms ({change:+.1f}%)")
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    settings.OCR_WARMUP_ENABLED = not args.no_warmup
+    # Every image must run the pipeline: no cached or shared results
+    settings.ENABLE_MODEL_CACHING = False
+    settings.OCR_SINGLEFLIGHT_ENABLED = False
+    service = await OCRService.initialize(wait_for_models=True)
+    if not service.is_ready():
+        raise RuntimeError(f"OCR models failed to load: {service.engines.status()}")
+    loaded = await service.models.preload(settings.OCR_MODEL_PRIMARY)
+
+    samples = generate_dataset(args.count, args.kinds.split(","), args.seed)
+    levels = [
+        await run_level(service, samples, concurrency, batch_size)
+        for concurrency in parse_batch_sizes(args.concurrency)
+        for batch_size in parse_batch_sizes(args.batch_sizes)
+    ]
+
+    return {
+        "benchmark": "stages",
+        "commit": _git_commit(),
+        "model": loaded.model_id,
+        "device": loaded.device,
+        "graph_optimization": settings.OCR_GRAPH_OPTIMIZATION,
+        "threads": service._threads,
+        "samples_per_kind": args.count,
+        "seed": args.seed,
+        "levels": levels,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark OCR pipeline stages")
+    parser.add_argument("--count", type=int, default=10, help="Synthetic samples per kind")
+    parser.add_argument("--kinds", default=",".join(KINDS), help="Comma separated sample kinds")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--concurrency", default="1,4", help="Comma separated concurrency levels")
+    parser.add_argument("--batch-sizes", default="1,5", help="Comma separated batch sizes")
+    parser.add_argument("--no-warmup", action="store_true", help="Skip model warm-up (measures cold start)")
+    parser.add_argument("--json", action="store_true", help="Emit machine-readable JSON on stdout")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    parser.add_argument("--baseline", help="Previous JSON report to compare against")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"🧪 {report['model']} on {report['device']}, {args.count} samples per kind, commit {report['commit']}")
+        for level in report["levels"]:
+            print(f"\n⚙️  concurrency {level['concurrency']}, batch {level['batch_size']}: "
+                  f"{level['images_per_second']} images/s, similarity {level['text_similarity']}, "
+                  f"{level['degraded']} degraded, {level['errors']} errors")
+            for stage, stats in level["stages"].items():
+                print(f"  {stage:<12} p50 {stats['p50_ms']:8.1f} ms  p95 {stats['p95_ms']:8.1f} ms  "
+                      f"p99 {stats['p99_ms']:8.1f} ms")
+
+    if args.baseline:
+        compare(report, json.loads(Path(args.baseline).read_text()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+OCR Transport Benchmark
+======================
+
+Compares the per-request cost of getting an image into the pipeline and the
+result back out: ``/process`` (multipart form, spooled upload, temp file)
+against ``/scan`` (raw body, header/query options, compact response), with
+the image as a JPEG or as a compact pre-processed payload.
+
+By default requests go through the ASGI app in-process with OCR and rate
+limiting replaced by instant no-ops, so the numbers are pure transport and
+framework overhead. With ``--url`` the same requests go to a running server
+(real OCR); ``--http2`` then multiplexes them over a single connection
+(start the server with ``OCR_SERVER=hypercorn``).
+
+Usage:
+    python -m benchmarks.transport_benchmark --requests 500 --concurrency 1,8
+    python -m benchmarks.transport_benchmark --url http://localhost:8000 --http2 --concurrency 16
+    python -m benchmarks.transport_benchmark --output transport.json
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx  # noqa: E402
+
+from app.models.schemas import OCRRequest, OCRResult  # noqa: E402
+from app.services.compact_image import COMPACT_CONTENT_TYPE, encode_compact  # noqa: E402
+from app.services.warmup import parse_batch_sizes  # noqa: E402
+from benchmarks.stage_benchmark import _git_commit, _summarize  # noqa: E402
+from benchmarks.synthetic import generate_sample  # noqa: E402
+
+VARIANTS = ("process", "scan", "scan-compact")
+
+
+class _InstantService:
+    """Stands in for OCRService so only the transport is measured."""
+
+    async def process_image(self, request: OCRRequest) -> OCRResult:
+        return OCRResult(id=str(uuid.uuid4()), text="BENCH 12.50", confidence=0.95, model_used="none")
+
+
+def _in_process_client() -> httpx.AsyncClient:
+    """Client bound to the ASGI app, with OCR and rate limiting disabled."""
+    from app.api.v1 import api
+    from main import app
+
+    async def no_rate_limit(user_id: str, shop_id: str) -> None:
+        return None
+
+    service = _InstantService()
+    api.check_rate_limits = no_rate_limit
+    api.OCRService.get_instance = classmethod(lambda cls: service)
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark")
+
+
+def _request_factory(variant: str, jpeg: bytes, compact: bytes) -> Callable[[httpx.AsyncClient], Any]:
+    if variant == "process":
+        return lambda client: client.post(
+            "/api/v1/process",
+            files={"image": ("label.jpg", jpeg, "image/jpeg")},
+            data={"ocr_type": "product", "confidence_threshold": "0.8", "extract_barcodes": "true", "language": "en"},
+        )
+    if variant == "scan":
+        return lambda client: client.post(
+            "/api/v1/scan", params={"t": "product"}, content=jpeg, headers={"content-type": "image/jpeg"}
+        )
+    return lambda client: client.post(
+        "/api/v1/scan", params={"t": "product"}, content=compact, headers={"content-type": COMPACT_CONTENT_TYPE}
+    )
+
+
+async def run_variant(
+    client: httpx.AsyncClient, send: Callable[[httpx.AsyncClient], Any], requests: int, concurrency: int
+) -> Dict[str, Any]:
+    """Send ``requests`` requests with ``concurrency`` in flight."""
+    latencies: List[float] = []
+    request_bytes: List[int] = []
+    response_bytes: List[int] = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker() -> None:
+        nonlocal errors
+        for _ in remaining:
+            started = time.perf_counter()
+            response = await send(client)
+            latencies.append((time.perf_counter() - started) * 1000)
+            request_bytes.append(int(response.request.headers.get("content-length", 0)))
+            response_bytes.append(len(response.content))
+            if response.status_code != 200:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall_seconds = time.perf_counter() - started
+
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "requests_per_second": round(requests / wall_seconds, 1),
+        "latency": _summarize(latencies),
+        "request_bytes": round(sum(request_bytes) / len(request_bytes)),
+        "response_bytes": round(sum(response_bytes) / len(response_bytes)),
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    sample = generate_sample("product", random.Random(args.seed))
+    jpeg = sample.encode()
+    # What the app would send: the label scaled to TrOCR's working size
+    scaled = sample.image.copy()
+    scaled.thumbnail((768, 768))
+    compact = encode_compact(scaled, source_size=sample.image.size)
+
+    if args.url:
+        client = httpx.AsyncClient(
+            base_url=args.url,
+            http2=args.http2,
+            limits=httpx.Limits(max_connections=1 if args.http2 else max(parse_batch_sizes(args.concurrency))),
+            timeout=60.0,
+        )
+    else:
+        client = _in_process_client()
+
+    results: Dict[str, List[Dict[str, Any]]] = {}
+    async with client:
+        for variant in args.variants.split(","):
+            send = _request_factory(variant, jpeg, compact)
+            # Warm up connections, imports and caches
+            await run_variant(client, send, min(20, args.requests), 1)
+            results[variant] = [
+                await run_variant(client, send, args.requests, concurrency)
+                for concurrency in parse_batch_sizes(args.concurrency)
+            ]
+
+    return {
+        "benchmark": "transport",
+        "commit": _git_commit(),
+        "target": args.url or "in-process (OCR disabled)",
+        "http2": bool(args.url and args.http2),
+        "image_bytes": {"jpeg": len(jpeg), "compact": len(compact)},
+        "variants": results,
+    }
+
+
+def _overhead_saved(report: Dict[str, Any], variant: str) -> Optional[str]:
+    baseline = report["variants"].get("process")
+    other = report["variants"].get(variant)
+    if not baseline or not other:
+        return None
+    parts = []
+    for before, after in zip(baseline, other):
+        saved = before["latency"]["p50_ms"] - after["latency"]["p50_ms"]
+        parts.append(f"c{before['concurrency']} {saved:+.2f} ms p50")
+    return ", ".join(parts)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark /process against the raw-body /scan endpoint")
+    parser.add_argument("--requests", type=int, default=500, help="Requests per variant and concurrency level")
+    parser.add_argument("--concurrency", default="1,8", help="Comma separated concurrency levels")
+    parser.add_argument("--variants", default=",".join(VARIANTS), help="Comma separated: " + ", ".join(VARIANTS))
+    parser.add_argument("--url", help="Benchmark a running server instead of the in-process app")
+    parser.add_argument("--http2", action="store_true", help="With --url: multiplex over one HTTP/2 connection")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true", help="Emit machine-readable JSON on stdout")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0
+
+    print(f"🧪 {report['target']}, commit {report['commit']}, "
+          f"image {report['image_bytes']['jpeg']} B JPEG / {report['image_bytes']['compact']} B compact")
+    for variant, levels in report["variants"].items():
+        print(f"\n⚙️  {variant}")
+        for level in levels:
+            latency = level["latency"]
+            print(f"  concurrency {level['concurrency']:>3}: {level['requests_per_second']:8.1f} req/s  "
+                  f"p50 {latency['p50_ms']:7.2f} ms  p95 {latency['p95_ms']:7.2f} ms  "
+                  f"up {level['request_bytes']} B  down {level['response_bytes']} B  errors {level['errors']}")
+        saved = _overhead_saved(report, variant) if variant != "process" else None
+        if saved:
+            print(f"  saved vs /process: {saved}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -13,15 +13,20 @@ Features:
 - Comprehensive error handling
 """
 
+import asyncio
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, HTTPException, status
+from fastapi import FastAPI, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 import structlog
 
 from app.core.config import settings
-from app.core.database import init_db, close_db, AsyncSessionLocal
+from app.core.startup import startup_timeline
+from app.core.database import init_db, close_db
+from app.core.health import health_monitor
 from app.core.redis import init_redis, close_redis
 from app.core.monitoring import setup_monitoring
+from app.services.job_retention import job_history
 from app.services.ocr_service import OCRService
 from app.api.v1.api import api_router
 
@@ -34,30 +39,45 @@ async def lifespan(app: FastAPI):
     """Application lifespan manager for startup and shutdown."""
     # Startup
     logger.info("Starting ZakPOS OCR Server", version=settings.VERSION)
+    app.state.infrastructure_ready = False
 
-    # Initialize database
-    await init_db()
-    logger.info("Database initialized")
-
-    # Initialize Redis
-    await init_redis()
-    logger.info("Redis initialized")
-
-    # Initialize OCR service (with error handling for Docker startup)
+    # Start loading OCR models in the background first so they overlap
+    # with database and Redis initialization
     try:
-        ocr_service = await OCRService.initialize()
-        logger.info("OCR service initialized", model=settings.OCR_MODEL_PRIMARY)
+        await OCRService.initialize()
+        logger.info("OCR service initialized, models loading", model=settings.OCR_MODEL_PRIMARY)
     except Exception as e:
         logger.warning("OCR service initialization failed, will retry", error=str(e))
         # Don't fail startup, allow health checks to handle model loading
 
-    # Setup monitoring
-    setup_monitoring(app)
+    async def timed(phase: str, init) -> None:
+        with startup_timeline.phase(phase):
+            await init()
+        logger.info(f"{phase.capitalize()} initialized")
+
+    # Initialize database and Redis concurrently
+    await asyncio.gather(timed("database", init_db), timed("redis", init_redis))
+    app.state.infrastructure_ready = True
+
+    # Probes are answered from snapshots refreshed in the background
+    health_monitor.start()
+    job_history.start()
+
+    async def mark_ready_when_loaded() -> None:
+        ocr_service = OCRService.get_instance()
+        await ocr_service.wait_until_loaded()
+        if ocr_service.is_ready():
+            startup_timeline.mark_ready()
+
+    ready_watcher = asyncio.create_task(mark_ready_when_loaded())
 
     yield
 
     # Shutdown
     logger.info("Shutting down OCR Server")
+    ready_watcher.cancel()
+    await health_monitor.stop()
+    await job_history.stop()
     await close_redis()
     await close_db()
 
@@ -82,6 +102,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Setup monitoring (request middleware and the Prometheus /metrics route);
+# middleware must be registered before the application starts
+setup_monitoring(app)
+
 # Include API routes
 app.include_router(api_router, prefix="/api/v1")
 
@@ -100,60 +124,98 @@ async def root():
 
 @app.get("/health", tags=["Health"])
 async def health_check():
-    """Health check endpoint for load balancers and monitoring."""
-    try:
-        # Check database connectivity
-        async with AsyncSessionLocal() as session:
-            await session.execute("SELECT 1")
-
-        # Check Redis connectivity
-        from app.core.redis import get_redis
-        redis = await get_redis()
-        await redis.ping()
+    """Health check for load balancers, served from the background snapshot."""
+    snapshot = health_monitor.current()
+    services = snapshot["services"]
 
-        # Check OCR service
-        ocr_service = OCRService.get_instance()
-        if not ocr_service.is_ready():
-            raise HTTPException(status_code=503, detail="OCR service not ready")
+    def component(name: str) -> str:
+        return services.get(name, {}).get("status", "unknown")
 
-        return {
-            "status": "healthy",
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if snapshot["status"] == "healthy" else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={
+            "status": snapshot["status"],
             "version": settings.VERSION,
             "model": settings.OCR_MODEL_PRIMARY,
-            "database": "connected",
-            "redis": "connected",
-            "ocr_service": "ready"
+            "database": component("database"),
+            "redis": component("redis"),
+            "ocr_service": component("ocr_service"),
+            "age_seconds": snapshot["age_seconds"],
         }
+    )
 
-    except Exception as e:
-        logger.error("Health check failed", error=str(e))
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="Service unhealthy"
-        )
 
+@app.get("/health/live", tags=["Health"])
+async def liveness():
+    """Liveness probe: the process is up and serving the event loop."""
+    return {"status": "alive", "uptime_seconds": round(startup_timeline.uptime_seconds, 3)}
 
-@app.get("/metrics", tags=["Monitoring"])
-async def metrics():
-    """Prometheus-style metrics endpoint."""
-    # TODO: Implement detailed metrics collection
-    return {
-        "total_requests": 0,
-        "successful_requests": 0,
-        "average_processing_time_ms": 0,
-        "model_accuracy": 0.95,
-        "uptime_seconds": 0
-    }
 
+@app.get("/health/ready", tags=["Health"])
+async def readiness():
+    """Readiness probe: infrastructure initialised, models loaded, health snapshot fresh."""
+    ocr_status = health_monitor.current()["services"].get("ocr_service", {})
+    engines = ocr_status.get("engines", {})
+    warmup = ocr_status.get("warmup")
 
-if __name__ == "__main__":
-    import uvicorn
-
-    uvicorn.run(
-        "main:app",
-        host="0.0.0.0",
-        port=settings.PORT,
-        reload=settings.DEBUG,
-        log_level=settings.LOG_LEVEL.lower(),
-        access_log=True,
+    ready = getattr(app.state, "infrastructure_ready", False) and health_monitor.is_ready()
+
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={
+            "status": "ready" if ready else "not_ready",
+            "infrastructure": "connected" if getattr(app.state, "infrastructure_ready", False) else "initializing",
+            "engines": engines,
+            "warmup": warmup,
+        }
     )
+
+
+@app.get("/health/deep", tags=["Health"])
+async def deep_health():
+    """Deep diagnostics with live checks; not for probes (rate limited)."""
+    return await health_monitor.deep()
+
+
+@app.get("/health/startup", tags=["Health"])
+async def startup_report():
+    """Startup timeline: per-phase offsets and durations since import."""
+    return startup_timeline.as_dict()
+
+
+def serve_http2() -> None:
+    """Serve with hypercorn so clients can multiplex scans over one HTTP/2 connection.
+
+    Cleartext clients use h2c (prior knowledge or Upgrade); with
+    OCR_TLS_CERTFILE / OCR_TLS_KEYFILE set, h2 is negotiated over TLS.
+    """
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+
+    config = Config()
+    config.bind = [f"0.0.0.0:{settings.PORT}"]
+    config.alpn_protocols = ["h2", "http/1.1"]
+    config.h2_max_concurrent_streams = settings.OCR_H2_MAX_CONCURRENT_STREAMS
+    config.loglevel = settings.LOG_LEVEL.upper()
+    config.accesslog = "-"
+    if settings.OCR_TLS_CERTFILE and settings.OCR_TLS_KEYFILE:
+        config.certfile = settings.OCR_TLS_CERTFILE
+        config.keyfile = settings.OCR_TLS_KEYFILE
+
+    asyncio.run(serve(app, config))
+
+
+if __name__ == "__main__":
+    if settings.OCR_SERVER == "hypercorn":
+        serve_http2()
+    else:
+        import uvicorn
+
+        uvicorn.run(
+            "main:app",
+            host="0.0.0.0",
+            port=settings.PORT,
+            reload=settings.DEBUG,
+            log_level=settings.LOG_LEVEL.lower(),
+            access_log=True,
+        )
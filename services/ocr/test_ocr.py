@@ -29,7 +29,7 @@ async def test_imports():
         from app.core.database import Base, OCRProcessingJob
         print("✅ Database models imported")
 
-        from app.core.redis import redis_client
+        from app.core.redis import shards
         print("✅ Redis module imported")
 
         return True
@@ -0,0 +1,17 @@
+"""Shared fixtures for the OCR service tests."""
+
+import pytest
+
+from app.models.schemas import OCRRequest
+
+
+@pytest.fixture
+def make_request():
+    """Build an OCRRequest with test defaults."""
+
+    def make(**fields) -> OCRRequest:
+        fields.setdefault("shop_id", "shop-1")
+        fields.setdefault("user_id", "user-1")
+        return OCRRequest(**fields)
+
+    return make
@@ -0,0 +1,90 @@
+"""Tests for the admission decisions in app/services/admission.py."""
+
+import pytest
+
+from app.core.config import settings
+from app.services.admission import AdmissionController, AdmissionRejected, ProcessingMode
+
+
+@pytest.fixture
+def controller(monkeypatch):
+    monkeypatch.setattr(settings, "OCR_WORKERS", 1)
+    monkeypatch.setattr(settings, "OCR_ADMISSION_SAFETY_FACTOR", 1.0)
+    monkeypatch.setattr(settings, "OCR_ADMISSION_DEGRADE", True)
+    controller = AdmissionController(fallback_available=lambda: True)
+    controller.service_seconds = {
+        ProcessingMode.FULL: 1.0,
+        ProcessingMode.FALLBACK_ONLY: 0.2,
+        ProcessingMode.BARCODE_ONLY: 0.05,
+    }
+    return controller
+
+
+def test_admits_full_lane_when_it_fits(controller, make_request):
+    ticket = controller._decide(make_request(), budget_seconds=5.0)
+
+    assert ticket.mode == ProcessingMode.FULL
+    assert not ticket.degraded
+    assert ticket.predicted_seconds == pytest.approx(1.0)
+
+
+def test_degrades_to_fallback_when_full_lane_too_slow(controller, make_request):
+    ticket = controller._decide(make_request(), budget_seconds=0.5)
+
+    assert ticket.mode == ProcessingMode.FALLBACK_ONLY
+    assert ticket.degraded
+
+
+def test_degrades_to_barcode_only_without_fallback(controller, make_request):
+    controller._fallback_available = lambda: False
+
+    ticket = controller._decide(make_request(extract_barcodes=True), budget_seconds=0.1)
+
+    assert ticket.mode == ProcessingMode.BARCODE_ONLY
+
+
+def test_barcode_requests_only_use_barcode_lane(controller, make_request):
+    ticket = controller._decide(make_request(ocr_type="barcode"), budget_seconds=5.0)
+
+    assert ticket.mode == ProcessingMode.BARCODE_ONLY
+    assert not ticket.degraded
+
+
+def test_rejects_with_retry_after_when_nothing_fits(controller, make_request, monkeypatch):
+    monkeypatch.setattr(settings, "OCR_ADMISSION_DEGRADE", False)
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller._decide(make_request(), budget_seconds=0.5)
+
+    assert rejected.value.code == "OVERLOADED"
+    assert rejected.value.retry_after_seconds == 1
+
+
+def test_rejects_when_queue_full(controller, make_request, monkeypatch):
+    monkeypatch.setattr(settings, "OCR_QUEUE_SIZE", 2)
+    controller.in_flight[ProcessingMode.FULL] = 2
+
+    with pytest.raises(AdmissionRejected):
+        controller._decide(make_request(), budget_seconds=60.0)
+
+
+def test_prediction_counts_work_admitted_to_every_lane(controller, monkeypatch):
+    monkeypatch.setattr(settings, "OCR_WORKERS", 2)
+    controller.in_flight[ProcessingMode.FULL] = 2
+    controller.in_flight[ProcessingMode.FALLBACK_ONLY] = 5
+
+    # (2 * 1.0 + 5 * 0.2) queued seconds over 2 workers, plus own service time
+    assert controller.predict(ProcessingMode.FULL) == pytest.approx(2.5)
+    assert controller.predict(ProcessingMode.BARCODE_ONLY) == pytest.approx(1.55)
+
+
+def test_service_time_ewma_from_slot_time(controller, make_request, monkeypatch):
+    monkeypatch.setattr(settings, "OCR_ADMISSION_ENABLED", True)
+    monkeypatch.setattr(settings, "OCR_ADMISSION_EWMA_ALPHA", 0.5)
+
+    with controller.admit(make_request(), budget_seconds=5.0) as ticket:
+        assert controller.in_flight[ProcessingMode.FULL] == 1
+        ticket.observe(3.0)
+
+    assert controller.in_flight[ProcessingMode.FULL] == 0
+    assert controller.service_seconds[ProcessingMode.FULL] == pytest.approx(2.0)
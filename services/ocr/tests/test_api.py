@@ -0,0 +1,176 @@
+"""Tests for the request helpers in app/api/v1/api.py."""
+
+import io
+import os
+import types
+
+import pytest
+from fastapi import BackgroundTasks, FastAPI, UploadFile
+from fastapi.testclient import TestClient
+from PIL import Image
+from starlette.datastructures import Headers
+
+from app.api.v1 import api
+from app.api.v1.api import parse_byte_range
+from app.core.config import settings
+from app.models.schemas import OCRResult
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        ("bytes=0-99", (0, 99)),
+        ("bytes=100-", (100, 999)),
+        ("bytes=900-5000", (900, 999)),
+        ("bytes=-100", (900, 999)),
+        ("bytes=-5000", (0, 999)),
+    ],
+)
+def test_parse_byte_range(header, expected):
+    assert parse_byte_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", ["items=0-10", "bytes=0-1,5-6", "bytes=abc", "bytes=-", "bytes=10-5"])
+def test_parse_byte_range_ignores_unusable_headers(header):
+    assert parse_byte_range(header, 1000) is None
+
+
+@pytest.mark.parametrize("header, size", [("bytes=1000-", 1000), ("bytes=-0", 1000), ("bytes=-10", 0)])
+def test_parse_byte_range_unsatisfiable(header, size):
+    with pytest.raises(ValueError):
+        parse_byte_range(header, size)
+
+
+@pytest.mark.asyncio
+async def test_async_upload_is_queued_with_its_size(monkeypatch):
+    async def allow(user_id, shop_id):
+        return None
+
+    monkeypatch.setattr(api, "check_rate_limits", allow)
+    data = b"\xff\xd8" + b"\0" * 1000
+    upload = UploadFile(
+        io.BytesIO(data), size=len(data), filename="label.jpg", headers=Headers({"content-type": "image/jpeg"})
+    )
+    tasks = BackgroundTasks()
+
+    await api.process_image_async(
+        http_request=types.SimpleNamespace(headers={}),
+        background_tasks=tasks,
+        image=upload,
+        storage_key=None,
+        ocr_type="product",
+        confidence_threshold=0.8,
+        extract_barcodes=True,
+        language="en",
+        callback_url=None,
+        current_user={"user_id": "user-1", "shop_id": "shop-1"},
+    )
+
+    (task,) = tasks.tasks
+    temp_path, file_size = task.args[1], task.args[-1]
+    assert file_size == len(data)
+    with open(temp_path, "rb") as saved:
+        assert saved.read() == data
+    os.remove(temp_path)
+
+
+class RecordingService:
+    """Stands in for OCRService and remembers the requests it was given."""
+
+    def __init__(self):
+        self.requests = []
+
+    async def process_image(self, request):
+        with Image.open(io.BytesIO(request.image_bytes)) as image:
+            size = image.size
+        self.requests.append((request, size))
+        return OCRResult(id="scan-1", text="Milk 1L 85.00", confidence=0.9, model_used="trocr")
+
+
+@pytest.fixture
+def scan_client(monkeypatch):
+    async def allow(user_id, shop_id):
+        return None
+
+    service = RecordingService()
+    monkeypatch.setattr(api, "check_rate_limits", allow)
+    monkeypatch.setattr(api.OCRService, "get_instance", classmethod(lambda cls: service))
+    app = FastAPI()
+    app.include_router(api.api_router, prefix="/api/v1")
+    return TestClient(app), service
+
+
+def jpeg_bytes(size=(320, 120)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, "white").save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def test_scan_processes_raw_image_body(scan_client):
+    client, service = scan_client
+    body = jpeg_bytes()
+
+    response = client.post(
+        "/api/v1/scan", params={"t": "receipt", "b": "0"}, content=body, headers={"content-type": "image/jpeg"}
+    )
+
+    assert response.status_code == 200
+    assert response.json()["t"] == "Milk 1L 85.00"
+    ((request, size),) = service.requests
+    assert size == (320, 120)
+    assert (request.ocr_type, request.extract_barcodes, request.file_size) == ("receipt", False, len(body))
+
+
+def test_scan_rejects_oversized_body(scan_client, monkeypatch):
+    client, service = scan_client
+    monkeypatch.setattr(settings, "MAX_IMAGE_SIZE_MB", 0)
+
+    response = client.post("/api/v1/scan", content=jpeg_bytes(), headers={"content-type": "image/jpeg"})
+
+    assert response.status_code == 413
+    assert not service.requests
+
+
+@pytest.mark.parametrize(
+    "path, upload",
+    [
+        ("/api/v1/process", {"files": {"image": ("label.jpg", jpeg_bytes(), "image/jpeg")}}),
+        ("/api/v1/process/async", {"files": {"image": ("label.jpg", jpeg_bytes(), "image/jpeg")}}),
+        ("/api/v1/batch", {"files": [("images", ("label.jpg", jpeg_bytes(), "image/jpeg"))]}),
+    ],
+)
+def test_form_endpoints_reject_unknown_ocr_type(scan_client, path, upload):
+    client, service = scan_client
+
+    response = client.post(path, data={"ocr_type": "passport"}, **upload)
+
+    assert response.status_code == 400
+    assert "ocr_type" in response.json()["detail"]
+    assert not service.requests
+
+
+def test_batch_stream_rejects_unknown_ocr_type(scan_client):
+    client, service = scan_client
+
+    response = client.post(
+        "/api/v1/batch/stream",
+        params={"ocr_type": "passport"},
+        content=b"",
+        headers={"content-type": "application/x-tar"},
+    )
+
+    assert response.status_code == 400
+    assert not service.requests
+
+
+def test_scan_rejects_non_finite_timeout(scan_client):
+    client, service = scan_client
+
+    response = client.post(
+        "/api/v1/scan",
+        content=jpeg_bytes(),
+        headers={"content-type": "image/jpeg", settings.OCR_REQUEST_TIMEOUT_HEADER: "nan"},
+    )
+
+    assert response.status_code == 400
+    assert not service.requests
@@ -0,0 +1,109 @@
+"""Tests for the upload readers in app/services/batch_stream.py."""
+
+import io
+import tarfile
+
+import pytest
+
+from app.core.config import settings
+from app.models.schemas import OCRError
+from app.services.batch_stream import iter_multipart, iter_tar
+
+
+async def _chunked(data: bytes, size: int = 100):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+async def _collect(items):
+    return [(item.index, item.filename, item.data, item.error) async for item in items]
+
+
+def _tar(members, **options) -> bytes:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w", **options) as archive:
+        for name, data in members:
+            if data is None:
+                info = tarfile.TarInfo(name)
+                info.type = tarfile.DIRTYPE
+                archive.addfile(info)
+                continue
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+@pytest.mark.asyncio
+async def test_iter_tar_yields_regular_files_in_order():
+    data = _tar([("a.jpg", b"A" * 700), ("dir", None), ("b.png", b"B" * 10)])
+
+    items = await _collect(iter_tar(_chunked(data)))
+
+    assert items == [(0, "a.jpg", b"A" * 700, None), (1, "b.png", b"B" * 10, None)]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("tar_format", [tarfile.GNU_FORMAT, tarfile.PAX_FORMAT])
+async def test_iter_tar_long_names(tar_format):
+    name = "scans/" + "x" * 150 + ".jpg"
+    data = _tar([(name, b"img")], format=tar_format)
+
+    items = await _collect(iter_tar(_chunked(data, 37)))
+
+    assert [(filename, payload) for _, filename, payload, _ in items] == [(name, b"img")]
+
+
+@pytest.mark.asyncio
+async def test_iter_tar_flags_oversized_image(monkeypatch):
+    monkeypatch.setattr(settings, "MAX_IMAGE_SIZE_MB", 0)
+    data = _tar([("big.jpg", b"X" * 10)])
+
+    items = await _collect(iter_tar(_chunked(data)))
+
+    assert items[0][2] == b""
+    assert items[0][3].code == "FILE_TOO_LARGE"
+
+
+@pytest.mark.asyncio
+async def test_iter_tar_rejects_truncated_archive():
+    data = _tar([("a.jpg", b"A" * 2000)])[:1024]
+
+    with pytest.raises(OCRError) as error:
+        await _collect(iter_tar(_chunked(data)))
+    assert error.value.code == "INVALID_UPLOAD"
+
+
+def _multipart(boundary: str, parts) -> bytes:
+    body = b""
+    for name, filename, data in parts:
+        disposition = f'form-data; name="{name}"'
+        if filename is not None:
+            disposition += f'; filename="{filename}"'
+        body += f"--{boundary}\r\nContent-Disposition: {disposition}\r\n\r\n".encode() + data + b"\r\n"
+    return body + f"--{boundary}--\r\n".encode()
+
+
+@pytest.mark.asyncio
+async def test_iter_multipart_yields_file_parts_only():
+    body = _multipart("XyZ", [("files", "a.jpg", b"A" * 300), ("note", None, b"hello"), ("files", "b.jpg", b"BB")])
+
+    items = await _collect(iter_multipart("multipart/form-data; boundary=XyZ", _chunked(body, 50)))
+
+    assert items == [(0, "a.jpg", b"A" * 300, None), (1, "b.jpg", b"BB", None)]
+
+
+@pytest.mark.asyncio
+async def test_iter_multipart_enforces_image_count(monkeypatch):
+    monkeypatch.setattr(settings, "OCR_STREAM_MAX_IMAGES", 1)
+    body = _multipart("XyZ", [("files", "a.jpg", b"A"), ("files", "b.jpg", b"B")])
+
+    with pytest.raises(OCRError) as error:
+        await _collect(iter_multipart("multipart/form-data; boundary=XyZ", _chunked(body)))
+    assert error.value.code == "TOO_MANY_IMAGES"
+
+
+@pytest.mark.asyncio
+async def test_iter_multipart_requires_boundary():
+    with pytest.raises(OCRError):
+        await _collect(iter_multipart("multipart/form-data", _chunked(b"")))
@@ -0,0 +1,195 @@
+"""Tests for app/services/bulk_job.py against a local object store."""
+
+import asyncio
+import json
+import types
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.v1 import api
+from app.core.config import settings
+from app.models.schemas import BulkJobRequest, OCRResult
+from app.services import bulk_job
+from app.services.bulk_job import BulkJob, BulkJobError, BulkJobRegistry, BulkJobSpec, read_checkpoint
+from app.services.storage import LocalObjectStore
+
+PREFIX = "uploads/shop-1/invoices/"
+KEYS = [f"{PREFIX}{index:02d}.jpg" for index in range(7)]
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = LocalObjectStore("ocr", root=str(tmp_path))
+    monkeypatch.setattr(bulk_job, "get_object_store", lambda bucket=None: store)
+    monkeypatch.setattr(settings, "OCR_BULK_PART_SIZE", 2)
+    return store
+
+
+async def fill(store, keys=KEYS):
+    for key in keys:
+        await store.put_bytes(key, key.encode())
+
+
+async def recognise(request):
+    return OCRResult(id=request.filename, text=request.image_bytes.decode(), model_used="fake")
+
+
+async def result_lines(store, spec):
+    lines = []
+    async for entry in store.list_objects(spec.result_prefix):
+        if entry.key.endswith(".jsonl"):
+            lines += [json.loads(line) for line in (await store.get_bytes(entry.key)).splitlines()]
+    return lines
+
+
+def make_spec(**fields):
+    fields.setdefault("prefix", PREFIX)
+    fields.setdefault("job_id", "job-1")
+    fields.setdefault("shop_id", "shop-1")
+    fields.setdefault("output_prefix", "ocr-results/shop-1")
+    return BulkJobSpec(**fields)
+
+
+@pytest.mark.asyncio
+async def test_job_processes_images_in_key_order(store):
+    await fill(store)
+    await store.put_bytes(f"{PREFIX}notes.txt", b"not an image")
+    await store.put_bytes("uploads/shop-1/other/99.jpg", b"outside the prefix")
+    spec = make_spec()
+
+    status = await BulkJob(spec, recognise, concurrency=3, prefetch=2).run()
+
+    lines = await result_lines(store, spec)
+    assert [line["key"] for line in lines] == KEYS
+    assert all(line["result"]["text"] == line["key"] for line in lines)
+    assert (status["state"], status["processed"], status["skipped"]) == ("completed", 7, 1)
+    checkpoint = await read_checkpoint(spec)
+    assert checkpoint["part"] == status["parts"] >= 2
+    assert checkpoint["after"] == f"{PREFIX}notes.txt"
+    assert checkpoint["finished_at"] is not None
+
+
+@pytest.mark.asyncio
+async def test_watermark_waits_for_earlier_keys(store):
+    await fill(store)
+    spec = make_spec()
+    first_done = asyncio.Event()
+
+    async def slow_first(request):
+        if request.filename == KEYS[0]:
+            await first_done.wait()
+        return await recognise(request)
+
+    job = BulkJob(spec, slow_first, concurrency=3)
+    task = asyncio.create_task(job.run())
+    while job.listed < len(KEYS) or len(job._finished) < 2:
+        await asyncio.sleep(0.01)
+
+    # Later keys finished, but nothing is checkpointed past the unfinished first key
+    assert await read_checkpoint(spec) is None
+    first_done.set()
+    await task
+    assert (await read_checkpoint(spec))["processed"] == len(KEYS)
+
+
+@pytest.mark.asyncio
+async def test_cancelled_job_resumes_after_checkpoint(store, monkeypatch):
+    monkeypatch.setattr(settings, "OCR_BULK_CONCURRENCY", 1)
+    await fill(store)
+    spec = make_spec()
+    stuck = asyncio.Event()
+
+    async def stop_at_fifth(request):
+        if request.filename == KEYS[4]:
+            stuck.set()
+            await asyncio.Event().wait()
+        return await recognise(request)
+
+    registry = BulkJobRegistry()
+    job = registry.start(spec, stop_at_fifth)
+    await stuck.wait()
+    assert registry.cancel("shop-1", "job-1")
+    with pytest.raises(asyncio.CancelledError):
+        await registry._tasks[("shop-1", "job-1")]
+    assert job.state == "cancelled"
+    assert (await read_checkpoint(spec))["after"] == KEYS[3]
+
+    calls = []
+
+    async def record(request):
+        calls.append(request.filename)
+        return await recognise(request)
+
+    status = await BulkJob(make_spec(), record).run()
+
+    assert calls == KEYS[4:]
+    assert [line["key"] for line in await result_lines(store, spec)] == KEYS
+    assert status["processed"] == len(KEYS)
+
+
+@pytest.mark.asyncio
+async def test_resume_refuses_different_parameters(store):
+    await fill(store, KEYS[:1])
+    await BulkJob(make_spec(), recognise).run()
+
+    with pytest.raises(BulkJobError):
+        await BulkJob(make_spec(ocr_type="receipt"), recognise).run()
+    with pytest.raises(BulkJobError):
+        await BulkJob(make_spec(shop_id="shop-2"), recognise).run()
+
+
+@pytest.mark.asyncio
+async def test_api_keeps_bulk_jobs_to_the_callers_shop(store, monkeypatch):
+    started = []
+    registry = BulkJobRegistry()
+    monkeypatch.setattr(registry, "start", lambda spec, process: started.append(spec) or BulkJob(spec, process))
+    monkeypatch.setattr(api, "bulk_jobs", registry)
+    service = types.SimpleNamespace(process_image=recognise)
+    monkeypatch.setattr(api.OCRService, "get_instance", classmethod(lambda cls: service))
+    user = {"user_id": "user-1", "shop_id": "shop-1"}
+
+    await api.start_bulk_job(BulkJobRequest(prefix=PREFIX, job_id="job-1"), user)
+    (spec,) = started
+    assert spec.result_prefix == "ocr-results/shop-1/job-1/"
+
+    forbidden = [
+        BulkJobRequest(prefix="uploads/shop-2/"),
+        BulkJobRequest(prefix="uploads/shop-1/../shop-2/"),
+        BulkJobRequest(prefix="uploads/"),
+        BulkJobRequest(prefix=PREFIX, bucket="other"),
+        BulkJobRequest(prefix=PREFIX, output_bucket="other"),
+        BulkJobRequest(prefix=PREFIX, output_prefix="ocr-results/shop-2"),
+        BulkJobRequest(prefix=PREFIX, output_prefix="ocr-results/shop-1/../shop-2"),
+    ]
+    for request in forbidden:
+        with pytest.raises(HTTPException) as error:
+            await api.start_bulk_job(request, user)
+        assert error.value.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_api_hides_other_shops_jobs(store, monkeypatch):
+    await fill(store)
+    registry = BulkJobRegistry()
+    monkeypatch.setattr(api, "bulk_jobs", registry)
+    stuck = asyncio.Event()
+
+    async def block(request):
+        stuck.set()
+        await asyncio.Event().wait()
+
+    registry.start(make_spec(), block)
+    await stuck.wait()
+    owner = {"user_id": "user-1", "shop_id": "shop-1"}
+    other = {"user_id": "user-2", "shop_id": "shop-2"}
+
+    assert (await api.get_bulk_job("job-1", None, owner)).state == "running"
+    for call in (api.get_bulk_job("job-1", None, other), api.cancel_bulk_job("job-1", other)):
+        with pytest.raises(HTTPException) as error:
+            await call
+        assert error.value.status_code == 404
+
+    assert (await api.cancel_bulk_job("job-1", owner)).state == "cancelling"
+    with pytest.raises(asyncio.CancelledError):
+        await registry._tasks[("shop-1", "job-1")]
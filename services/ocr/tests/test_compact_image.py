@@ -0,0 +1,88 @@
+"""Tests for the compact upload format in app/services/compact_image.py."""
+
+import struct
+
+import pytest
+from PIL import Image
+
+from app.models.schemas import OCRError
+from app.services.compact_image import (
+    HEADER_SIZE,
+    INFO_KEY,
+    Encoding,
+    decode_compact,
+    encode_compact,
+    is_compact,
+    parse_header,
+)
+
+_HEADER = struct.Struct("<4sBBBBHHHHHHHHI")
+
+
+def _header(**fields) -> bytes:
+    values = dict(
+        magic=b"ZKOC", version=1, encoding=Encoding.RAW, channels=1, reserved=0, width=4, height=2,
+        src_width=40, src_height=20, left=0, top=0, right=40, bottom=20, length=8,
+    )
+    values.update(fields)
+    return _HEADER.pack(*values.values())
+
+
+def test_parse_valid_header():
+    header = parse_header(_header(left=5, top=2, right=25, bottom=12), HEADER_SIZE + 8)
+
+    assert (header.width, header.height, header.length) == (4, 2, 8)
+    assert header.source_size == (40, 20)
+    assert header.crop == (5, 2, 25, 12)
+
+
+@pytest.mark.parametrize(
+    "fields, message",
+    [
+        (dict(magic=b"JPEG"), "Not a compact image"),
+        (dict(version=2), "Unsupported version"),
+        (dict(channels=3), "grayscale"),
+        (dict(encoding=7), "grayscale"),
+        (dict(width=0), "px per side"),
+        (dict(height=5000), "px per side"),
+        (dict(right=41), "Crop box"),
+        (dict(top=20), "Crop box"),
+        (dict(length=9), "Raw payload length"),
+    ],
+)
+def test_parse_rejects_invalid_header(fields, message):
+    with pytest.raises(OCRError) as error:
+        parse_header(_header(**fields))
+
+    assert error.value.code == "INVALID_COMPACT_IMAGE"
+    assert message in error.value.message
+
+
+def test_parse_rejects_truncated_and_mismatched_uploads():
+    with pytest.raises(OCRError, match="Truncated"):
+        parse_header(_header()[:10])
+    with pytest.raises(OCRError, match="does not match the upload"):
+        parse_header(_header(), HEADER_SIZE + 7)
+
+
+@pytest.mark.parametrize("encoding", [Encoding.RAW, Encoding.WEBP])
+def test_round_trip(encoding):
+    image = Image.linear_gradient("L").resize((64, 32))
+
+    data = encode_compact(image, source_size=(640, 480), crop=(10, 20, 330, 180), encoding=encoding)
+    decoded = decode_compact(data)
+
+    assert is_compact(data)
+    assert decoded.mode == "L" and decoded.size == (64, 32)
+    assert decoded.info[INFO_KEY]["crop"] == [10, 20, 330, 180]
+    if encoding == Encoding.RAW:
+        assert decoded.tobytes() == image.tobytes()
+
+
+def test_webp_payload_must_match_header():
+    data = bytearray(encode_compact(Image.new("L", (64, 32), 128)))
+    # Declare a different width than the WebP payload holds
+    struct.pack_into("<H", data, 8, 63)
+
+    with pytest.raises(OCRError, match="does not match its header"):
+        decode_compact(bytes(data))
@@ -0,0 +1,124 @@
+"""Tests for app/services/deadlines.py and the decoding stop on expiry."""
+
+import asyncio
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+from app.core.config import settings
+from app.services.deadlines import (
+    ClientDisconnected,
+    DeadlineExceeded,
+    check_deadline,
+    expire,
+    is_expired,
+    remaining_seconds,
+    resolve_deadline,
+    run_until_disconnected,
+)
+from app.services.generation import _expiry_stopping_criteria
+
+
+def test_resolve_deadline(monkeypatch):
+    monkeypatch.setattr(settings, "OCR_PROCESSING_TIMEOUT_SECONDS", 30)
+
+    assert resolve_deadline(None, 5.0, now=100.0) == 105.0
+    assert resolve_deadline("250", 5.0, now=100.0) == 100.25
+    # Capped by the processing timeout
+    assert resolve_deadline("600000", 5.0, now=100.0) == 130.0
+    with pytest.raises(ValueError):
+        resolve_deadline("0", 5.0)
+    with pytest.raises(ValueError):
+        resolve_deadline("soon", 5.0)
+
+
+@pytest.mark.parametrize("header", ["nan", "NaN", "inf", "-inf", "1e400"])
+def test_resolve_deadline_rejects_non_finite(header):
+    with pytest.raises(ValueError):
+        resolve_deadline(header, 5.0, now=100.0)
+
+
+def test_check_deadline(make_request):
+    check_deadline(make_request(), "decode")
+    check_deadline(make_request(deadline=time.time() + 60), "decode")
+
+    with pytest.raises(DeadlineExceeded) as exceeded:
+        check_deadline(make_request(deadline=time.time() - 1), "decoder")
+    assert exceeded.value.stage == "decoder"
+    assert exceeded.value.code == "DEADLINE_EXCEEDED"
+
+
+def test_expire_stops_at_next_check(make_request):
+    request = make_request(deadline=time.time() + 60)
+    assert remaining_seconds(request) > 59
+
+    expire(request)
+
+    assert is_expired(request)
+    assert remaining_seconds(request) < 0
+    with pytest.raises(DeadlineExceeded):
+        check_deadline(request, "barcode")
+
+
+@pytest.mark.asyncio
+async def test_run_until_disconnected_returns_result(monkeypatch):
+    monkeypatch.setattr(settings, "OCR_DISCONNECT_POLL_SECONDS", 0.01)
+
+    async def connected() -> bool:
+        return False
+
+    async def work() -> str:
+        await asyncio.sleep(0.03)
+        return "done"
+
+    assert await run_until_disconnected(connected, work()) == "done"
+
+
+@pytest.mark.asyncio
+async def test_disconnect_expires_work_in_executor_thread(make_request, monkeypatch):
+    monkeypatch.setattr(settings, "OCR_DISCONNECT_POLL_SECONDS", 0.01)
+    request = make_request(deadline=time.time() + 60)
+    stopped = threading.Event()
+
+    def generate() -> None:
+        # Like generate() polling its expiry stopping criterion per step
+        while not is_expired(request):
+            time.sleep(0.005)
+        stopped.set()
+
+    disconnected = False
+
+    async def is_disconnected() -> bool:
+        return disconnected
+
+    async def work() -> None:
+        await asyncio.get_running_loop().run_in_executor(None, generate)
+
+    async def client_leaves() -> None:
+        nonlocal disconnected
+        await asyncio.sleep(0.05)
+        disconnected = True
+
+    leaving = asyncio.create_task(client_leaves())
+    with pytest.raises(ClientDisconnected):
+        await run_until_disconnected(is_disconnected, work(), on_disconnect=lambda: expire(request))
+    await leaving
+
+    assert await asyncio.to_thread(stopped.wait, 1.0)
+
+
+def test_expiry_stopping_criterion(make_request, monkeypatch):
+    fake = types.ModuleType("transformers")
+    fake.StoppingCriteria = type("StoppingCriteria", (), {})
+    monkeypatch.setitem(sys.modules, "transformers", fake)
+    request = make_request(deadline=time.time() + 60)
+
+    criterion = _expiry_stopping_criteria(lambda: is_expired(request))
+
+    assert isinstance(criterion, fake.StoppingCriteria)
+    assert criterion(input_ids=None, scores=None) is False
+    expire(request)
+    assert criterion(input_ids=None, scores=None) is True
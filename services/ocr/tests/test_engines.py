@@ -0,0 +1,104 @@
+"""Tests for the lazy engine registry in app/services/engines.py."""
+
+import asyncio
+import threading
+
+import pytest
+
+from app.services.engines import EngineRegistry, EngineState
+
+
+@pytest.mark.asyncio
+async def test_blocking_loader_runs_off_the_event_loop():
+    release = threading.Event()
+    threads = []
+
+    def load_model():
+        threads.append(threading.current_thread())
+        release.wait(5)
+        return "trocr"
+
+    engines = EngineRegistry()
+    engines.register("trocr", load_model)
+    engines.load_in_background()
+    await asyncio.sleep(0.05)
+
+    # Still loading: lookups answer at once instead of waiting
+    assert engines.state("trocr") == EngineState.LOADING
+    assert engines.get("trocr") is None
+    assert not engines.all_required_ready()
+
+    release.set()
+    assert await engines.wait_for("trocr", timeout=5) == "trocr"
+    assert threads[0] is not threading.main_thread()
+    assert engines.is_ready("trocr")
+    assert engines.status()["trocr"]["load_seconds"] >= 0.05
+
+
+@pytest.mark.asyncio
+async def test_coroutine_loader_is_awaited_once():
+    calls = []
+
+    async def load_tesseract():
+        calls.append(1)
+        return "tesseract"
+
+    engines = EngineRegistry()
+    engines.register("tesseract", load_tesseract, required=False)
+
+    # wait_for starts a pending engine itself; later calls reuse the same load
+    results = await asyncio.gather(*(engines.wait_for("tesseract") for _ in range(3)))
+
+    assert results == ["tesseract"] * 3
+    assert calls == [1]
+
+
+@pytest.mark.asyncio
+async def test_failed_required_engine_blocks_readiness():
+    def broken():
+        raise RuntimeError("CUDA out of memory")
+
+    async def tesseract():
+        return "tesseract"
+
+    engines = EngineRegistry()
+    engines.register("trocr", broken)
+    engines.register("tesseract", tesseract, required=False)
+    engines.load_in_background()
+
+    assert await engines.wait_for("trocr", timeout=5) is None
+    await engines.wait_for("tesseract", timeout=5)
+
+    assert engines.state("trocr") == EngineState.FAILED
+    assert engines.status()["trocr"]["error"] == "CUDA out of memory"
+    assert not engines.all_required_ready()
+
+
+@pytest.mark.asyncio
+async def test_failed_optional_engine_does_not_block_readiness():
+    def broken():
+        raise ImportError("No module named 'pytesseract'")
+
+    engines = EngineRegistry()
+    engines.register("trocr", lambda: "trocr")
+    engines.register("tesseract", broken, required=False)
+    engines.load_in_background()
+    await engines.wait_for("trocr", timeout=5)
+    await engines.wait_for("tesseract", timeout=5)
+
+    assert engines.all_required_ready()
+    assert engines.get("tesseract") is None
+
+
+@pytest.mark.asyncio
+async def test_wait_for_gives_up_after_timeout():
+    release = threading.Event()
+    engines = EngineRegistry()
+    engines.register("trocr", lambda: release.wait(5))
+
+    assert await engines.wait_for("trocr", timeout=0.05) is None
+    assert await engines.wait_for("unknown") is None
+    assert "trocr" in engines and "unknown" not in engines
+
+    release.set()
+    assert await engines.wait_for("trocr", timeout=5) is True
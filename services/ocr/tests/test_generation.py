@@ -0,0 +1,59 @@
+"""Tests for the adaptive token budgets in app/services/generation.py."""
+
+from app.core.config import settings
+from app.services.generation import GenerationProfile
+
+
+def test_budget_fixed_until_enough_samples(monkeypatch):
+    monkeypatch.setattr(settings, "OCR_GENERATION_MIN_SAMPLES", 10)
+    profile = GenerationProfile("product", max_new_tokens=64)
+
+    profile.observe([5] * 9, profile.budget)
+
+    assert profile.budget == 64
+
+
+def test_budget_shrinks_to_p99_with_headroom(monkeypatch):
+    monkeypatch.setattr(settings, "OCR_GENERATION_MIN_SAMPLES", 10)
+    monkeypatch.setattr(settings, "OCR_GENERATION_HEADROOM", 0.25)
+    profile = GenerationProfile("product", max_new_tokens=64)
+
+    profile.observe([10] * 20, profile.budget)
+
+    # ceil(10 * 1.25) + 1
+    assert profile.budget == 14
+    assert profile.requests == 20
+    assert profile.truncations == 0
+
+
+def test_budget_respects_minimum(monkeypatch):
+    monkeypatch.setattr(settings, "OCR_GENERATION_MIN_SAMPLES", 10)
+    profile = GenerationProfile("product", max_new_tokens=64, min_new_tokens=8)
+
+    profile.observe([1] * 20, profile.budget)
+
+    assert profile.budget == 8
+
+
+def test_truncated_outputs_push_budget_back_up(monkeypatch):
+    monkeypatch.setattr(settings, "OCR_GENERATION_MIN_SAMPLES", 10)
+    monkeypatch.setattr(settings, "OCR_GENERATION_HEADROOM", 0.0)
+    profile = GenerationProfile("receipt", max_new_tokens=100)
+    profile.observe([10] * 20, profile.budget)
+    assert profile.budget == 11
+
+    # Outputs that hit the budget count as twice the budget
+    profile.observe([11] * 20, profile.budget)
+
+    assert profile.truncations == 20
+    assert profile.budget == 23
+
+
+def test_budget_fixed_when_adaptation_disabled(monkeypatch):
+    monkeypatch.setattr(settings, "OCR_GENERATION_ADAPTIVE", False)
+    monkeypatch.setattr(settings, "OCR_GENERATION_MIN_SAMPLES", 1)
+    profile = GenerationProfile("invoice", max_new_tokens=256)
+
+    profile.observe([4] * 50, profile.budget)
+
+    assert profile.budget == 256
@@ -0,0 +1,142 @@
+"""Tests for the background health snapshots in app/core/health.py."""
+
+import asyncio
+import time
+import types
+
+import pytest
+
+from app.core import health
+from app.core.config import settings
+from app.core.health import HealthMonitor
+
+START = 1_700_000_000.0
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [START]
+    monkeypatch.setattr(health, "time", types.SimpleNamespace(time=lambda: now[0], perf_counter=time.perf_counter))
+    return now
+
+
+def status(value):
+    async def check():
+        return {"status": value}
+
+    return check
+
+
+def make_monitor(**statuses) -> HealthMonitor:
+    monitor = HealthMonitor(interval_seconds=5.0, timeout_seconds=0.05)
+    statuses = {"database": "healthy", "redis": "healthy", "ocr_service": "ready", **statuses}
+    monitor._checks = {name: status(value) for name, value in statuses.items()}
+    return monitor
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "statuses, overall",
+    [
+        ({}, "healthy"),
+        ({"redis": "unhealthy"}, "degraded"),
+        ({"database": "unhealthy", "redis": "unhealthy"}, "degraded"),
+        ({"ocr_service": "not_ready"}, "unhealthy"),
+    ],
+)
+async def test_refresh_overall_status(clock, statuses, overall):
+    snapshot = await make_monitor(**statuses).refresh()
+
+    assert snapshot["status"] == overall
+    assert snapshot["timestamp"] == START
+
+
+@pytest.mark.asyncio
+async def test_slow_or_failing_checks_are_unhealthy(clock):
+    async def hang():
+        await asyncio.Event().wait()
+
+    async def fail():
+        raise ConnectionError("connection refused")
+
+    monitor = make_monitor()
+    monitor._checks.update(database=hang, redis=fail)
+
+    services = (await monitor.refresh())["services"]
+
+    assert services["database"]["status"] == "unhealthy"
+    assert "timed out" in services["database"]["error"]
+    assert (services["redis"]["status"], services["redis"]["error"]) == ("unhealthy", "connection refused")
+    assert services["ocr_service"]["status"] == "ready"
+
+
+@pytest.mark.asyncio
+async def test_snapshot_goes_stale_without_refreshes(clock):
+    monitor = make_monitor()
+    assert monitor.current()["status"] == "starting"
+    assert monitor.current()["age_seconds"] is None
+
+    await monitor.refresh()
+    clock[0] += 15
+    assert monitor.current() == {**monitor._snapshot, "age_seconds": 15.0}
+
+    # Three intervals without a refresh: the refresher is stuck
+    clock[0] += 0.1
+    assert monitor.current()["status"] == "stale"
+    assert monitor._snapshot["status"] == "healthy"
+
+
+@pytest.mark.asyncio
+async def test_readiness_follows_the_engines_not_shared_dependencies(clock):
+    monitor = make_monitor(database="unhealthy", redis="unhealthy")
+    assert not monitor.is_ready()
+
+    await monitor.refresh()
+    assert monitor.is_ready()
+
+    clock[0] += 16
+    assert not monitor.is_ready()
+
+    not_loaded = make_monitor(ocr_service="not_ready")
+    await not_loaded.refresh()
+    assert not not_loaded.is_ready()
+
+
+@pytest.mark.asyncio
+async def test_deep_diagnostics_are_shared_and_rate_limited(clock, monkeypatch):
+    monkeypatch.setattr(settings, "OCR_HEALTH_DEEP_MIN_INTERVAL_SECONDS", 10.0)
+    calls = []
+
+    async def system_health():
+        calls.append(clock[0])
+        await asyncio.sleep(0.01)
+        return {"status": "healthy", "timestamp": clock[0]}
+
+    monkeypatch.setattr(health, "get_system_health", system_health)
+    monitor = make_monitor()
+
+    first, second = await asyncio.gather(monitor.deep(), monitor.deep())
+    assert first is second
+    clock[0] += 9
+    assert await monitor.deep() is first
+    assert len(calls) == 1
+
+    clock[0] += 1
+    assert (await monitor.deep())["timestamp"] == START + 10
+    assert calls == [START, START + 10]
+
+
+@pytest.mark.asyncio
+async def test_background_loop_keeps_refreshing(clock):
+    monitor = make_monitor()
+    monitor.interval_seconds = 0.01
+    refreshed = []
+    monitor._checks["ocr_service"] = lambda: refreshed.append(1) or status("ready")()
+
+    monitor.start()
+    while len(refreshed) < 3:
+        await asyncio.sleep(0.005)
+    await monitor.stop()
+
+    assert monitor._task is None
+    assert monitor.current()["status"] == "healthy"
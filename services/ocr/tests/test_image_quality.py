@@ -0,0 +1,110 @@
+"""Tests for app/services/image_quality.py on synthetic pages."""
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw, ImageFilter
+
+from app.core.config import settings
+from app.services.image_quality import (
+    ImageRejected,
+    QualityReport,
+    Step,
+    analyze,
+    apply_steps,
+    check_readable
+)
+
+
+def page(ink=0, paper=255) -> Image.Image:
+    """Ten lines of word-like stroke groups, about as dense as a printed receipt."""
+    image = Image.new("L", (480, 360), paper)
+    draw = ImageDraw.Draw(image)
+    rng = np.random.default_rng(1)
+    for row in range(10):
+        x = 20
+        while x < 420:
+            width = int(rng.integers(3, 8)) * 6
+            for stroke in range(x, min(x + width, 460), 6):
+                draw.rectangle((stroke, 24 + row * 32, stroke + 2, 40 + row * 32), fill=ink)
+            x += width + 12
+    return image.convert("RGB")
+
+
+def add_noise(image: Image.Image, sigma: float) -> Image.Image:
+    pixels = np.asarray(image).astype(np.float32)
+    pixels += np.random.default_rng(0).normal(0, sigma, pixels.shape)
+    return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+
+
+def with_glare(image: Image.Image) -> Image.Image:
+    pixels = np.asarray(image).copy()
+    pixels[:100, :200] = 255
+    return Image.fromarray(pixels)
+
+
+@pytest.mark.parametrize(
+    "image, recipe",
+    [
+        (page(), "clean"),
+        # A flatbed scan: white paper is not glare
+        (page(ink=40), "clean"),
+        (add_noise(page(), 20), "denoise"),
+        (page(ink=150, paper=190), "contrast"),
+        (with_glare(page(ink=40, paper=200)), "threshold"),
+    ],
+    ids=["print", "scan", "noisy", "faded", "glare"],
+)
+def test_recipe_matches_the_defect(image, recipe):
+    report = analyze(image)
+
+    assert report.recipe == recipe
+    assert not report.blurry
+
+
+def test_select_steps_order_and_precedence():
+    soft = QualityReport(contrast=0.2, sharpness=60.0, noise=1.0, glare=0.2)
+    assert soft.steps == [Step.SHARPEN, Step.CONTRAST, Step.THRESHOLD]
+
+    # Never sharpen a noisy image, even a soft one
+    noisy = QualityReport(contrast=0.9, sharpness=60.0, noise=12.0, glare=0.0)
+    assert noisy.steps == [Step.DENOISE]
+    assert noisy.to_dict()["recipe"] == "denoise"
+
+
+def test_blurry_photo_is_rejected_with_a_hint():
+    report = analyze(page().filter(ImageFilter.GaussianBlur(4)))
+
+    assert report.blurry
+    with pytest.raises(ImageRejected) as error:
+        check_readable(report)
+    assert error.value.to_dict()["code"] == "IMAGE_TOO_BLURRY"
+    assert "retake" in error.value.hint
+
+
+def test_blur_rejection_can_be_turned_off(monkeypatch):
+    monkeypatch.setattr(settings, "OCR_QUALITY_REJECT_BLURRY", False)
+
+    check_readable(analyze(page().filter(ImageFilter.GaussianBlur(4))))
+
+
+def test_blank_page_is_not_called_blurry():
+    report = analyze(Image.new("RGB", (480, 360), "white"))
+
+    assert report.blank and not report.blurry
+    check_readable(report)
+
+
+def test_measurements_use_a_thumbnail(monkeypatch):
+    monkeypatch.setattr(settings, "OCR_QUALITY_MAX_SIDE", 240)
+    large = page().resize((1920, 1440), Image.Resampling.NEAREST)
+
+    assert analyze(large).recipe == "clean"
+
+
+def test_apply_steps():
+    image = page(ink=150, paper=190)
+
+    assert apply_steps(image, []) is image
+    processed = apply_steps(image, [Step.DENOISE, Step.CONTRAST, Step.THRESHOLD])
+    assert processed.mode == "RGB" and processed.size == image.size
+    assert set(np.unique(np.asarray(processed))) <= {0, 255}
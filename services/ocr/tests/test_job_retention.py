@@ -0,0 +1,145 @@
+"""Tests for job history partitioning and retention against a real Postgres.
+
+Set OCR_TEST_DATABASE_URL (e.g. postgresql://postgres@localhost:5432/postgres)
+to run them; every test works in a schema of its own that is dropped after.
+"""
+
+import asyncio
+import csv
+import gzip
+import io
+import os
+import uuid
+from datetime import date, datetime, timezone
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.core.config import settings
+from app.core.database import Base, OCRProcessingJob
+from app.core.partitions import (
+    JOB_TABLE,
+    LEGACY_TABLE,
+    attached_partitions,
+    ensure_partitions,
+    migrate_legacy_jobs,
+    prepare_job_table,
+    table_kind,
+)
+from app.services import job_retention
+from app.services.job_retention import archive_key, maintain_job_history
+from app.services.storage import LocalObjectStore
+
+DATABASE_URL = os.environ.get("OCR_TEST_DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(not DATABASE_URL, reason="OCR_TEST_DATABASE_URL not set")
+
+SHOP = "00000000-0000-0000-0000-000000000001"
+
+
+def _async_url(url: str) -> str:
+    return url.replace("postgresql://", "postgresql+asyncpg://")
+
+
+async def _execute(statement: str) -> None:
+    admin = create_async_engine(_async_url(DATABASE_URL), poolclass=NullPool)
+    async with admin.begin() as conn:
+        await conn.execute(text(statement))
+    await admin.dispose()
+
+
+@pytest.fixture
+def engine():
+    schema = f"ocr_test_{uuid.uuid4().hex[:12]}"
+    asyncio.run(_execute(f"CREATE SCHEMA {schema}"))
+    # No pooled connections outlive the test's event loop
+    yield create_async_engine(
+        _async_url(DATABASE_URL), poolclass=NullPool, connect_args={"server_settings": {"search_path": schema}}
+    )
+    asyncio.run(_execute(f"DROP SCHEMA {schema} CASCADE"))
+
+
+async def insert_job(conn, created_at: datetime) -> None:
+    await conn.execute(OCRProcessingJob.__table__.insert().values(
+        shop_id=SHOP, user_id=SHOP, status="completed", job_type="single", ocr_type="receipt",
+        image_url=f"uploads/{created_at:%Y%m%d}.jpg", image_size_bytes=2048, image_format="jpeg",
+        confidence_threshold=0.8, extract_barcodes=True, language="en",
+        extracted_text="Total 4.00", confidence_score=0.9, structured_data={"total_amount": 4.0},
+        detected_barcodes=[], processing_metadata={}, created_at=created_at, started_at=created_at,
+        completed_at=created_at, error_message="", processing_time_ms=120, model_used="trocr", queue_wait_time_ms=3,
+    ))
+
+
+async def count(conn, table: str) -> int:
+    return (await conn.execute(text(f"SELECT count(*) FROM {table}"))).scalar_one()
+
+
+@pytest.mark.asyncio
+async def test_legacy_rows_move_into_monthly_partitions(engine):
+    async with engine.begin() as conn:
+        # The job table as created before partitioning: same columns, keyed on id
+        # alone, plus a column since removed
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(text(f"ALTER TABLE {JOB_TABLE} RENAME TO model_jobs"))
+        await conn.execute(text(
+            f"CREATE TABLE {JOB_TABLE} (LIKE model_jobs INCLUDING DEFAULTS, retired_column text, PRIMARY KEY (id))"
+        ))
+        await conn.execute(text("DROP TABLE model_jobs"))
+        for created_at in (
+            datetime(2023, 1, 5, tzinfo=timezone.utc),
+            datetime(2023, 2, 28, 23, 30, tzinfo=timezone.utc),
+            datetime.now(timezone.utc),
+        ):
+            await insert_job(conn, created_at)
+
+    async with engine.begin() as conn:
+        await prepare_job_table(conn)
+        assert await table_kind(conn, LEGACY_TABLE) == "r"
+        await conn.run_sync(Base.metadata.create_all)
+        await ensure_partitions(conn, datetime.now(timezone.utc).date(), 1)
+
+        assert await migrate_legacy_jobs(conn) == 3
+
+        assert await table_kind(conn, LEGACY_TABLE) is None
+        assert await count(conn, JOB_TABLE) == 3
+        partitions = [name for name, _ in await attached_partitions(conn)]
+        assert partitions[:2] == ["ocr_processing_jobs_p2023_01", "ocr_processing_jobs_p2023_02"]
+        assert await count(conn, "ocr_processing_jobs_p2023_02") == 1
+        # Nothing left to move on the next start
+        assert await migrate_legacy_jobs(conn) == 0
+
+
+@pytest.mark.asyncio
+async def test_maintenance_archives_expired_months(engine, tmp_path, monkeypatch):
+    store = LocalObjectStore("ocr", root=str(tmp_path))
+    monkeypatch.setattr(job_retention, "engine", engine)
+    monkeypatch.setattr(job_retention, "get_object_store", lambda bucket=None: store)
+    monkeypatch.setattr(settings, "OCR_JOB_RETENTION_MONTHS", 13)
+    monkeypatch.setattr(settings, "OCR_JOB_PARTITIONS_AHEAD", 1)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await ensure_partitions(conn, date(2023, 1, 1), 1)
+        for day in (3, 17):
+            await insert_job(conn, datetime(2023, 1, day, tzinfo=timezone.utc))
+        await insert_job(conn, datetime(2023, 2, 10, tzinfo=timezone.utc))
+
+    report = await maintain_job_history(date(2024, 3, 15))
+
+    assert report["created"] == ["ocr_processing_jobs_p2024_03", "ocr_processing_jobs_p2024_04"]
+    assert report["detached"] == ["ocr_processing_jobs_p2023_01"]
+    (archived,) = report["archived"]
+    assert archived["rows"] == 2
+    assert archived["key"] == archive_key("ocr_processing_jobs_p2023_01")
+
+    rows = list(csv.DictReader(io.StringIO(gzip.decompress(await store.get_bytes(archived["key"])).decode())))
+    assert [row["image_url"] for row in rows] == ["uploads/20230103.jpg", "uploads/20230117.jpg"]
+    async with engine.connect() as conn:
+        assert await table_kind(conn, "ocr_processing_jobs_p2023_01") is None
+        # February is still inside the retention window
+        assert await count(conn, JOB_TABLE) == 1
+
+    # A second run has nothing left to do
+    assert await maintain_job_history(date(2024, 3, 15)) == {"created": [], "detached": [], "archived": []}
@@ -0,0 +1,64 @@
+"""Tests for app/services/model_registry.py."""
+
+import asyncio
+
+import pytest
+
+from app.services.model_registry import LoadedModel, ModelRegistry, parse_model_routes
+
+
+def _registry(budget_bytes: int = 0) -> ModelRegistry:
+    def load(model_id: str) -> LoadedModel:
+        return LoadedModel(model_id, processor=None, model=None, device="cpu", memory_bytes=100)
+
+    return ModelRegistry(load, default_model="printed", budget_bytes=budget_bytes)
+
+
+@pytest.mark.asyncio
+async def test_leased_model_is_resident_when_loads_race():
+    registry = _registry(budget_bytes=100)
+    leased = []
+
+    async def use(model_id: str) -> None:
+        async with registry.lease(model_id) as loaded:
+            leased.append(model_id)
+            assert registry.is_resident(model_id)
+            assert loaded.model_id == model_id
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(use("printed"), use("handwritten"), use("printed"))
+
+    assert sorted(leased) == ["handwritten", "printed", "printed"]
+
+
+@pytest.mark.asyncio
+async def test_idle_model_is_evicted_to_fit_budget():
+    registry = _registry(budget_bytes=150)
+
+    async with registry.lease("printed"):
+        pass
+    async with registry.lease("handwritten"):
+        assert not registry.is_resident("printed")
+    assert registry.resident_bytes == 100
+
+
+@pytest.mark.asyncio
+async def test_leased_model_is_never_evicted():
+    registry = _registry(budget_bytes=150)
+
+    async with registry.lease("printed"):
+        async with registry.lease("handwritten"):
+            assert registry.is_resident("printed")
+            assert registry.is_resident("handwritten")
+
+
+def test_routes():
+    registry = _registry()
+    registry.routes = parse_model_routes("receipt=base,handwritten:*=hand,*:ar=arabic")
+
+    assert registry.resolve("receipt") == "base"
+    assert registry.resolve("handwritten", "fr") == "hand"
+    assert registry.resolve("product", "ar") == "arabic"
+    assert registry.resolve("product") == "printed"
+    with pytest.raises(ValueError):
+        parse_model_routes("receipt=")
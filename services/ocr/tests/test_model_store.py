@@ -0,0 +1,136 @@
+"""Tests for the local artifact store in app/services/model_store.py."""
+
+import json
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+from app.core.config import settings
+from app.services import model_store
+from app.services.model_store import ModelStoreError
+
+MODEL_ID = "microsoft/trocr-small-printed"
+
+
+class _FakePretrained:
+    """Stands in for the hub classes: writes a small artifact on save."""
+
+    files = {}
+
+    def __init__(self) -> None:
+        self.config = types.SimpleNamespace(_commit_hash="3f1a9c0e2b7d5a6b")
+
+    @classmethod
+    def from_pretrained(cls, model_id, revision="main"):
+        return cls()
+
+    def save_pretrained(self, directory, **options):
+        for name, data in self.files.items():
+            (Path(directory) / name).write_bytes(data)
+
+
+class _FakeModel(_FakePretrained):
+    files = {"config.json": b"{}", "model.safetensors": b"weights"}
+
+
+class _FakeProcessor(_FakePretrained):
+    files = {"preprocessor_config.json": b"{}"}
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "OCR_MODEL_STORE_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "OCR_MODEL_VERSION", None)
+    monkeypatch.setattr(settings, "OCR_MODEL_OFFLINE", True)
+    fake = types.ModuleType("transformers")
+    fake.VisionEncoderDecoderModel = _FakeModel
+    fake.TrOCRProcessor = _FakeProcessor
+    monkeypatch.setitem(sys.modules, "transformers", fake)
+    return tmp_path
+
+
+def test_missing_model_is_an_error_offline(store):
+    with pytest.raises(ModelStoreError):
+        model_store.resolve_model_source(MODEL_ID)
+
+
+def test_missing_model_resolves_to_hub_online(store, monkeypatch):
+    monkeypatch.setattr(settings, "OCR_MODEL_OFFLINE", False)
+
+    assert model_store.resolve_model_source(MODEL_ID) == MODEL_ID
+
+
+def test_fetch_activate_resolve(store):
+    path = model_store.fetch(MODEL_ID)
+
+    assert path == store / "microsoft--trocr-small-printed" / "3f1a9c0e2b7d"
+    assert model_store.resolve_model_source(MODEL_ID) == str(path)
+    manifest = json.loads((path / "manifest.json").read_text())
+    assert manifest["format"] == "safetensors"
+    assert set(manifest["files"]) == {"config.json", "model.safetensors", "preprocessor_config.json"}
+    assert model_store.artifact_bytes(MODEL_ID) == len(b"weights")
+    assert model_store.verify(MODEL_ID)["version"] == "3f1a9c0e2b7d"
+    # No staging directory is left behind
+    assert sorted(p.name for p in path.parent.iterdir()) == ["3f1a9c0e2b7d", "CURRENT"]
+
+    second = model_store.fetch(MODEL_ID, version="v2", make_active=False)
+    assert model_store.list_versions(MODEL_ID) == ["3f1a9c0e2b7d", "v2"]
+    assert model_store.resolve_model_source(MODEL_ID) == str(path)
+
+    model_store.activate(MODEL_ID, "v2")
+    assert model_store.active_version(MODEL_ID) == "v2"
+    assert model_store.resolve_model_source(MODEL_ID) == str(second)
+
+
+def test_pinned_version_wins_over_current(store, monkeypatch):
+    first = model_store.fetch(MODEL_ID, version="v1")
+    model_store.fetch(MODEL_ID, version="v2")
+    monkeypatch.setattr(settings, "OCR_MODEL_VERSION", "v1")
+
+    assert model_store.resolve_model_source(MODEL_ID) == str(first)
+
+
+def test_fetch_refuses_existing_version(store):
+    model_store.fetch(MODEL_ID, version="v1")
+
+    with pytest.raises(ModelStoreError):
+        model_store.fetch(MODEL_ID, version="v1")
+
+
+def test_activate_unknown_version(store):
+    with pytest.raises(ModelStoreError):
+        model_store.activate(MODEL_ID, "missing")
+
+
+def test_verify_detects_tampering(store):
+    path = model_store.fetch(MODEL_ID)
+    (path / "model.safetensors").write_bytes(b"tampered")
+
+    with pytest.raises(ModelStoreError, match="model.safetensors"):
+        model_store.verify(MODEL_ID)
+
+
+def test_mapped_state_dict(tmp_path):
+    torch = pytest.importorskip("torch")
+    safetensors_torch = pytest.importorskip("safetensors.torch")
+    safetensors_torch.save_file({"weight": torch.arange(6.0).reshape(2, 3)}, str(tmp_path / "model.safetensors"))
+
+    state = model_store.mapped_state_dict(tmp_path)
+
+    assert list(state) == ["weight"]
+    assert state["weight"].tolist() == [[0.0, 1.0, 2.0], [3.0, 4.0, 5.0]]
+    assert model_store.mapped_state_dict(tmp_path / "empty") == {}
+
+
+def test_cli_output(store, capsys):
+    assert model_store.main(["fetch", MODEL_ID, "--version", "v1"]) == 0
+    assert model_store.main(["list"]) == 0
+    assert model_store.main(["activate", MODEL_ID, "missing"]) == 1
+
+    out, err = capsys.readouterr()
+    lines = out.splitlines()
+    assert f"Stored {MODEL_ID} at {store / 'microsoft--trocr-small-printed' / 'v1'}" in lines
+    assert f"* {MODEL_ID} v1" in lines
+    assert err.startswith("error: Version missing")
@@ -0,0 +1,175 @@
+"""Tests for how app/services/ocr_service.py runs the pipeline."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+from PIL import Image
+
+from app.core.config import settings
+from app.core.monitoring import StageTimer
+from app.models.schemas import OCRResult
+from app.services import ocr_service
+from app.services.admission import ProcessingMode
+from app.services.model_registry import LoadedModel, ModelRegistry
+from app.services.ocr_service import OCRService
+
+
+@pytest.fixture
+def service(monkeypatch):
+    service = OCRService()
+    service.models = ModelRegistry(
+        lambda model_id: LoadedModel(model_id, processor=None, model=None, device="cpu", memory_bytes=1),
+        default_model="printed",
+    )
+    monkeypatch.setattr(service, "is_ready", lambda: True)
+    yield service
+    service.executor.shutdown(wait=True)
+
+
+@pytest.mark.asyncio
+async def test_inference_runs_off_the_event_loop(service, make_request, monkeypatch):
+    threads = []
+
+    def recognise(loaded, image, profile, request, timer):
+        threads.append(threading.current_thread().name)
+        time.sleep(0.2)
+        return "Milk 3.50"
+
+    monkeypatch.setattr(service, "_recognise_image", recognise)
+    ticks = 0
+
+    async def tick() -> None:
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    ticker = asyncio.create_task(tick())
+    result = await service._extract_text_with_primary_model(
+        Image.new("RGB", (32, 32)), make_request(), StageTimer("product")
+    )
+    ticker.cancel()
+
+    assert result.text == "Milk 3.50"
+    assert threads[0].startswith("ocr-inference")
+    # The loop kept running while the model did
+    assert ticks >= 5
+
+
+@pytest.mark.asyncio
+async def test_deadline_fires_while_model_runs(service, make_request, monkeypatch):
+    def recognise(loaded, image, profile, request, timer):
+        time.sleep(0.5)
+        return "late"
+
+    monkeypatch.setattr(service, "_recognise_image", recognise)
+    started = time.perf_counter()
+
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(
+            service._extract_text_with_primary_model(Image.new("RGB", (32, 32)), make_request(), StageTimer("product")),
+            timeout=0.05,
+        )
+
+    assert time.perf_counter() - started < 0.3
+
+
+@pytest.mark.asyncio
+async def test_executor_is_bounded_by_workers(make_request, monkeypatch):
+    monkeypatch.setattr(settings, "OCR_WORKERS", 2)
+    service = OCRService()
+    running = peak = 0
+    lock = threading.Lock()
+
+    def work() -> None:
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.05)
+        with lock:
+            running -= 1
+
+    await asyncio.gather(*(service._run_blocking(work) for _ in range(6)))
+    service.executor.shutdown(wait=True)
+
+    assert peak == 2
+
+
+@pytest.mark.parametrize("caching, expected", [(True, True), (False, False)])
+def test_replica_lease_requires_result_cache(monkeypatch, caching, expected):
+    monkeypatch.setattr(settings, "OCR_SINGLEFLIGHT_REDIS_LEASE", True)
+    monkeypatch.setattr(settings, "ENABLE_MODEL_CACHING", caching)
+
+    service = OCRService()
+    service.executor.shutdown()
+
+    assert service.replica_lease is expected
+
+
+@pytest.mark.asyncio
+async def test_flight_without_lease_runs_locally(service, make_request, monkeypatch):
+    service.replica_lease = False
+
+    async def process(request):
+        return "local"
+
+    def no_lease(*args):
+        raise AssertionError("replica lease used")
+
+    monkeypatch.setattr(service, "_admit_and_process", process)
+    monkeypatch.setattr("app.services.ocr_service.replica_lease", no_lease)
+
+    assert await service._run_flight(make_request()) == "local"
+
+
+@pytest.mark.asyncio
+async def test_cache_hit_skips_admission_and_slots(service, make_request, monkeypatch):
+    async def cached(shop_id, content_key):
+        return OCRResult(id="cached", text="Milk 3.50", model_used="printed").to_dict()
+
+    def no_slot(*args):
+        raise AssertionError("cache hit took an execution slot")
+
+    monkeypatch.setattr(ocr_service, "get_cached_ocr_result", cached)
+    monkeypatch.setattr(service.scheduler, "slot", no_slot)
+    before = dict(service.admission.service_seconds)
+
+    result = await service._admit_and_process(make_request(content_key="key", deadline=time.time() + 5))
+
+    assert result.id == "cached"
+    assert service.admission.service_seconds == before
+    assert service.admission.decisions == {}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "mode, cached",
+    [(ProcessingMode.FULL, True), (ProcessingMode.FALLBACK_ONLY, False), (ProcessingMode.BARCODE_ONLY, False)],
+)
+async def test_only_full_quality_results_are_cached(service, make_request, monkeypatch, mode, cached):
+    stored = []
+
+    async def store(shop_id, content_key, result):
+        stored.append(content_key)
+
+    async def preprocess(request, timer):
+        return Image.new("RGB", (32, 32))
+
+    async def recognise(*args):
+        return OCRResult(id="result", text="Milk 3.50", model_used="printed")
+
+    async def no_barcodes(image):
+        return []
+
+    monkeypatch.setattr(ocr_service, "cache_ocr_result", store)
+    monkeypatch.setattr(service, "_validate_and_preprocess_image", preprocess)
+    monkeypatch.setattr(service, "_extract_text_with_primary_model", recognise)
+    monkeypatch.setattr(service, "_process_with_fallback", recognise)
+    monkeypatch.setattr(service, "_detect_barcodes", no_barcodes)
+
+    await service._process_image(make_request(content_key="key", extract_barcodes=False), mode)
+
+    assert stored == (["key"] if cached else [])
@@ -0,0 +1,112 @@
+"""Tests for app/services/orientation.py on rendered text."""
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw, ImageFont
+
+from app.core.config import settings
+from app.services.orientation import (
+    _baseline_signal,
+    _best_angle,
+    correct_orientation,
+    estimate_orientation,
+    ink_mask
+)
+
+FONT_DIR = Path("/usr/share/fonts/truetype/dejavu")
+
+pytestmark = pytest.mark.skipif(not (FONT_DIR / "DejaVuSans.ttf").is_file(), reason="DejaVu fonts not installed")
+
+RECEIPT = ["Rahman Store", "Rice 5kg 420.00", "Lentils 1kg 135.50", "Soybean Oil 2L 310.00", "Total Tk 865.50"]
+
+
+def render(lines, size=28, width=None, font="DejaVuSans.ttf", line_height=1.5) -> Image.Image:
+    face = ImageFont.truetype(str(FONT_DIR / font), size)
+    width = width or max(int(face.getlength(line)) for line in lines) + 2 * size
+    image = Image.new("RGB", (width, int(size * (line_height * len(lines) + 1))), "white")
+    draw = ImageDraw.Draw(image)
+    for index, line in enumerate(lines):
+        draw.text((size, size // 2 + index * int(size * line_height)), line, font=face, fill="black")
+    return image
+
+
+def invoice_page() -> Image.Image:
+    rng = np.random.default_rng(0)
+    products = ["Rice 5kg", "Lentils 1kg", "Sugar", "Milk Powder", "Tea 400g", "Biscuits", "Salt 1kg", "Flour"]
+    lines = ["Karim Traders Ltd", "Invoice No: INV-2024-0042", "Date: 2024-03-18"]
+    lines += [f"{rng.choice(products)}  {rng.integers(1, 20)} x {rng.uniform(5, 500):.2f}" for _ in range(30)]
+    return render(lines, size=18, width=1240, font="DejaVuSerif.ttf")
+
+
+def turn(image: Image.Image, degrees: float) -> Image.Image:
+    return image.rotate(degrees, expand=True, fillcolor="white", resample=Image.Resampling.BILINEAR)
+
+
+@pytest.mark.parametrize(
+    "image",
+    [render(["Milk 1L  Tk 85.00"], size=32), render(RECEIPT, size=22), invoice_page()],
+    ids=["label", "receipt", "invoice"],
+)
+def test_upright_text_is_left_alone(image):
+    orientation = estimate_orientation(image)
+
+    assert orientation.rotation == 0
+    assert orientation.skew == 0.0
+    assert not orientation.corrected
+
+
+@pytest.mark.parametrize("turned, rotation", [(90, 270), (180, 180), (270, 90)])
+@pytest.mark.parametrize("make", [lambda: render(RECEIPT, size=22), invoice_page], ids=["receipt", "invoice"])
+def test_turned_text_rotation(make, turned, rotation):
+    assert estimate_orientation(turn(make(), turned)).rotation == rotation
+
+
+@pytest.mark.parametrize("skew", [-6.0, 4.0])
+def test_skewed_text(skew):
+    orientation = estimate_orientation(turn(render(RECEIPT, size=22), skew))
+
+    assert orientation.rotation == 0
+    assert orientation.skew == pytest.approx(-skew, abs=0.5)
+
+
+def test_skew_search_stays_within_range(monkeypatch):
+    monkeypatch.setattr(settings, "OCR_ORIENTATION_MAX_SKEW_DEGREES", 3.0)
+    mask = ink_mask(turn(render(RECEIPT, size=22), 8.0), 512)
+
+    skew, _ = _best_angle(mask, 3.0)
+
+    assert -3.0 <= skew <= 3.0
+    assert abs(estimate_orientation(turn(render(RECEIPT, size=22), 8.0)).skew) <= 3.0
+
+
+def test_baseline_signal_sign():
+    mask = ink_mask(render(RECEIPT, size=22), 1024)
+
+    assert _baseline_signal(mask) > 0
+    assert _baseline_signal(np.ascontiguousarray(np.rot90(mask, 2))) < 0
+
+
+def test_capitals_give_no_direction():
+    capitals = render(["RICE 5KG 420.00", "TOTAL TK 865.50"], size=28)
+
+    assert estimate_orientation(turn(capitals, 180)).rotation == 0
+    # Sideways, but which way up is unknown: not turned at all
+    assert estimate_orientation(turn(capitals, 90)).rotation == 0
+
+
+def test_scripts_without_baseline_are_not_turned():
+    assert estimate_orientation(turn(render(RECEIPT, size=22), 90), language="bn").rotation == 0
+    assert estimate_orientation(turn(render(RECEIPT, size=22), 180), language="bn").rotation == 0
+
+
+def test_blank_page_is_not_rotated():
+    assert not estimate_orientation(Image.new("L", (300, 200), 255)).corrected
+
+
+def test_correct_orientation_returns_upright_image():
+    corrected, orientation = correct_orientation(turn(invoice_page(), 180))
+
+    assert orientation.rotation == 180
+    assert estimate_orientation(corrected).rotation == 0
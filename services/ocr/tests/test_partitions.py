@@ -0,0 +1,104 @@
+"""Tests for the partition helpers in app/core/partitions.py."""
+
+from datetime import date
+
+import pytest
+
+from app.core.partitions import (
+    ERROR_LOG_JOB_INDEX,
+    add_months,
+    ensure_error_log_index,
+    expired_partitions,
+    month_start,
+    partition_month,
+    partition_name,
+)
+from app.services.job_retention import archive_key
+
+
+def test_month_start():
+    assert month_start(date(2024, 2, 29)) == date(2024, 2, 1)
+
+
+@pytest.mark.parametrize(
+    "month, months, expected",
+    [
+        (date(2024, 1, 1), 1, date(2024, 2, 1)),
+        (date(2024, 12, 1), 1, date(2025, 1, 1)),
+        (date(2024, 1, 1), -1, date(2023, 12, 1)),
+        (date(2024, 3, 1), -27, date(2021, 12, 1)),
+    ],
+)
+def test_add_months(month, months, expected):
+    assert add_months(month, months) == expected
+
+
+def test_partition_name_round_trip():
+    name = partition_name(date(2024, 7, 1))
+
+    assert name == "ocr_processing_jobs_p2024_07"
+    assert partition_month(name) == date(2024, 7, 1)
+    assert partition_month("ocr_processing_jobs_legacy") is None
+    assert partition_month("ocr_processing_jobs_p2024_7") is None
+
+
+def test_expired_partitions_keep_retention_window():
+    names = [partition_name(date(2023, month, 1)) for month in range(1, 13)] + ["ocr_processing_jobs_legacy"]
+
+    # 13 months back from 2024-03 is 2023-02: January 2023 is the only whole month before it
+    assert expired_partitions(names, date(2024, 3, 15), 13) == ["ocr_processing_jobs_p2023_01"]
+    assert expired_partitions(names, date(2024, 3, 15), 3) == names[:11]
+
+
+def test_archive_key(monkeypatch):
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "OCR_JOB_ARCHIVE_PREFIX", "archive/")
+
+    assert archive_key("ocr_processing_jobs_p2023_01") == "archive/ocr_processing_jobs/2023/ocr_processing_jobs_p2023_01.csv.gz"
+
+
+class _Result:
+    def __init__(self, value):
+        self.value = value
+
+    def scalar_one_or_none(self):
+        return self.value
+
+
+class _Connection:
+    """Records statements; answers the index validity lookup."""
+
+    def __init__(self, valid):
+        self.valid = valid
+        self.statements = []
+
+    async def execute(self, statement, parameters=None):
+        self.statements.append(str(statement))
+        return _Result(self.valid)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "valid, expected",
+    [
+        (None, ["CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_ocr_error_logs_job_id ON ocr_error_logs (job_id)"]),
+        (True, []),
+        (False, [
+            "DROP INDEX CONCURRENTLY IF EXISTS ix_ocr_error_logs_job_id",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_ocr_error_logs_job_id ON ocr_error_logs (job_id)",
+        ]),
+    ],
+)
+async def test_ensure_error_log_index(valid, expected):
+    conn = _Connection(valid)
+
+    await ensure_error_log_index(conn)
+
+    assert conn.statements[1:] == expected
+
+
+def test_error_log_index_name_matches_model():
+    from app.core.database import OCRErrorLog
+
+    assert ERROR_LOG_JOB_INDEX in {index.name for index in OCRErrorLog.__table__.indexes}
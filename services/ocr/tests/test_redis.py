@@ -0,0 +1,134 @@
+"""Tests for key placement in app/core/redis.py."""
+
+from collections import Counter
+
+import pytest
+
+from app.core.config import settings
+from app.core.redis import HashRing, hash_tag, node_name, shop_tag
+
+NODES = ["redis-a:6379/0", "redis-b:6379/0", "redis-c:6379/0"]
+SHOPS = [f"shop-{n}" for n in range(3000)]
+
+
+def test_hash_tag_follows_cluster_rules():
+    assert hash_tag("rate_limit:{shop:42}:user:7") == "shop:42"
+    assert hash_tag("plain-key") == "plain-key"
+    assert hash_tag("empty:{}:tag") == "empty:{}:tag"
+    assert hash_tag(shop_tag("42")) == "shop:42"
+
+
+def test_node_name_hides_credentials():
+    assert node_name("redis://:secret@cache-1:6380/2") == "cache-1:6380/2"
+    assert node_name("redis://localhost") == "localhost:6379/0"
+
+
+def test_ring_needs_nodes():
+    with pytest.raises(ValueError):
+        HashRing([], 160)
+
+
+def test_shops_spread_evenly():
+    ring = HashRing(NODES, 160)
+
+    counts = Counter(ring.node_for(shop_tag(shop)) for shop in SHOPS)
+
+    assert set(counts) == set(NODES)
+    for count in counts.values():
+        assert abs(count - len(SHOPS) / 3) < len(SHOPS) * 0.06
+
+
+def test_keys_of_one_shop_share_a_node():
+    ring = HashRing(NODES, 160)
+    tag = shop_tag("shop-7")
+
+    assert len({ring.node_for(f"rate_limit:{tag}:user:{user}") for user in range(50)} | {ring.node_for(f"{tag}:ocr")}) == 1
+
+
+def test_adding_a_node_moves_about_one_in_n_shops():
+    before = HashRing(NODES, 160)
+    after = HashRing(NODES + ["redis-d:6379/0"], 160)
+
+    moved = [shop for shop in SHOPS if before.node_for(shop_tag(shop)) != after.node_for(shop_tag(shop))]
+
+    assert 0.15 < len(moved) / len(SHOPS) < 0.35
+    assert all(after.node_for(shop_tag(shop)) == "redis-d:6379/0" for shop in moved)
+
+
+class _FakeQueue:
+    """The list commands of one Redis node."""
+
+    def __init__(self, lists):
+        self.lists = lists
+
+    async def lpush(self, key, value):
+        self.lists.setdefault(key, []).insert(0, value)
+
+    async def rpop(self, key):
+        items = self.lists.get(key)
+        return items.pop() if items else None
+
+    async def llen(self, key):
+        return len(self.lists.get(key, []))
+
+    def pipeline(self, transaction=False):
+        node = self
+
+        class Pipeline:
+            def __init__(self):
+                self.calls = []
+
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            def llen(self, key):
+                self.calls.append(key)
+
+            async def execute(self):
+                return [len(node.lists.get(key, [])) for key in self.calls]
+
+        return Pipeline()
+
+
+@pytest.mark.asyncio
+async def test_legacy_queue_is_drained_first(monkeypatch):
+    from app.core import redis as redis_module
+
+    node = _FakeQueue({"ocr:queue:high": ["old-2", "old-1"]})
+    monkeypatch.setattr(redis_module, "_client", lambda role, key: node)
+    monkeypatch.setattr(redis_module, "_legacy_queues_drained", {})
+
+    await redis_module.add_to_processing_queue("new-1", "high")
+    assert (await redis_module.get_queue_length())["high"] == 3
+
+    popped = [await redis_module.get_next_job_id("high") for _ in range(4)]
+
+    assert popped == ["old-1", "old-2", "new-1", None]
+    assert set(redis_module._legacy_queues_drained) == {"high", "normal"}
+    # Once drained, the legacy key is not read again until the recheck is due
+    node.lists["ocr:queue:high"] = ["late"]
+    assert (await redis_module.get_queue_length())["high"] == 0
+
+
+@pytest.mark.asyncio
+async def test_drained_legacy_queue_is_rechecked(monkeypatch):
+    from app.core import redis as redis_module
+
+    node = _FakeQueue({})
+    monkeypatch.setattr(redis_module, "_client", lambda role, key: node)
+    monkeypatch.setattr(redis_module, "_legacy_queues_drained", {})
+    monkeypatch.setattr(settings, "REDIS_LEGACY_QUEUE_RECHECK_SECONDS", 60.0)
+
+    assert await redis_module.get_next_job_id("high") is None
+    # An older replica still running during the rollout queues more work
+    node.lists["ocr:queue:high"] = ["late"]
+    assert await redis_module.get_next_job_id("high") is None
+
+    # A minute later the legacy key is read again
+    redis_module._legacy_queues_drained["high"] -= 61
+    assert (await redis_module.get_queue_length())["high"] == 1
+    assert await redis_module.get_next_job_id("high") == "late"
+    assert await redis_module.get_next_job_id("high") is None
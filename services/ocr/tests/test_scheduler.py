@@ -0,0 +1,235 @@
+"""Tests for the fair-share scheduler in app/services/scheduler.py."""
+
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.services.scheduler import FairScheduler, Lane, _Job, _LaneQueue, _Tenant, parse_tenant_weights
+
+
+def _drain(lane: _LaneQueue, quantum: float = 1.0):
+    order = []
+    while (picked := lane.next_job(quantum)) is not None:
+        order.append(picked[0].shop_id)
+    return order
+
+
+@pytest.mark.asyncio
+async def test_drr_alternates_between_shops():
+    lane = _LaneQueue("interactive")
+    bulk, small = _Tenant("bulk", 1.0), _Tenant("small", 1.0)
+    for _ in range(4):
+        lane.enqueue(bulk, _Job("bulk", 1.0))
+    for _ in range(2):
+        lane.enqueue(small, _Job("small", 1.0))
+
+    assert _drain(lane) == ["bulk", "small", "bulk", "small", "bulk", "bulk"]
+
+
+@pytest.mark.asyncio
+async def test_drr_shares_by_weight():
+    lane = _LaneQueue("bulk")
+    heavy, light = _Tenant("heavy", 2.0), _Tenant("light", 1.0)
+    for _ in range(4):
+        lane.enqueue(heavy, _Job("heavy", 1.0))
+        lane.enqueue(light, _Job("light", 1.0))
+
+    assert _drain(lane)[:6] == ["heavy", "heavy", "light", "heavy", "heavy", "light"]
+
+
+@pytest.mark.asyncio
+async def test_drr_expensive_job_waits_for_enough_deficit():
+    lane = _LaneQueue("bulk")
+    batch, scan = _Tenant("batch", 1.0), _Tenant("scan", 1.0)
+    lane.enqueue(batch, _Job("batch", 3.0))
+    for _ in range(3):
+        lane.enqueue(scan, _Job("scan", 1.0))
+
+    # The 3-unit job needs three rounds of credit before it may start
+    assert _drain(lane) == ["scan", "scan", "batch", "scan"]
+
+
+@pytest.mark.asyncio
+async def test_idle_shop_does_not_bank_credit():
+    lane = _LaneQueue("interactive")
+    shop = _Tenant("shop", 1.0)
+    lane.enqueue(shop, _Job("shop", 1.0))
+
+    assert lane.next_job(5.0)[0] is shop
+    assert shop.deficit == 0.0
+    assert lane.next_job(5.0) is None
+
+
+@pytest.mark.asyncio
+async def test_withdraw_removes_waiting_job():
+    lane = _LaneQueue("interactive")
+    shop = _Tenant("shop", 1.0)
+    job = _Job("shop", 1.0)
+    lane.enqueue(shop, job)
+
+    assert lane.withdraw(shop, job)
+    assert not lane.withdraw(shop, job)
+    assert lane.queued == 0
+    assert lane.next_job(1.0) is None
+
+
+def test_parse_tenant_weights():
+    assert parse_tenant_weights(" shop-a=4, shop-b=0.5 ,") == {"shop-a": 4.0, "shop-b": 0.5}
+    with pytest.raises(ValueError):
+        parse_tenant_weights("shop-a=x")
+    with pytest.raises(ValueError):
+        parse_tenant_weights("shop-a=0")
+
+
+class _Jobs:
+    """Requests holding scheduler slots until the test finishes them."""
+
+    def __init__(self, scheduler: FairScheduler) -> None:
+        self.scheduler = scheduler
+        self.granted = []
+        self.max_bulk_running = 0
+        self._done = {}
+        self.tasks = {}
+
+    async def submit(self, name: str, shop_id: str, lane: str) -> None:
+        done = self._done[name] = asyncio.Event()
+
+        async def run() -> None:
+            async with self.scheduler.slot(shop_id, lane):
+                self.granted.append(name)
+                self.max_bulk_running = max(self.max_bulk_running, self.scheduler._lanes[Lane.BULK].running)
+                await done.wait()
+
+        self.tasks[name] = asyncio.create_task(run())
+        await _settle()
+
+    async def finish(self, name: str) -> None:
+        self._done[name].set()
+        await _settle()
+
+
+async def _settle() -> None:
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_interactive_goes_first_and_keeps_reserved_slot(monkeypatch):
+    monkeypatch.setattr(settings, "OCR_BULK_WORK_STEALING", False)
+    jobs = _Jobs(FairScheduler(slots=3, weights={}, default_weight=1.0, reserved_interactive=1))
+
+    for n in range(1, 5):
+        await jobs.submit(f"bulk{n}", "importer", Lane.BULK)
+    # The reserved slot stays free for the till
+    assert jobs.granted == ["bulk1", "bulk2"]
+    assert jobs.scheduler.running == 2
+
+    await jobs.submit("a1", "shop-a", Lane.INTERACTIVE)
+    assert jobs.granted[-1] == "a1"
+    for name, shop_id in (("a2", "shop-a"), ("a3", "shop-a"), ("b1", "shop-b")):
+        await jobs.submit(name, shop_id, Lane.INTERACTIVE)
+
+    # Freed slots go to waiting interactive work, round-robin across shops
+    for name in ("bulk1", "a1", "bulk2"):
+        await jobs.finish(name)
+    assert jobs.granted[3:] == ["a2", "b1", "a3"]
+
+    # Bulk only resumes once no interactive work is waiting
+    await jobs.finish("a2")
+    await jobs.finish("b1")
+    assert jobs.granted[6:] == ["bulk3", "bulk4"]
+    assert jobs.max_bulk_running == 2
+
+    for name in ("a3", "bulk3", "bulk4"):
+        await jobs.finish(name)
+    assert jobs.scheduler.running == 0
+    assert jobs.scheduler.queued == 0
+
+
+@pytest.mark.asyncio
+async def test_bulk_steals_idle_reserved_slot_and_yields_it(monkeypatch):
+    monkeypatch.setattr(settings, "OCR_BULK_WORK_STEALING", True)
+    jobs = _Jobs(FairScheduler(slots=2, weights={}, default_weight=1.0, reserved_interactive=1))
+
+    for n in range(1, 4):
+        await jobs.submit(f"bulk{n}", "importer", Lane.BULK)
+    assert jobs.granted == ["bulk1", "bulk2"]
+    assert jobs.scheduler.status()["lanes"][Lane.BULK]["stolen_slots"] == 1
+
+    await jobs.submit("scan", "shop-a", Lane.INTERACTIVE)
+    assert "scan" not in jobs.granted
+
+    # The next image boundary hands the slot to the till, not to bulk3
+    await jobs.finish("bulk1")
+    assert jobs.granted[-1] == "scan"
+
+    await jobs.finish("scan")
+    assert jobs.granted[-1] == "bulk3"
+    await jobs.finish("bulk2")
+    await jobs.finish("bulk3")
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_gives_up_its_place(monkeypatch):
+    monkeypatch.setattr(settings, "OCR_BULK_WORK_STEALING", False)
+    jobs = _Jobs(FairScheduler(slots=1, weights={}, default_weight=1.0, reserved_interactive=0))
+
+    await jobs.submit("first", "shop-a", Lane.INTERACTIVE)
+    await jobs.submit("gone", "shop-b", Lane.INTERACTIVE)
+    await jobs.submit("next", "shop-c", Lane.INTERACTIVE)
+    jobs.tasks["gone"].cancel()
+    await _settle()
+
+    await jobs.finish("first")
+    assert jobs.granted == ["first", "next"]
+    assert jobs.scheduler.queued == 0
+    await jobs.finish("next")
+
+
+def test_bulk_can_always_make_progress():
+    assert FairScheduler(slots=1, weights={}, reserved_interactive=5).reserved_interactive == 0
+    assert FairScheduler(slots=4, weights={}, reserved_interactive=5).reserved_interactive == 3
+
+
+@pytest.mark.asyncio
+async def test_idle_shops_are_forgotten(monkeypatch):
+    monkeypatch.setattr(settings, "OCR_BULK_WORK_STEALING", False)
+    jobs = _Jobs(FairScheduler(slots=1, weights={}, default_weight=1.0, reserved_interactive=0))
+    interactive = jobs.scheduler._lanes[Lane.INTERACTIVE]
+
+    for n in range(50):
+        await jobs.submit(f"scan{n}", f"shop-{n}", Lane.INTERACTIVE)
+    jobs.tasks["scan1"].cancel()
+    await _settle()
+    assert "shop-1" not in interactive.tenants
+    for n in range(50):
+        if n != 1:
+            await jobs.finish(f"scan{n}")
+
+    assert interactive.tenants == {}
+    assert jobs.scheduler.status()["lanes"][Lane.INTERACTIVE]["tenants"] == {}
+
+
+@pytest.mark.asyncio
+async def test_only_weighted_shops_are_named_in_metrics(monkeypatch):
+    from app.core.monitoring import TENANT_QUEUE_DEPTH, TENANT_QUEUE_WAIT
+
+    jobs = _Jobs(FairScheduler(slots=1, weights={"chain": 2.0}, default_weight=1.0, reserved_interactive=0))
+    await jobs.submit("chain1", "chain", Lane.INTERACTIVE)
+    for n in range(3):
+        await jobs.submit(f"scan{n}", f"corner-shop-{n}", Lane.INTERACTIVE)
+
+    tenants = {
+        sample.labels["tenant"]
+        for metric in (TENANT_QUEUE_DEPTH, TENANT_QUEUE_WAIT)
+        for family in metric.collect()
+        for sample in family.samples
+    }
+    assert "chain" in tenants and "other" in tenants
+    assert not any(tenant.startswith("corner-shop") for tenant in tenants)
+    # Waiting shops outside the weights are summed into one series
+    assert TENANT_QUEUE_DEPTH.labels(tenant="other", lane=Lane.INTERACTIVE)._value.get() == 3
+
+    for name in ("chain1", "scan0", "scan1", "scan2"):
+        await jobs.finish(name)
@@ -0,0 +1,103 @@
+"""Tests for request coalescing in app/services/singleflight.py."""
+
+import asyncio
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.models.schemas import OCRResult
+from app.services.deadlines import DeadlineExceeded, is_expired
+from app.services.singleflight import SingleFlight, request_key
+
+
+class _Work:
+    """OCR work that finishes when released and counts its runs."""
+
+    def __init__(self) -> None:
+        self.runs = 0
+        self.release = asyncio.Event()
+        self.requests = []
+
+    async def __call__(self, request) -> OCRResult:
+        self.runs += 1
+        self.requests.append(request)
+        await self.release.wait()
+        return OCRResult(id="job", text="Milk 3.50", processing_time_ms=200, model_used="trocr")
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_share_one_run(make_request):
+    flights, work = SingleFlight(), _Work()
+
+    first = asyncio.create_task(flights.run("k", make_request(), work))
+    second = asyncio.create_task(flights.run("k", make_request(), work))
+    await asyncio.sleep(0)
+    work.release.set()
+    results = await asyncio.gather(first, second)
+
+    assert work.runs == 1
+    assert flights.coalesced == 1
+    assert [result.text for result in results] == ["Milk 3.50"] * 2
+    # Every caller gets its own copy
+    assert results[0] is not results[1]
+    assert flights.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_retry_joins_work_of_disconnected_client(make_request, monkeypatch):
+    monkeypatch.setattr(settings, "OCR_SINGLEFLIGHT_GRACE_SECONDS", 5)
+    flights, work = SingleFlight(), _Work()
+    original = make_request()
+
+    first = asyncio.create_task(flights.run("k", original, work))
+    await asyncio.sleep(0)
+    first.cancel()
+    await asyncio.gather(first, return_exceptions=True)
+    retry = asyncio.create_task(flights.run("k", make_request(), work))
+    await asyncio.sleep(0)
+    work.release.set()
+
+    assert (await retry).text == "Milk 3.50"
+    assert work.runs == 1
+    # The work ran on a private copy, so cancelling the caller did not expire it
+    assert work.requests[0] is not original
+    assert not is_expired(work.requests[0])
+
+
+@pytest.mark.asyncio
+async def test_work_without_waiters_is_abandoned_after_grace(make_request, monkeypatch):
+    monkeypatch.setattr(settings, "OCR_SINGLEFLIGHT_GRACE_SECONDS", 0.01)
+    flights, work = SingleFlight(), _Work()
+
+    caller = asyncio.create_task(flights.run("k", make_request(), work))
+    await asyncio.sleep(0)
+    caller.cancel()
+    await asyncio.gather(caller, return_exceptions=True)
+    await asyncio.sleep(0.05)
+
+    assert flights.in_flight == 0
+    assert is_expired(work.requests[0])
+
+
+@pytest.mark.asyncio
+async def test_follower_stops_waiting_at_its_deadline(make_request):
+    flights, work = SingleFlight(), _Work()
+
+    leader = asyncio.create_task(flights.run("k", make_request(), work))
+    with pytest.raises(DeadlineExceeded):
+        await flights.run("k", make_request(deadline=time.time() + 0.01), work)
+    work.release.set()
+
+    assert (await leader).text == "Milk 3.50"
+
+
+@pytest.mark.asyncio
+async def test_request_key(make_request):
+    image = make_request(image_bytes=b"jpeg")
+
+    assert await request_key(image) == await request_key(make_request(image_bytes=b"jpeg"))
+    assert await request_key(image) != await request_key(make_request(image_bytes=b"jpeg", ocr_type="receipt"))
+    assert await request_key(make_request(idempotency_key="abc")) == "idem:user-1:abc"
+    assert (await request_key(make_request(storage_key="uploads/1.jpg"))).startswith("img:object:uploads/1.jpg:")
+    assert await request_key(make_request()) is None
@@ -0,0 +1,46 @@
+"""Tests for the startup timeline in app/core/startup.py."""
+
+import pytest
+
+from app.core.startup import StartupTimeline
+
+
+def test_phases_are_recorded_in_order():
+    timeline = StartupTimeline()
+
+    with timeline.phase("database"):
+        pass
+    with pytest.raises(ConnectionError):
+        with timeline.phase("redis"):
+            raise ConnectionError("connection refused")
+
+    database, redis = timeline.as_dict()["phases"]
+    assert (database["phase"], database["status"]) == ("database", "completed")
+    assert (redis["phase"], redis["status"], redis["error"]) == ("redis", "failed", "connection refused")
+    assert database["finished_ms"] <= redis["started_ms"]
+    assert redis["duration_ms"] == pytest.approx(redis["finished_ms"] - redis["started_ms"], abs=0.2)
+
+
+def test_running_phase_is_visible():
+    timeline = StartupTimeline()
+
+    with timeline.phase("engine:trocr"):
+        (phase,) = timeline.as_dict()["phases"]
+        assert phase["status"] == "running"
+        assert "finished_ms" not in phase
+
+
+def test_ready_is_marked_once(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("app.core.startup.time.monotonic", lambda: now[0])
+    timeline = StartupTimeline()
+
+    assert timeline.as_dict()["ready_ms"] is None
+    now[0] = 102.5
+    timeline.mark_ready()
+    # A later readiness flap does not move the first ready time
+    now[0] = 109.0
+    timeline.mark_ready()
+
+    now[0] = 110.0
+    assert timeline.as_dict() == {"uptime_seconds": 10.0, "ready_ms": 2500.0, "phases": []}
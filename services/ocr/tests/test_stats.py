@@ -0,0 +1,111 @@
+"""Tests for the rolling request statistics in app/core/stats.py."""
+
+import random
+import types
+
+import pytest
+
+from app.core import stats
+from app.core.stats import QuantileSketch, RollingStats
+
+START = 1_700_000_000.0
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [START]
+    monkeypatch.setattr(stats, "time", types.SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+def test_sketch_quantiles_stay_within_accuracy():
+    rng = random.Random(7)
+    values = [rng.lognormvariate(5, 1) for _ in range(5000)]
+    sketch = QuantileSketch(accuracy=0.01)
+    for value in values:
+        sketch.add(value)
+
+    ordered = sorted(values)
+    for q in (0.5, 0.95, 0.99):
+        exact = ordered[int(q * (len(ordered) - 1))]
+        assert sketch.quantile(q) == pytest.approx(exact, rel=0.01)
+    assert sketch.total == pytest.approx(sum(values))
+
+
+def test_sketch_merge_matches_one_sketch():
+    whole, low, high = QuantileSketch(), QuantileSketch(), QuantileSketch()
+    for value in range(1, 201):
+        whole.add(value)
+        (low if value <= 100 else high).add(value)
+
+    low.merge(high)
+
+    assert low.count == whole.count == 200
+    assert [low.quantile(q) for q in (0.1, 0.5, 0.9)] == [whole.quantile(q) for q in (0.1, 0.5, 0.9)]
+    assert QuantileSketch().quantile(0.5) is None
+
+
+def test_windows_age_out_old_requests(clock):
+    rolling = RollingStats()
+    for _ in range(6):
+        rolling.request_started()
+        rolling.request_finished(0.1)
+
+    clock[0] += 120
+    rolling.request_started()
+    rolling.request_finished(0.3)
+
+    summary = rolling.summary()
+    assert [summary["windows"][name]["requests"] for name in ("1m", "5m", "15m")] == [1, 7, 7]
+    assert summary["windows"]["1m"]["latency_ms"]["p50"] == pytest.approx(300, rel=0.01)
+
+    # Past 15 minutes the ring slots of the first burst are reused, not merged
+    clock[0] += 900
+    rolling.request_started()
+    rolling.request_finished(0.05)
+    assert rolling.window(900)["requests"] == 1
+    assert rolling.summary()["total_requests"] == 8
+
+
+def test_window_rates(clock):
+    rolling = RollingStats()
+    for error_type in (None, None, None, "Timeout"):
+        rolling.request_started()
+        rolling.request_finished(0.2, error_type=error_type)
+    rolling.record_cache(hit=True)
+    rolling.record_cache(hit=False)
+    rolling.record_cache(hit=False)
+    clock[0] += 30
+
+    window = rolling.window(60)
+
+    # Up for 30 s only: throughput over uptime, not the whole minute
+    assert window["throughput_rps"] == pytest.approx(4 / 30, abs=0.001)
+    assert window["error_rate"] == 0.25
+    assert window["errors_by_type"] == {"Timeout": 1}
+    assert window["cache_hit_ratio"] == pytest.approx(1 / 3, abs=0.0001)
+    assert window["max_in_flight"] == 1
+
+
+def test_empty_window(clock):
+    window = RollingStats().window(60)
+
+    assert window["requests"] == 0
+    assert window["error_rate"] == 0.0
+    assert window["cache_hit_ratio"] is None
+    assert window["latency_ms"] == {"mean": None, "p50": None, "p95": None, "p99": None}
+
+
+def test_in_flight_and_confidence(clock):
+    rolling = RollingStats()
+    for _ in range(3):
+        rolling.request_started()
+    rolling.request_finished(0.1, model="trocr", confidence=0.9)
+    rolling.request_finished(0.1, model="trocr", confidence=0.7)
+    rolling.request_finished(0.1, error_type="ValueError", model="trocr", confidence=0.0)
+
+    assert rolling.in_flight == 0
+    assert rolling.window(60)["max_in_flight"] == 3
+    # Failed requests do not drag the model's confidence down
+    assert rolling.mean_confidence() == {"trocr": 0.8}
+    assert rolling.summary()["errors_by_type"] == {"ValueError": 1}
@@ -0,0 +1,86 @@
+"""Tests for app/services/storage.py and the stored-upload lookup."""
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.v1 import api
+from app.core.config import settings
+from app.services import storage
+from app.services.storage import (
+    LocalObjectStore,
+    ObjectNotFound,
+    ObjectStore,
+    get_object_store,
+    is_clean_key,
+    is_shop_upload
+)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = LocalObjectStore("ocr", root=str(tmp_path))
+    monkeypatch.setattr(api, "get_object_store", lambda bucket=None: store)
+    return store
+
+
+@pytest.mark.parametrize(
+    "key",
+    [
+        "uploads/shopA/../shopB/x.jpg",
+        "uploads/shopA/./x.jpg",
+        "uploads/shopA//x.jpg",
+        "/uploads/shopA/x.jpg",
+        "uploads/shopA/..",
+        "uploads\\shopA\\x.jpg",
+    ],
+)
+def test_unclean_keys_are_rejected(key):
+    assert not is_clean_key(key)
+    assert not is_shop_upload(key, "shopA")
+
+
+def test_shop_upload_must_be_under_the_shop_prefix():
+    assert is_shop_upload("uploads/shopA/x.jpg", "shopA")
+    assert not is_shop_upload("uploads/shopB/x.jpg", "shopA")
+    assert not is_shop_upload("uploads/shopAB/x.jpg", "shopA")
+
+
+@pytest.mark.asyncio
+async def test_local_store_refuses_traversal(store):
+    await store.put_bytes("uploads/shopB/x.jpg", b"shop b")
+
+    assert await store.get_bytes("uploads/shopB/x.jpg") == b"shop b"
+    with pytest.raises(ObjectNotFound):
+        await store.get_bytes("uploads/shopA/../shopB/x.jpg")
+    with pytest.raises(ObjectNotFound):
+        await store.stat("uploads/shopA/../shopB/x.jpg")
+
+
+@pytest.mark.asyncio
+async def test_stored_upload_cannot_reach_another_shop(store):
+    await store.put_bytes("uploads/shopA/own.jpg", b"shop a")
+    await store.put_bytes("uploads/shopB/x.jpg", b"shop b")
+    user = {"user_id": "user-1", "shop_id": "shopA"}
+
+    assert (await api.stored_upload("uploads/shopA/own.jpg", user)).size == len(b"shop a")
+    for key in ("uploads/shopA/../shopB/x.jpg", "uploads/shopB/x.jpg"):
+        with pytest.raises(HTTPException) as error:
+            await api.stored_upload(key, user)
+        assert error.value.status_code == 404
+
+
+def test_object_store_is_abstract():
+    with pytest.raises(TypeError):
+        ObjectStore("ocr")
+
+
+def test_get_object_store_reuses_one_store_per_bucket(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "_stores", {})
+    monkeypatch.setattr(settings, "OCR_STORAGE_BACKEND", "local")
+    monkeypatch.setattr(settings, "OCR_STORAGE_LOCAL_DIR", str(tmp_path))
+
+    store = get_object_store("ocr")
+
+    assert isinstance(store, LocalObjectStore)
+    assert get_object_store("ocr") is store
+    assert get_object_store("results") is not store
@@ -0,0 +1,54 @@
+"""Tests for app/services/structured_parser.py."""
+
+from app.services.structured_parser import parse_structured_data, scan_document
+
+RECEIPT = """FRESH MART
+Milk 2L   3.50
+Bread     2.25
+Subtotal  5.75
+Tax       0.46
+Total     6.21
+Invoice No: INV-1042"""
+
+
+def test_scan_document_collects_receipt_fields():
+    document = scan_document(RECEIPT)
+
+    assert document.first_line == "FRESH MART"
+    assert [(item.name, item.amount) for item in document.line_items] == [("Milk 2L", 3.5), ("Bread", 2.25)]
+    assert document.subtotal == 5.75
+    assert document.tax == 0.46
+    assert document.total == 6.21
+    assert document.total_amount == 6.21
+    assert document.invoice_number == "INV-1042"
+    assert document.numeric_lines == 6
+
+
+def test_scan_document_prefers_marked_price():
+    document = scan_document("Coca Cola 330ml\nPrice: $1.50")
+
+    assert document.first_line == "Coca Cola 330ml"
+    assert document.marked_amount == 1.5
+    assert document.to_product()["price"] == 1.5
+
+
+def test_scan_document_ignores_blank_lines():
+    document = scan_document("\n\n   \nTotal 4.00\n")
+
+    assert document.first_line == "Total 4.00"
+    assert document.total == 4.0
+
+
+def test_parse_structured_data_by_type():
+    assert parse_structured_data(RECEIPT, "barcode") == {}
+    product = parse_structured_data("Coca Cola 330ml\nPrice: $1.50", "product")
+    assert product["product_name"] == "Coca Cola 330ml"
+    assert product["currency"] == "USD"
+
+
+def test_scan_document_folds_bengali_digits():
+    document = scan_document("রহমান স্টোর\nচাল ৫ x ৮৪.০০ ৪২০.০০\nমোট ৪২০.০০ টাকা", language="bn")
+
+    assert document.total == 420.0
+    assert [(item.quantity, item.unit_price, item.amount) for item in document.line_items] == [(5.0, 84.0, 420.0)]
+    assert document.marked_amount == 420.0
@@ -0,0 +1,72 @@
+"""Tests for app/services/tiling.py."""
+
+from PIL import Image, ImageDraw
+
+from app.core.config import settings
+from app.services.tiling import Tile, merge_tiles, plan_tiles
+
+
+def _words(draw: ImageDraw.ImageDraw, left: int, right: int, top: int) -> None:
+    """A run of glyph-sized blocks from ``left`` to ``right``."""
+    for x in range(left, right, 9):
+        draw.rectangle([x, top, x + 5, top + 14], fill=0)
+
+
+def _page() -> Image.Image:
+    image = Image.new("L", (900, 300), 255)
+    draw = ImageDraw.Draw(image)
+    # Two columns, then one line too wide for a single tile, then a logo
+    _words(draw, 20, 200, 20)
+    _words(draw, 500, 600, 20)
+    _words(draw, 20, 880, 100)
+    draw.rectangle([650, 150, 780, 290], fill=0)
+    return image
+
+
+def test_plan_tiles_reading_order_and_columns():
+    tiles = plan_tiles(_page())
+
+    assert [tile.row for tile in tiles] == [0, 0, 0, 1, 1, 1, 1, 1, 1]
+    first_row = [tile for tile in tiles if tile.row == 0]
+    assert [tile.box[0] < 250 for tile in first_row] == [True, True, False]
+    # A column gap never continues the previous segment numbering
+    assert first_row[2].segment > first_row[1].segment + 1
+
+
+def test_plan_tiles_splits_wide_lines_with_overlap():
+    wide = [tile for tile in plan_tiles(_page()) if tile.row == 1]
+
+    assert [tile.segment for tile in wide] == list(range(len(wide)))
+    for tile in wide:
+        left, top, right, bottom = tile.box
+        assert right - left <= (bottom - top) * settings.OCR_TILE_MAX_ASPECT
+        assert tile.image.size == (right - left, bottom - top)
+    for previous, tile in zip(wide, wide[1:]):
+        assert tile.box[0] < previous.box[2]
+
+
+def test_plan_tiles_skips_logos_and_blank_pages():
+    assert all(tile.box[1] < 150 for tile in plan_tiles(_page()))
+    assert plan_tiles(Image.new("L", (400, 300), 255)) == []
+
+
+def _tile(row: int, segment: int, text: str) -> Tile:
+    tile = Tile(row, (0, 0, 1, 1), Image.new("L", (1, 1)), segment)
+    tile.text = text
+    return tile
+
+
+def test_merge_tiles_drops_overlap_words():
+    tiles = [_tile(0, 0, "Total quantity of"), _tile(0, 1, "Quantity of items"), _tile(1, 0, "12.50")]
+
+    assert merge_tiles(tiles) == "Total quantity of items\n12.50"
+
+
+def test_merge_tiles_rejoins_cut_words():
+    assert merge_tiles([_tile(0, 0, "Grand Quant"), _tile(0, 1, "antity 5")]) == "Grand Quantity 5"
+
+
+def test_merge_tiles_keeps_columns_apart():
+    tiles = [_tile(0, 0, "Milk"), _tile(0, 2, "Milk"), _tile(1, 0, ""), _tile(2, 0, "Total")]
+
+    assert merge_tiles(tiles) == "Milk Milk\nTotal"
@@ -0,0 +1,130 @@
+"""Tests for model warm-up in app/services/warmup.py."""
+
+import types
+
+import pytest
+
+from app.core.config import settings
+from app.services import warmup
+from app.services.warmup import (
+    configure_torch_threads,
+    optimize_model,
+    parse_batch_sizes,
+    run_warmup,
+    synthetic_images
+)
+
+
+class FakeClock:
+    """perf_counter that advances by a scripted latency on every inference call."""
+
+    def __init__(self, latencies_ms):
+        self.latencies = iter(latencies_ms)
+        self.now = 0.0
+
+    def perf_counter(self):
+        return self.now
+
+    def infer(self, images):
+        self.now += next(self.latencies) / 1000
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    def install(latencies_ms):
+        fake = FakeClock(latencies_ms)
+        monkeypatch.setattr(warmup, "time", types.SimpleNamespace(perf_counter=fake.perf_counter))
+        return fake
+
+    return install
+
+
+def test_parse_batch_sizes():
+    assert parse_batch_sizes("5, 1,5,,8") == [1, 5, 8]
+    assert parse_batch_sizes("0,-2") == [1]
+
+
+def test_synthetic_images_look_like_scans():
+    images = synthetic_images(3)
+
+    assert [image.size for image in images] == [(384, 96)] * 3
+    # Text was drawn, not blank canvases
+    assert all(image.convert("L").getextrema()[0] < 128 for image in images)
+
+
+def test_warmup_stops_once_p95_settles(clock):
+    # Windows of 3: p95 50 -> 12 (still falling) -> 11 (within 10%): settled
+    fake = clock([50, 40, 30, 12, 10, 11, 10, 11, 10, 99, 99, 99])
+
+    report = run_warmup(fake.infer, [4], window=3, max_iterations=30, tolerance=0.1)
+
+    batch = report["batches"]["4"]
+    assert batch["iterations"] == 9
+    assert batch["first_call_ms"] == 50
+    assert (batch["p50_ms"], batch["p95_ms"]) == (10, 11)
+    assert batch["settled"] and report["settled"]
+
+
+def test_warmup_gives_up_after_max_iterations(clock):
+    fake = clock([10, 10, 30, 30, 10, 10, 5, 5, 5, 5, 5, 5])
+
+    report = run_warmup(fake.infer, [1, 2], window=2, max_iterations=6, tolerance=0.1)
+
+    assert report["batches"]["1"] == {
+        "iterations": 6, "first_call_ms": 10, "p50_ms": 10, "p95_ms": 10, "settled": False
+    }
+    # The next batch size starts over and settles on its own
+    assert report["batches"]["2"]["settled"]
+    assert not report["settled"]
+
+
+class FakeTorch:
+    def __init__(self, interop_error=None):
+        self.threads = 8
+        self.interop = 8
+        self.interop_error = interop_error
+
+    def set_num_threads(self, count):
+        self.threads = count
+
+    def set_num_interop_threads(self, count):
+        if self.interop_error:
+            raise RuntimeError(self.interop_error)
+        self.interop = count
+
+    def get_num_threads(self):
+        return self.threads
+
+    def get_num_interop_threads(self):
+        return self.interop
+
+
+def test_configure_torch_threads(monkeypatch):
+    monkeypatch.setattr(settings, "OCR_TORCH_INTRA_OP_THREADS", 4)
+    monkeypatch.setattr(settings, "OCR_TORCH_INTER_OP_THREADS", 0)
+
+    assert configure_torch_threads(FakeTorch()) == {"intra_op": 4, "inter_op": 8}
+
+    monkeypatch.setattr(settings, "OCR_TORCH_INTER_OP_THREADS", 2)
+    started = FakeTorch(interop_error="cannot set number of interop threads after parallel work has started")
+    # Too late to change inter-op threads: keep running with what torch has
+    assert configure_torch_threads(started) == {"intra_op": 4, "inter_op": 8}
+
+
+def test_optimize_model_falls_back_to_eager():
+    model = types.SimpleNamespace(encoder="eager")
+
+    assert optimize_model(model, object(), "none", None) == "none"
+    assert optimize_model(model, object(), "onnx", None) == "none"
+    # torch<2.0 has no torch.compile
+    assert optimize_model(model, object(), "compile", None) == "none"
+    assert model.encoder == "eager"
+
+
+def test_optimize_model_compiles_the_encoder():
+    torch = types.SimpleNamespace(compile=lambda module, dynamic: ("compiled", module, dynamic))
+    model = types.SimpleNamespace(encoder="eager", decoder="eager")
+
+    assert optimize_model(model, torch, "COMPILE", None) == "compile"
+    assert model.encoder == ("compiled", "eager", False)
+    assert model.decoder == "eager"